@@ -0,0 +1,195 @@
+"""
+Notifica SDK — Query Cache
+==========================
+Optionele persistente cache voor query-resultaten op schijf (Parquet).
+
+Sleutel: (klantnummer, genormaliseerde SQL) of (klantnummer, template, parameters),
+plus het transport: JSON (met to_numeric) en Arrow leveren andere dtypes.
+Meerdere processen (Streamlit sessies, CLI scripts) delen dezelfde map en
+dus dezelfde warme resultaten.
+
+Gebruik:
+    from notifica_sdk import NotificaClient, QueryCache
+
+    cache = QueryCache('~/.cache/notifica', ttl=3600, max_bytes=500_000_000)
+    client = NotificaClient(cache=cache)
+
+Of via environment: NOTIFICA_CACHE_DIR (+ optioneel NOTIFICA_CACHE_TTL,
+NOTIFICA_CACHE_MAX_MB).
+
+Vereist pyarrow (of fastparquet) voor Parquet opslag.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+
+def normalize_sql(sql: str) -> str:
+    """Normaliseer SQL voor de cache-sleutel: whitespace samenvoegen, afsluitende ; weg.
+
+    Hoofdletters blijven staan — string literals zijn hoofdlettergevoelig.
+    """
+    return re.sub(r'\s+', ' ', sql).strip().rstrip(';').strip()
+
+
+def fingerprint(klantnummer: int, kind: str, payload: dict) -> str:
+    """Stabiele hash voor een query (kind = 'sql' of 'template')."""
+    raw = json.dumps(
+        {'klantnummer': int(klantnummer), 'kind': kind, **payload},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """Parquet-cache met TTL en LRU-eviction op totale grootte.
+
+    Per entry staan twee bestanden in de map:
+        <key>.parquet  - het resultaat (mtime = laatst gebruikt, voor LRU)
+        <key>.json     - metadata (aanmaaktijd voor TTL, klantnummer, query)
+
+    Schrijven gaat via een tijdelijk bestand + os.replace, zodat gelijktijdige
+    processen nooit een half geschreven bestand lezen.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = 3600, max_bytes: Optional[int] = 500 * 1024 * 1024):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                raise ImportError("QueryCache vereist pyarrow of fastparquet: pip install pyarrow")
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['QueryCache']:
+        """Maak een cache op basis van NOTIFICA_CACHE_DIR (None als niet gezet)."""
+        directory = os.getenv('NOTIFICA_CACHE_DIR', '')
+        if not directory:
+            return None
+        ttl = float(os.getenv('NOTIFICA_CACHE_TTL', '3600'))
+        max_mb = float(os.getenv('NOTIFICA_CACHE_MAX_MB', '500'))
+        return cls(directory, ttl=ttl, max_bytes=int(max_mb * 1024 * 1024))
+
+    # ===== Sleutels =====
+
+    @staticmethod
+    def key_for_sql(klantnummer: int, sql: str, max_rows: int = None, transport: str = 'json') -> str:
+        return fingerprint(klantnummer, 'sql', {
+            'sql': normalize_sql(sql), 'max_rows': max_rows, 'transport': transport,
+        })
+
+    @staticmethod
+    def key_for_template(klantnummer: int, template_name: str, parameters: dict = None,
+                         transport: str = 'json') -> str:
+        return fingerprint(klantnummer, 'template', {
+            'template': template_name, 'parameters': parameters or {}, 'transport': transport,
+        })
+
+    def _paths(self, key: str):
+        return self.directory / f'{key}.parquet', self.directory / f'{key}.json'
+
+    # ===== Lezen / schrijven =====
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Haal een resultaat op, of None bij miss/verlopen entry."""
+        data_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if self.ttl is not None and time.time() - meta['created'] > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            df = pd.read_parquet(data_path)
+            os.utime(data_path, None)  # LRU: markeer als recent gebruikt
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        except Exception:
+            # Corrupt bestand (bijv. afgebroken schrijfactie) — weggooien
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+    def put(self, key: str, df: pd.DataFrame, **meta):
+        """Sla een resultaat op. Niet-serialiseerbare resultaten worden overgeslagen."""
+        data_path, meta_path = self._paths(key)
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, data_path)
+        except Exception:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        meta_tmp = meta_path.with_suffix('.json.tmp')
+        meta_tmp.write_text(json.dumps({'created': time.time(), **meta}, default=str), encoding='utf-8')
+        os.replace(meta_tmp, meta_path)
+        self._evict()
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Verwijder least-recently-used entries tot de cache onder max_bytes zit."""
+        if self.max_bytes is None:
+            return
+        entries = []
+        total = 0
+        for path in self.directory.glob('*.parquet'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path.stem))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, key in sorted(entries):
+            self._remove(key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self, klantnummer: int = None):
+        """Leeg de cache (optioneel alleen voor één klant)."""
+        for meta_path in self.directory.glob('*.json'):
+            if klantnummer is not None:
+                try:
+                    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                except (OSError, ValueError):
+                    continue
+                if meta.get('klantnummer') != int(klantnummer):
+                    continue
+            self._remove(meta_path.stem)
+
+    def stats(self) -> dict:
+        sizes = [p.stat().st_size for p in self.directory.glob('*.parquet')]
+        return {
+            'entries': len(sizes),
+            'bytes': sum(sizes),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -12,5 +12,8 @@ setup(
     ],
     extras_require={
         'dotenv': ['python-dotenv>=1.0'],
+        'cache': ['pyarrow>=14.0'],
+        'arrow': ['pyarrow>=14.0'],
+        'async': ['httpx>=0.24'],
     },
 )
@@ -0,0 +1,136 @@
+"""
+Test: async client (notifica_sdk/async_client.py)
+=================================================
+AsyncNotificaClient tegen een httpx.MockTransport stub: gather_queries
+begrenst het aantal gelijktijdige requests, levert frames per naam,
+geeft fouten per query terug met return_exceptions, en een 429 pauzeert
+de scheduler en wordt opnieuw geprobeerd. Met een QueryCache komt een
+tweede run volledig uit de cache.
+
+Draaien:
+    python -m pytest test_async_client.py -q
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+
+import httpx
+
+from notifica_sdk import AsyncNotificaClient, QueryCache, RateLimitScheduler, ValidationError
+
+
+class _RecordingScheduler(RateLimitScheduler):
+    def __init__(self):
+        super().__init__(max_requests=1000, period=1.0)
+        self.pauses = []
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+        super().pause(seconds)
+
+
+class _Stub:
+    """Async handler: antwoordt met de SQL als waarde; 'FOUT' geeft 400, 'DRUK' eerst een 429."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        sql = json.loads(request.content)['sql']
+        self.requests.append(sql)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if sql == 'FOUT':
+            return httpx.Response(400, json={'error': 'syntax error'})
+        if sql == 'DRUK' and self.requests.count('DRUK') == 1:
+            return httpx.Response(429, headers={'Retry-After': '0.1'}, json={'error': 'rate limit'})
+        return httpx.Response(200, json={'columns': ['sql', 'n'], 'rows': [[sql, '1']]})
+
+
+def _client(stub, cache=False):
+    client = AsyncNotificaClient(api_url='http://stub', app_key='test', cache=cache,
+                                 transport='json', max_retries=2, scheduler=_RecordingScheduler())
+    client._http = httpx.AsyncClient(base_url='http://stub', transport=httpx.MockTransport(stub))
+    return client
+
+
+def test_gather_bounds_concurrency_and_keys_results():
+    stub = _Stub(delay=0.05)
+    queries = {f'q{i}': f'SELECT {i}' for i in range(6)}
+
+    async def main():
+        async with _client(stub) as client:
+            return await client.gather_queries(1229, queries, max_concurrency=2)
+
+    result = asyncio.run(main())
+    assert list(result) == list(queries)
+    assert {name: df['sql'].iloc[0] for name, df in result.items()} == queries
+    assert result['q0']['n'].tolist() == [1]
+    assert stub.peak == 2
+
+
+def test_return_exceptions_per_query():
+    stub = _Stub()
+    queries = {'goed': 'SELECT 1', 'fout': 'FOUT'}
+
+    async def main(return_exceptions):
+        async with _client(stub) as client:
+            return await client.gather_queries(1229, queries, return_exceptions=return_exceptions)
+
+    result = asyncio.run(main(True))
+    assert isinstance(result['fout'], ValidationError)
+    assert result['goed']['sql'].tolist() == ['SELECT 1']
+
+    try:
+        asyncio.run(main(False))
+        raise AssertionError("ValidationError verwacht")
+    except ValidationError:
+        pass
+
+
+def test_429_pauses_scheduler_and_retries():
+    stub = _Stub()
+
+    async def main():
+        async with _client(stub) as client:
+            start = time.monotonic()
+            result = await client.gather_queries(1229, {'druk': 'DRUK'})
+            return client.scheduler, result, time.monotonic() - start
+
+    scheduler, result, elapsed = asyncio.run(main())
+    assert stub.requests == ['DRUK', 'DRUK']
+    assert scheduler.pauses == [0.1] and elapsed >= 0.09
+    assert result['druk']['sql'].tolist() == ['DRUK']
+
+
+def test_second_gather_comes_from_cache():
+    stub = _Stub()
+    queries = {'a': 'SELECT 1', 'b': 'SELECT 2'}
+
+    async def main(cache):
+        async with _client(stub, cache=cache) as client:
+            return await client.gather_queries(1229, queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QueryCache(tmp)
+        first = asyncio.run(main(cache))
+        second = asyncio.run(main(cache))
+    assert len(stub.requests) == 2
+    for name in queries:
+        assert first[name].equals(second[name])
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
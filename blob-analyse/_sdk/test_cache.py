@@ -0,0 +1,97 @@
+"""
+Test: persistente query cache (notifica_sdk/cache.py)
+=====================================================
+Controleert TTL, LRU-eviction op totale grootte (mtime = laatst gebruikt),
+configuratie via environment en dat de sleutels sql, template en transport
+uit elkaar houden.
+
+Draaien:
+    python -m pytest test_cache.py -q
+"""
+
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from notifica_sdk import QueryCache
+
+FRAME = pd.DataFrame({'week_start': ['2025-01-06', '2025-01-13'], 'inkomsten': [1200.5, 980.0]})
+
+
+def test_round_trip_and_ttl_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QueryCache(tmp, ttl=0.2)
+        key = QueryCache.key_for_sql(1229, 'SELECT 1')
+        assert cache.get(key) is None
+        cache.put(key, FRAME, klantnummer=1229)
+        pd.testing.assert_frame_equal(cache.get(key), FRAME)
+
+        time.sleep(0.3)
+        assert cache.get(key) is None
+        assert cache.stats() == {'entries': 0, 'bytes': 0, 'hits': 1, 'misses': 2}
+
+
+def test_lru_eviction_by_size_and_mtime():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QueryCache(tmp, ttl=None, max_bytes=None)
+        a, b, c = (QueryCache.key_for_sql(1229, f'SELECT {n}') for n in 'abc')
+        cache.put(a, FRAME)
+        cache.put(b, FRAME)
+        size = cache.stats()['bytes'] // 2
+
+        # a en b zijn oud; a wordt daarna gelezen en is dus recent gebruikt
+        now = time.time()
+        os.utime(cache._paths(a)[0], (now - 100, now - 100))
+        os.utime(cache._paths(b)[0], (now - 50, now - 50))
+        assert cache.get(a) is not None
+
+        cache.max_bytes = int(size * 2.5)
+        cache.put(c, FRAME)
+        assert cache.get(b) is None
+        assert cache.get(a) is not None and cache.get(c) is not None
+        assert cache.stats()['entries'] == 2
+
+
+def test_from_env():
+    saved = {k: os.environ.pop(k, None) for k in ('NOTIFICA_CACHE_DIR', 'NOTIFICA_CACHE_TTL', 'NOTIFICA_CACHE_MAX_MB')}
+    try:
+        assert QueryCache.from_env() is None
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ.update(NOTIFICA_CACHE_DIR=tmp, NOTIFICA_CACHE_TTL='60', NOTIFICA_CACHE_MAX_MB='2')
+            cache = QueryCache.from_env()
+            assert str(cache.directory) == tmp
+            assert cache.ttl == 60 and cache.max_bytes == 2 * 1024 * 1024
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def test_keys_separate_sql_template_and_transport():
+    sql = QueryCache.key_for_sql(1229, 'cashflow')
+    template = QueryCache.key_for_template(1229, 'cashflow')
+    assert sql != template
+
+    # Whitespace en afsluitende ; tellen niet mee, hoofdletters wel
+    assert QueryCache.key_for_sql(1229, 'SELECT  *\n FROM x;') == QueryCache.key_for_sql(1229, 'SELECT * FROM x')
+    assert QueryCache.key_for_sql(1229, "SELECT 'A'") != QueryCache.key_for_sql(1229, "SELECT 'a'")
+
+    assert QueryCache.key_for_sql(1229, 'SELECT 1') != QueryCache.key_for_sql(1230, 'SELECT 1')
+    assert QueryCache.key_for_sql(1229, 'SELECT 1') != QueryCache.key_for_sql(1229, 'SELECT 1', max_rows=10)
+    assert (QueryCache.key_for_template(1229, 't', {'jaar': 2024})
+            != QueryCache.key_for_template(1229, 't', {'jaar': 2025}))
+
+    # JSON (to_numeric) en Arrow leveren andere dtypes: aparte entries
+    assert QueryCache.key_for_sql(1229, 'SELECT 1', transport='json') != QueryCache.key_for_sql(1229, 'SELECT 1', transport='arrow')
+    assert QueryCache.key_for_template(1229, 't', transport='json') != QueryCache.key_for_template(1229, 't', transport='arrow')
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
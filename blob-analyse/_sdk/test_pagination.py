@@ -0,0 +1,114 @@
+"""
+Test: gepagineerde queries (NotificaClient.query_iter)
+======================================================
+Een lokale stub server voert de pagina-SQL uit op een tabel in het geheugen
+(WHERE key > x, LIMIT, OFFSET) en kapt desgewenst af op een eigen max_rows,
+zoals App Beheer dat doet.
+
+Draaien:
+    python -m pytest test_pagination.py -q
+"""
+
+import json
+import re
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+
+from notifica_sdk import NotificaClient, RateLimitScheduler
+
+ROWS = [{'id': i, 'bedrag': i * 10.0} for i in range(1, 26)]  # 25 rijen
+
+
+def _start_server(rows, server_cap=None):
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            sql = body['sql']
+            requests_seen.append(sql)
+            page = list(rows)
+            after = re.search(r'WHERE _page\."id" > (\d+)', sql)
+            if after:
+                page = [r for r in page if r['id'] > int(after.group(1))]
+            offset = re.search(r'OFFSET (\d+)', sql)
+            if offset:
+                page = page[int(offset.group(1)):]
+            page = page[:int(re.search(r'LIMIT (\d+)', sql).group(1))]
+            if server_cap:
+                page = page[:server_cap]
+            payload = json.dumps({
+                'columns': ['id', 'bedrag'],
+                'rows': [[str(r['id']), str(r['bedrag'])] for r in page],
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = NotificaClient(api_url=f'http://127.0.0.1:{server.server_port}', app_key='test',
+                            cache=False, transport='json', scheduler=RateLimitScheduler(1000, 1.0))
+    return server, client, requests_seen
+
+
+def test_keyset_pages_until_short_last_page():
+    server, client, seen = _start_server(ROWS)
+    try:
+        pages = list(client.query_iter(1229, 'SELECT * FROM x', page_size=10, key_column='id'))
+    finally:
+        server.shutdown()
+    assert [len(p) for p in pages] == [10, 10, 5]
+    assert pd.concat(pages)['id'].tolist() == list(range(1, 26))
+    assert 'WHERE _page."id" > 10' in seen[1] and 'WHERE _page."id" > 20' in seen[2]
+    # Na de korte laatste pagina nog één controle: leeg, dus klaar
+    assert len(seen) == 4 and 'WHERE _page."id" > 25' in seen[3]
+
+
+def test_offset_pages_on_exact_multiple():
+    server, client, seen = _start_server(ROWS[:20])
+    try:
+        pages = list(client.query_iter(1229, 'SELECT * FROM x', page_size=10, order_by='"id"'))
+    finally:
+        server.shutdown()
+    assert [len(p) for p in pages] == [10, 10]
+    assert [re.search(r'OFFSET (\d+)', s).group(1) for s in seen] == ['0', '10', '20']
+
+
+def test_empty_result_yields_nothing():
+    server, client, seen = _start_server([])
+    try:
+        assert list(client.query_iter(1229, 'SELECT * FROM x', page_size=10, key_column='id')) == []
+    finally:
+        server.shutdown()
+    assert len(seen) == 1
+
+
+def test_server_cap_smaller_than_page_size_is_not_truncated():
+    for paging in ({'key_column': 'id'}, {'order_by': '"id"'}):
+        server, client, seen = _start_server(ROWS, server_cap=7)
+        try:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                pages = list(client.query_iter(1229, 'SELECT * FROM x', page_size=10, **paging))
+        finally:
+            server.shutdown()
+        assert pd.concat(pages)['id'].tolist() == list(range(1, 26)), paging
+        assert [len(p) for p in pages] == [7, 7, 7, 4]
+        caught = [w for w in caught if issubclass(w.category, RuntimeWarning)]
+        assert len(caught) == 1 and 'max 7 rijen' in str(caught[0].message)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
@@ -0,0 +1,167 @@
+"""
+Test: request pacing en retries (notifica_sdk/scheduler.py, NotificaClient._send)
+=================================================================================
+Controleert dat een volledige dashboard-load (±21 requests) niet wordt
+vertraagd, dat er in geen enkel venster meer dan max_requests requests
+doorgaan en dat pause() alle requests tegenhoudt. Met een lokale stub
+server die een vast rijtje statussen teruggeeft: retry na 429 (Retry-After
+pauzeert de scheduler), geen retry van een 5xx op een write en opgeven na
+max_retries.
+
+Draaien:
+    python -m pytest test_scheduler.py -q
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from notifica_sdk import NotificaClient, RateLimitScheduler, RetryPolicy, ServerError
+from notifica_sdk.exceptions import RateLimitError
+
+
+def test_dashboard_load_is_not_paced():
+    scheduler = RateLimitScheduler()  # 60 per 60 s
+    start = time.monotonic()
+    for _ in range(21):
+        scheduler.acquire()
+    assert time.monotonic() - start < 0.5
+    assert scheduler.stats()['in_window'] == 21
+
+
+def test_window_is_never_exceeded():
+    scheduler = RateLimitScheduler(max_requests=5, period=0.4)
+    stamps = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(4):
+            scheduler.acquire()
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stamps.sort()
+    assert len(stamps) == 12
+    for i in range(len(stamps) - 5):
+        # De 6e request na request i valt buiten diens venster
+        assert stamps[i + 5] - stamps[i] >= 0.4 - 1e-3
+    # Eerste 5 direct, daarna per venster
+    assert stamps[4] - stamps[0] < 0.1
+
+
+def test_pause_blocks_all_requests():
+    scheduler = RateLimitScheduler(max_requests=10, period=1.0)
+    scheduler.pause(0.2)
+    start = time.monotonic()
+    scheduler.acquire()
+    assert time.monotonic() - start >= 0.19
+
+
+# ===== Retries in NotificaClient._send =====
+
+class _RecordingScheduler(RateLimitScheduler):
+    def __init__(self):
+        super().__init__(max_requests=1000, period=1.0)
+        self.pauses = []
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+        super().pause(seconds)
+
+
+def _start_server(statuses, headers=None):
+    """Stub die per request de volgende status uit `statuses` teruggeeft (daarna 200)."""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self):
+            seen.append((self.command, self.path))
+            status = statuses[len(seen) - 1] if len(seen) <= len(statuses) else 200
+            payload = json.dumps({'columns': ['x'], 'rows': [['1']]} if status == 200 else {'error': 'fout'}).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).get(status, {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            self._reply()
+
+        do_GET = _reply
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheduler = _RecordingScheduler()
+    client = NotificaClient(api_url=f'http://127.0.0.1:{server.server_port}', app_key='test',
+                            cache=False, transport='json', max_retries=2, scheduler=scheduler)
+    client.retry = RetryPolicy(max_retries=2, backoff_base=0.01)
+    return server, client, scheduler, seen
+
+
+def test_429_with_retry_after_pauses_and_retries():
+    server, client, scheduler, seen = _start_server([429], headers={429: {'Retry-After': '0.2'}})
+    try:
+        start = time.monotonic()
+        df = client.query(1229, 'SELECT 1')
+    finally:
+        server.shutdown()
+    assert len(seen) == 2 and df['x'].tolist() == [1]
+    assert scheduler.pauses == [0.2]
+    assert time.monotonic() - start >= 0.19
+
+
+def test_5xx_on_write_is_not_retried():
+    server, client, scheduler, seen = _start_server([503])
+    try:
+        try:
+            client.write(1229, "INSERT INTO app_x VALUES (1)")
+            raise AssertionError("ServerError verwacht")
+        except ServerError as e:
+            assert e.status_code == 503
+    finally:
+        server.shutdown()
+    # Write mogelijk al uitgevoerd: niet nog eens
+    assert seen == [('POST', '/api/data/write')]
+
+
+def test_429_on_write_is_retried():
+    server, client, scheduler, seen = _start_server([429])
+    try:
+        client.write(1229, "INSERT INTO app_x VALUES (1)")
+    finally:
+        server.shutdown()
+    assert len(seen) == 2
+
+
+def test_gives_up_after_max_retries():
+    server, client, scheduler, seen = _start_server([429, 429, 429, 429])
+    try:
+        try:
+            client.query(1229, 'SELECT 1')
+            raise AssertionError("RateLimitError verwacht")
+        except RateLimitError:
+            pass
+    finally:
+        server.shutdown()
+    assert len(seen) == 3  # eerste poging + max_retries
+    assert len(scheduler.pauses) == 2
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
@@ -0,0 +1,131 @@
+"""
+Test: columnar (Arrow/Parquet) transport van NotificaClient
+===========================================================
+Start een lokale stub server die — afhankelijk van de Accept header en het
+pad — Arrow IPC, Parquet of JSON terugstuurt, en controleert dat de client
+in alle gevallen hetzelfde (getypeerde) DataFrame oplevert.
+
+Draaien:
+    python -m pytest test_transport.py -q
+"""
+
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from notifica_sdk import NotificaClient
+from notifica_sdk.client import ARROW_STREAM_TYPE, PARQUET_TYPE
+
+EXPECTED = pd.DataFrame({
+    'week_start': ['2025-01-06', '2025-01-13', '2025-01-20'],
+    'inkomsten': [1200.5, 980.0, 1500.25],
+    'aantal': [3, 2, 5],
+})
+
+
+def _arrow_bytes(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _parquet_bytes(df):
+    buf = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """/api/data/query -> Arrow of Parquet (als geaccepteerd), /api/data/query/<template> -> altijd JSON."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, content_type, payload):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        accept = self.headers.get('Accept', '')
+        if self.path == '/api/data/query' and ARROW_STREAM_TYPE in accept:
+            if 'parquet' in body['sql']:
+                self._send(PARQUET_TYPE, _parquet_bytes(EXPECTED))
+            else:
+                self._send(ARROW_STREAM_TYPE, _arrow_bytes(EXPECTED))
+            return
+        # JSON zoals de huidige API: alle waarden als strings
+        payload = {
+            'columns': list(EXPECTED.columns),
+            'rows': EXPECTED.astype(str).values.tolist(),
+        }
+        self._send('application/json', json.dumps(payload).encode())
+
+
+def _start_server():
+    server = HTTPServer(('127.0.0.1', 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _client(server, transport):
+    return NotificaClient(
+        api_url=f'http://127.0.0.1:{server.server_port}', app_key='test',
+        cache=False, transport=transport,
+    )
+
+
+def test_arrow_stream_response_is_typed():
+    server = _start_server()
+    try:
+        df = _client(server, 'arrow').query(1229, 'SELECT * FROM x')
+    finally:
+        server.shutdown()
+    pd.testing.assert_frame_equal(df, EXPECTED)
+
+
+def test_parquet_response_is_typed():
+    server = _start_server()
+    try:
+        df = _client(server, 'arrow').query(1229, 'SELECT * FROM parquet')
+    finally:
+        server.shutdown()
+    pd.testing.assert_frame_equal(df, EXPECTED)
+
+
+def test_json_fallback_matches_columnar():
+    server = _start_server()
+    try:
+        arrow_df = _client(server, 'arrow').query(1229, 'SELECT * FROM x')
+        json_df = _client(server, 'json').query(1229, 'SELECT * FROM x')
+    finally:
+        server.shutdown()
+    pd.testing.assert_frame_equal(arrow_df, json_df)
+
+
+def test_template_falls_back_to_json_when_server_has_no_columnar():
+    server = _start_server()
+    try:
+        df = _client(server, 'arrow').query_template(1229, 'cashflow')
+    finally:
+        server.shutdown()
+    # Template-pad converteert niet naar numeriek (zelfde gedrag als JSON transport)
+    assert list(df.columns) == list(EXPECTED.columns)
+    assert df['inkomsten'].tolist() == EXPECTED['inkomsten'].astype(str).tolist()
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
@@ -41,6 +41,7 @@ st.set_page_config(
 )
 
 KLANTNUMMER = 1229  # Zenith
+WERKBON_PAGE_SIZE = 5000  # Rijen per pagina bij het streamen van werkbonnen
 
 # ============================================================================
 # KPI CLASSIFICATIE-MATRIX (uit Zenith Classificatie tab)
@@ -1172,7 +1173,12 @@ with tab1:
             # ====================================================================
             status_container.info("Stap 1/6: Basis werkbonnen ophalen...")
 
-            werkbonnen_basis = client.query(KLANTNUMMER, f'''
+            # Werkbonnen per pagina ophalen en direct filteren, zodat alleen de
+            # gefilterde werkbonnen in het geheugen blijven (keyset paginering)
+            aantal_gevonden = 0
+            aantal_na_opdrachtgever = 0
+            chunks = []
+            for chunk in client.query_iter(KLANTNUMMER, f'''
                 SELECT
                     wb."WerkbonDocumentKey",
                     wb."Werkbon",
@@ -1192,23 +1198,33 @@ with tab1:
                   ON wb."WerkbonDocumentKey" = ssm."WerkbonDocumentKey"
                 WHERE wb."MeldDatum" >= '{start_date}'
                   AND wb."MeldDatum" <= '{end_date}'
-                ORDER BY wb."MeldDatum" DESC
-            ''')
-
-            if werkbonnen_basis.empty:
+            ''', page_size=WERKBON_PAGE_SIZE, key_column='WerkbonDocumentKey'):
+                aantal_gevonden += len(chunk)
+                # Pas opdrachtgever filter toe indien ingesteld
+                if opdrachtgever_filter:
+                    chunk = chunk[chunk['Debiteur'].isin(opdrachtgever_filter)]
+                aantal_na_opdrachtgever += len(chunk)
+                # Pas klantfilter toe indien ingesteld
+                if klant_filter:
+                    chunk = chunk[chunk['Klant'].isin(klant_filter)]
+                chunks.append(chunk)
+
+            if aantal_gevonden == 0:
                 st.warning("Geen werkbonnen gevonden in deze periode.")
                 st.stop()
 
-            status_container.success(f"✓ {len(werkbonnen_basis)} werkbonnen gevonden")
+            status_container.success(f"✓ {aantal_gevonden} werkbonnen gevonden")
+
+            werkbonnen_basis = (
+                pd.concat(chunks, ignore_index=True)
+                .sort_values('MeldDatum', ascending=False)
+                .reset_index(drop=True)
+            )
 
-            # Pas opdrachtgever filter toe indien ingesteld
             if opdrachtgever_filter:
-                werkbonnen_basis = werkbonnen_basis[werkbonnen_basis['Debiteur'].isin(opdrachtgever_filter)]
-                st.info(f"📌 Gefilterd op {len(opdrachtgever_filter)} opdrachtgever(s) - {len(werkbonnen_basis)} werkbonnen")
+                st.info(f"📌 Gefilterd op {len(opdrachtgever_filter)} opdrachtgever(s) - {aantal_na_opdrachtgever} werkbonnen")
 
-            # Pas klantfilter toe indien ingesteld
             if klant_filter:
-                werkbonnen_basis = werkbonnen_basis[werkbonnen_basis['Klant'].isin(klant_filter)]
                 st.info(f"📌 Gefilterd op {len(klant_filter)} klant(en) - {len(werkbonnen_basis)} werkbonnen")
 
             if werkbonnen_basis.empty:
@@ -10,6 +10,7 @@ voor nauwkeurigere classificaties.
 Dit is een aparte versie voor A/B testing met de originele app.py.
 """
 import json
+import pandas as pd
 import streamlit as st
 from pathlib import Path
 from datetime import date, timedelta
@@ -19,7 +20,18 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.auth import require_auth, get_secret
-from src.services.parquet_data_service import ParquetDataService, WerkbonVerhaalBuilder as OriginalVerhaalBuilder
+from src.services.parquet_data_service import ParquetDataService
+from src.services.llm_pool import (
+    CLASSIFY_MAX_WORKERS, UsageStats, call_with_retry, get_anthropic_client, run_pool
+)
+from src.services.classificatie import (
+    CLASSIFY_MODEL, CLASSIFY_TEMPERATURE, PROMPT_VERSION_V6,
+    api_error_result, classificatie_result, classification_cache, classify_params,
+    clear_all_history, get_contract_for_debiteur, get_usage_count, load_history,
+    load_processed_werkbon_keys, parse_classificatie_response, parse_error_result,
+    prepare_werkbon, save_processed_werkbon_keys, save_to_history,
+    load_contracts as _load_contracts,
+)
 
 # Fixed batch size (like DWH version)
 BATCH_SIZE = 10
@@ -54,273 +66,78 @@ def is_collectief_systeem(paragraaf_naam: str, collectieve_patronen: set) -> boo
     return False
 
 
-# === VERBETERDE VERHAAL BUILDER ===
-class VerbeterdeVerhaalBuilder(OriginalVerhaalBuilder):
-    """Verbeterde builder die oplossingen prominenter toont."""
-
-    def build_verhaal(self, keten, chronological: bool = True) -> str:
-        """Build verhaal met oplossingen EERST (belangrijker dan kosten)."""
-        lines = []
-
-        # Header
-        lines.append(f"# Werkbonketen voor {keten.relatie_naam}")
-        lines.append(f"Relatiecode: {keten.relatie_code}")
-        lines.append("")
-
-        # Summary
-        lines.append("## Samenvatting")
-        lines.append(f"- Aantal werkbonnen in keten: {keten.aantal_werkbonnen}")
-        lines.append(f"- Totaal aantal paragrafen: {keten.aantal_paragrafen}")
-        lines.append(f"- Totale kosten: €{keten.totaal_kosten:,.2f}")
-        lines.append("")
-
-        # Sort werkbonnen by melddatum
-        werkbonnen = sorted(
-            keten.werkbonnen,
-            key=lambda w: w.melddatum or "",
-            reverse=chronological
-        )
-
-        # Each werkbon
-        for i, wb in enumerate(werkbonnen, 1):
-            if wb.is_hoofdwerkbon:
-                lines.append(f"## Hoofdwerkbon: {wb.werkbon_nummer}")
-            else:
-                lines.append(f"## Vervolgbon (niveau {wb.niveau}): {wb.werkbon_nummer}")
-
-            lines.append(f"- **Status: {wb.status}** | Documentstatus: {wb.documentstatus}")
-            if wb.administratieve_fase:
-                lines.append(f"- Administratieve fase: {wb.administratieve_fase}")
-
-            lines.append(f"- Type: {wb.type}")
-            if wb.melddatum:
-                melding = wb.melddatum
-                if wb.meldtijd:
-                    melding += f" {wb.meldtijd}"
-                lines.append(f"- Melding: {melding}")
-            if wb.afspraakdatum:
-                lines.append(f"- Afspraakdatum: {wb.afspraakdatum}")
-            if wb.opleverdatum:
-                lines.append(f"- Opleverdatum: {wb.opleverdatum}")
-
-            if wb.monteur:
-                lines.append(f"- Monteur: {wb.monteur}")
-            lines.append(f"- Locatie: {wb.postcode} {wb.plaats}")
-
-            # Paragrafen
-            if wb.paragrafen:
-                lines.append("### Werkbonparagrafen")
-                for p in wb.paragrafen:
-                    lines.append(f"\n**{p.naam}** ({p.type})")
-                    if p.factureerwijze:
-                        lines.append(f"- ⚠️ Factureerwijze: {p.factureerwijze}")
-                    lines.append(f"- Uitvoeringstatus: {p.uitvoeringstatus}")
-
-                    if p.plandatum:
-                        lines.append(f"- Plandatum: {p.plandatum}")
-                    if p.uitgevoerd_op:
-                        uitvoering = p.uitgevoerd_op
-                        if p.tijdstip_uitgevoerd:
-                            uitvoering += f" {p.tijdstip_uitgevoerd}"
-                        lines.append(f"- Uitgevoerd: {uitvoering}")
-
-                    if p.storing:
-                        lines.append(f"- Storingscode: {p.storing}")
-                    if p.oorzaak:
-                        lines.append(f"- Oorzaakcode: {p.oorzaak}")
-
-                    # ⭐ OPLOSSINGEN EERST - Dit is de belangrijkste info!
-                    if p.oplossingen:
-                        lines.append("")
-                        lines.append("🔍 **WAT HEEFT DE MONTEUR GEDAAN? (Oplossingen):**")
-                        oplossingen = sorted(
-                            p.oplossingen,
-                            key=lambda o: o.aanmaakdatum or "",
-                            reverse=chronological
-                        )
-                        for opl in oplossingen:
-                            datum = f"[{opl.aanmaakdatum}] " if opl.aanmaakdatum else ""
-                            lines.append(f"- {datum}{opl.oplossing}")
-                            if opl.oplossing_uitgebreid:
-                                lines.append(f"  Toelichting: {opl.oplossing_uitgebreid}")
-
-                    # Kostenregels daarna
-                    if p.kosten:
-                        lines.append("")
-                        lines.append("**Kostenregels:**")
-                        for k in p.kosten:
-                            cat = k.categorie.upper() if k.categorie else "ONBEKEND"
-                            lines.append(f"- [{cat}] {k.omschrijving}")
-                            lines.append(f"  Aantal: {k.aantal} | Verrekenprijs: €{k.verrekenprijs:,.2f} | Kostprijs: €{k.kostprijs:,.2f}")
-                            if k.taak:
-                                lines.append(f"  Taak: {k.taak}")
-                            if k.boekdatum:
-                                lines.append(f"  Boekdatum: {k.boekdatum}")
-
-                    # Opvolgingen
-                    if p.opvolgingen:
-                        lines.append("")
-                        lines.append("**Opvolgingen:**")
-                        opvolgingen = sorted(
-                            p.opvolgingen,
-                            key=lambda o: o.aanmaakdatum or "",
-                            reverse=chronological
-                        )
-                        for opv in opvolgingen:
-                            datum = f"[{opv.aanmaakdatum}] " if opv.aanmaakdatum else ""
-                            status = f"({opv.status})" if opv.status else ""
-                            lines.append(f"- {datum}**{opv.opvolgsoort}** {status}")
-                            if opv.beschrijving:
-                                lines.append(f"  > {opv.beschrijving}")
-
-                lines.append("")
-
-        return "\n".join(lines)
-
-
 # === CONTRACT LOADING ===
 @st.cache_resource
 def load_contracts():
     """Load all contracts from contracts folder."""
-    contracts_dir = Path(__file__).parent / "contracts"
-    contracts = {}
-
-    # Load metadata
-    meta_path = contracts_dir / "contracts_metadata.json"
-    if meta_path.exists():
-        with open(meta_path, "r", encoding="utf-8") as f:
-            meta = json.load(f)
-
-        for c in meta.get("contracts", []):
-            contract_file = contracts_dir / c["filename"]
-            if contract_file.exists():
-                content = contract_file.read_text(encoding="utf-8")
-                contracts[c["id"]] = {
-                    "id": c["id"],
-                    "filename": c["filename"],
-                    "content": content,
-                    "clients": c.get("clients", [])
-                }
-
-    return contracts
-
-
-def get_contract_for_debiteur(debiteur_code: str, contracts: dict):
-    """Get contract for a specific debiteur."""
-    # Extract code from "005102 - Trivire" format
-    code = debiteur_code.split(" - ")[0].strip() if " - " in debiteur_code else debiteur_code
-
-    for contract in contracts.values():
-        if code in contract.get("clients", []):
-            return contract
-    return None
-
-
-# === USAGE TRACKING (Parquet persistent storage) ===
-import pandas as pd
-
-def get_history_path():
-    """Get path to classification history Parquet file."""
-    return Path(__file__).parent / "data" / "classification_history_v2.parquet"
-
-
-def get_processed_keys_path():
-    """Get path to processed werkbon keys file."""
-    return Path(__file__).parent / "data" / "processed_werkbon_keys_v2.parquet"
-
-
-def get_usage_count() -> int:
-    """Get total number of classifications from Parquet file."""
-    history_path = get_history_path()
-    if history_path.exists():
-        try:
-            df = pd.read_parquet(history_path)
-            return len(df)
-        except Exception:
-            return 0
-    return 0
-
-
-def load_history() -> list:
-    """Load classification history from Parquet file."""
-    history_path = get_history_path()
-    if history_path.exists():
-        try:
-            df = pd.read_parquet(history_path)
-            return df.to_dict('records')
-        except Exception:
-            return []
-    return []
-
+    return _load_contracts()
+
+
+# === CLASSIFICATIE ===
+def classify_werkbon(
+    client,
+    werkbon_key: int,
+    contract_text: str,
+    threshold_ja: float,
+    threshold_nee: float,
+    usage: UsageStats = None,
+) -> dict:
+    """Classify using IMPROVED V2 prompt.
+
+    `client` is de gedeelde Anthropic client (zie get_anthropic_client); de
+    functie is thread-safe en draait in de worker pool van de batch. Met
+    `usage` wordt het tokengebruik (incl. prompt-cache hits) bijgehouden.
+    """
+    try:
+        # Data-fouten (bijv. een kapotte werkbon) horen bij deze werkbon, niet bij de batch
+        prepared = prepare_werkbon(data_service, werkbon_key, contract_text)
+        if not prepared:
+            return {"error": "Werkbon niet gevonden", "werkbon_key": werkbon_key}
+        keten, verhaal, contract_truncated = prepared
+
+        # Eerder geclassificeerd met exact dezelfde invoer? Dan geen API call
+        cache_key = classification_cache.make_key(
+            CLASSIFY_MODEL, PROMPT_VERSION_V6, contract_truncated, verhaal, CLASSIFY_TEMPERATURE
+        )
+        cached = classification_cache.get(cache_key)
 
-def save_to_history(results: list):
-    """Save classification results to Parquet file (persistent storage)."""
-    from datetime import datetime
+        # Call Claude API (gedeelde client, retry met backoff bij rate limits)
+        if cached:
+            response_text = cached["raw_response"]
+        else:
+            response = call_with_retry(lambda: client.messages.create(
+                **classify_params(contract_truncated, verhaal)
+            ))
+            if usage is not None:
+                usage.add(getattr(response, "usage", None))
 
-    history_path = get_history_path()
+            response_text = response.content[0].text
 
-    # Load existing history
-    existing_records = []
-    if history_path.exists():
+        # Parse JSON
         try:
-            df_existing = pd.read_parquet(history_path)
-            existing_records = df_existing.to_dict('records')
-        except Exception:
-            pass
-
-    # Add new records
-    timestamp = datetime.now().isoformat()
-    for r in results:
-        history_entry = {
-            "timestamp": timestamp,
-            "werkbon_key": r.get("werkbon_key"),
-            "werkbon_code": r.get("werkbon_code", ""),
-            "debiteur": r.get("debiteur", ""),
-            "datum": str(r.get("datum", "")),
-            "contract_filename": r.get("contract_filename", ""),
-            "classificatie": r.get("classificatie", ""),
-            "basis_classificatie": r.get("basis_classificatie", ""),
-            "confidence": r.get("confidence", 0) * 100,
-            "toelichting": r.get("toelichting", ""),
-            "contract_referentie": r.get("contract_referentie", ""),
-            "totaal_kosten": r.get("totaal_kosten", 0),
-        }
-        existing_records.append(history_entry)
-
-    # Save to Parquet
-    df = pd.DataFrame(existing_records)
-    history_path.parent.mkdir(exist_ok=True)
-    df.to_parquet(history_path, index=False)
-
-
-def load_processed_werkbon_keys() -> set:
-    """Load set of already processed werkbon keys from Parquet."""
-    keys_path = get_processed_keys_path()
-    if keys_path.exists():
-        try:
-            df = pd.read_parquet(keys_path)
-            return set(df["werkbon_key"].tolist())
-        except Exception:
-            return set()
-    return set()
-
-
-def save_processed_werkbon_keys(keys: set):
-    """Save processed werkbon keys to Parquet file."""
-    keys_path = get_processed_keys_path()
-    df = pd.DataFrame({"werkbon_key": list(keys)})
-    keys_path.parent.mkdir(exist_ok=True)
-    df.to_parquet(keys_path, index=False)
+            if cached:
+                result = cached["parsed"]
+            else:
+                result = parse_classificatie_response(response_text)
+                # Een mislukte cache-write is geen API fout: resultaat gewoon teruggeven
+                try:
+                    classification_cache.put(
+                        cache_key, result, response_text,
+                        model=CLASSIFY_MODEL, prompt_version=PROMPT_VERSION_V6, werkbon_key=werkbon_key
+                    )
+                except OSError as e:
+                    print(f"⚠️ Cache schrijven mislukt voor werkbon {werkbon_key}: {e}")
+
+            return classificatie_result(
+                werkbon_key, keten, verhaal, result, response_text,
+                threshold_ja, threshold_nee, from_cache=bool(cached)
+            )
 
+        except (json.JSONDecodeError, KeyError) as e:
+            return parse_error_result(werkbon_key, keten, verhaal, e, response_text)
 
-def clear_all_history():
-    """Clear all history and processed keys (for reset functionality)."""
-    history_path = get_history_path()
-    keys_path = get_processed_keys_path()
-    if history_path.exists():
-        history_path.unlink()
-    if keys_path.exists():
-        keys_path.unlink()
+    except Exception as e:
+        return api_error_result(werkbon_key, e)
 
 
 # === PAGE CONFIG ===
@@ -435,6 +252,10 @@ with st.sidebar:
 
     st.divider()
     st.caption(f"Batch grootte: {BATCH_SIZE} (vast)")
+    max_workers = st.slider(
+        "Parallelle aanvragen", 1, 16, CLASSIFY_MAX_WORKERS,
+        help="Aantal werkbonnen dat tegelijk naar Claude gaat. Verlaag bij rate limits."
+    )
 
     st.divider()
     st.markdown("[📖 Handleiding](https://notifica.nl/tools/contract-checker)")
@@ -723,14 +544,12 @@ with tab_classify:
         with st.spinner("Werkbonnen laden..."):
             debiteur_codes = [d.split(" - ")[0].strip() for d in selected_debiteuren] if selected_debiteuren else None
 
-            df = data_service.df_werkbonnen.copy()
-            df = df[df["werkbon_key"] == df["hoofdwerkbon_key"]]
-            df["melddatum_str"] = df["melddatum"].fillna("").astype(str).str[:10]
+            # Voorbewerkte hoofdwerkbonnen (debiteur_code, melddatum_str) uit de data service
+            df = data_service.df_hoofdwerkbonnen
             df = df[(df["melddatum_str"] >= str(filter_start)) & (df["melddatum_str"] <= str(filter_end))]
 
             if debiteur_codes:
-                mask = df["debiteur"].apply(lambda x: any(code in str(x) for code in debiteur_codes))
-                df = df[mask]
+                df = df[df["debiteur_code"].isin(debiteur_codes)]
 
             # Contract-type filter (blacklist: collectief herkennen, rest = individueel)
             if contract_type_filter != "Alle contracten":
@@ -782,223 +601,19 @@ with tab_classify:
 
     # === CLASSIFY BUTTON ===
     if st.button("🚀 Classificeer batch (V2)", type="primary", use_container_width=True):
-        import anthropic
-
-        def classify_werkbon(werkbon_key: int, contract_text: str, threshold_ja: float, threshold_nee: float) -> dict:
-            """Classify using IMPROVED V2 prompt."""
-            keten = data_service.get_werkbon_keten(
-                werkbon_key,
-                include_kosten_details=True,
-                include_oplossingen=True,
-                include_opvolgingen=True
-            )
-
-            if not keten:
-                return {"error": "Werkbon niet gevonden", "werkbon_key": werkbon_key}
-
-            # Gebruik verbeterde builder
-            builder = VerbeterdeVerhaalBuilder()
-            verhaal = builder.build_verhaal(keten)
-
-            # ⭐ SYSTEM PROMPT V6 - Generiek (contracttekst-gestuurd)
-            system_prompt = """Je bent een expert in het analyseren van servicecontracten voor verwarmingssystemen.
-
-Je taak is om te bepalen of een werkbon binnen of buiten een servicecontract valt.
-Het CONTRACT dat je meekrijgt bevat het BASISPRINCIPE en de BELANGRIJKE UITZONDERINGEN voor deze specifieke woningbouwvereniging. Lees dit EERST en volg de contractregels nauwkeurig.
-
-⭐ BELANGRIJKSTE ANALYSE PUNT: Lees daarna de "WAT HEEFT DE MONTEUR GEDAAN? (Oplossingen)" sectie.
-Dit is een vrij tekstveld waar de monteur beschrijft wat er aan de hand was en wat hij heeft gedaan.
-Deze informatie is CRUCIAAL en weegt ZWAARDER dan storingscodes of kostenregels.
-
-🔍 UNIVERSELE REGELS (gelden voor ALLE contracten, op volgorde van prioriteit):
-
-📌 REGEL 0 - HOOGSTE PRIORITEIT (ALTIJD NEE, ongeacht andere regels):
-- **Factureerwijze "Regie (alles factureren)"** → ALTIJD NEE. Als de paragraaf op Regie staat, is het antwoord altijd NEE.
-- **Oorzaakcode 900 / "Probleem door derde"** → ALTIJD NEE (factureren aan derden)
-  Dit geldt OOK als de storingscode iets anders suggereert (bijv. lekkage onder ketel + probleem derden = NEE)
-- **Tapwaterboiler / geiser / moederhaard** → ALTIJD NEE (regie)
-- **Vloerverwarming (verdelers, pompen, regelingen)** → ALTIJD NEE (buiten contract)
-- **Verstopping** → ALTIJD NEE (buiten contract)
-
-📌 REGEL 1 - OPLOSSING GAAT VOOR OP STORINGSCODE:
-- Als de OPLOSSING van de monteur is "installatie gevuld en ontlucht" / "bijgevuld" / "ontlucht" → ALTIJD JA
-  Dit geldt OOK als de storingscode iets anders suggereert (bijv. "GEEN CV en WW" + oplossing gevuld/ontlucht = JA)
-- Als de OPLOSSING een ander verhaal vertelt dan de storingscode, volg dan de OPLOSSING
-
-📌 REGEL 2 - KETELONDERDELEN = BINNEN DE MANTEL (ALTIJD JA):
-De volgende onderdelen zitten fysiek IN de cv-ketel (binnen de mantel) en vallen ALTIJD binnen contract:
-- Hydroblok, driewegklep (3-wegklep), manometer, automatisch vulsysteem, vulset
-- Expansievat, warmtewisselaar (platenwisselaar), branderunit, brander, waakvlambrander
-- Gasblok, gasregelblok, ventilator, ventilatormotor
-- Printplaat, branderautomaat, display/LCD, opentherm interface
-- Ontstekingselektrode, ionisatie-electrode, ontstekingstransformator, thermokoppel
-- Pomp (cv-pomp in de ketel), overloopbeveiliging, veiligheidsklep, overstortventiel
-- Sensor, NTC (temperatuursensor), doorstroomsensor, druksensor
-- Luchtdrukschakelaar, waterdrukschakelaar, maximaalthermostaat
-- Sifon, condensafvoer, condensbak, dompelbuis
-- Aansluitblok, kabelboom, O-ringen, pakkingen, afdichtingen (ketel-intern)
-Als de werkbon (of een vervolgbon/meenemen-bon) deze onderdelen noemt → JA.
-
-📌 REGEL 3 - CONTRACTTEKST IS LEIDEND:
-Volg het CONTRACT voor contractspecifieke regels over:
-- Welke onderdelen/locaties wel of niet gedekt zijn
-- Of er een afstandsgrens geldt (bijv. "2 meter van de ketel")
-- Hoe radiatoren, radiatorkranen, WTW-units, RGA/LTV behandeld worden
-- Deze regels VERSCHILLEN per woningbouwvereniging — lees het contract!
-
-📌 REGEL 4 - STORINGSCODES (universeel, Syntess-systeemcodes):
-- **Storingscode 006.1 "Lekkage ONDER de ketel"** = lekkage dichtbij/onder de ketel (binnen de mantel)
-- **Storingscode 006.2 "Lekkage aan de installatie"** = lekkage op AFSTAND van de ketel (buiten de mantel) → NEE
-  LET OP: 006.1 ≠ 006.2! Dit is een CRUCIAAL onderscheid.
-  006.2 betekent dat de lekkage NIET aan de ketel zelf zit maar aan de installatie op afstand → classificeer als NEE.
-
-📌 REGEL 5 - BIJ TWIJFEL:
-- **Radiatoren vervangen** → classificeer als NEE (medewerker kan dit beter beoordelen dan AI)
-- **CV-leiding niet in het zicht (reparatie)** → classificeer als NEE (moeilijk te beoordelen door AI)
-- **Niet thuis geweest** → JA met lage confidence (werk niet uitgevoerd maar geen regie)
-
-Analyseer vervolgens:
-- Type werkzaamheden (onderhoud, reparatie, storing, modificatie)
-- Locatie: binnen ketelkast/mantel vs buiten ketel
-- Gebruikte materialen en onderdelen
-- Arbeidsuren en kostenposten
-- Oorzaak: wie/wat veroorzaakt het probleem
-- Storingscodes en oorzaken
-
-Geef je antwoord ALLEEN in het volgende JSON formaat:
-{
-    "classificatie": "JA" of "NEE",
-    "confidence": 0.0-1.0,
-    "contract_referentie": "Verwijzing naar relevant contract artikel of -regel",
-    "toelichting": "Korte uitleg: vermeld EXPLICIET wat de monteur deed en welke contractregel van toepassing is"
-}
-
-Classificatie:
-- JA: Werkzaamheden vallen volledig binnen het contract (niet factureren aan klant)
-- NEE: Werkzaamheden vallen buiten het contract (wel factureren aan klant)
-
-confidence: Je zekerheid over de classificatie (0.0 = zeer onzeker, 1.0 = zeer zeker)
-
-BELANGRIJK:
-- Geef ALTIJD een classificatie (JA of NEE), ook als je onzeker bent
-- Bij twijfel over locatie → kijk naar wat de monteur schrijft in oplossingen
-- Ketelonderdelen (binnen de mantel) zijn BINNEN contract, ook als ze "duur" zijn
-- OORZAAK "PROBLEEM DOOR DERDE" → ALTIJD NEE, ook bij lekkage onder ketel
-- OPLOSSING "gevuld en ontlucht" → ALTIJD JA, ook als storingscode iets anders suggereert
-- Volg het CONTRACT voor contractspecifieke regels over radiatorkranen, WTW-units, afstandsgrenzen etc."""
-
-            contract_truncated = contract_text[:15000] if len(contract_text) > 15000 else contract_text
-
-            user_message = f"""### CONTRACT ###
-{contract_truncated}
-
-### WERKBON VERHAAL ###
-{verhaal}
-
-Classificeer deze werkbon. Let VOORAL op de "WAT HEEFT DE MONTEUR GEDAAN?" sectie.
-Geef je antwoord in JSON formaat."""
-
-            # Call Claude API
-            client = anthropic.Anthropic(api_key=api_key)
-
-            try:
-                response = client.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=1024,
-                    temperature=0,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_message}]
-                )
-
-                response_text = response.content[0].text
-
-                # Parse JSON
-                try:
-                    text = response_text.strip()
-                    if "```json" in text:
-                        text = text.split("```json")[1].split("```")[0]
-                    elif "```" in text:
-                        text = text.split("```")[1].split("```")[0]
-
-                    # Clean control characters die JSON parsing breken
-                    import re
-                    text_clean = re.sub(r'[\x00-\x1f\x7f]', ' ', text.strip())
-
-                    try:
-                        result = json.loads(text_clean)
-                    except json.JSONDecodeError:
-                        # Fallback: probeer classificatie en confidence via regex te extraheren
-                        class_match = re.search(r'"classificatie"\s*:\s*"(JA|NEE)"', text, re.IGNORECASE)
-                        conf_match = re.search(r'"confidence"\s*:\s*([\d.]+)', text)
-                        toel_match = re.search(r'"toelichting"\s*:\s*"([^"]*)"', text)
-                        ref_match = re.search(r'"contract_referentie"\s*:\s*"([^"]*)"', text)
-
-                        if class_match:
-                            result = {
-                                "classificatie": class_match.group(1).upper(),
-                                "confidence": float(conf_match.group(1)) if conf_match else 0.8,
-                                "toelichting": toel_match.group(1) if toel_match else "Geëxtraheerd via regex fallback",
-                                "contract_referentie": ref_match.group(1) if ref_match else ""
-                            }
-                        else:
-                            raise json.JSONDecodeError("Geen classificatie gevonden", text, 0)
-
-                    confidence = float(result.get("confidence", 0.5))
-                    base_classificatie = result.get("classificatie", "NEE").upper()
-
-                    # Apply thresholds
-                    if base_classificatie == "JA":
-                        final = "JA" if confidence >= threshold_ja else "TWIJFEL"
-                    else:
-                        final = "NEE" if confidence >= threshold_nee else "TWIJFEL"
-
-                    return {
-                        "werkbon_key": werkbon_key,
-                        "classificatie": final,
-                        "basis_classificatie": base_classificatie,
-                        "confidence": confidence,
-                        "contract_referentie": result.get("contract_referentie", ""),
-                        "toelichting": result.get("toelichting", ""),
-                        "verhaal": verhaal,
-                        "totaal_kosten": keten.totaal_kosten,
-                        "aantal_werkbonnen": keten.aantal_werkbonnen,
-                        "raw_response": response_text
-                    }
-
-                except (json.JSONDecodeError, KeyError) as e:
-                    return {
-                        "werkbon_key": werkbon_key,
-                        "classificatie": "TWIJFEL",
-                        "basis_classificatie": "PARSE_ERROR",
-                        "confidence": 0.0,
-                        "contract_referentie": "",
-                        "toelichting": f"Kon response niet parsen: {str(e)}",
-                        "verhaal": verhaal,
-                        "totaal_kosten": keten.totaal_kosten if keten else 0,
-                        "raw_response": response_text
-                    }
-
-            except Exception as e:
-                return {
-                    "werkbon_key": werkbon_key,
-                    "error": str(e),
-                    "classificatie": "ERROR",
-                    "confidence": 0.0,
-                    "toelichting": f"API fout: {str(e)}"
-                }
+        client = get_anthropic_client(api_key)
 
-        results = []
+        results = [None] * len(werkbonnen)
+        jobs = []
         progress = st.progress(0)
         status = st.empty()
 
         for i, wb in enumerate(werkbonnen):
             debiteur = wb.get("debiteur", "")
-            status.text(f"Classificeren {i+1}/{len(werkbonnen)}: {debiteur[:30]}...")
-
             contract = get_contract_for_debiteur(debiteur, contracts)
 
             if not contract:
-                results.append({
+                results[i] = {
                     "werkbon_key": wb["hoofdwerkbon_key"],
                     "werkbon_code": wb.get("werkbon_code", ""),
                     "debiteur": debiteur,
@@ -1009,24 +624,60 @@ Geef je antwoord in JSON formaat."""
                     "toelichting": f"Geen contract gevonden voor debiteur {debiteur}",
                     "contract_referentie": "",
                     "contract_filename": None
-                })
-                progress.progress((i + 1) / len(werkbonnen))
-                continue
+                }
+            else:
+                jobs.append((i, wb, contract))
 
+        def _classify_job(job):
+            i, wb, contract = job
             result = classify_werkbon(
+                client,
                 wb["hoofdwerkbon_key"],
                 contract["content"],
                 threshold_ja,
-                threshold_nee
+                threshold_nee,
+                usage=usage
             )
+            return _with_werkbon_info(result, job)
 
+        def _job_error(job, error):
+            # Onverwachte fout in één werkbon: alleen die werkbon als ERROR
+            return _with_werkbon_info(api_error_result(job[1]["hoofdwerkbon_key"], error), job)
+
+        def _with_werkbon_info(result, job):
+            _, wb, contract = job
             result["werkbon_code"] = wb.get("werkbon_code", "")
-            result["debiteur"] = debiteur
+            result["debiteur"] = wb.get("debiteur", "")
             result["datum"] = wb.get("aanmaakdatum", "")
             result["contract_filename"] = contract["filename"]
-            results.append(result)
-
-            progress.progress((i + 1) / len(werkbonnen))
+            return result
+
+        usage = UsageStats()
+        finished = [len(werkbonnen) - len(jobs)]
+
+        def _on_progress(done, total, job, result):
+            # Draait in de Streamlit thread; workers raken st niet aan
+            finished[0] += 1
+            debiteur = job[1].get("debiteur", "")
+            status.text(f"Geclassificeerd {finished[0]}/{len(werkbonnen)}: {debiteur[:30]}...")
+            progress.progress(finished[0] / len(werkbonnen))
+
+        # Eerst één werkbon per contract: die schrijft het prompt-prefix in de
+        # provider-cache, zodat de parallelle rest het daaruit kan lezen
+        seen_contracts = set()
+        warmup, rest = [], []
+        for job in jobs:
+            filename = job[2]["filename"]
+            (rest if filename in seen_contracts else warmup).append(job)
+            seen_contracts.add(filename)
+
+        for batch in (warmup, rest):
+            batch_results = run_pool(
+                batch, _classify_job, max_workers=max_workers, on_progress=_on_progress,
+                on_error=_job_error,
+            )
+            for (i, _, _), result in zip(batch, batch_results):
+                results[i] = result
 
         status.empty()
         progress.empty()
@@ -1043,6 +694,7 @@ Geef je antwoord in JSON formaat."""
         save_to_history(results)
 
         st.session_state.just_classified = len(results)
+        st.session_state.last_batch_usage = usage.as_dict()
         st.rerun()
 
     # === RESULTS ===
@@ -1053,6 +705,17 @@ Geef je antwoord in JSON formaat."""
             st.success(f"✅ {st.session_state.just_classified} werkbonnen geclassificeerd met V2!")
             st.session_state.just_classified = None
 
+            batch_usage = st.session_state.get("last_batch_usage")
+            if batch_usage and batch_usage["requests"]:
+                st.caption(
+                    f"Tokens: {batch_usage['prompt_tokens']:,} input, waarvan "
+                    f"{batch_usage['cache_read_input_tokens']:,} uit prompt-cache "
+                    f"({batch_usage['cached_ratio']:.0%}), "
+                    f"{batch_usage['cache_creation_input_tokens']:,} naar cache geschreven, "
+                    f"{batch_usage['input_tokens']:,} ongecachet · "
+                    f"{batch_usage['output_tokens']:,} output"
+                )
+
         st.divider()
         st.header("Resultaten")
 
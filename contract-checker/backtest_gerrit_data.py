@@ -15,7 +15,11 @@ import os
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.services.parquet_data_service import ParquetDataService, WerkbonVerhaalBuilder
-from app_v2 import VerbeterdeVerhaalBuilder
+from src.services.classification_cache import get_classification_cache, prompt_version
+from src.services.classificatie import VerbeterdeVerhaalBuilder
+
+
+MODEL = "claude-3-haiku-20240307"
 
 
 class GerritBacktest:
@@ -33,6 +37,9 @@ class GerritBacktest:
         # Anthropic client
         self.client = anthropic.Anthropic(api_key=api_key)
 
+        # Eerder geclassificeerde werkbonnen niet opnieuw naar de API sturen
+        self.cache = get_classification_cache()
+
         # Load Gerrit's ground truth
         self.ground_truth = self._load_gerrit_data()
 
@@ -196,25 +203,38 @@ BELANGRIJK:
 Classificeer deze werkbon. {"Let VOORAL op de 'WAT HEEFT DE MONTEUR GEDAAN?' sectie." if version == "v2" else ""}
 Geef je antwoord in JSON formaat."""
 
+        # Temperature niet gezet (API-default); telt mee in de cachesleutel
+        version_key = prompt_version(version, system_prompt)
+        cache_key = self.cache.make_key(MODEL, version_key, contract_truncated, verhaal, None)
+        cached = self.cache.get(cache_key)
+
         # Call Claude API
         try:
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1024,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_message}]
-            )
-
-            response_text = response.content[0].text
-
-            # Parse JSON
-            text = response_text.strip()
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-
-            result = json.loads(text.strip())
+            if cached:
+                response_text = cached["raw_response"]
+                result = cached["parsed"]
+            else:
+                response = self.client.messages.create(
+                    model=MODEL,
+                    max_tokens=1024,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": user_message}]
+                )
+
+                response_text = response.content[0].text
+
+                # Parse JSON
+                text = response_text.strip()
+                if "```json" in text:
+                    text = text.split("```json")[1].split("```")[0]
+                elif "```" in text:
+                    text = text.split("```")[1].split("```")[0]
+
+                result = json.loads(text.strip())
+                try:
+                    self.cache.put(cache_key, result, response_text, model=MODEL, prompt_version=version_key)
+                except OSError as e:
+                    print(f"  ⚠️ Cache schrijven mislukt: {e}")
 
             confidence = float(result.get("confidence", 0.5))
             base_classificatie = result.get("classificatie", "NEE").upper()
@@ -330,6 +350,9 @@ Geef je antwoord in JSON formaat."""
         print("RESULTATEN")
         print(f"{'='*70}\n")
 
+        cache_stats = self.cache.stats()
+        print(f"Cache: {cache_stats['hits']} uit cache, {cache_stats['misses']} niet in cache\n")
+
         v1_correct_count = len(df_results[df_results['v1_match'] == '✅'])
         v2_correct_count = len(df_results[df_results['v2_match'] == '✅'])
         total = len(df_results)
@@ -19,6 +19,7 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.services.parquet_data_service import ParquetDataService, WerkbonVerhaalBuilder
+from src.services.classification_cache import get_classification_cache, prompt_version
 
 # === VERBETERDE VERHAAL BUILDER (kopie uit app_v2.py) ===
 class VerbeterdeVerhaalBuilder(WerkbonVerhaalBuilder):
@@ -205,8 +206,18 @@ BELANGRIJK:
 - Volg het CONTRACT voor contractspecifieke regels over radiatorkranen, WTW-units, afstandsgrenzen etc."""
 
 
-def classify_werkbon(client, verhaal, contract_text, threshold_ja=0.7, threshold_nee=0.7):
-    """Classify a single werkbon using V4 prompt."""
+MODEL = "claude-3-haiku-20240307"
+TEMPERATURE = 0
+PROMPT_VERSION = prompt_version("v6", SYSTEM_PROMPT_V6)
+
+
+def classify_werkbon(client, verhaal, contract_text, threshold_ja=0.7, threshold_nee=0.7, cache=None):
+    """Classify a single werkbon using V4 prompt.
+
+    Returns (classificatie, confidence, toelichting, from_cache). Met een
+    cache worden eerder geclassificeerde (contract, verhaal) paren niet
+    opnieuw naar de API gestuurd; alleen de drempels worden opnieuw toegepast.
+    """
     contract_truncated = contract_text[:15000] if len(contract_text) > 15000 else contract_text
 
     user_message = f"""### CONTRACT ###
@@ -218,11 +229,17 @@ def classify_werkbon(client, verhaal, contract_text, threshold_ja=0.7, threshold
 Classificeer deze werkbon. Let VOORAL op de "WAT HEEFT DE MONTEUR GEDAAN?" sectie.
 Geef je antwoord in JSON formaat."""
 
+    cache_key = cache.make_key(MODEL, PROMPT_VERSION, contract_truncated, verhaal, TEMPERATURE) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        result = cached["parsed"]
+        return (*apply_thresholds(result, threshold_ja, threshold_nee), True)
+
     try:
         response = client.messages.create(
-            model="claude-3-haiku-20240307",
+            model=MODEL,
             max_tokens=1024,
-            temperature=0,
+            temperature=TEMPERATURE,
             system=SYSTEM_PROMPT_V6,
             messages=[{"role": "user", "content": user_message}]
         )
@@ -252,20 +269,31 @@ Geef je antwoord in JSON formaat."""
                     "toelichting": "Regex fallback"
                 }
             else:
-                return "PARSE_ERROR", 0.0, "Kon niet parsen"
-
-        confidence = float(result.get("confidence", 0.5))
-        base = result.get("classificatie", "NEE").upper()
+                return "PARSE_ERROR", 0.0, "Kon niet parsen", False
 
-        if base == "JA":
-            final = "JA" if confidence >= threshold_ja else "TWIJFEL"
-        else:
-            final = "NEE" if confidence >= threshold_nee else "TWIJFEL"
+        if cache:
+            try:
+                cache.put(cache_key, result, response_text, model=MODEL, prompt_version=PROMPT_VERSION)
+            except OSError as e:
+                print(f"  ⚠️ Cache schrijven mislukt: {e}")
 
-        return final, confidence, result.get("toelichting", "")
+        return (*apply_thresholds(result, threshold_ja, threshold_nee), False)
 
     except Exception as e:
-        return "ERROR", 0.0, str(e)
+        return "ERROR", 0.0, str(e), False
+
+
+def apply_thresholds(result, threshold_ja, threshold_nee):
+    """(classificatie, confidence, toelichting) na toepassen van de drempels."""
+    confidence = float(result.get("confidence", 0.5))
+    base = result.get("classificatie", "NEE").upper()
+
+    if base == "JA":
+        final = "JA" if confidence >= threshold_ja else "TWIJFEL"
+    else:
+        final = "NEE" if confidence >= threshold_nee else "TWIJFEL"
+
+    return final, confidence, result.get("toelichting", "")
 
 
 def main():
@@ -298,6 +326,7 @@ def main():
 
     # API client
     client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    cache = get_classification_cache()
 
     results = []
     for i, (_, row) in enumerate(df_test.iterrows()):
@@ -341,7 +370,7 @@ def main():
         verhaal = builder.build_verhaal(keten)
 
         # Classify
-        v4_classificatie, confidence, toelichting = classify_werkbon(client, verhaal, contract_text)
+        v4_classificatie, confidence, toelichting, from_cache = classify_werkbon(client, verhaal, contract_text, cache=cache)
 
         # Compare
         v4_correct = (v4_classificatie == expected) or (v4_classificatie == "TWIJFEL" and expected == "TWIJFEL")
@@ -368,8 +397,9 @@ def main():
             "opmerking_gerrit": opmerking
         })
 
-        # Rate limiting
-        time.sleep(0.5)
+        # Rate limiting (alleen nodig als de API echt aangeroepen is)
+        if not from_cache:
+            time.sleep(0.5)
 
     # Summary
     print("\n" + "="*60)
@@ -384,6 +414,8 @@ def main():
     print(f"V3 accuracy: {100*v3_goed/total:.1f}% ({v3_goed}/{total})")
     print(f"V4 accuracy: {100*v4_goed/total:.1f}% ({v4_goed}/{total})")
     print(f"Verbetering: {v4_goed - v3_goed:+d} werkbonnen")
+    stats = cache.stats()
+    print(f"Cache: {stats['hits']} uit cache, {stats['misses']} niet in cache")
 
     # Detail: which errors did V4 fix?
     print("\n--- V3 fouten die V4 WEL goed heeft: ---")
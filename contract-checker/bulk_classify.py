@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Bulk classificatie van werkbonnen via een asynchrone batch.
+
+Voor het 's nachts (her)classificeren van grote aantallen werkbonnen: alle
+aanvragen worden vooraf opgebouwd uit de Parquet data, als één batch
+ingediend, en na afronding in de history van app_v2 weggeschreven
+(data/classification_history_v2.parquet), net als een batch uit de UI.
+
+- Werkbonnen die al in de classificatie-cache staan gaan niet naar de API.
+- Werkbonnen zonder contract krijgen GEEN_CONTRACT, zoals in de app.
+- Het manifest (data/bulk_batches/<batch_id>.json) bewaart welke werkbon bij
+  welke aanvraag hoort; met --resume pak je een onderbroken run weer op.
+
+Gebruik:
+    python bulk_classify.py --debiteur 005102 --van 2025-01-01 --limit 5000
+    python bulk_classify.py --resume msgbatch_...
+    python bulk_classify.py --provider local             # offline, zonder API (altijd dry-run)
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.services.batch_provider import (
+    AnthropicBatchProvider, BatchRequest, LocalBatchProvider, wait_for_batch
+)
+from src.services.llm_pool import UsageStats
+from src.services.parquet_data_service import ParquetDataService
+from src.services.classificatie import (
+    CLASSIFY_MODEL, CLASSIFY_TEMPERATURE, DATA_DIR, PROMPT_VERSION_V6,
+    api_error_result, classificatie_result, classification_cache, classify_params,
+    get_contract_for_debiteur, load_contracts, load_processed_werkbon_keys,
+    parse_classificatie_response, parse_error_result, prepare_werkbon,
+    save_processed_werkbon_keys, save_to_history,
+)
+
+MANIFEST_DIR = DATA_DIR / "bulk_batches"
+
+data_service = ParquetDataService(data_dir=str(DATA_DIR))
+contracts = load_contracts()
+
+
+def select_werkbonnen(debiteur_codes=None, van=None, tot=None, limit=1000, include_processed=False):
+    """Hoofdwerkbonnen voor de bulk run (nieuwste eerst)."""
+    werkbonnen = data_service.get_hoofdwerkbon_list(
+        debiteur_codes=debiteur_codes,
+        melddatum_start=van,
+        melddatum_end=tot,
+        limit=limit
+    )
+    if include_processed:
+        return werkbonnen
+    processed = load_processed_werkbon_keys()
+    return [wb for wb in werkbonnen if wb["hoofdwerkbon_key"] not in processed]
+
+
+def _with_werkbon_fields(result: dict, wb: dict, contract_filename) -> dict:
+    result["werkbon_code"] = wb.get("werkbon_code", "")
+    result["debiteur"] = wb.get("debiteur", "")
+    result["datum"] = wb.get("aanmaakdatum", "")
+    result["contract_filename"] = contract_filename
+    return result
+
+
+def build_requests(werkbonnen, threshold_ja, threshold_nee):
+    """Bouw alle aanvragen vooraf op.
+
+    Returns:
+        (requests, pending, results): batch aanvragen, manifest per custom_id
+        en de resultaten die geen API call nodig hebben (cache / geen contract).
+    """
+    requests, pending, results = [], {}, []
+
+    for wb in werkbonnen:
+        werkbon_key = wb["hoofdwerkbon_key"]
+        debiteur = wb.get("debiteur", "")
+        contract = get_contract_for_debiteur(debiteur, contracts)
+
+        if not contract:
+            results.append({
+                "werkbon_key": werkbon_key,
+                "werkbon_code": wb.get("werkbon_code", ""),
+                "debiteur": debiteur,
+                "datum": wb.get("melddatum", ""),
+                "classificatie": "TWIJFEL",
+                "basis_classificatie": "GEEN_CONTRACT",
+                "confidence": 0.0,
+                "toelichting": f"Geen contract gevonden voor debiteur {debiteur}",
+                "contract_referentie": "",
+                "contract_filename": None
+            })
+            continue
+
+        prepared = prepare_werkbon(data_service, werkbon_key, contract["content"])
+        if not prepared:
+            continue
+        keten, verhaal, contract_truncated = prepared
+
+        cache_key = classification_cache.make_key(
+            CLASSIFY_MODEL, PROMPT_VERSION_V6, contract_truncated, verhaal, CLASSIFY_TEMPERATURE
+        )
+        cached = classification_cache.get(cache_key)
+        if cached:
+            result = classificatie_result(
+                werkbon_key, keten, verhaal, cached["parsed"], cached["raw_response"],
+                threshold_ja, threshold_nee, from_cache=True
+            )
+            results.append(_with_werkbon_fields(result, wb, contract["filename"]))
+            continue
+
+        custom_id = f"wb-{werkbon_key}"
+        requests.append(BatchRequest(custom_id, classify_params(contract_truncated, verhaal)))
+        pending[custom_id] = {
+            "werkbon": wb,
+            "contract_filename": contract["filename"],
+            "cache_key": cache_key,
+        }
+
+    return requests, pending, results
+
+
+def collect_results(provider, batch_id, pending, threshold_ja, threshold_nee, usage=None, cache_results=True):
+    """Zet de batch-uitkomsten om naar history-resultaten.
+
+    Met `cache_results` komen geslaagde antwoorden ook in de classificatie-
+    cache; uit voor de lokale stand-in, die geen echte oordelen geeft.
+    """
+    contract_by_filename = {c["filename"]: c for c in contracts.values()}
+    results = []
+
+    for batch_result in provider.results(batch_id):
+        item = pending.get(batch_result.custom_id)
+        if item is None:
+            continue
+        wb = item["werkbon"]
+        werkbon_key = wb["hoofdwerkbon_key"]
+
+        if not batch_result.ok:
+            result = api_error_result(werkbon_key, batch_result.error)
+            results.append(_with_werkbon_fields(result, wb, item["contract_filename"]))
+            continue
+
+        if usage is not None:
+            usage.add(batch_result.usage)
+
+        contract = contract_by_filename.get(item["contract_filename"])
+        prepared = prepare_werkbon(data_service, werkbon_key, contract["content"] if contract else "")
+        if not prepared:
+            continue
+        keten, verhaal, _ = prepared
+
+        try:
+            parsed = parse_classificatie_response(batch_result.text)
+            result = classificatie_result(
+                werkbon_key, keten, verhaal, parsed, batch_result.text, threshold_ja, threshold_nee
+            )
+        except (json.JSONDecodeError, KeyError) as e:
+            result = parse_error_result(werkbon_key, keten, verhaal, e, batch_result.text)
+        else:
+            if cache_results:
+                try:
+                    classification_cache.put(
+                        item["cache_key"], parsed, batch_result.text,
+                        model=CLASSIFY_MODEL, prompt_version=PROMPT_VERSION_V6, werkbon_key=werkbon_key
+                    )
+                except OSError as e:
+                    print(f"⚠️ Cache schrijven mislukt voor werkbon {werkbon_key}: {e}")
+
+        results.append(_with_werkbon_fields(result, wb, item["contract_filename"]))
+
+    return results
+
+
+def save_manifest(batch_id, provider_name, pending, settings):
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    path = MANIFEST_DIR / f"{batch_id}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "batch_id": batch_id,
+            "provider": provider_name,
+            "created": datetime.now().isoformat(),
+            "settings": settings,
+            "pending": pending,
+        }, f, ensure_ascii=False, default=str)
+    return path
+
+
+def load_manifest(batch_id):
+    with open(MANIFEST_DIR / f"{batch_id}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_results(results, dry_run=False):
+    """Schrijf naar de history store en markeer werkbonnen als verwerkt."""
+    if dry_run or not results:
+        return
+    save_to_history(results)
+    processed = load_processed_werkbon_keys()
+    processed.update(r["werkbon_key"] for r in results if r.get("werkbon_key"))
+    save_processed_werkbon_keys(processed)
+
+
+def print_summary(results, usage=None):
+    counts = {}
+    for r in results:
+        counts[r.get("classificatie", "?")] = counts.get(r.get("classificatie", "?"), 0) + 1
+    from_cache = sum(1 for r in results if r.get("from_cache"))
+
+    print(f"\n{'='*60}")
+    print(f"Resultaten: {len(results)} werkbonnen ({from_cache} uit cache)")
+    for classificatie, n in sorted(counts.items()):
+        print(f"  {classificatie:<8} {n}")
+    if usage is not None and usage.requests:
+        stats = usage.as_dict()
+        print(f"Tokens: {stats['prompt_tokens']:,} input "
+              f"({stats['cache_read_input_tokens']:,} uit prompt-cache), {stats['output_tokens']:,} output")
+    print(f"{'='*60}\n")
+
+
+def make_provider(name):
+    if name == "local":
+        return LocalBatchProvider()
+
+    from src.services.llm_pool import get_anthropic_client
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        print("❌ ANTHROPIC_API_KEY environment variable not set")
+        print("Export je API key: export ANTHROPIC_API_KEY=sk-ant-...")
+        sys.exit(1)
+    return AnthropicBatchProvider(get_anthropic_client(api_key))
+
+
+def _print_progress(counts):
+    if counts:
+        print("  ... " + ", ".join(f"{k}={v}" for k, v in counts.items() if v))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk classificatie via een batch job")
+    parser.add_argument("--debiteur", action="append", help="Debiteurcode (herhaalbaar)")
+    parser.add_argument("--van", help="Melddatum vanaf (YYYY-MM-DD)")
+    parser.add_argument("--tot", help="Melddatum tot en met (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=1000, help="Max aantal werkbonnen")
+    parser.add_argument("--include-processed", action="store_true",
+                        help="Ook werkbonnen die al eerder geclassificeerd zijn")
+    parser.add_argument("--threshold-ja", type=float, default=0.85)
+    parser.add_argument("--threshold-nee", type=float, default=0.85)
+    parser.add_argument("--provider", choices=["anthropic", "local"], default="anthropic")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconden tussen status checks")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop met wachten na N seconden")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wacht op een eerder ingediende batch")
+    parser.add_argument("--dry-run", action="store_true", help="Niets naar de history schrijven")
+    args = parser.parse_args()
+
+    # De lokale stand-in geeft geen echte oordelen: nooit in de history of
+    # als verwerkt markeren, anders slaat de volgende echte run ze over
+    if args.provider == "local" and not args.dry_run:
+        print("Lokale provider: dry-run (er wordt niets naar de history geschreven)")
+        args.dry_run = True
+
+    usage = UsageStats()
+
+    if args.resume:
+        manifest = load_manifest(args.resume)
+        provider = make_provider(manifest["provider"])
+        batch_id = manifest["batch_id"]
+        pending = manifest["pending"]
+        thresholds = manifest["settings"]
+        results = []
+        print(f"Hervat batch {batch_id} ({len(pending)} aanvragen)")
+    else:
+        provider = make_provider(args.provider)
+        thresholds = {"threshold_ja": args.threshold_ja, "threshold_nee": args.threshold_nee}
+
+        werkbonnen = select_werkbonnen(args.debiteur, args.van, args.tot, args.limit, args.include_processed)
+        print(f"Geselecteerd: {len(werkbonnen)} werkbonnen")
+
+        requests, pending, results = build_requests(werkbonnen, **thresholds)
+        print(f"Uit cache / zonder contract: {len(results)} | Naar batch: {len(requests)}")
+
+        if not requests:
+            write_results(results, args.dry_run)
+            print_summary(results)
+            return
+
+        batch_id = provider.submit(requests)
+        print(f"Batch ingediend: {batch_id}")
+        # Een lokale batch bestaat alleen binnen deze run; niets om te hervatten
+        if provider.name != "local":
+            print(f"Manifest: {save_manifest(batch_id, provider.name, pending, thresholds)}")
+
+        # Resultaten die geen API call nodig hadden meteen wegschrijven; bij
+        # een onderbreking hoeft --resume alleen de batch af te maken
+        write_results(results, args.dry_run)
+
+    try:
+        wait_for_batch(provider, batch_id, poll_interval=args.poll_interval,
+                       timeout=args.timeout, on_poll=_print_progress)
+    except TimeoutError as e:
+        print(f"⏳ {e}. Later verder met: python bulk_classify.py --resume {batch_id}")
+        sys.exit(2)
+
+    batch_results = collect_results(
+        provider, batch_id, pending, usage=usage, cache_results=provider.name != "local", **thresholds
+    )
+    write_results(batch_results, args.dry_run)
+    print_summary(results + batch_results, usage)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Asynchrone batch-verwerking van LLM-aanvragen.
+
+Voor het 's nachts herclassificeren van duizenden werkbonnen zijn losse
+interactieve calls onnodig duur en traag. Een batch provider neemt alle
+aanvragen in één keer aan, verwerkt ze asynchroon en levert daarna de
+resultaten per `custom_id` terug.
+
+Providers:
+- AnthropicBatchProvider: Anthropic Message Batches API (50% goedkoper,
+  resultaten binnen 24 uur, meestal veel sneller).
+- LocalBatchProvider: stand-in die alles lokaal afhandelt; voor offline
+  testen en droogdraaien van de bulk-flow zonder API key.
+
+Gebruik:
+    provider = AnthropicBatchProvider(client)
+    batch_id = provider.submit(requests)
+    wait_for_batch(provider, batch_id)
+    for result in provider.results(batch_id):
+        ...
+"""
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass
+class BatchRequest:
+    """Eén aanvraag: `params` zijn de keyword arguments voor messages.create."""
+    custom_id: str
+    params: Dict[str, Any]
+
+
+@dataclass
+class BatchResult:
+    """Uitkomst van één aanvraag uit een batch."""
+    custom_id: str
+    text: Optional[str] = None
+    usage: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.text is not None
+
+
+class BatchProvider:
+    """Interface voor batch providers."""
+
+    name = "base"
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Dien alle aanvragen in; geeft een batch id terug."""
+        raise NotImplementedError
+
+    def is_done(self, batch_id: str) -> bool:
+        """True als de batch klaar is (alle aanvragen verwerkt of verlopen)."""
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        """Resultaten van een afgeronde batch (volgorde niet gegarandeerd)."""
+        raise NotImplementedError
+
+    def progress(self, batch_id: str) -> Dict[str, int]:
+        """Tellers voor voortgangsmeldingen (optioneel per provider)."""
+        return {}
+
+
+class AnthropicBatchProvider(BatchProvider):
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    # Limiet van de API per batch
+    MAX_REQUESTS = 100_000
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        if len(requests) > self.MAX_REQUESTS:
+            raise ValueError(f"Maximaal {self.MAX_REQUESTS} aanvragen per batch, kreeg {len(requests)}")
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": r.custom_id, "params": r.params} for r in requests]
+        )
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def progress(self, batch_id: str) -> Dict[str, int]:
+        counts = self.client.messages.batches.retrieve(batch_id).request_counts
+        return {
+            field: getattr(counts, field, 0)
+            for field in ("processing", "succeeded", "errored", "canceled", "expired")
+        }
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == "succeeded":
+                message = result.message
+                yield BatchResult(entry.custom_id, text=message.content[0].text, usage=message.usage)
+            else:
+                detail = getattr(getattr(result, "error", None), "error", None)
+                message = getattr(detail, "message", "") if detail else ""
+                yield BatchResult(entry.custom_id, error=f"{result.type}: {message}".rstrip(": "))
+
+
+def default_local_response(params: Dict[str, Any]) -> str:
+    """Antwoord van de stand-in: geldige JSON zonder inhoudelijk oordeel.
+
+    Confidence 0.0 valt altijd onder de drempels, dus lokaal 'geclassificeerde'
+    werkbonnen komen als TWIJFEL uit en worden nooit stilzwijgend JA/NEE.
+    """
+    return json.dumps({
+        "classificatie": "NEE",
+        "confidence": 0.0,
+        "contract_referentie": "",
+        "toelichting": "Lokale stand-in provider (geen LLM aangeroepen)",
+    })
+
+
+class LocalBatchProvider(BatchProvider):
+    """Lokale stand-in voor een batch API.
+
+    Args:
+        respond: Functie params -> response tekst. Default: default_local_response.
+            Een functie die de echte API synchroon aanroept kan ook, dan werkt
+            de bulk-flow met elke provider zonder eigen batch API.
+        polls_until_done: Aantal is_done() aanroepen voordat de batch klaar
+            is; om het pollen te kunnen testen.
+    """
+
+    name = "local"
+
+    def __init__(self, respond: Callable[[Dict[str, Any]], str] = None, polls_until_done: int = 0):
+        self.respond = respond or default_local_response
+        self.polls_until_done = polls_until_done
+        self._batches: Dict[str, List[BatchRequest]] = {}
+        self._polls: Dict[str, int] = {}
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        batch_id = f"local_batch_{len(self._batches) + 1}"
+        self._batches[batch_id] = list(requests)
+        self._polls[batch_id] = 0
+        return batch_id
+
+    def is_done(self, batch_id: str) -> bool:
+        self._polls[batch_id] += 1
+        return self._polls[batch_id] > self.polls_until_done
+
+    def progress(self, batch_id: str) -> Dict[str, int]:
+        total = len(self._batches[batch_id])
+        done = self._polls[batch_id] > self.polls_until_done
+        return {"processing": 0 if done else total, "succeeded": total if done else 0}
+
+    def results(self, batch_id: str) -> Iterator[BatchResult]:
+        for request in self._batches[batch_id]:
+            try:
+                yield BatchResult(request.custom_id, text=self.respond(request.params))
+            except Exception as e:
+                yield BatchResult(request.custom_id, error=str(e))
+
+
+def wait_for_batch(
+    provider: BatchProvider,
+    batch_id: str,
+    poll_interval: float = 60.0,
+    timeout: Optional[float] = None,
+    on_poll: Optional[Callable[[Dict[str, int]], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """Poll tot de batch klaar is.
+
+    Raises:
+        TimeoutError: als de batch na `timeout` seconden nog niet klaar is
+            (de batch loopt bij de provider gewoon door).
+    """
+    started = time.monotonic()
+    while not provider.is_done(batch_id):
+        if on_poll:
+            on_poll(provider.progress(batch_id))
+        if timeout is not None and time.monotonic() - started >= timeout:
+            raise TimeoutError(f"Batch {batch_id} niet klaar na {timeout:.0f}s")
+        sleep(poll_interval)
@@ -0,0 +1,542 @@
+"""Classificatie van werkbonnen tegen een servicecontract (V6 prompt).
+
+Alles wat nodig is om een werkbon te classificeren en het resultaat op te
+slaan, los van de Streamlit UI: verhaal opbouwen, prompt en request
+parameters, het antwoord parsen, resultaat-dicts en de history. Gedeeld
+door app_v2 (interactief) en bulk_classify (batch), zodat beide exact
+dezelfde aanvragen doen en in dezelfde history schrijven.
+"""
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from .classification_cache import get_classification_cache, prompt_version
+from .llm_pool import cached_text_block
+from .parquet_data_service import WerkbonVerhaalBuilder as OriginalVerhaalBuilder
+
+APP_DIR = Path(__file__).resolve().parents[2]
+CONTRACTS_DIR = APP_DIR / "contracts"
+DATA_DIR = APP_DIR / "data"
+
+
+# === VERBETERDE VERHAAL BUILDER ===
+class VerbeterdeVerhaalBuilder(OriginalVerhaalBuilder):
+    """Verbeterde builder die oplossingen prominenter toont."""
+
+    def build_verhaal(self, keten, chronological: bool = True) -> str:
+        """Build verhaal met oplossingen EERST (belangrijker dan kosten)."""
+        lines = []
+
+        # Header
+        lines.append(f"# Werkbonketen voor {keten.relatie_naam}")
+        lines.append(f"Relatiecode: {keten.relatie_code}")
+        lines.append("")
+
+        # Summary
+        lines.append("## Samenvatting")
+        lines.append(f"- Aantal werkbonnen in keten: {keten.aantal_werkbonnen}")
+        lines.append(f"- Totaal aantal paragrafen: {keten.aantal_paragrafen}")
+        lines.append(f"- Totale kosten: €{keten.totaal_kosten:,.2f}")
+        lines.append("")
+
+        # Sort werkbonnen by melddatum
+        werkbonnen = sorted(
+            keten.werkbonnen,
+            key=lambda w: w.melddatum or "",
+            reverse=chronological
+        )
+
+        # Each werkbon
+        for i, wb in enumerate(werkbonnen, 1):
+            if wb.is_hoofdwerkbon:
+                lines.append(f"## Hoofdwerkbon: {wb.werkbon_nummer}")
+            else:
+                lines.append(f"## Vervolgbon (niveau {wb.niveau}): {wb.werkbon_nummer}")
+
+            lines.append(f"- **Status: {wb.status}** | Documentstatus: {wb.documentstatus}")
+            if wb.administratieve_fase:
+                lines.append(f"- Administratieve fase: {wb.administratieve_fase}")
+
+            lines.append(f"- Type: {wb.type}")
+            if wb.melddatum:
+                melding = wb.melddatum
+                if wb.meldtijd:
+                    melding += f" {wb.meldtijd}"
+                lines.append(f"- Melding: {melding}")
+            if wb.afspraakdatum:
+                lines.append(f"- Afspraakdatum: {wb.afspraakdatum}")
+            if wb.opleverdatum:
+                lines.append(f"- Opleverdatum: {wb.opleverdatum}")
+
+            if wb.monteur:
+                lines.append(f"- Monteur: {wb.monteur}")
+            lines.append(f"- Locatie: {wb.postcode} {wb.plaats}")
+
+            # Paragrafen
+            if wb.paragrafen:
+                lines.append("### Werkbonparagrafen")
+                for p in wb.paragrafen:
+                    lines.append(f"\n**{p.naam}** ({p.type})")
+                    if p.factureerwijze:
+                        lines.append(f"- ⚠️ Factureerwijze: {p.factureerwijze}")
+                    lines.append(f"- Uitvoeringstatus: {p.uitvoeringstatus}")
+
+                    if p.plandatum:
+                        lines.append(f"- Plandatum: {p.plandatum}")
+                    if p.uitgevoerd_op:
+                        uitvoering = p.uitgevoerd_op
+                        if p.tijdstip_uitgevoerd:
+                            uitvoering += f" {p.tijdstip_uitgevoerd}"
+                        lines.append(f"- Uitgevoerd: {uitvoering}")
+
+                    if p.storing:
+                        lines.append(f"- Storingscode: {p.storing}")
+                    if p.oorzaak:
+                        lines.append(f"- Oorzaakcode: {p.oorzaak}")
+
+                    # ⭐ OPLOSSINGEN EERST - Dit is de belangrijkste info!
+                    if p.oplossingen:
+                        lines.append("")
+                        lines.append("🔍 **WAT HEEFT DE MONTEUR GEDAAN? (Oplossingen):**")
+                        oplossingen = sorted(
+                            p.oplossingen,
+                            key=lambda o: o.aanmaakdatum or "",
+                            reverse=chronological
+                        )
+                        for opl in oplossingen:
+                            datum = f"[{opl.aanmaakdatum}] " if opl.aanmaakdatum else ""
+                            lines.append(f"- {datum}{opl.oplossing}")
+                            if opl.oplossing_uitgebreid:
+                                lines.append(f"  Toelichting: {opl.oplossing_uitgebreid}")
+
+                    # Kostenregels daarna
+                    if p.kosten:
+                        lines.append("")
+                        lines.append("**Kostenregels:**")
+                        for k in p.kosten:
+                            cat = k.categorie.upper() if k.categorie else "ONBEKEND"
+                            lines.append(f"- [{cat}] {k.omschrijving}")
+                            lines.append(f"  Aantal: {k.aantal} | Verrekenprijs: €{k.verrekenprijs:,.2f} | Kostprijs: €{k.kostprijs:,.2f}")
+                            if k.taak:
+                                lines.append(f"  Taak: {k.taak}")
+                            if k.boekdatum:
+                                lines.append(f"  Boekdatum: {k.boekdatum}")
+
+                    # Opvolgingen
+                    if p.opvolgingen:
+                        lines.append("")
+                        lines.append("**Opvolgingen:**")
+                        opvolgingen = sorted(
+                            p.opvolgingen,
+                            key=lambda o: o.aanmaakdatum or "",
+                            reverse=chronological
+                        )
+                        for opv in opvolgingen:
+                            datum = f"[{opv.aanmaakdatum}] " if opv.aanmaakdatum else ""
+                            status = f"({opv.status})" if opv.status else ""
+                            lines.append(f"- {datum}**{opv.opvolgsoort}** {status}")
+                            if opv.beschrijving:
+                                lines.append(f"  > {opv.beschrijving}")
+
+                lines.append("")
+
+        return "\n".join(lines)
+
+
+# === CONTRACT LOADING ===
+def load_contracts(contracts_dir: Path = CONTRACTS_DIR):
+    """Load all contracts from contracts folder."""
+    contracts_dir = Path(contracts_dir)
+    contracts = {}
+
+    # Load metadata
+    meta_path = contracts_dir / "contracts_metadata.json"
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        for c in meta.get("contracts", []):
+            contract_file = contracts_dir / c["filename"]
+            if contract_file.exists():
+                content = contract_file.read_text(encoding="utf-8")
+                contracts[c["id"]] = {
+                    "id": c["id"],
+                    "filename": c["filename"],
+                    "content": content,
+                    "clients": c.get("clients", [])
+                }
+
+    return contracts
+
+
+def get_contract_for_debiteur(debiteur_code: str, contracts: dict):
+    """Get contract for a specific debiteur."""
+    # Extract code from "005102 - Trivire" format
+    code = debiteur_code.split(" - ")[0].strip() if " - " in debiteur_code else debiteur_code
+
+    for contract in contracts.values():
+        if code in contract.get("clients", []):
+            return contract
+    return None
+
+
+# === CLASSIFICATIE ===
+# ⭐ SYSTEM PROMPT V6 - Generiek (contracttekst-gestuurd)
+SYSTEM_PROMPT_V6 = """Je bent een expert in het analyseren van servicecontracten voor verwarmingssystemen.
+
+Je taak is om te bepalen of een werkbon binnen of buiten een servicecontract valt.
+Het CONTRACT dat je meekrijgt bevat het BASISPRINCIPE en de BELANGRIJKE UITZONDERINGEN voor deze specifieke woningbouwvereniging. Lees dit EERST en volg de contractregels nauwkeurig.
+
+⭐ BELANGRIJKSTE ANALYSE PUNT: Lees daarna de "WAT HEEFT DE MONTEUR GEDAAN? (Oplossingen)" sectie.
+Dit is een vrij tekstveld waar de monteur beschrijft wat er aan de hand was en wat hij heeft gedaan.
+Deze informatie is CRUCIAAL en weegt ZWAARDER dan storingscodes of kostenregels.
+
+🔍 UNIVERSELE REGELS (gelden voor ALLE contracten, op volgorde van prioriteit):
+
+📌 REGEL 0 - HOOGSTE PRIORITEIT (ALTIJD NEE, ongeacht andere regels):
+- **Factureerwijze "Regie (alles factureren)"** → ALTIJD NEE. Als de paragraaf op Regie staat, is het antwoord altijd NEE.
+- **Oorzaakcode 900 / "Probleem door derde"** → ALTIJD NEE (factureren aan derden)
+  Dit geldt OOK als de storingscode iets anders suggereert (bijv. lekkage onder ketel + probleem derden = NEE)
+- **Tapwaterboiler / geiser / moederhaard** → ALTIJD NEE (regie)
+- **Vloerverwarming (verdelers, pompen, regelingen)** → ALTIJD NEE (buiten contract)
+- **Verstopping** → ALTIJD NEE (buiten contract)
+
+📌 REGEL 1 - OPLOSSING GAAT VOOR OP STORINGSCODE:
+- Als de OPLOSSING van de monteur is "installatie gevuld en ontlucht" / "bijgevuld" / "ontlucht" → ALTIJD JA
+  Dit geldt OOK als de storingscode iets anders suggereert (bijv. "GEEN CV en WW" + oplossing gevuld/ontlucht = JA)
+- Als de OPLOSSING een ander verhaal vertelt dan de storingscode, volg dan de OPLOSSING
+
+📌 REGEL 2 - KETELONDERDELEN = BINNEN DE MANTEL (ALTIJD JA):
+De volgende onderdelen zitten fysiek IN de cv-ketel (binnen de mantel) en vallen ALTIJD binnen contract:
+- Hydroblok, driewegklep (3-wegklep), manometer, automatisch vulsysteem, vulset
+- Expansievat, warmtewisselaar (platenwisselaar), branderunit, brander, waakvlambrander
+- Gasblok, gasregelblok, ventilator, ventilatormotor
+- Printplaat, branderautomaat, display/LCD, opentherm interface
+- Ontstekingselektrode, ionisatie-electrode, ontstekingstransformator, thermokoppel
+- Pomp (cv-pomp in de ketel), overloopbeveiliging, veiligheidsklep, overstortventiel
+- Sensor, NTC (temperatuursensor), doorstroomsensor, druksensor
+- Luchtdrukschakelaar, waterdrukschakelaar, maximaalthermostaat
+- Sifon, condensafvoer, condensbak, dompelbuis
+- Aansluitblok, kabelboom, O-ringen, pakkingen, afdichtingen (ketel-intern)
+Als de werkbon (of een vervolgbon/meenemen-bon) deze onderdelen noemt → JA.
+
+📌 REGEL 3 - CONTRACTTEKST IS LEIDEND:
+Volg het CONTRACT voor contractspecifieke regels over:
+- Welke onderdelen/locaties wel of niet gedekt zijn
+- Of er een afstandsgrens geldt (bijv. "2 meter van de ketel")
+- Hoe radiatoren, radiatorkranen, WTW-units, RGA/LTV behandeld worden
+- Deze regels VERSCHILLEN per woningbouwvereniging — lees het contract!
+
+📌 REGEL 4 - STORINGSCODES (universeel, Syntess-systeemcodes):
+- **Storingscode 006.1 "Lekkage ONDER de ketel"** = lekkage dichtbij/onder de ketel (binnen de mantel)
+- **Storingscode 006.2 "Lekkage aan de installatie"** = lekkage op AFSTAND van de ketel (buiten de mantel) → NEE
+  LET OP: 006.1 ≠ 006.2! Dit is een CRUCIAAL onderscheid.
+  006.2 betekent dat de lekkage NIET aan de ketel zelf zit maar aan de installatie op afstand → classificeer als NEE.
+
+📌 REGEL 5 - BIJ TWIJFEL:
+- **Radiatoren vervangen** → classificeer als NEE (medewerker kan dit beter beoordelen dan AI)
+- **CV-leiding niet in het zicht (reparatie)** → classificeer als NEE (moeilijk te beoordelen door AI)
+- **Niet thuis geweest** → JA met lage confidence (werk niet uitgevoerd maar geen regie)
+
+Analyseer vervolgens:
+- Type werkzaamheden (onderhoud, reparatie, storing, modificatie)
+- Locatie: binnen ketelkast/mantel vs buiten ketel
+- Gebruikte materialen en onderdelen
+- Arbeidsuren en kostenposten
+- Oorzaak: wie/wat veroorzaakt het probleem
+- Storingscodes en oorzaken
+
+Geef je antwoord ALLEEN in het volgende JSON formaat:
+{
+    "classificatie": "JA" of "NEE",
+    "confidence": 0.0-1.0,
+    "contract_referentie": "Verwijzing naar relevant contract artikel of -regel",
+    "toelichting": "Korte uitleg: vermeld EXPLICIET wat de monteur deed en welke contractregel van toepassing is"
+}
+
+Classificatie:
+- JA: Werkzaamheden vallen volledig binnen het contract (niet factureren aan klant)
+- NEE: Werkzaamheden vallen buiten het contract (wel factureren aan klant)
+
+confidence: Je zekerheid over de classificatie (0.0 = zeer onzeker, 1.0 = zeer zeker)
+
+BELANGRIJK:
+- Geef ALTIJD een classificatie (JA of NEE), ook als je onzeker bent
+- Bij twijfel over locatie → kijk naar wat de monteur schrijft in oplossingen
+- Ketelonderdelen (binnen de mantel) zijn BINNEN contract, ook als ze "duur" zijn
+- OORZAAK "PROBLEEM DOOR DERDE" → ALTIJD NEE, ook bij lekkage onder ketel
+- OPLOSSING "gevuld en ontlucht" → ALTIJD JA, ook als storingscode iets anders suggereert
+- Volg het CONTRACT voor contractspecifieke regels over radiatorkranen, WTW-units, afstandsgrenzen etc."""
+
+CLASSIFY_MODEL = "claude-3-haiku-20240307"
+CLASSIFY_TEMPERATURE = 0
+PROMPT_VERSION_V6 = prompt_version("v6", SYSTEM_PROMPT_V6)
+
+# Resultaten per (model, prompt, contract, verhaal, temperature); zie classification_cache
+classification_cache = get_classification_cache()
+
+
+def parse_classificatie_response(response_text: str) -> dict:
+    """Parse het JSON antwoord van Claude; regex fallback bij kapotte JSON.
+
+    Raises:
+        json.JSONDecodeError: als er geen classificatie in de response staat
+    """
+    text = response_text.strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+
+    # Clean control characters die JSON parsing breken
+    text_clean = re.sub(r'[\x00-\x1f\x7f]', ' ', text.strip())
+
+    try:
+        result = json.loads(text_clean)
+    except json.JSONDecodeError:
+        # Fallback: probeer classificatie en confidence via regex te extraheren
+        class_match = re.search(r'"classificatie"\s*:\s*"(JA|NEE)"', text, re.IGNORECASE)
+        conf_match = re.search(r'"confidence"\s*:\s*([\d.]+)', text)
+        toel_match = re.search(r'"toelichting"\s*:\s*"([^"]*)"', text)
+        ref_match = re.search(r'"contract_referentie"\s*:\s*"([^"]*)"', text)
+
+        if class_match:
+            result = {
+                "classificatie": class_match.group(1).upper(),
+                "confidence": float(conf_match.group(1)) if conf_match else 0.8,
+                "toelichting": toel_match.group(1) if toel_match else "Geëxtraheerd via regex fallback",
+                "contract_referentie": ref_match.group(1) if ref_match else ""
+            }
+        else:
+            raise json.JSONDecodeError("Geen classificatie gevonden", text, 0)
+
+    return result
+
+
+def build_classify_request(contract_text: str, verhaal: str) -> dict:
+    """Request voor messages.create, opgebouwd als cacheable prefix.
+
+    Volgorde van statisch naar variabel: system prompt (altijd gelijk),
+    contract (gelijk voor alle werkbonnen van een debiteur), verhaal (per
+    werkbon). De eerste twee zijn cache breakpoints; de tekst die het model
+    ziet is identiek aan één user message met contract + verhaal.
+    """
+    return {
+        "system": [cached_text_block(SYSTEM_PROMPT_V6)],
+        "messages": [{
+            "role": "user",
+            "content": [
+                cached_text_block(f"### CONTRACT ###\n{contract_text}\n\n"),
+                {
+                    "type": "text",
+                    "text": f"""### WERKBON VERHAAL ###
+{verhaal}
+
+Classificeer deze werkbon. Let VOORAL op de "WAT HEEFT DE MONTEUR GEDAAN?" sectie.
+Geef je antwoord in JSON formaat.""",
+                },
+            ],
+        }],
+    }
+
+
+def classify_params(contract_text: str, verhaal: str) -> dict:
+    """Volledige parameters voor messages.create (ook gebruikt in bulk batches)."""
+    return {
+        "model": CLASSIFY_MODEL,
+        "max_tokens": 1024,
+        "temperature": CLASSIFY_TEMPERATURE,
+        **build_classify_request(contract_text, verhaal),
+    }
+
+
+def prepare_werkbon(data_service, werkbon_key: int, contract_text: str):
+    """Werkbonketen, verhaal en (ingekorte) contracttekst voor één classificatie.
+
+    Returns:
+        (keten, verhaal, contract_truncated), of None als de werkbon niet bestaat
+    """
+    keten = data_service.get_werkbon_keten(
+        werkbon_key,
+        include_kosten_details=True,
+        include_oplossingen=True,
+        include_opvolgingen=True
+    )
+
+    if not keten:
+        return None
+
+    # Gebruik verbeterde builder
+    builder = VerbeterdeVerhaalBuilder()
+    verhaal = builder.build_verhaal(keten)
+
+    contract_truncated = contract_text[:15000] if len(contract_text) > 15000 else contract_text
+    return keten, verhaal, contract_truncated
+
+
+def classificatie_result(
+    werkbon_key: int,
+    keten,
+    verhaal: str,
+    result: dict,
+    response_text: str,
+    threshold_ja: float,
+    threshold_nee: float,
+    from_cache: bool = False,
+) -> dict:
+    """Resultaat-dict voor de UI/history uit een geparst antwoord (past drempels toe)."""
+    confidence = float(result.get("confidence", 0.5))
+    base_classificatie = result.get("classificatie", "NEE").upper()
+
+    # Apply thresholds
+    if base_classificatie == "JA":
+        final = "JA" if confidence >= threshold_ja else "TWIJFEL"
+    else:
+        final = "NEE" if confidence >= threshold_nee else "TWIJFEL"
+
+    return {
+        "werkbon_key": werkbon_key,
+        "classificatie": final,
+        "basis_classificatie": base_classificatie,
+        "confidence": confidence,
+        "contract_referentie": result.get("contract_referentie", ""),
+        "toelichting": result.get("toelichting", ""),
+        "verhaal": verhaal,
+        "totaal_kosten": keten.totaal_kosten,
+        "aantal_werkbonnen": keten.aantal_werkbonnen,
+        "raw_response": response_text,
+        "from_cache": from_cache
+    }
+
+
+def parse_error_result(werkbon_key: int, keten, verhaal: str, error: Exception, response_text: str) -> dict:
+    """Resultaat-dict als de response van Claude niet te parsen is."""
+    return {
+        "werkbon_key": werkbon_key,
+        "classificatie": "TWIJFEL",
+        "basis_classificatie": "PARSE_ERROR",
+        "confidence": 0.0,
+        "contract_referentie": "",
+        "toelichting": f"Kon response niet parsen: {str(error)}",
+        "verhaal": verhaal,
+        "totaal_kosten": keten.totaal_kosten if keten else 0,
+        "raw_response": response_text
+    }
+
+
+def api_error_result(werkbon_key: int, error) -> dict:
+    """Resultaat-dict bij een mislukte API call."""
+    return {
+        "werkbon_key": werkbon_key,
+        "error": str(error),
+        "classificatie": "ERROR",
+        "confidence": 0.0,
+        "toelichting": f"API fout: {str(error)}"
+    }
+
+
+# === USAGE TRACKING (Parquet persistent storage) ===
+def get_history_path():
+    """Get path to classification history Parquet file."""
+    return DATA_DIR / "classification_history_v2.parquet"
+
+
+def get_processed_keys_path():
+    """Get path to processed werkbon keys file."""
+    return DATA_DIR / "processed_werkbon_keys_v2.parquet"
+
+
+def get_usage_count() -> int:
+    """Get total number of classifications from Parquet file."""
+    history_path = get_history_path()
+    if history_path.exists():
+        try:
+            df = pd.read_parquet(history_path)
+            return len(df)
+        except Exception:
+            return 0
+    return 0
+
+
+def load_history() -> list:
+    """Load classification history from Parquet file."""
+    history_path = get_history_path()
+    if history_path.exists():
+        try:
+            df = pd.read_parquet(history_path)
+            return df.to_dict('records')
+        except Exception:
+            return []
+    return []
+
+
+def save_to_history(results: list):
+    """Save classification results to Parquet file (persistent storage)."""
+    from datetime import datetime
+
+    history_path = get_history_path()
+
+    # Load existing history
+    existing_records = []
+    if history_path.exists():
+        try:
+            df_existing = pd.read_parquet(history_path)
+            existing_records = df_existing.to_dict('records')
+        except Exception:
+            pass
+
+    # Add new records
+    timestamp = datetime.now().isoformat()
+    for r in results:
+        history_entry = {
+            "timestamp": timestamp,
+            "werkbon_key": r.get("werkbon_key"),
+            "werkbon_code": r.get("werkbon_code", ""),
+            "debiteur": r.get("debiteur", ""),
+            "datum": str(r.get("datum", "")),
+            "contract_filename": r.get("contract_filename", ""),
+            "classificatie": r.get("classificatie", ""),
+            "basis_classificatie": r.get("basis_classificatie", ""),
+            "confidence": r.get("confidence", 0) * 100,
+            "toelichting": r.get("toelichting", ""),
+            "contract_referentie": r.get("contract_referentie", ""),
+            "totaal_kosten": r.get("totaal_kosten", 0),
+        }
+        existing_records.append(history_entry)
+
+    # Save to Parquet
+    df = pd.DataFrame(existing_records)
+    history_path.parent.mkdir(exist_ok=True)
+    df.to_parquet(history_path, index=False)
+
+
+def load_processed_werkbon_keys() -> set:
+    """Load set of already processed werkbon keys from Parquet."""
+    keys_path = get_processed_keys_path()
+    if keys_path.exists():
+        try:
+            df = pd.read_parquet(keys_path)
+            return set(df["werkbon_key"].tolist())
+        except Exception:
+            return set()
+    return set()
+
+
+def save_processed_werkbon_keys(keys: set):
+    """Save processed werkbon keys to Parquet file."""
+    keys_path = get_processed_keys_path()
+    df = pd.DataFrame({"werkbon_key": list(keys)})
+    keys_path.parent.mkdir(exist_ok=True)
+    df.to_parquet(keys_path, index=False)
+
+
+def clear_all_history():
+    """Clear all history and processed keys (for reset functionality)."""
+    history_path = get_history_path()
+    keys_path = get_processed_keys_path()
+    if history_path.exists():
+        history_path.unlink()
+    if keys_path.exists():
+        keys_path.unlink()
@@ -0,0 +1,152 @@
+"""Persistente cache voor LLM-classificaties.
+
+Een classificatie hangt alleen af van wat er naar het model gaat: model,
+prompt, contracttekst, werkbonverhaal en temperature. De cache gebruikt de
+hash van precies die invoer als sleutel (content-addressed) en bewaart het
+geparste antwoord plus de ruwe response. Wie een backtest opnieuw draait
+met alleen andere drempelwaardes, doet dus geen enkele API call meer;
+verandert het verhaal, het contract of de prompt, dan verandert de sleutel
+vanzelf.
+
+Drempelwaardes (JA/NEE/TWIJFEL) horen bewust NIET in de sleutel: die worden
+na het ophalen toegepast op de opgeslagen confidence.
+
+Opslag: één JSON bestand per sleutel in `<cache_dir>/<ab>/<sleutel>.json`.
+Schrijven gaat via een tijdelijk bestand + os.replace, zodat parallelle
+workers (zie llm_pool) elkaar niet in de weg zitten.
+
+Configuratie via environment:
+    CLASSIFY_CACHE_DIR   Map voor de cache (default data/classification_cache)
+    CLASSIFY_CACHE       "0" zet de cache uit
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / "classification_cache"
+CLASSIFY_CACHE_DIR = os.getenv("CLASSIFY_CACHE_DIR", str(DEFAULT_CACHE_DIR))
+CLASSIFY_CACHE_ENABLED = os.getenv("CLASSIFY_CACHE", "1") != "0"
+
+# Verhoog bij een wijziging in wat er in een entry staat
+CACHE_FORMAT_VERSION = 1
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 van een tekst (utf-8)."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def prompt_version(label: str, system_prompt: str) -> str:
+    """Promptversie = label + hash van de prompttekst.
+
+    Een aanpassing aan de prompt zonder nieuw label levert zo toch een
+    nieuwe versie (en dus nieuwe cachesleutels) op.
+    """
+    return f"{label}-{text_hash(system_prompt)[:12]}"
+
+
+class ClassificationCache:
+    """Content-addressed opslag van (geparste) LLM-classificaties."""
+
+    def __init__(self, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.cache_dir = Path(cache_dir or CLASSIFY_CACHE_DIR)
+        self.enabled = CLASSIFY_CACHE_ENABLED if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        model: str,
+        prompt_version: str,
+        contract_text: str,
+        verhaal: str,
+        temperature: Optional[float],
+    ) -> str:
+        """Sleutel voor één classificatie-aanvraag.
+
+        `contract_text` en `verhaal` moeten de teksten zijn zoals ze naar het
+        model gaan (dus na eventuele truncatie). `temperature=None` betekent
+        de API-default en is een andere sleutel dan een expliciete waarde.
+        """
+        payload = json.dumps({
+            "format": CACHE_FORMAT_VERSION,
+            "model": model,
+            "prompt_version": prompt_version,
+            "contract": text_hash(contract_text),
+            "verhaal": text_hash(verhaal),
+            "temperature": temperature,
+        }, sort_keys=True)
+        return text_hash(payload)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Opgeslagen entry ({"parsed", "raw_response", ...}) of None."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        entry = None
+        if path.exists():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, parsed: Dict[str, Any], raw_response: str, **meta) -> None:
+        """Sla een geslaagde classificatie op.
+
+        Alleen aanroepen als de response geparst kon worden: API- en
+        parsefouten worden niet gecachet, zodat een nieuwe run het opnieuw
+        probeert.
+        """
+        if not self.enabled:
+            return
+        entry = {
+            "key": key,
+            "parsed": parsed,
+            "raw_response": raw_response,
+            "created": datetime.now().isoformat(),
+            **meta,
+        }
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_default_cache: Optional[ClassificationCache] = None
+_default_lock = threading.Lock()
+
+
+def get_classification_cache() -> ClassificationCache:
+    """Gedeelde cache-instantie (configuratie uit de environment)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ClassificationCache()
+        return _default_cache
@@ -0,0 +1,205 @@
+"""Parallelle LLM-aanroepen voor batchclassificatie.
+
+Een batch werkbonnen classificeren is vooral wachten op het netwerk: elke
+`messages.create` duurt enkele seconden, terwijl er lokaal weinig te doen
+is. Deze module laat meerdere aanvragen tegelijk lopen:
+
+- Eén gedeelde Anthropic client per API key (de client is thread-safe en
+  hergebruikt de HTTP-verbindingen).
+- Een begrensde worker pool; de resultaten komen terug in de volgorde van
+  de invoer, ongeacht welke aanvraag het eerst klaar is.
+- Per aanvraag retry met exponentiële backoff bij rate limits (429),
+  overbelasting (529) en tijdelijke server-/verbindingsfouten. Een
+  `retry-after` header van de API gaat voor op de eigen backoff.
+- Voortgang via een callback die in de aanroepende thread draait, zodat
+  Streamlit elementen (st.progress) veilig bijgewerkt kunnen worden.
+- Prompt caching: vaste delen van de prompt (system prompt, contracttekst)
+  als cacheable blok meesturen (`cached_text_block`) en met `UsageStats`
+  bijhouden hoeveel input tokens uit de provider-cache kwamen.
+
+Configuratie via environment:
+    CLASSIFY_MAX_WORKERS   Max aantal gelijktijdige aanvragen (default 8)
+    CLASSIFY_MAX_RETRIES   Max aantal herhalingen per aanvraag (default 5)
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+CLASSIFY_MAX_WORKERS = int(os.getenv("CLASSIFY_MAX_WORKERS", "8"))
+CLASSIFY_MAX_RETRIES = int(os.getenv("CLASSIFY_MAX_RETRIES", "5"))
+
+# HTTP statussen die een nieuwe poging waard zijn
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRY_ERROR_TYPES = {"APIConnectionError", "APITimeoutError"}
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_anthropic_client(api_key: str):
+    """Gedeelde Anthropic client per API key.
+
+    De SDK-retries staan uit (max_retries=0): call_with_retry regelt de
+    herhalingen, zodat de backoff en het aantal pogingen op één plek staan.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            import anthropic
+            client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True bij rate limits, overbelasting en tijdelijke fouten."""
+    if type(exc).__name__ in RETRY_ERROR_TYPES:
+        return True
+    return getattr(exc, "status_code", None) in RETRY_STATUS_CODES
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(exc: Exception, attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Wachttijd voor poging `attempt` (0 = eerste herhaling)."""
+    server_delay = _retry_after(exc)
+    if server_delay is not None:
+        return min(max(server_delay, 0.0), max_delay)
+    delay = min(base_delay * (2 ** attempt), max_delay)
+    # Jitter: niet alle workers tegelijk opnieuw laten proberen
+    return delay * (0.5 + random.random() / 2)
+
+
+def call_with_retry(
+    fn: Callable[[], R],
+    max_retries: int = CLASSIFY_MAX_RETRIES,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> R:
+    """Voer fn uit; herhaal bij tijdelijke fouten, andere fouten direct doorgeven."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            sleep(retry_delay(e, attempt, base_delay, max_delay))
+            attempt += 1
+
+
+def cached_text_block(text: str) -> Dict[str, Any]:
+    """Tekstblok dat de API als prompt-prefix mag cachen.
+
+    Alles tot en met dit blok (tools, system, eerdere content) wordt bij de
+    provider gecachet; een volgende aanvraag met exact hetzelfde prefix
+    leest het uit de cache tegen een fractie van de prijs en latency.
+    Prefixen onder de minimale cachegrootte van het model worden gewoon
+    ongecachet verwerkt.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+class UsageStats:
+    """Thread-safe optelling van token usage over een batch aanvragen."""
+
+    FIELDS = ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.totals = {field: 0 for field in self.FIELDS}
+
+    def add(self, usage: Any) -> None:
+        """Tel de `usage` van een API response op (None wordt genegeerd)."""
+        if usage is None:
+            return
+        with self._lock:
+            self.requests += 1
+            for field in self.FIELDS:
+                self.totals[field] += getattr(usage, field, None) or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Totalen plus afgeleide cijfers.
+
+        `input_tokens` is bij de API alleen het ongecachete deel; het totaal
+        aantal prompt tokens is input + cache_creation + cache_read.
+        """
+        with self._lock:
+            totals = dict(self.totals)
+            requests = self.requests
+        prompt_tokens = (
+            totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+        )
+        return {
+            "requests": requests,
+            **totals,
+            "prompt_tokens": prompt_tokens,
+            "cached_ratio": totals["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0,
+        }
+
+
+def run_pool(
+    items: Sequence[T],
+    worker: Callable[[T], R],
+    max_workers: int = CLASSIFY_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int, T, R], None]] = None,
+    on_error: Optional[Callable[[T, Exception], R]] = None,
+) -> List[R]:
+    """Verwerk items met maximaal max_workers tegelijk.
+
+    Args:
+        items: Invoer (bijv. werkbonnen)
+        worker: Functie per item
+        max_workers: Maximaal aantal gelijktijdige aanroepen (1 = sequentieel)
+        on_progress: Callback (klaar, totaal, item, resultaat) na elk item,
+            aangeroepen in de thread van de aanroeper
+        on_error: Resultaat voor een item waarvan de worker een exception
+            gooit (item, exception). Zonder on_error gaat de exception door
+            naar de aanroeper; met on_error lopen de overige items gewoon door.
+
+    Returns:
+        Resultaten in de volgorde van items
+    """
+    total = len(items)
+    results: List[Optional[R]] = [None] * total
+
+    def _result(item: T, call: Callable[[], R]) -> R:
+        if on_error is None:
+            return call()
+        try:
+            return call()
+        except Exception as e:
+            return on_error(item, e)
+
+    if max_workers <= 1 or total <= 1:
+        for i, item in enumerate(items):
+            results[i] = _result(item, lambda: worker(item))
+            if on_progress:
+                on_progress(i + 1, total, item, results[i])
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, total)) as pool:
+        futures = {pool.submit(worker, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            results[i] = _result(items[i], future.result)
+            if on_progress:
+                on_progress(done, total, items[i], results[i])
+    return results
@@ -166,6 +166,11 @@ class ParquetDataService:
             ]["werkbon_key"].tolist()
         )
 
+        # Paragrafen per werkbon en een voorbewerkte hoofdwerkbon-selectie,
+        # zodat get_hoofdwerkbon_list alleen nog hoeft te filteren
+        self._paragraaf_counts = self.df_paragrafen.groupby("werkbon_key").size()
+        self.df_hoofdwerkbonnen = self._build_hoofdwerkbon_frame()
+
         # Group dataframes by keys for fast access
         self._werkbonnen_by_hoofdwerkbon = self.df_werkbonnen.groupby("hoofdwerkbon_key")
         self._paragrafen_by_werkbon = self.df_paragrafen.groupby("werkbon_key")
@@ -183,6 +188,27 @@ class ParquetDataService:
         else:
             self._opvolgingen_by_paragraaf = None
 
+    def _build_hoofdwerkbon_frame(self) -> pd.DataFrame:
+        """Hoofdwerkbonnen met afgeleide kolommen, gesorteerd op melddatum (nieuwste eerst).
+
+        Extra kolommen: debiteur_code ("005102" uit "005102 - Trivire"),
+        melddatum_str (YYYY-MM-DD of ""), werkbon_code en paragraaf_count.
+        """
+        df = self.df_werkbonnen[
+            self.df_werkbonnen["werkbon_key"] == self.df_werkbonnen["hoofdwerkbon_key"]
+        ].copy()
+
+        debiteur = df["debiteur"].fillna("").astype(str)
+        df["debiteur_code"] = debiteur.str.split(" - ", n=1).str[0].str.strip()
+        df["melddatum_str"] = df["melddatum"].fillna("").astype(str).str[:10]
+        df["werkbon_code"] = df["werkbon"].fillna("").astype(str).str.split(" - ", n=1).str[0]
+        df["paragraaf_count"] = (
+            df["werkbon_key"].map(self._paragraaf_counts).fillna(0).astype(int)
+        )
+
+        # NaN values at end; stabiel zodat een gefilterde subset dezelfde volgorde houdt
+        return df.sort_values("melddatum", ascending=False, na_position="last", kind="stable")
+
     def get_hoofdwerkbon_list(
         self,
         debiteur_codes: List[str] = None,
@@ -190,55 +216,53 @@ class ParquetDataService:
         melddatum_end: str = None,
         limit: int = 100
     ) -> List[Dict[str, Any]]:
-        """Get list of hoofdwerkbonnen for selection UI."""
-        df = self.df_werkbonnen[
-            self.df_werkbonnen["werkbon_key"] == self.df_werkbonnen["hoofdwerkbon_key"]
-        ].copy()
+        """Get list of hoofdwerkbonnen for selection UI.
+
+        Debiteur matcht op de code ("005102") of op het begin van de volledige
+        naam ("005102 - Triv...").
+        """
+        df = self.df_hoofdwerkbonnen
 
         # Filter op debiteur als opgegeven
         if debiteur_codes:
-            mask = df["debiteur"].apply(
-                lambda x: any(code in str(x) for code in debiteur_codes)
-            )
-            df = df[mask]
+            codes = [str(code).strip() for code in debiteur_codes]
+            # Prefix-match op de (weinige) unieke debiteuren, daarna isin over alle rijen
+            debiteuren = pd.Series(df["debiteur"].dropna().unique()).astype(str)
+            prefixed = debiteuren[debiteuren.str.startswith(tuple(codes))]
+            df = df[df["debiteur_code"].isin(codes) | df["debiteur"].isin(prefixed)]
 
         # Filter op melddatum als opgegeven
         if melddatum_start or melddatum_end:
-            # Convert to string, handle NaN
-            df["melddatum_str"] = df["melddatum"].fillna("").astype(str).str[:10]
+            melddatum = df["melddatum_str"]
+            mask = melddatum != ""
             if melddatum_start:
-                df = df[(df["melddatum_str"] >= str(melddatum_start)) & (df["melddatum_str"] != "")]
+                mask &= melddatum >= str(melddatum_start)
             if melddatum_end:
-                df = df[(df["melddatum_str"] <= str(melddatum_end)) & (df["melddatum_str"] != "")]
-
-        # Sorteer op melddatum (nieuwste eerst), NaN values at end
-        df = df.sort_values("melddatum", ascending=False, na_position="last")
+                mask &= melddatum <= str(melddatum_end)
+            df = df[mask]
 
-        # Limit
+        # Limit (frame is al gesorteerd op melddatum, nieuwste eerst)
         df = df.head(limit)
 
-        # Tel paragrafen per werkbon
-        paragraaf_counts = self.df_paragrafen.groupby("werkbon_key").size()
-
-        result = []
-        for _, row in df.iterrows():
-            werkbon_code = str(row["werkbon"]).split(" - ")[0] if row["werkbon"] else ""
-            result.append({
-                "hoofdwerkbon_key": int(row["werkbon_key"]),
-                "werkbon_document_key": int(row["werkbon_key"]),
-                "werkbon": row["werkbon"],
-                "werkbon_code": werkbon_code,
-                "aanmaakdatum": self._format_date(row.get("aanmaakdatum")),
-                "melddatum": self._format_date(row.get("melddatum")),
-                "status": str(row["status"]).strip() if row["status"] else "",
-                "documentstatus": str(row["documentstatus"]).strip() if row["documentstatus"] else "",
-                "admin_fase": row.get("administratieve_fase") or "",
-                "klant": row["klant"],
-                "debiteur": row["debiteur"],
-                "paragraaf_count": paragraaf_counts.get(row["werkbon_key"], 0),
-            })
-
-        return result
+        admin_fase = df["administratieve_fase"] if "administratieve_fase" in df.columns else pd.Series("", index=df.index)
+        result = pd.DataFrame({
+            "hoofdwerkbon_key": df["werkbon_key"].astype(int),
+            "werkbon_document_key": df["werkbon_key"].astype(int),
+            "werkbon": df["werkbon"],
+            "werkbon_code": df["werkbon_code"],
+            "aanmaakdatum": df["aanmaakdatum"].map(self._format_date) if "aanmaakdatum" in df.columns else None,
+            "melddatum": df["melddatum"].map(self._format_date),
+            "status": df["status"].fillna("").astype(str).str.strip(),
+            "documentstatus": df["documentstatus"].fillna("").astype(str).str.strip(),
+            "admin_fase": admin_fase.fillna(""),
+            "klant": df["klant"],
+            "debiteur": df["debiteur"],
+            "paragraaf_count": df["paragraaf_count"],
+        })
+        # NaT/NaN → None in de output (zoals _format_date)
+        result = result.astype(object).where(result.notna(), None)
+
+        return result.to_dict("records")
 
     def get_werkbon_keten(
         self,
@@ -0,0 +1,74 @@
+"""
+Test: bulk classificatie (bulk_classify.py) met de lokale batch provider
+=======================================================================
+Offline round-trip: aanvragen opbouwen uit de Parquet data, indienen bij
+LocalBatchProvider, pollen tot klaar en de resultaten terugvertalen. Geen
+API key nodig; de classificatie-cache staat uit.
+
+Draaien:
+    python -m pytest test_bulk_classify.py -q
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bulk_classify
+from src.services.batch_provider import LocalBatchProvider, wait_for_batch
+from src.services.classificatie import get_history_path, get_processed_keys_path
+from src.services.classification_cache import ClassificationCache
+
+
+@pytest.fixture(autouse=True)
+def no_classification_cache(monkeypatch):
+    monkeypatch.setattr(bulk_classify, "classification_cache", ClassificationCache(enabled=False))
+
+
+def _respond_ja(params):
+    return json.dumps({
+        "classificatie": "JA",
+        "confidence": 0.9,
+        "contract_referentie": "Art. 1",
+        "toelichting": "Ketelonderdeel vervangen",
+    })
+
+
+def test_local_batch_round_trip():
+    werkbonnen = bulk_classify.select_werkbonnen(limit=5, include_processed=True)
+    requests, pending, results = bulk_classify.build_requests(werkbonnen, 0.85, 0.85)
+    assert requests and len(requests) + len(results) == len(werkbonnen)
+    assert set(pending) == {r.custom_id for r in requests}
+
+    provider = LocalBatchProvider(respond=_respond_ja, polls_until_done=2)
+    batch_id = provider.submit(requests)
+    polls = []
+    wait_for_batch(provider, batch_id, poll_interval=0, on_poll=polls.append, sleep=lambda s: None)
+    assert len(polls) == 2 and polls[0]["processing"] == len(requests)
+
+    collected = bulk_classify.collect_results(provider, batch_id, pending, 0.85, 0.85, cache_results=False)
+    assert len(collected) == len(requests)
+    by_key = {wb["hoofdwerkbon_key"]: wb for wb in werkbonnen}
+    for result in collected:
+        assert result["classificatie"] == "JA"
+        assert result["werkbon_code"] == by_key[result["werkbon_key"]].get("werkbon_code", "")
+        assert result["contract_filename"]
+
+
+def test_local_provider_never_writes_history(monkeypatch):
+    paths = [get_history_path(), get_processed_keys_path()]
+    before = [p.stat().st_mtime if p.exists() else None for p in paths]
+
+    monkeypatch.setattr(sys, "argv", ["bulk_classify.py", "--provider", "local", "--limit", "3",
+                                      "--include-processed", "--poll-interval", "0"])
+    bulk_classify.main()
+
+    assert [p.stat().st_mtime if p.exists() else None for p in paths] == before
+
+
+if __name__ == '__main__':
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,91 @@
+"""
+Test: classificatie-cache (src/services/classification_cache.py)
+================================================================
+Controleert de sleutel (invoer van het model wel, drempelwaardes niet), de
+opslag in een tijdelijke map en het doel van de cache: een bulk-run
+opnieuw draaien met alleen andere drempels doet geen enkele API call.
+
+Draaien:
+    python -m pytest test_classification_cache.py -q
+"""
+
+import inspect
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bulk_classify
+from src.services.batch_provider import LocalBatchProvider, wait_for_batch
+from src.services.classification_cache import ClassificationCache, prompt_version
+
+BASE = dict(model="claude-x", prompt_version="v6-abc", contract_text="Art. 1 ketel",
+            verhaal="Ketel vervangen", temperature=0.0)
+
+
+def test_make_key_depends_on_model_input_only():
+    key = ClassificationCache.make_key(**BASE)
+    assert key == ClassificationCache.make_key(**BASE)
+
+    # Drempels kunnen niet eens meegegeven worden
+    assert set(inspect.signature(ClassificationCache.make_key).parameters) == set(BASE)
+
+    for field, other in [("model", "claude-y"), ("prompt_version", "v7-abc"),
+                         ("contract_text", "Art. 2"), ("verhaal", "Lekkage"),
+                         ("temperature", 0.2), ("temperature", None)]:
+        assert ClassificationCache.make_key(**{**BASE, field: other}) != key, field
+
+
+def test_prompt_version_follows_prompt_text():
+    assert prompt_version("v6", "Je bent een expert") == prompt_version("v6", "Je bent een expert")
+    assert prompt_version("v6", "Je bent een expert") != prompt_version("v6", "Je bent een expert.")
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ClassificationCache(cache_dir=str(tmp_path), enabled=True)
+    key = ClassificationCache.make_key(**BASE)
+    assert cache.get(key) is None
+
+    parsed = {"classificatie": "JA", "confidence": 0.9}
+    cache.put(key, parsed, '{"classificatie": "JA"}', werkbon_key=42)
+    entry = ClassificationCache(cache_dir=str(tmp_path), enabled=True).get(key)
+    assert entry["parsed"] == parsed and entry["werkbon_key"] == 42
+    assert entry["raw_response"] == '{"classificatie": "JA"}'
+    assert cache.stats() == {"hits": 0, "misses": 1}
+
+    disabled = ClassificationCache(cache_dir=str(tmp_path / "uit"), enabled=False)
+    disabled.put(key, parsed, "")
+    assert disabled.get(key) is None and not (tmp_path / "uit").exists()
+
+
+def _respond_ja(params):
+    return json.dumps({"classificatie": "JA", "confidence": 0.8,
+                       "contract_referentie": "Art. 1", "toelichting": "Onderdeel vervangen"})
+
+
+def test_rerun_with_other_thresholds_makes_no_api_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_classify, "classification_cache",
+                        ClassificationCache(cache_dir=str(tmp_path), enabled=True))
+    werkbonnen = bulk_classify.select_werkbonnen(limit=5, include_processed=True)
+
+    requests, pending, _ = bulk_classify.build_requests(werkbonnen, 0.85, 0.85)
+    assert requests
+    provider = LocalBatchProvider(respond=_respond_ja, polls_until_done=1)
+    batch_id = provider.submit(requests)
+    wait_for_batch(provider, batch_id, poll_interval=0, sleep=lambda s: None)
+    first = bulk_classify.collect_results(provider, batch_id, pending, 0.85, 0.85)
+    assert {r["classificatie"] for r in first} == {"TWIJFEL"}  # 0.8 < 0.85
+
+    # Zelfde werkbonnen, alleen lagere drempels: alles uit de cache
+    requests, pending, results = bulk_classify.build_requests(werkbonnen, 0.7, 0.7)
+    assert requests == [] and pending == {}
+    cached = [r for r in results if r.get("from_cache")]
+    assert len(cached) == len(first)
+    assert {r["classificatie"] for r in cached} == {"JA"}
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,121 @@
+"""
+Test: parallelle LLM-aanroepen (src/services/llm_pool.py)
+=========================================================
+Retry met backoff (retry-after van de API gaat voor) en de worker pool:
+resultaten in invoervolgorde, voortgang per item en een fout in één item
+die de rest van de batch niet meeneemt. Geen API key nodig.
+
+Draaien:
+    python -m pytest test_llm_pool.py -q
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.llm_pool import call_with_retry, retry_delay, run_pool
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class _APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = _Response(headers or {})
+
+
+def _flaky(failures):
+    """Functie die eerst de gegeven exceptions gooit en daarna 'ok' geeft."""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+
+    return fn, calls
+
+
+def test_retry_after_header_wins_over_backoff():
+    fn, calls = _flaky([_APIError(429, {"retry-after": "7"}), _APIError(529, {"retry-after": "2.5"})])
+    sleeps = []
+    assert call_with_retry(fn, max_retries=5, base_delay=100.0, sleep=sleeps.append) == "ok"
+    assert sleeps == [7.0, 2.5] and len(calls) == 3
+
+
+def test_backoff_without_retry_after():
+    fn, _ = _flaky([_APIError(503)] * 3)
+    sleeps = []
+    call_with_retry(fn, max_retries=5, base_delay=1.0, sleep=sleeps.append)
+    # Exponentieel met jitter: tussen de helft en het volle interval
+    for attempt, delay in enumerate(sleeps):
+        assert 0.5 * 2 ** attempt <= delay <= 2 ** attempt
+    assert retry_delay(_APIError(429, {"retry-after": "600"}), 0, max_delay=60.0) == 60.0
+
+
+def test_no_retry_on_client_error_or_after_max_retries():
+    fn, calls = _flaky([_APIError(400)])
+    with pytest.raises(_APIError):
+        call_with_retry(fn, sleep=lambda s: None)
+    assert len(calls) == 1
+
+    fn, calls = _flaky([_APIError(429)] * 10)
+    with pytest.raises(_APIError):
+        call_with_retry(fn, max_retries=2, sleep=lambda s: None)
+    assert len(calls) == 3
+
+
+def test_run_pool_keeps_input_order():
+    items = list(range(12))
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def worker(x):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01 * (len(items) - x))  # latere items eerder klaar
+        with lock:
+            active[0] -= 1
+        return x * 10
+
+    progress = []
+    results = run_pool(items, worker, max_workers=4,
+                       on_progress=lambda done, total, item, result: progress.append((done, total)))
+    assert results == [x * 10 for x in items]
+    assert progress == [(i, len(items)) for i in range(1, len(items) + 1)]
+    assert 1 < peak[0] <= 4
+
+
+def test_run_pool_failing_item_does_not_discard_batch():
+    def worker(x):
+        if x == 3:
+            raise ValueError("kapotte werkbon")
+        return {"werkbon_key": x}
+
+    def on_error(x, e):
+        return {"werkbon_key": x, "error": str(e)}
+
+    for workers in (1, 4):
+        results = run_pool(list(range(6)), worker, max_workers=workers, on_error=on_error)
+        assert [r["werkbon_key"] for r in results] == list(range(6))
+        assert results[3]["error"] == "kapotte werkbon"
+        assert sum("error" in r for r in results) == 1
+
+        # Zonder on_error gaat de fout door naar de aanroeper
+        with pytest.raises(ValueError):
+            run_pool(list(range(6)), worker, max_workers=workers)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, "-q"]))
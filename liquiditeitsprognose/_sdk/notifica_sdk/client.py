@@ -12,14 +12,33 @@ Gebruik:
 
 import os
 import io
+import time
+import numbers
+import warnings
+from typing import Iterator
+
 import pandas as pd
 import requests
 
+from .cache import QueryCache
+from .scheduler import RateLimitScheduler, RetryPolicy, shared_scheduler, parse_retry_after
 from .exceptions import (
     NotificaError, AuthError, PermissionError, ValidationError,
     TimeoutError, RateLimitError, ServerError,
 )
 
+# Columnar transport (optioneel, vereist pyarrow)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_TYPE = 'application/vnd.apache.parquet'
+COLUMNAR_ACCEPT = f'{ARROW_STREAM_TYPE}, {PARQUET_TYPE};q=0.9, application/json;q=0.5'
+
 # Probeer python-dotenv te laden (optioneel)
 try:
     from dotenv import load_dotenv
@@ -28,6 +47,63 @@ except ImportError:
     pass
 
 
+def _sql_literal(value) -> str:
+    """Zet een keyset-waarde om naar een SQL literal."""
+    if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _frame_from_columnar(resp: requests.Response):
+    """Bouw een DataFrame uit een Arrow IPC / Parquet response (None bij andere content-type)."""
+    content_type = resp.headers.get('content-type', '')
+    if ARROW_STREAM_TYPE in content_type:
+        table = pa.ipc.open_stream(pa.py_buffer(resp.content)).read_all()
+    elif PARQUET_TYPE in content_type:
+        table = pq.read_table(pa.BufferReader(pa.py_buffer(resp.content)))
+    else:
+        return None
+    # split_blocks + self_destruct: numerieke kolommen zonder nulls worden zonder kopie overgenomen
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _frame_from_json(result: dict, convert_numeric: bool) -> pd.DataFrame:
+    """Bouw een DataFrame uit een JSON rows/columns response."""
+    df = pd.DataFrame(result.get('rows', []), columns=result.get('columns', []))
+    if convert_numeric:
+        # API geeft numerieke waarden als strings terug — converteer waar mogelijk
+        for col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='ignore')
+    return df
+
+
+def _raise_for_error(resp):
+    """Vertaal een fout-response naar de bijbehorende NotificaError.
+
+    Werkt voor requests- en httpx-responses (status_code, json(), text).
+    """
+    try:
+        error_data = resp.json()
+        error_msg = error_data.get('error', resp.text)
+    except Exception:
+        error_msg = resp.text
+
+    if resp.status_code == 401:
+        raise AuthError(f"Ongeldige API key. Controleer NOTIFICA_APP_KEY.", status_code=401, detail=error_msg)
+    elif resp.status_code == 403:
+        raise PermissionError(f"Geen toegang: {error_msg}", status_code=403, detail=error_msg)
+    elif resp.status_code == 400:
+        raise ValidationError(f"Ongeldige request: {error_msg}", status_code=400, detail=error_msg)
+    elif resp.status_code == 408:
+        raise TimeoutError(f"Query timeout: {error_msg}", status_code=408, detail=error_msg)
+    elif resp.status_code == 429:
+        raise RateLimitError("Te veel requests. Max 60 per minuut.", status_code=429, detail=error_msg)
+    else:
+        raise ServerError(f"API fout ({resp.status_code}): {error_msg}", status_code=resp.status_code, detail=error_msg)
+
+
 class NotificaClient:
     """Client voor de Notifica Data API.
 
@@ -35,9 +111,30 @@ class NotificaClient:
         NOTIFICA_API_URL  - Base URL (default: https://app.notifica.nl)
         NOTIFICA_APP_KEY  - API key uit App Beheer
         NOTIFICA_DATA_KEY - DWH data key (optioneel, heeft voorrang op App Key)
+        NOTIFICA_CACHE_DIR - Map voor de persistente query cache (optioneel)
+        NOTIFICA_TRANSPORT - 'json' (default) of 'arrow'
+        NOTIFICA_TIMEOUT  - Request timeout in seconden (default 120)
+        NOTIFICA_MAX_RETRIES - Aantal retries bij 429/408/5xx (default 3)
+
+    Args:
+        cache: Optionele QueryCache. Zonder cache= wordt NOTIFICA_CACHE_DIR
+               gebruikt als die gezet is; cache=False schakelt de cache uit.
+        transport: 'arrow' vraagt query-resultaten op als Arrow IPC stream of
+               Parquet met getypeerde kolommen (geen string->numeriek conversie).
+               Levert de server toch JSON, dan valt de client terug op het
+               JSON pad. Zonder pyarrow wordt altijd JSON gebruikt.
+        timeout: Request timeout in seconden.
+        max_retries: Retries met jittered exponential backoff bij 429/408/5xx
+               en verbindingsfouten (writes alleen bij 429).
+        scheduler: RateLimitScheduler voor client-side pacing. Default is een
+               proces-brede limiter per API key (max 60 requests per minuut),
+               gedeeld door alle threads en clients met dezelfde key.
     """
 
-    def __init__(self, api_url: str = None, app_key: str = None, data_key: str = None):
+    def __init__(self, api_url: str = None, app_key: str = None, data_key: str = None,
+                 cache: QueryCache = None, transport: str = None,
+                 timeout: float = None, max_retries: int = None,
+                 scheduler: RateLimitScheduler = None):
         self.api_url = (api_url or os.getenv('NOTIFICA_API_URL', 'https://app.notifica.nl')).rstrip('/')
         self.app_key = app_key or os.getenv('NOTIFICA_APP_KEY', '')
         self.data_key = data_key or os.getenv('NOTIFICA_DATA_KEY', '')
@@ -51,47 +148,94 @@ class NotificaClient:
         elif self.app_key:
             headers['X-App-Key'] = self.app_key
         self._session.headers.update(headers)
-
-    def _request(self, method: str, path: str, **kwargs) -> dict:
-        """Voer een HTTP request uit en vertaal fouten naar duidelijke exceptions."""
+        if cache is None:
+            cache = QueryCache.from_env()
+        self.cache = cache or None
+        transport = (transport or os.getenv('NOTIFICA_TRANSPORT', 'json')).lower()
+        if transport not in ('json', 'arrow'):
+            raise ValueError(f"Onbekend transport '{transport}' (kies 'json' of 'arrow')")
+        self.transport = transport if PYARROW_AVAILABLE else 'json'
+        self.timeout = timeout if timeout is not None else float(os.getenv('NOTIFICA_TIMEOUT', '120'))
+        if max_retries is None:
+            max_retries = int(os.getenv('NOTIFICA_MAX_RETRIES', '3'))
+        self.retry = RetryPolicy(max_retries=max_retries)
+        self.scheduler = scheduler or shared_scheduler(self.api_url, self.data_key or self.app_key)
+
+    def _send(self, method: str, path: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        """Verstuur een request via de scheduler, met retry/backoff.
+
+        Retourneert de laatste response (ook bij een fout-status); verbindingsfouten
+        die na alle retries blijven worden vertaald naar ServerError/TimeoutError.
+        """
         url = f"{self.api_url}{path}"
-        try:
-            resp = self._session.request(method, url, timeout=120, **kwargs)
-        except requests.ConnectionError:
-            raise ServerError(f"Kan niet verbinden met {self.api_url}. Is de API bereikbaar?")
-        except requests.Timeout:
-            raise TimeoutError("Request timeout bij verbinden met de API.")
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            try:
+                resp = self._session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError:
+                if self.retry.should_retry(attempt, None, idempotent):
+                    time.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raise ServerError(f"Kan niet verbinden met {self.api_url}. Is de API bereikbaar?")
+            except requests.Timeout:
+                if self.retry.should_retry(attempt, None, idempotent):
+                    time.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raise TimeoutError("Request timeout bij verbinden met de API.")
+
+            if resp.status_code == 200 or not self.retry.should_retry(attempt, resp.status_code, idempotent):
+                return resp
+
+            retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+            wait = self.retry.delay(attempt, retry_after)
+            if resp.status_code == 429:
+                # Hele budget pauzeren, niet alleen deze thread
+                self.scheduler.pause(wait)
+            time.sleep(wait)
+            attempt += 1
+
+    def _request(self, method: str, path: str, raw: bool = False, idempotent: bool = True, **kwargs):
+        """Voer een HTTP request uit en vertaal fouten naar duidelijke exceptions.
+
+        Met raw=True wordt bij succes het Response object zelf geretourneerd.
+        idempotent=False (writes) beperkt retries tot 429.
+        """
+        resp = self._send(method, path, idempotent=idempotent, **kwargs)
 
         if resp.status_code == 200:
+            if raw:
+                return resp
             content_type = resp.headers.get('content-type', '')
             if 'application/json' in content_type:
                 return resp.json()
             return {'raw': resp.text}
 
         # Fout responses vertalen
-        try:
-            error_data = resp.json()
-            error_msg = error_data.get('error', resp.text)
-        except Exception:
-            error_msg = resp.text
-
-        if resp.status_code == 401:
-            raise AuthError(f"Ongeldige API key. Controleer NOTIFICA_APP_KEY.", status_code=401, detail=error_msg)
-        elif resp.status_code == 403:
-            raise PermissionError(f"Geen toegang: {error_msg}", status_code=403, detail=error_msg)
-        elif resp.status_code == 400:
-            raise ValidationError(f"Ongeldige request: {error_msg}", status_code=400, detail=error_msg)
-        elif resp.status_code == 408:
-            raise TimeoutError(f"Query timeout: {error_msg}", status_code=408, detail=error_msg)
-        elif resp.status_code == 429:
-            raise RateLimitError("Te veel requests. Max 60 per minuut.", status_code=429, detail=error_msg)
-        else:
-            raise ServerError(f"API fout ({resp.status_code}): {error_msg}", status_code=resp.status_code, detail=error_msg)
+        _raise_for_error(resp)
 
     def _raw_request(self, method: str, path: str, **kwargs) -> requests.Response:
         """Voer een HTTP request uit en retourneer het raw Response object."""
-        url = f"{self.api_url}{path}"
-        return self._session.request(method, url, timeout=120, **kwargs)
+        return self._send(method, path, **kwargs)
+
+    def _fetch_frame(self, path: str, body: dict, convert_numeric: bool) -> pd.DataFrame:
+        """POST een query en bouw een DataFrame.
+
+        In arrow-transport wordt een columnar response (Arrow IPC / Parquet)
+        direct omgezet; anders via JSON rows/columns.
+        """
+        if self.transport == 'arrow':
+            resp = self._request('POST', path, raw=True, json=body, headers={'Accept': COLUMNAR_ACCEPT})
+            df = _frame_from_columnar(resp)
+            if df is not None:
+                return df
+            # Server ondersteunt geen columnar response — JSON fallback
+            result = resp.json() if 'application/json' in resp.headers.get('content-type', '') else {}
+        else:
+            result = self._request('POST', path, json=body)
+        return _frame_from_json(result, convert_numeric)
 
     # ===== INFO =====
 
@@ -105,43 +249,125 @@ class NotificaClient:
 
     # ===== QUERIES =====
 
-    def query(self, klantnummer: int, sql: str, max_rows: int = None) -> pd.DataFrame:
+    def query(self, klantnummer: int, sql: str, max_rows: int = None, use_cache: bool = True) -> pd.DataFrame:
         """Voer een vrije SQL query uit (vereist dev_mode).
 
         Args:
             klantnummer: Klantnummer (bijv. 1210)
             sql: SELECT query
             max_rows: Max aantal rijen (optioneel, default uit app config)
+            use_cache: Gebruik de query cache (als geconfigureerd)
 
         Returns:
             pandas DataFrame met resultaten
         """
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = QueryCache.key_for_sql(klantnummer, sql, max_rows, self.transport)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         body = {'klantnummer': klantnummer, 'sql': sql}
         if max_rows:
             body['max_rows'] = max_rows
-        result = self._request('POST', '/api/data/query', json=body)
-        df = pd.DataFrame(result.get('rows', []), columns=result.get('columns', []))
-        # API geeft numerieke waarden als strings terug — converteer waar mogelijk
-        for col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='ignore')
+        df = self._fetch_frame('/api/data/query', body, convert_numeric=True)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, df, klantnummer=int(klantnummer), sql=sql[:500])
         return df
 
-    def query_template(self, klantnummer: int, template_name: str, parameters: dict = None) -> pd.DataFrame:
+    def query_template(self, klantnummer: int, template_name: str, parameters: dict = None,
+                       use_cache: bool = True) -> pd.DataFrame:
         """Voer een template-query uit.
 
         Args:
             klantnummer: Klantnummer (bijv. 1210)
             template_name: Naam van de geregistreerde template
             parameters: Dict met template parameters
+            use_cache: Gebruik de query cache (als geconfigureerd)
 
         Returns:
             pandas DataFrame met resultaten
         """
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = QueryCache.key_for_template(klantnummer, template_name, parameters, self.transport)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         body = {'klantnummer': klantnummer}
         if parameters:
             body['parameters'] = parameters
-        result = self._request('POST', f'/api/data/query/{template_name}', json=body)
-        return pd.DataFrame(result.get('rows', []), columns=result.get('columns', []))
+        df = self._fetch_frame(f'/api/data/query/{template_name}', body, convert_numeric=False)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, df, klantnummer=int(klantnummer), template=template_name)
+        return df
+
+    def query_iter(self, klantnummer: int, sql: str, page_size: int = 10000,
+                   key_column: str = None, order_by: str = None,
+                   use_cache: bool = True) -> Iterator[pd.DataFrame]:
+        """Voer een query gepagineerd uit en lever het resultaat in DataFrame chunks.
+
+        Zo kan een groot resultaat als stroom verwerkt worden met begrensd
+        geheugen, in plaats van alles in één keer (met max_rows cap) te laden.
+
+        Paginering:
+            key_column gezet: keyset paginering op die kolom (aanbevolen).
+                Elke pagina is WHERE key > laatste_key ORDER BY key, dus stabiel
+                en even snel voor de laatste als voor de eerste pagina.
+                De kolom moet uniek zijn in het resultaat.
+            anders: LIMIT/OFFSET paginering. Geef order_by mee (bijv.
+                '"WerkbonDocumentKey"') voor een deterministische volgorde.
+
+        Args:
+            klantnummer: Klantnummer (bijv. 1210)
+            sql: SELECT query (zonder LIMIT; wordt als subquery gebruikt)
+            page_size: Rijen per pagina. Kapt de server (max_rows in App Beheer)
+                pagina's op minder rijen af, dan gaat de paginering door met
+                die kleinere pagina's en volgt een RuntimeWarning.
+            key_column: Kolom voor keyset paginering
+            order_by: ORDER BY expressie voor offset paginering
+            use_cache: Gebruik de query cache per pagina (als geconfigureerd)
+
+        Yields:
+            pandas DataFrame per pagina (lege resultaten leveren niets op)
+        """
+        base = sql.strip().rstrip(';')
+        last_key = None
+        offset = 0
+        short_page = None  # lengte van een onvolledige pagina: laatste pagina of server-cap
+        while True:
+            if key_column:
+                col = f'_page."{key_column}"'
+                where = f' WHERE {col} > {_sql_literal(last_key)}' if last_key is not None else ''
+                page_sql = f'SELECT * FROM ({base}) AS _page{where} ORDER BY {col} LIMIT {int(page_size)}'
+            else:
+                order = f' ORDER BY {order_by}' if order_by else ''
+                page_sql = f'SELECT * FROM ({base}) AS _page{order} LIMIT {int(page_size)} OFFSET {offset}'
+
+            df = self.query(klantnummer, page_sql, max_rows=page_size, use_cache=use_cache)
+            if df.empty:
+                return
+            if short_page is not None:
+                # Na een onvolledige pagina nog rijen: de server kapt af op short_page
+                warnings.warn(
+                    f"Server levert max {short_page} rijen per pagina (page_size={page_size}, "
+                    f"zie max_rows in App Beheer); paginering gaat verder met {short_page}.",
+                    RuntimeWarning, stacklevel=2,
+                )
+                page_size = short_page
+                short_page = None
+            yield df
+            # Een onvolledige pagina is pas de laatste als de volgende leeg is
+            if len(df) < page_size:
+                short_page = len(df)
+            if key_column:
+                last_key = df[key_column].iloc[-1]
+            else:
+                offset += len(df)
 
     # ===== SCHEMA =====
 
@@ -168,7 +394,7 @@ class NotificaClient:
         Returns:
             dict met resultaat
         """
-        return self._request('POST', '/api/data/write', json={
+        return self._request('POST', '/api/data/write', idempotent=False, json={
             'klantnummer': klantnummer,
             'sql': sql,
         })
@@ -187,7 +413,7 @@ class NotificaClient:
         body = {'klantnummer': klantnummer}
         if parameters:
             body['parameters'] = parameters
-        return self._request('POST', f'/api/data/write/{template_name}', json=body)
+        return self._request('POST', f'/api/data/write/{template_name}', idempotent=False, json=body)
 
     # ===== CSV =====
 
@@ -276,4 +502,4 @@ class NotificaClient:
             body['parameters'] = parameters
         if description:
             body['description'] = description
-        return self._request('POST', '/api/data/templates/register', json=body)
+        return self._request('POST', '/api/data/templates/register', idempotent=False, json=body)
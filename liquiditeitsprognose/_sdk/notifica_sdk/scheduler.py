@@ -0,0 +1,160 @@
+"""
+Notifica SDK — Request Scheduler
+================================
+Client-side pacing en retries voor de Notifica Data API.
+
+- RateLimitScheduler: sliding window die requests doseert op de
+  gedocumenteerde limiet (max 60 in elk venster van 60 seconden). Eén
+  scheduler per API key, gedeeld door alle threads en NotificaClient
+  instanties in het proces.
+- RetryPolicy: automatische retry met exponentiële backoff + jitter voor
+  429/408/5xx en verbindingsfouten.
+
+Gebruik:
+    client = NotificaClient()                        # gedeelde limiter, 3 retries
+    client = NotificaClient(max_retries=0)           # geen retries
+    client = NotificaClient(scheduler=RateLimitScheduler(30))  # eigen budget
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+
+# Gedocumenteerde API limiet
+DEFAULT_MAX_REQUESTS = 60
+DEFAULT_PERIOD = 60.0
+
+
+class RateLimitScheduler:
+    """Thread-safe sliding-window limiter.
+
+    Houdt de tijdstippen van de requests in het laatste `period` seconden
+    bij en laat een request pas door als er in dat venster minder dan
+    max_requests zijn geweest. Een volledige dashboard-load (±20 requests)
+    gaat dus zonder wachten; pas de 61e request binnen een minuut wacht tot
+    de oudste uit het venster valt.
+    """
+
+    def __init__(self, max_requests: int = DEFAULT_MAX_REQUESTS, period: float = DEFAULT_PERIOD):
+        self.max_requests = max(1, max_requests)
+        self.period = period
+        self._calls = deque()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        # Tellers
+        self.requests = 0
+        self.wait_total = 0.0
+
+    def _evict(self, now: float):
+        while self._calls and now - self._calls[0] >= self.period:
+            self._calls.popleft()
+
+    def _try_acquire(self) -> float:
+        """Registreer een request als dat kan (0.0), anders de wachttijd in seconden."""
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+            if now >= self._paused_until and len(self._calls) < self.max_requests:
+                self._calls.append(now)
+                self.requests += 1
+                return 0.0
+            wait = self._paused_until - now
+            if len(self._calls) >= self.max_requests:
+                wait = max(wait, self.period - (now - self._calls[0]))
+            return max(wait, 0.005)
+
+    def acquire(self):
+        """Blokkeer tot er ruimte is in het venster en registreer de request."""
+        start = time.monotonic()
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                break
+            time.sleep(wait)
+        with self._lock:
+            self.wait_total += time.monotonic() - start
+
+    async def acquire_async(self):
+        """Async variant van acquire(): wacht zonder de event loop te blokkeren."""
+        start = time.monotonic()
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                break
+            await asyncio.sleep(wait)
+        with self._lock:
+            self.wait_total += time.monotonic() - start
+
+    def pause(self, seconds: float):
+        """Stop alle requests op deze scheduler (bijv. na een 429 met Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict(time.monotonic())
+            return {
+                'requests': self.requests,
+                'wait_total_s': self.wait_total,
+                'in_window': len(self._calls),
+            }
+
+
+_SHARED: Dict[Tuple[str, str], RateLimitScheduler] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_scheduler(api_url: str, credential: str, max_requests: int = DEFAULT_MAX_REQUESTS) -> RateLimitScheduler:
+    """Proces-brede scheduler per (api_url, API key): de limiet geldt per key."""
+    key = (api_url, credential)
+    with _SHARED_LOCK:
+        scheduler = _SHARED.get(key)
+        if scheduler is None:
+            scheduler = RateLimitScheduler(max_requests=max_requests)
+            _SHARED[key] = scheduler
+        return scheduler
+
+
+@dataclass
+class RetryPolicy:
+    """Retry met 'full jitter' exponentiële backoff.
+
+    Wachttijd voor poging n: willekeurig tussen 0 en min(backoff_max, backoff_base * 2**n),
+    of de Retry-After header van de server als die gezet is.
+    """
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+    retry_statuses: Tuple[int, ...] = (408, 429, 500, 502, 503, 504)
+
+    def should_retry(self, attempt: int, status_code: Optional[int], idempotent: bool = True) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if status_code is None:
+            # Verbindingsfout/timeout — request is mogelijk uitgevoerd
+            return idempotent
+        if status_code == 429:
+            # Niet uitgevoerd door de server, altijd veilig
+            return True
+        return idempotent and status_code in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (seconden) naar float; HTTP-datums worden genegeerd."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
@@ -17,6 +17,8 @@ from typing import Optional, List, Dict, Any, Tuple
 # Local imports
 from config import AppConfig, COLORS, LIQUIDITY_THRESHOLDS
 from src.database import get_database, MockDatabase, NotificaDataSource, FailedConnectionDatabase
+from src.fetch_planner import fetch_dashboard_data
+from src.admin_snapshot import CONSOLIDATED, fetch_dashboard_data_per_administratie
 from src.calculations import (
     calculate_liquidity_metrics,
     create_weekly_cashflow_forecast,
@@ -48,7 +50,7 @@ from src.calculations import (
 )
 from src.daily_forecast import create_daily_forecast
 from src.forecast_model import create_forecast_for_app, run_walk_forward_backtest as run_backtest_new
-from src.forecast_v7 import create_forecast_v7
+from src.forecast_cache import cached_forecast_v7
 from src.profile_ui import render_profile_selector, render_profile_info_card
 from src.customer_insights import generate_customer_insights, generate_insights_markdown
 
@@ -56,6 +58,7 @@ from src.customer_insights import generate_customer_insights, generate_insights_
 import os
 CUSTOMER_CODE = os.getenv("KLANTNUMMER", "1229")
 CUSTOMER_NAME = "Zenith"  # Demo klant
+FORECAST_DEBUG = os.getenv("FORECAST_DEBUG", "") == "1"  # Toon timing per forecast-stap
 
 # Page configuration
 st.set_page_config(
@@ -360,6 +363,11 @@ def _fetch_data_cached(use_mock: bool, customer_code: str, standdatum_str: str,
     """
     Cached data fetching - wordt alleen opnieuw uitgevoerd bij wijziging van parameters.
     Scenario slider wijzigingen triggeren GEEN nieuwe database query.
+
+    Onafhankelijke queries lopen parallel via de fetch planner (max
+    FETCH_MAX_WORKERS tegelijk; de SDK bewaakt de API-limiet van 60 per minuut).
+    Alleen als de administratie nog niet bekend is, gaan de debiteuren
+    (voor auto-detectie) in een eerste ronde voor.
     """
     standdatum = datetime.strptime(standdatum_str, "%Y-%m-%d").date() if standdatum_str else datetime.now().date()
 
@@ -373,156 +381,37 @@ def _fetch_data_cached(use_mock: bool, customer_code: str, standdatum_str: str,
     if isinstance(db, FailedConnectionDatabase):
         return {"error": db.error_msg, "detected_admin": None}
 
-    # Bereken periodes
-    hist_startdatum = date(standdatum.year - 1, standdatum.month, 1)
-    dso_startdatum = date(standdatum.year - 2, standdatum.month, 1)
-
-    # Haal eerst debiteuren op om administratie te detecteren
-    debiteuren = db.get_openstaande_debiteuren(standdatum=standdatum, administratie=administratie)
-
-    # Auto-detect administratie
-    detected_admin = administratie
-    if not administratie and not debiteuren.empty and "administratie" in debiteuren.columns:
-        unique_admins = debiteuren["administratie"].dropna().unique()
-        if len(unique_admins) > 0:
-            admin_counts = debiteuren["administratie"].value_counts()
-            detected_admin = admin_counts.index[0] if len(admin_counts) > 0 else unique_admins[0]
-
-    data = {
-        "banksaldo": db.get_banksaldo(standdatum=standdatum, administratie=detected_admin),
-        "debiteuren": debiteuren,
-        "crediteuren": db.get_openstaande_crediteuren(standdatum=standdatum),
-        "salarissen": db.get_geplande_salarissen(),
-        "historisch": db.get_historisch_betalingsgedrag(),
-        "detected_admin": detected_admin,
-        "calibrated_dso": None,
-        "calibrated_dpo": None,
-        "betaalgedrag_debiteuren": pd.DataFrame(),
-        "betaalgedrag_crediteuren": pd.DataFrame(),
-        "terugkerende_kosten": pd.DataFrame(),
-        "historische_cashflow": pd.DataFrame(),
-        "_db": db,  # Database referentie voor profiel opslag
-    }
+    return fetch_dashboard_data(db, standdatum, administratie)
 
-    is_mock_db = type(db).__name__ == "MockDatabase"
-
-    if is_mock_db:
-        data["terugkerende_kosten"] = db.get_terugkerende_kosten()
-        data["historische_cashflow"] = db.get_historische_cashflow_per_week()
-        if hasattr(db, 'get_betaalgedrag_per_debiteur'):
-            data["betaalgedrag_debiteuren"] = db.get_betaalgedrag_per_debiteur()
-            data["betaalgedrag_crediteuren"] = db.get_betaalgedrag_per_crediteur()
-        if hasattr(db, 'get_service_orders_prognose'):
-            data["service_orders_prognose"] = db.get_service_orders_prognose()
-        # Nieuwe V7 databronnen (mock)
-        data["orderregels_periodiek"] = db.get_orderregels_periodiek()
-        data["orderregels_eenmalig"] = db.get_orderregels_eenmalig()
-        data["abonnementen"] = db.get_abonnementen()
-        data["service_contract_intake"] = db.get_service_contract_intake()
-        data["btw_prognose"] = db.get_btw_prognose()
-    elif detected_admin:
-        # Echte database met administratie
-        if hasattr(db, 'get_historische_cashflow_per_week'):
-            data["historische_cashflow"] = db.get_historische_cashflow_per_week(
-                startdatum=hist_startdatum,
-                einddatum=standdatum,
-                administratie=detected_admin
-            )
 
-        # Betaalgedrag data
-        if hasattr(db, 'get_betaalgedrag_per_debiteur'):
-            data["betaalgedrag_debiteuren"] = db.get_betaalgedrag_per_debiteur(
-                startdatum=dso_startdatum, einddatum=standdatum, administratie=detected_admin
-            )
-            data["betaalgedrag_crediteuren"] = db.get_betaalgedrag_per_crediteur(
-                startdatum=dso_startdatum, einddatum=standdatum, administratie=detected_admin
-            )
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_per_administratie_cached(use_mock: bool, customer_code: str, standdatum_str: str):
+    """
+    Cached data per administratie, voor het administratie-filter.
 
-        # DSO/DPO calibratie
-        if hasattr(db, 'get_calibrated_dso_dpo'):
-            try:
-                dso_dpo = db.get_calibrated_dso_dpo(detected_admin)
-                data["calibrated_dso"] = dso_dpo.get('dso')
-                data["calibrated_dpo"] = dso_dpo.get('dpo')
-            except Exception:
-                pass
-
-        # V7 data sources
-        try:
-            data["btw_aangifteregels"] = db.get_btw_aangifteregels(
-                startdatum=dso_startdatum, einddatum=standdatum)
-        except Exception:
-            data["btw_aangifteregels"] = pd.DataFrame()
-
-        try:
-            data["salarishistorie"] = db.get_salarishistorie(
-                startdatum=dso_startdatum, einddatum=standdatum)
-        except Exception:
-            data["salarishistorie"] = pd.DataFrame()
-
-        try:
-            data["budgetten"] = db.get_budgetten(
-                boekjaar=standdatum.year, administratie=detected_admin)
-        except Exception:
-            data["budgetten"] = pd.DataFrame()
-
-        try:
-            data["orderportefeuille"] = db.get_orderportefeuille(
-                administratie=detected_admin)
-        except Exception:
-            data["orderportefeuille"] = pd.DataFrame()
-
-        # NIEUW V7: Service Orders Prognose (verwachte toekomstige facturatie)
-        try:
-            data["service_orders_prognose"] = db.get_service_orders_prognose(
-                administratie=detected_admin)
-        except Exception:
-            data["service_orders_prognose"] = pd.DataFrame()
-
-        # NIEUW V7: Terugkerende kosten (voor echte DB, was alleen mock)
-        try:
-            data["terugkerende_kosten"] = db.get_terugkerende_kosten(
-                startdatum=hist_startdatum, einddatum=standdatum,
-                administratie=detected_admin)
-        except Exception:
-            data["terugkerende_kosten"] = pd.DataFrame()
-
-        # NIEUW V7: Periodieke + Eenmalige Orderregels (projectfacturatie-timing)
-        try:
-            data["orderregels_periodiek"] = db.get_orderregels_periodiek(
-                administratie=detected_admin)
-        except Exception:
-            data["orderregels_periodiek"] = pd.DataFrame()
-
-        try:
-            data["orderregels_eenmalig"] = db.get_orderregels_eenmalig(
-                administratie=detected_admin)
-        except Exception:
-            data["orderregels_eenmalig"] = pd.DataFrame()
-
-        # NIEUW V7: Abonnementen + Servicecontracten (recurring revenue)
-        try:
-            data["abonnementen"] = db.get_abonnementen(
-                administratie=detected_admin)
-        except Exception:
-            data["abonnementen"] = pd.DataFrame()
-
-        try:
-            data["service_contract_intake"] = db.get_service_contract_intake(
-                administratie=detected_admin)
-        except Exception:
-            data["service_contract_intake"] = pd.DataFrame()
-
-        # NIEUW V7: BTW Prognose uit SSM
-        try:
-            data["btw_prognose"] = db.get_btw_prognose(
-                administratie=detected_admin)
-        except Exception:
-            data["btw_prognose"] = pd.DataFrame()
-
-        data["geplande_salarissen"] = pd.DataFrame()
+    Via de administratie-snapshot draait elke dataset één keer voor alle
+    administraties; wisselen van administratie kost daarna geen query meer.
+    """
+    standdatum = datetime.strptime(standdatum_str, "%Y-%m-%d").date() if standdatum_str else datetime.now().date()
+    db = get_database(use_mock=use_mock, customer_code=customer_code if customer_code else None)
 
-    return data
+    if isinstance(db, FailedConnectionDatabase):
+        return {}
+
+    return fetch_dashboard_data_per_administratie(db, standdatum, consolidated=False)
+
+
+def load_administratie_data(use_mock: bool, customer_code: Optional[str], standdatum: date, administratie: str):
+    """
+    Data van één administratie (forecast-datasets inbegrepen), of None als
+    de administratie niet in de snapshot zit.
+    """
+    per_adm = _fetch_per_administratie_cached(
+        use_mock=use_mock,
+        customer_code=customer_code or "",
+        standdatum_str=standdatum.strftime("%Y-%m-%d"),
+    )
+    return per_adm.get(administratie)
 
 
 def load_data(use_mock: bool = True, customer_code: Optional[str] = None, standdatum: date = None, administratie: str = None):
@@ -1135,6 +1024,21 @@ def render_scenario_sidebar():
     return (forecast_weeks, history_weeks)
 
 
+def render_stage_timings(metadata: dict):
+    """Debugpaneel: doorlooptijd en rijen per stap van create_forecast_v7."""
+    timings = (metadata or {}).get('stage_timings')
+    if not timings:
+        return
+    with st.sidebar.expander("⏱️ Forecast timing", expanded=False):
+        label = f"Totaal: **{timings.get('total_s', 0):.3f}s**"
+        if timings.get('from_cache'):
+            label += " (uit cache, timing van de oorspronkelijke run)"
+        st.markdown(label)
+        stages = pd.DataFrame(timings.get('stages', []))
+        if not stages.empty:
+            st.dataframe(stages, hide_index=True, use_container_width=True)
+
+
 def render_scenario_controls():
     """
     Render scenario analyse controls in main content area.
@@ -2158,6 +2062,15 @@ def main():
     # Prognose instellingen (horizon)
     (forecast_weeks, history_weeks) = render_scenario_sidebar()
 
+    # Specifieke administratie: alle datasets (ook historie en vaste lasten)
+    # van die administratie, niet alleen gefilterde debiteuren/crediteuren
+    selected_filter_admin = filters.get("administratie")
+    if selected_filter_admin and selected_filter_admin != CONSOLIDATED:
+        with st.spinner(f"Data laden voor administratie {selected_filter_admin}..."):
+            admin_data = load_administratie_data(use_mock, customer_code, standdatum, selected_filter_admin)
+        if admin_data is not None:
+            data = admin_data
+
     # Apply filters to data
     has_active_filters = any([
         filters.get("bankrekeningen"),
@@ -2194,7 +2107,9 @@ def main():
     calibrated_dso = filtered_data.get("calibrated_dso")
     calibrated_dpo = filtered_data.get("calibrated_dpo")
 
-    forecast, forecast_start_idx, forecast_metadata = create_forecast_v7(
+    # Gecached op inhoud van de data + parameters: een rerun door alleen
+    # UI-widgets (tabs, grafieken) rekent de pilaren niet opnieuw door.
+    forecast, forecast_start_idx, forecast_metadata = cached_forecast_v7(
         data=filtered_data,
         weeks_forecast=forecast_weeks,
         weeks_history=history_weeks,
@@ -2241,6 +2156,9 @@ def main():
         if pp.get('total_value', 0) > 0:
             st.sidebar.caption(f"Pijplijn: EUR {pp['total_value']:,.0f} ({pp.get('coverage_weeks', 0)} weken)")
 
+        if FORECAST_DEBUG:
+            render_stage_timings(forecast_metadata)
+
     # === KLANTPROFIEL (optioneel voor insights) ===
     customer_profile = None
 
@@ -0,0 +1,316 @@
+"""
+Liquiditeitsprognose - Administratie Snapshot
+=============================================
+Laadt de datasets van het dashboard één keer voor alle administraties van
+een klant en splitst ze in-memory per administratie.
+
+Zonder snapshot kost een forecast per administratie (en een geconsolideerde
+view) telkens het volledige fetch-plan: ±20 queries die elk via een JOIN op
+de administratietabel filteren, dus N x 20 queries voor N administraties.
+Met de snapshot draait elke dataset één keer voor alle administraties,
+gegroepeerd op AdministratieKey (kolom `administratie`), en kost elke
+administratie daarna geen query meer.
+
+De snapshot gedraagt zich als data source (zelfde get_* methoden en
+kolommen als NotificaDataSource), zodat fetch_dashboard_data ongewijzigd
+per administratie draait:
+- Banksaldo, weekcashflow, open debiteuren en betaalgedrag komen uit de
+  ruwe data op dag/regel-niveau, met dezelfde in-memory aggregaties als
+  BacktestSnapshot. Dat is ook exact voor de geconsolideerde view, waar
+  gemiddelden en medianen niet uit de per-administratie-uitkomsten volgen.
+- Terugkerende kosten, DSO/DPO en de lijst-datasets (budgetten, orders,
+  abonnementen, BTW-prognose) komen uit één query met een kolom
+  administratie en worden daarop gefilterd (geconsolideerd: opgeteld).
+- Administratie-onafhankelijke datasets (BTW-aangifte, salarishistorie,
+  servicecontracten) worden één keer opgehaald en gedeeld.
+- Vraagt iemand een ander venster dan het geladen venster, dan gaat de
+  aanroep ongewijzigd (en gememoized) naar de onderliggende database.
+
+Gebruik:
+    per_adm = fetch_dashboard_data_per_administratie(db, standdatum)
+    per_adm["Zenith BV"]["debiteuren"]
+    per_adm[CONSOLIDATED]["historische_cashflow"]
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.backtest_snapshot import (
+    _admin_rows,
+    _banksaldo,
+    _betaalgedrag_crediteuren,
+    _betaalgedrag_debiteuren,
+    _memo_key,
+    _open_debiteuren,
+    _prepare,
+    _weekly_cashflow,
+)
+from src.fetch_planner import FETCH_MAX_WORKERS, FetchTask, fetch_dashboard_data, run_fetch_plan
+
+
+# Sleutel (en administratie-argument) voor de geconsolideerde view
+CONSOLIDATED = "Alle"
+
+# Bulk-methoden die de data source moet hebben (zie NotificaDataSource)
+BULK_METHODS = (
+    'get_bankmutaties_per_dag',
+    'get_verkoopfactuur_termijnen_per_dag',
+    'get_betalingen_inkoopregels',
+    'get_terugkerende_kosten_per_administratie',
+    'get_calibrated_dso_dpo_per_administratie',
+)
+
+# Eén query zonder administratie-filter, gesplitst op kolom administratie
+SPLIT_METHODS = (
+    'get_orderportefeuille',
+    'get_service_orders_prognose',
+    'get_orderregels_periodiek',
+    'get_orderregels_eenmalig',
+    'get_abonnementen',
+    'get_btw_prognose',
+)
+
+# SQL filtert niet op administratie: één keer ophalen, argument negeren
+ADMIN_INDEPENDENT_METHODS = (
+    'get_service_contract_intake',
+)
+
+
+def _is_consolidated(administratie: Optional[str]) -> bool:
+    return not administratie or administratie == CONSOLIDATED
+
+
+class AdministratieSnapshot:
+    """Eén keer geladen data voor alle administraties van een klant.
+
+    Args:
+        db: Data source met get_* methoden en de BULK_METHODS
+        standdatum: Peildatum (zoals in fetch_dashboard_data)
+        administraties: Administraties om te bedienen (None = alle met data)
+        max_workers: Parallelle queries bij het laden
+    """
+
+    def __init__(self, db, standdatum: date, administraties: Optional[Iterable[str]] = None,
+                 max_workers: int = FETCH_MAX_WORKERS):
+        self.db = db
+        self.standdatum = standdatum
+        # Zelfde vensters als plan_admin_tasks
+        self.hist_start = date(standdatum.year - 1, standdatum.month, 1)
+        self.dso_start = date(standdatum.year - 2, standdatum.month, 1)
+        self.max_workers = max_workers
+        self.queries = 0
+        self._administraties = list(administraties) if administraties is not None else None
+        self._frames: Dict[str, Any] = {}
+
+    @staticmethod
+    def supports(db) -> bool:
+        """True als de data source de bulk-methoden heeft (MockDatabase niet)."""
+        return all(callable(getattr(db, m, None)) for m in BULK_METHODS)
+
+    # ===== Laden =====
+
+    def _plan(self) -> List[FetchTask]:
+        sd = self.standdatum
+        dso_window = {'startdatum': self.dso_start, 'einddatum': sd}
+        tasks = [
+            # Banksaldo gebruikt boekdatum <= standdatum, de cashflow < standdatum
+            FetchTask('bankmutaties', 'get_bankmutaties_per_dag', {'einddatum': sd + timedelta(days=1)}),
+            FetchTask('verkooptermijnen', 'get_verkoopfactuur_termijnen_per_dag', {'einddatum': sd}),
+            FetchTask('crediteuren', 'get_openstaande_crediteuren', {'standdatum': sd}),
+            FetchTask('inkoopbetalingen', 'get_betalingen_inkoopregels', dict(dso_window)),
+            FetchTask('terugkerende_kosten', 'get_terugkerende_kosten_per_administratie',
+                      {'startdatum': self.hist_start, 'einddatum': sd}),
+            FetchTask('dso_dpo', 'get_calibrated_dso_dpo_per_administratie', default=dict),
+            FetchTask('budgetten', 'get_budgetten', {'boekjaar': sd.year}),
+        ]
+        tasks += [FetchTask(method, method) for method in SPLIT_METHODS + ADMIN_INDEPENDENT_METHODS]
+        # Administratie-onafhankelijk, met dezelfde argumenten als het dashboard-plan
+        shared = [
+            ('get_btw_aangifteregels', dict(dso_window)),
+            ('get_salarishistorie', dict(dso_window)),
+            ('get_geplande_salarissen', {}),
+            ('get_historisch_betalingsgedrag', {}),
+        ]
+        tasks += [FetchTask(_memo_key(method, (), kwargs), method, kwargs) for method, kwargs in shared]
+        return tasks
+
+    def load(self, timings: Optional[Dict[str, float]] = None) -> 'AdministratieSnapshot':
+        """Haal alle nog ontbrekende datasets in één parallelle ronde op."""
+        tasks = [t for t in self._plan() if t.key not in self._frames]
+        if tasks:
+            fetched = run_fetch_plan(self.db, tasks, max_workers=self.max_workers, timings=timings)
+            for key, result in fetched.items():
+                self._frames[key] = _prepare(key, result) if isinstance(result, pd.DataFrame) else result
+            self.queries += len(tasks)
+        return self
+
+    def _frame(self, key: str):
+        if key not in self._frames:
+            task = next(t for t in self._plan() if t.key == key)
+            result = run_fetch_plan(self.db, [task])[key]
+            self._frames[key] = _prepare(key, result) if isinstance(result, pd.DataFrame) else result
+            self.queries += 1
+        return self._frames[key]
+
+    def _rows(self, key: str, administratie: Optional[str], column: str = 'administratie') -> pd.DataFrame:
+        """Dataset voor één administratie (geconsolideerd: alle rijen)."""
+        df = self._frame(key)
+        if df is None:
+            return pd.DataFrame()
+        if _is_consolidated(administratie):
+            return df.copy()
+        rows = _admin_rows(df, administratie, column)
+        return rows.copy() if rows is df else rows
+
+    def _delegate(self, method: str, *args, **kwargs):
+        """Buiten het geladen venster: gewoon de database (één keer per argumentset)."""
+        key = _memo_key(method, args, kwargs)
+        if key not in self._frames:
+            self._frames[key] = getattr(self.db, method)(*args, **kwargs)
+            self.queries += 1
+        result = self._frames[key]
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'db':
+            raise AttributeError(name)
+        attr = getattr(self.db, name)
+        if not name.startswith('get_') or not callable(attr):
+            return attr
+
+        if name in SPLIT_METHODS:
+            def method(administratie: str = None):
+                return self._rows(name, administratie)
+        elif name in ADMIN_INDEPENDENT_METHODS:
+            def method(administratie: str = None):
+                return self._rows(name, None)
+        else:
+            def method(*args, **kwargs):
+                return self._delegate(name, *args, **kwargs)
+        return method
+
+    @property
+    def administraties(self) -> List[str]:
+        """Administraties met bankmutaties of verkoopfacturen (of de opgegeven lijst)."""
+        if self._administraties is None:
+            names = set()
+            for key in ('bankmutaties', 'verkooptermijnen'):
+                df = self._frame(key)
+                for column in ('administratie', 'cashflow_administratie'):
+                    if not df.empty and column in df.columns:
+                        names.update(df[column].dropna().unique())
+            names.discard('Onbekend')
+            self._administraties = sorted(names)
+        return self._administraties
+
+    # ===== Datasets uit de ruwe data =====
+
+    def get_banksaldo(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        if standdatum is None or standdatum > self.standdatum:
+            return self._delegate('get_banksaldo', standdatum=standdatum, administratie=administratie)
+        return _banksaldo(self._rows('bankmutaties', administratie), standdatum)
+
+    def get_historische_cashflow_per_week(self, startdatum: date = None, einddatum: date = None,
+                                          administratie: str = None, administratie_key: int = None) -> pd.DataFrame:
+        if startdatum is None or einddatum is None or administratie_key or einddatum > self.standdatum:
+            return self._delegate('get_historische_cashflow_per_week', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie, administratie_key=administratie_key)
+        return _weekly_cashflow(self._rows('bankmutaties', administratie, 'cashflow_administratie'),
+                                startdatum, einddatum)
+
+    def get_openstaande_debiteuren(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        if standdatum is None or standdatum > self.standdatum:
+            return self._delegate('get_openstaande_debiteuren', standdatum=standdatum, administratie=administratie)
+        return _open_debiteuren(self._rows('verkooptermijnen', administratie), standdatum)
+
+    def get_openstaande_crediteuren(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        # Bankafschrift-status is een momentopname: alleen de geladen standdatum
+        if standdatum != self.standdatum:
+            return self._delegate('get_openstaande_crediteuren', standdatum=standdatum, administratie=administratie)
+        return self._rows('crediteuren', administratie)
+
+    def get_betaalgedrag_per_debiteur(self, startdatum: date = None, einddatum: date = None,
+                                      administratie: str = None) -> pd.DataFrame:
+        if startdatum is None or einddatum is None or einddatum > self.standdatum:
+            return self._delegate('get_betaalgedrag_per_debiteur', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        return _betaalgedrag_debiteuren(self._rows('verkooptermijnen', administratie), startdatum, einddatum)
+
+    def get_betaalgedrag_per_crediteur(self, startdatum: date = None, einddatum: date = None,
+                                       administratie: str = None) -> pd.DataFrame:
+        if (startdatum is None or einddatum is None
+                or startdatum < self.dso_start or einddatum > self.standdatum):
+            return self._delegate('get_betaalgedrag_per_crediteur', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        return _betaalgedrag_crediteuren(self._rows('inkoopbetalingen', administratie), startdatum, einddatum)
+
+    # ===== Datasets met kolom administratie =====
+
+    def get_terugkerende_kosten(self, startdatum: date = None, einddatum: date = None,
+                                administratie: str = None) -> pd.DataFrame:
+        # Maandbedragen met een gebroken eindmaand: alleen exact het geladen venster
+        if (startdatum, einddatum) != (self.hist_start, self.standdatum):
+            return self._delegate('get_terugkerende_kosten', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        rows = self._rows('terugkerende_kosten', administratie)
+        if rows.empty:
+            return pd.DataFrame({"maand": [], "kostensoort": [], "bedrag": []})
+        if _is_consolidated(administratie):
+            rows = rows.groupby(['maand', 'kostensoort'], as_index=False, sort=False)['bedrag'].sum()
+            rows = rows.sort_values('maand', kind='stable')
+        return rows.drop(columns='administratie', errors='ignore').reset_index(drop=True)
+
+    def get_calibrated_dso_dpo(self, administratie: str = None, lookback_months: int = 12) -> dict:
+        if lookback_months != 12:
+            return self._delegate('get_calibrated_dso_dpo', administratie, lookback_months=lookback_months)
+        per_adm = self._frame('dso_dpo') or {}
+        totaal = per_adm.get(None) or {'dso': None, 'dpo': None}
+        if _is_consolidated(administratie):
+            return dict(totaal)
+        return dict(per_adm.get(administratie) or {'dso': totaal['dso'], 'dpo': None})
+
+    def get_budgetten(self, boekjaar: int = None, administratie: str = None) -> pd.DataFrame:
+        if boekjaar != self.standdatum.year:
+            return self._delegate('get_budgetten', boekjaar=boekjaar, administratie=administratie)
+        return self._rows('budgetten', administratie)
+
+    def stats(self) -> dict:
+        return {'queries': self.queries, 'administraties': len(self._administraties or [])}
+
+
+def fetch_dashboard_data_per_administratie(
+    db,
+    standdatum: date,
+    administraties: Optional[Iterable[str]] = None,
+    consolidated: bool = True,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """fetch_dashboard_data voor meerdere administraties, met één query per dataset.
+
+    Args:
+        db: Data source (NotificaDataSource / DirectDWHDataSource / MockDatabase)
+        standdatum: Peildatum
+        administraties: Administraties (None = alle administraties met data)
+        consolidated: Ook de geconsolideerde view opnemen (sleutel CONSOLIDATED)
+        timings: Optioneel dict dat per dataset de query-duur (s) ontvangt
+
+    Returns:
+        Dict {administratie: data-dict zoals fetch_dashboard_data}
+    """
+    if not AdministratieSnapshot.supports(db):
+        # Geen bulk-queries (MockDatabase): gewoon per administratie ophalen
+        if administraties is None:
+            administraties = db.get_beschikbare_administraties()
+        names = list(administraties) + ([CONSOLIDATED] if consolidated else [])
+        return {adm: fetch_dashboard_data(db, standdatum, adm, timings=timings) for adm in names}
+
+    snapshot = AdministratieSnapshot(db, standdatum, administraties).load(timings=timings)
+    names = snapshot.administraties + ([CONSOLIDATED] if consolidated else [])
+    result = {}
+    for adm in names:
+        data = fetch_dashboard_data(snapshot, standdatum, adm)
+        data["_db"] = db  # Profiel opslaan gaat naar de echte database
+        result[adm] = data
+    return result
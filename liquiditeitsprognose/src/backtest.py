@@ -15,16 +15,29 @@ V7 toevoegingen:
 - model_version parameter ('v6' of 'v7')
 - Extra data masking voor BTW, salaris, budgetten
 - ComparisonReport voor V6 vs V7 vergelijking
+
+Parallel: met max_workers > 1 (of BACKTEST_MAX_WORKERS) draaien forecast en
+metrics per cutoff in een process pool; de data wordt in het hoofdproces
+opgehaald (snapshot) en per cutoff meegestuurd.
 """
 
+import os
 import pandas as pd
 import numpy as np
+from concurrent.futures import Executor
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import warnings
 warnings.filterwarnings('ignore')
 
+from src.backtest_snapshot import BacktestSnapshot
+from src.calculations import _process_pool
+
+
+# Aantal processen voor cutoffs (1 = sequentieel, overschrijfbaar via environment)
+BACKTEST_MAX_WORKERS = int(os.getenv("BACKTEST_MAX_WORKERS", "1"))
+
 
 @dataclass
 class BacktestResult:
@@ -50,6 +63,7 @@ class BacktestReport:
     layer3_accuracy: float
     recommendations: List[str]
     model_version: str = 'v6'
+    errors: Dict[date, str] = field(default_factory=dict)  # cutoff -> foutmelding
 
 
 @dataclass
@@ -69,25 +83,55 @@ class BacktestFramework:
 
     Simuleert het model op historische momenten en vergelijkt met realisatie.
     Ondersteunt zowel V6 (Ghost Invoice) als V7 (Structuur x Volume x Realiteit).
+
+    Met use_snapshot=True (standaard) wordt de data één keer geladen voor alle
+    cutoffs (BacktestSnapshot) en per cutoff in-memory gefilterd.
     """
 
-    def __init__(self, db_connection, administratie: str, model_version: str = 'v6'):
+    def __init__(self, db_connection, administratie: str, model_version: str = 'v6',
+                 use_snapshot: bool = True, max_workers: int = BACKTEST_MAX_WORKERS,
+                 reference_date: Optional[date] = None):
         """
         Args:
             db_connection: Database connectie (NotificaDataSource)
             administratie: Administratie naam voor filtering
             model_version: 'v6' of 'v7'
+            use_snapshot: Data één keer laden en per cutoff in-memory slicen
+            max_workers: Aantal processen voor de cutoffs (1 = sequentieel)
+            reference_date: Datum waarvandaan de cutoffs terug worden gerekend
+                (default: vandaag)
         """
         self.db = db_connection
         self.administratie = administratie
         self.model_version = model_version
         self.forecast_horizon = 12  # Weken vooruit
+        self.use_snapshot = use_snapshot
+        self.snapshot: Optional[BacktestSnapshot] = None
+        self.max_workers = max_workers
+        self.reference_date = reference_date
+        self.errors: Dict[date, str] = {}  # fouten van de laatste run, per cutoff
+        self._executor: Optional[Executor] = None
+
+    @property
+    def source(self):
+        """Data source voor de tijdmachine: de snapshot als die geladen is, anders de database."""
+        return self.snapshot if self.snapshot is not None else self.db
+
+    def prepare_snapshot(self, cutoffs: List[date]) -> Optional[BacktestSnapshot]:
+        """Laad de data voor deze cutoffs één keer (hergebruikt bij V6 + V7 op dezelfde cutoffs)."""
+        if not self.use_snapshot or not cutoffs or not BacktestSnapshot.supports(self.db):
+            return None
+        if self.snapshot is None or not self.snapshot.covers(cutoffs):
+            self.snapshot = BacktestSnapshot(
+                self.db, self.administratie, cutoffs, horizon_weeks=self.forecast_horizon)
+        return self.snapshot.load(self.model_version)
 
     def generate_cutoff_dates(self, n_months: int = 12) -> List[date]:
         """
-        Genereer cutoff dates: 1e van elke maand voor de afgelopen N maanden.
+        Genereer cutoff dates: 1e van elke maand voor de N maanden vóór de
+        reference_date (default: vandaag).
         """
-        today = date.today()
+        today = self.reference_date or date.today()
         cutoffs = []
 
         for i in range(1, n_months + 1):
@@ -135,41 +179,42 @@ class BacktestFramework:
 
         # V7: extra databronnen ophalen
         if self.model_version == 'v7':
+            db = self.source
             hist_start_24m = date(cutoff.year - 2, cutoff.month, 1)
 
             try:
-                result['btw_aangifteregels'] = self.db.get_btw_aangifteregels(
+                result['btw_aangifteregels'] = db.get_btw_aangifteregels(
                     startdatum=hist_start_24m, einddatum=cutoff)
             except Exception:
                 result['btw_aangifteregels'] = pd.DataFrame()
 
             try:
-                result['salarishistorie'] = self.db.get_salarishistorie(
+                result['salarishistorie'] = db.get_salarishistorie(
                     startdatum=hist_start_24m, einddatum=cutoff)
             except Exception:
                 result['salarishistorie'] = pd.DataFrame()
 
             try:
-                result['budgetten'] = self.db.get_budgetten(
+                result['budgetten'] = db.get_budgetten(
                     boekjaar=cutoff.year, administratie=self.administratie)
             except Exception:
                 result['budgetten'] = pd.DataFrame()
 
             try:
-                result['orderportefeuille'] = self.db.get_orderportefeuille(
+                result['orderportefeuille'] = db.get_orderportefeuille(
                     administratie=self.administratie)
             except Exception:
                 result['orderportefeuille'] = pd.DataFrame()
 
             try:
-                result['betaalgedrag_debiteuren'] = self.db.get_betaalgedrag_per_debiteur(
+                result['betaalgedrag_debiteuren'] = db.get_betaalgedrag_per_debiteur(
                     startdatum=hist_start_24m, einddatum=cutoff,
                     administratie=self.administratie)
             except Exception:
                 result['betaalgedrag_debiteuren'] = pd.DataFrame()
 
             try:
-                result['betaalgedrag_crediteuren'] = self.db.get_betaalgedrag_per_crediteur(
+                result['betaalgedrag_crediteuren'] = db.get_betaalgedrag_per_crediteur(
                     startdatum=hist_start_24m, einddatum=cutoff,
                     administratie=self.administratie)
             except Exception:
@@ -179,44 +224,44 @@ class BacktestFramework:
 
             # NIEUW: Service orders, terugkerende kosten, orderregels, abonnementen, BTW prognose
             try:
-                result['service_orders_prognose'] = self.db.get_service_orders_prognose(
+                result['service_orders_prognose'] = db.get_service_orders_prognose(
                     administratie=self.administratie)
             except Exception:
                 result['service_orders_prognose'] = pd.DataFrame()
 
             try:
-                result['terugkerende_kosten'] = self.db.get_terugkerende_kosten(
+                result['terugkerende_kosten'] = db.get_terugkerende_kosten(
                     startdatum=hist_start, einddatum=cutoff,
                     administratie=self.administratie)
             except Exception:
                 result['terugkerende_kosten'] = pd.DataFrame()
 
             try:
-                result['orderregels_periodiek'] = self.db.get_orderregels_periodiek(
+                result['orderregels_periodiek'] = db.get_orderregels_periodiek(
                     administratie=self.administratie)
             except Exception:
                 result['orderregels_periodiek'] = pd.DataFrame()
 
             try:
-                result['orderregels_eenmalig'] = self.db.get_orderregels_eenmalig(
+                result['orderregels_eenmalig'] = db.get_orderregels_eenmalig(
                     administratie=self.administratie)
             except Exception:
                 result['orderregels_eenmalig'] = pd.DataFrame()
 
             try:
-                result['abonnementen'] = self.db.get_abonnementen(
+                result['abonnementen'] = db.get_abonnementen(
                     administratie=self.administratie)
             except Exception:
                 result['abonnementen'] = pd.DataFrame()
 
             try:
-                result['service_contract_intake'] = self.db.get_service_contract_intake(
+                result['service_contract_intake'] = db.get_service_contract_intake(
                     administratie=self.administratie)
             except Exception:
                 result['service_contract_intake'] = pd.DataFrame()
 
             try:
-                result['btw_prognose'] = self.db.get_btw_prognose(
+                result['btw_prognose'] = db.get_btw_prognose(
                     administratie=self.administratie)
             except Exception:
                 result['btw_prognose'] = pd.DataFrame()
@@ -227,7 +272,7 @@ class BacktestFramework:
         self, start: date, cutoff: date
     ) -> pd.DataFrame:
         """Haal historische cashflow op voor de periode VOOR de cutoff."""
-        return self.db.get_historische_cashflow_per_week(
+        return self.source.get_historische_cashflow_per_week(
             startdatum=start,
             einddatum=cutoff,
             administratie=self.administratie
@@ -243,18 +288,18 @@ class BacktestFramework:
         """
         # Haal alle debiteuren data op met standdatum = cutoff
         # Dit zou de database moeten ondersteunen met de juiste query
-        return self.db.get_openstaande_debiteuren(
+        return self.source.get_openstaande_debiteuren(
             standdatum=cutoff,
             administratie=self.administratie
         )
 
     def _reconstruct_open_ap_at_cutoff(self, cutoff: date) -> pd.DataFrame:
         """Reconstrueer openstaande crediteuren op de cutoff date."""
-        return self.db.get_openstaande_crediteuren(standdatum=cutoff)
+        return self.source.get_openstaande_crediteuren(standdatum=cutoff)
 
     def _get_balance_at_cutoff(self, cutoff: date) -> pd.DataFrame:
         """Haal banksaldo op per cutoff date."""
-        return self.db.get_banksaldo(
+        return self.source.get_banksaldo(
             standdatum=cutoff,
             administratie=self.administratie
         )
@@ -268,7 +313,7 @@ class BacktestFramework:
         """
         end_date = cutoff + timedelta(weeks=weeks)
 
-        actuals = self.db.get_historische_cashflow_per_week(
+        actuals = self.source.get_historische_cashflow_per_week(
             startdatum=cutoff,
             einddatum=end_date,
             administratie=self.administratie
@@ -424,8 +469,14 @@ class BacktestFramework:
         print(f"  [{self.model_version.upper()}] Backtest voor cutoff: {cutoff}")
 
         masked_data = self.mask_data_at_cutoff(cutoff)
-        forecast = self.run_forecast_at_cutoff(masked_data, cutoff)
         actuals = self.get_actuals_after_cutoff(cutoff)
+        return self.score_cutoff(cutoff, masked_data, actuals)
+
+    def score_cutoff(
+        self, cutoff: date, masked_data: Dict[str, pd.DataFrame], actuals: pd.DataFrame
+    ) -> BacktestResult:
+        """Forecast + metrics voor een cutoff op reeds opgehaalde data (geen database nodig)."""
+        forecast = self.run_forecast_at_cutoff(masked_data, cutoff)
 
         mape_per_week, bias_per_week, total_mape, total_bias = self.calculate_metrics(
             forecast, actuals
@@ -444,24 +495,95 @@ class BacktestFramework:
             model_version=self.model_version,
         )
 
+    def _run_cutoffs(self, cutoffs: List[date]) -> Tuple[List[BacktestResult], Dict[date, str]]:
+        """Draai alle cutoffs, sequentieel of in een process pool. Fouten per cutoff worden verzameld."""
+        results = []
+        errors = {}
+
+        if self.max_workers <= 1 or len(cutoffs) <= 1:
+            for cutoff in cutoffs:
+                try:
+                    results.append(self.run_single_backtest(cutoff))
+                except Exception as e:
+                    errors[cutoff] = f"{type(e).__name__}: {e}"
+                    print(f"  ERROR bij cutoff {cutoff}: {e}")
+            return results, errors
+
+        # Data ophalen in dit proces (de data source is niet picklebaar),
+        # forecast + metrics per cutoff in de pool
+        executor = self._executor or _process_pool(min(self.max_workers, len(cutoffs)))
+        futures = {}
+        try:
+            for cutoff in cutoffs:
+                print(f"  [{self.model_version.upper()}] Backtest voor cutoff: {cutoff}")
+                try:
+                    masked_data = self.mask_data_at_cutoff(cutoff)
+                    actuals = self.get_actuals_after_cutoff(cutoff)
+                except Exception as e:
+                    errors[cutoff] = f"{type(e).__name__}: {e}"
+                    continue
+                futures[cutoff] = executor.submit(
+                    _score_cutoff, self.model_version, self.forecast_horizon, cutoff, masked_data, actuals)
+
+            for cutoff, future in futures.items():
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    errors[cutoff] = f"{type(e).__name__}: {e}"
+        finally:
+            if executor is not self._executor:
+                executor.shutdown()
+
+        for cutoff in sorted(errors):
+            print(f"  ERROR bij cutoff {cutoff}: {errors[cutoff]}")
+        return results, errors
+
+    def fetch_cutoff_inputs(
+        self, cutoffs: List[date]
+    ) -> Tuple[Dict[date, Tuple[Dict[str, pd.DataFrame], pd.DataFrame]], Dict[date, str]]:
+        """Alleen het data-werk: gemaskeerde data + realisatie per cutoff.
+
+        Voor aanroepers die het scoren elders doen (score_cutoff, bijv. in
+        een ander proces) maar de database maar vanuit één plek willen
+        aanspreken. Returns ({cutoff: (masked_data, actuals)}, fouten per cutoff).
+        """
+        inputs = {}
+        errors = {}
+        for cutoff in cutoffs:
+            try:
+                inputs[cutoff] = (self.mask_data_at_cutoff(cutoff), self.get_actuals_after_cutoff(cutoff))
+            except Exception as e:
+                errors[cutoff] = f"{type(e).__name__}: {e}"
+        return inputs, errors
+
     def run_full_backtest(self, n_months: int = 12) -> BacktestReport:
         """Voer volledige Walk-Forward Validation uit."""
         print(f"[{self.model_version.upper()}] Walk-Forward Validation ({n_months} cutoff dates)")
         print("=" * 60)
 
         cutoffs = self.generate_cutoff_dates(n_months)
-        results = []
+        snapshot = self.prepare_snapshot(cutoffs)
+        results, self.errors = self._run_cutoffs(cutoffs)
 
-        for cutoff in cutoffs:
-            try:
-                result = self.run_single_backtest(cutoff)
-                results.append(result)
-            except Exception as e:
-                print(f"  ERROR bij cutoff {cutoff}: {e}")
-                continue
+        report = self.build_report(results)
+        if report is None:
+            print("Geen succesvolle backtests!")
+            return None
 
+        print(f"\n{'='*60}")
+        print(f"[{self.model_version.upper()}] COMPLEET: {len(results)} runs"
+              + (f", {len(self.errors)} mislukt" if self.errors else ""))
+        print(f"Overall MAPE: {report.overall_mape:.1f}%")
+        print(f"Overall Bias: EUR {report.overall_bias:,.0f}")
+        print(f"Layer 3 Accuracy: {report.layer3_accuracy:.1f}%")
+        if snapshot is not None:
+            print(f"Data snapshot: {snapshot.queries} queries voor {len(cutoffs)} cutoffs")
+
+        return report
+
+    def build_report(self, results: List[BacktestResult]) -> Optional[BacktestReport]:
+        """Aggregeer de cutoff-resultaten (en self.errors) tot een rapport; None zonder resultaten."""
         if not results:
-            print("Geen succesvolle backtests!")
             return None
 
         overall_mape = np.nanmean([r.total_mape for r in results])
@@ -469,20 +591,15 @@ class BacktestFramework:
 
         accuracy_decay = {}
         for week in range(self.forecast_horizon):
-            week_mapes = [r.mape_per_week.get(week, np.nan) for r in results]
-            accuracy_decay[week] = np.nanmean(week_mapes)
+            week_mapes = np.array([r.mape_per_week.get(week, np.nan) for r in results], dtype=float)
+            # Week na het einde van de data (recente cutoffs): geen realisatie
+            accuracy_decay[week] = np.nan if np.isnan(week_mapes).all() else np.nanmean(week_mapes)
 
         layer3_accuracy = np.nanmean([r.ghost_invoice_accuracy for r in results])
         recommendations = self._generate_recommendations(
             overall_mape, overall_bias, accuracy_decay, layer3_accuracy
         )
 
-        print(f"\n{'='*60}")
-        print(f"[{self.model_version.upper()}] COMPLEET: {len(results)} runs")
-        print(f"Overall MAPE: {overall_mape:.1f}%")
-        print(f"Overall Bias: EUR {overall_bias:,.0f}")
-        print(f"Layer 3 Accuracy: {layer3_accuracy:.1f}%")
-
         return BacktestReport(
             results=results,
             overall_mape=overall_mape,
@@ -491,6 +608,7 @@ class BacktestFramework:
             layer3_accuracy=layer3_accuracy,
             recommendations=recommendations,
             model_version=self.model_version,
+            errors=dict(self.errors),
         )
 
     def run_comparison_backtest(self, n_months: int = 6) -> ComparisonReport:
@@ -503,13 +621,21 @@ class BacktestFramework:
         print("COMPARISON BACKTEST: V6 vs V7")
         print("=" * 60)
 
-        # V6
-        self.model_version = 'v6'
-        v6_report = self.run_full_backtest(n_months)
-
-        # V7
-        self.model_version = 'v7'
-        v7_report = self.run_full_backtest(n_months)
+        # Eén pool voor beide modellen (workers blijven warm)
+        if self.max_workers > 1:
+            self._executor = _process_pool(self.max_workers)
+        try:
+            # V6
+            self.model_version = 'v6'
+            v6_report = self.run_full_backtest(n_months)
+
+            # V7
+            self.model_version = 'v7'
+            v7_report = self.run_full_backtest(n_months)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
         if v6_report is None or v7_report is None:
             print("Kon vergelijking niet uitvoeren")
@@ -586,6 +712,16 @@ class BacktestFramework:
         return recs
 
 
+def _score_cutoff(
+    model_version: str, forecast_horizon: int, cutoff: date,
+    masked_data: Dict[str, pd.DataFrame], actuals: pd.DataFrame,
+) -> BacktestResult:
+    """Process pool worker: forecast + metrics voor één cutoff."""
+    framework = BacktestFramework(None, '', model_version=model_version, use_snapshot=False, max_workers=1)
+    framework.forecast_horizon = forecast_horizon
+    return framework.score_cutoff(cutoff, masked_data, actuals)
+
+
 def create_backtest_visualizations(report: BacktestReport) -> Dict:
     """
     Maak visualisatie data voor het backtest rapport.
@@ -632,6 +768,7 @@ def run_backtest_for_customer(
     administratie: str,
     n_months: int = 6,
     model_version: str = 'v7',
+    max_workers: int = BACKTEST_MAX_WORKERS,
 ) -> Optional[BacktestReport]:
     """
     Helper functie om backtest te draaien voor een klant.
@@ -641,11 +778,12 @@ def run_backtest_for_customer(
         administratie: Administratie naam
         n_months: Aantal maanden terug te testen
         model_version: 'v6' of 'v7'
+        max_workers: Aantal processen voor de cutoffs
     """
     from src.database import get_database
 
     db = get_database(use_mock=False, customer_code=customer_code)
-    framework = BacktestFramework(db, administratie, model_version=model_version)
+    framework = BacktestFramework(db, administratie, model_version=model_version, max_workers=max_workers)
     return framework.run_full_backtest(n_months)
 
 
@@ -653,12 +791,13 @@ def run_comparison_for_customer(
     customer_code: str,
     administratie: str,
     n_months: int = 6,
+    max_workers: int = BACKTEST_MAX_WORKERS,
 ) -> Optional[ComparisonReport]:
     """Draai V6 vs V7 vergelijking voor een klant."""
     from src.database import get_database
 
     db = get_database(use_mock=False, customer_code=customer_code)
-    framework = BacktestFramework(db, administratie)
+    framework = BacktestFramework(db, administratie, max_workers=max_workers)
     return framework.run_comparison_backtest(n_months)
 
 
@@ -672,14 +811,15 @@ if __name__ == "__main__":
     administratie = sys.argv[2] if len(sys.argv) > 2 else ""
     n_months = int(sys.argv[3]) if len(sys.argv) > 3 else 6
     mode = sys.argv[4] if len(sys.argv) > 4 else "compare"  # 'v6', 'v7', 'compare'
+    max_workers = int(sys.argv[5]) if len(sys.argv) > 5 else BACKTEST_MAX_WORKERS
 
     print(f"Backtest voor klant {customer_code}")
     print(f"Administratie: {administratie or '(alle)'}")
-    print(f"Maanden: {n_months}, Mode: {mode}")
+    print(f"Maanden: {n_months}, Mode: {mode}, Workers: {max_workers}")
     print()
 
     if mode == 'compare':
-        report = run_comparison_for_customer(customer_code, administratie, n_months)
+        report = run_comparison_for_customer(customer_code, administratie, n_months, max_workers=max_workers)
         if report:
             print(f"\nV6 MAPE: {report.v6_report.overall_mape:.1f}%")
             print(f"V7 MAPE: {report.v7_report.overall_mape:.1f}%")
@@ -687,7 +827,7 @@ if __name__ == "__main__":
             print(f"\nAanbeveling: {report.recommendation}")
     else:
         report = run_backtest_for_customer(
-            customer_code, administratie, n_months, model_version=mode)
+            customer_code, administratie, n_months, model_version=mode, max_workers=max_workers)
         if report:
             print(f"\n[{report.model_version.upper()}] MAPE: {report.overall_mape:.1f}%")
             print(f"Bias: EUR {report.overall_bias:,.0f}")
@@ -0,0 +1,467 @@
+"""
+Liquiditeitsprognose - Backtest Snapshot
+========================================
+Laadt de historie voor een walk-forward backtest één keer en bouwt per
+cutoff de "tijdmachine"-view als in-memory filter.
+
+Zonder snapshot vraagt BacktestFramework per cutoff opnieuw de cashflow,
+open debiteuren/crediteuren, het banksaldo en (V7) nog ±15 datasets op, en
+in een V6 vs V7 vergelijking gebeurt dat twee keer. Met de snapshot kost
+een backtest één round-trip per dataset, ongeacht het aantal cutoffs.
+
+De snapshot gedraagt zich als data source: dezelfde get_* methoden en
+dezelfde kolommen als NotificaDataSource.
+- Cutoff-afhankelijke datasets komen uit ruwe data op dag/regel-niveau
+  (get_bankmutaties_per_dag, get_verkoopfactuur_termijnen_per_dag,
+  get_betalingen_inkoopregels). De SQL-aggregaties (GROUP BY/HAVING)
+  worden in pandas nagebouwd.
+- Maand-aggregaten (BTW, salaris, terugkerende kosten) worden één keer over
+  het hele venster opgehaald en per cutoff op maand gefilterd.
+- De overige get_* methoden (geen cutoff, bijv. orderportefeuille) worden
+  per argumentset één keer opgehaald.
+- Valt een aanroep buiten het geladen venster, dan gaat hij ongewijzigd
+  naar de onderliggende database.
+
+Gebruik:
+    snapshot = BacktestSnapshot(db, "Zenith BV", cutoffs, horizon_weeks=12)
+    snapshot.load('v7')
+    debiteuren = snapshot.get_openstaande_debiteuren(standdatum=cutoffs[0], administratie="Zenith BV")
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.fetch_planner import FETCH_MAX_WORKERS, FetchTask, run_fetch_plan
+
+
+# Ruwe data-methoden die de data source moet hebben (zie NotificaDataSource)
+RAW_METHODS = (
+    'get_bankmutaties_per_dag',
+    'get_verkoopfactuur_termijnen_per_dag',
+    'get_betalingen_inkoopregels',
+)
+
+# Niet cutoff-afhankelijk (SQL gebruikt CURRENT_DATE of geen datum)
+STATIC_METHODS = (
+    'get_orderportefeuille',
+    'get_service_orders_prognose',
+    'get_orderregels_periodiek',
+    'get_orderregels_eenmalig',
+    'get_abonnementen',
+    'get_service_contract_intake',
+    'get_btw_prognose',
+)
+
+_EMPTY_COLUMNS = {
+    'banksaldo': ['bank_naam', 'rekeningnummer', 'saldo', 'datum'],
+    'cashflow': ['week_start', 'week_nummer', 'maand', 'inkomsten', 'uitgaven', 'netto'],
+    'debiteuren': ['debiteur_code', 'debiteur_naam', 'factuurnummer', 'factuurdatum', 'vervaldatum',
+                   'bedrag_excl_btw', 'betaaldatum', 'betaald', 'openstaand', 'betaaltermijn_dagen',
+                   'administratie', 'bedrijfseenheid'],
+    'betaalgedrag_deb': ['debiteur_code', 'aantal_facturen', 'gem_dagen_tot_betaling', 'std_dagen_tot_betaling',
+                         'min_dagen', 'max_dagen', 'totaal_factuurbedrag', 'laatste_betaling', 'betrouwbaarheid'],
+    'betaalgedrag_cred': ['crediteur_code', 'aantal_facturen', 'gem_dagen_tot_betaling', 'std_dagen_tot_betaling',
+                          'totaal_factuurbedrag', 'laatste_betaling', 'betrouwbaarheid'],
+}
+
+
+def _empty(kind: str) -> pd.DataFrame:
+    return pd.DataFrame({c: [] for c in _EMPTY_COLUMNS[kind]})
+
+
+def _memo_key(method: str, args: tuple, kwargs: dict) -> str:
+    return f"{method}{args!r}{sorted(kwargs.items())!r}"
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    dates = pd.to_datetime(values, errors='coerce')
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values, errors='coerce').fillna(0.0)
+
+
+def _sql_round(values: pd.Series, decimals: int) -> pd.Series:
+    """ROUND(x::numeric, n) van PostgreSQL: half away from zero."""
+    factor = 10 ** decimals
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5) / factor
+
+
+def _prepare(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Parse datums en bedragen van de ruwe datasets één keer direct na het laden."""
+    if df is None:
+        return pd.DataFrame()
+    if df.empty or key not in ('bankmutaties', 'verkooptermijnen', 'inkoopbetalingen'):
+        return df
+    df = df.copy()
+    if key == 'bankmutaties':
+        df['boekdatum'] = _to_datetime(df['boekdatum']).dt.normalize()
+        df['inkomsten'] = _to_number(df['inkomsten'])
+        df['uitgaven'] = _to_number(df['uitgaven'])
+    elif key == 'verkooptermijnen':
+        df['alloc_datum'] = _to_datetime(df['alloc_datum'])
+        df['vervaldatum'] = _to_datetime(df['vervaldatum'])
+        for col in ('bedrag', 'bedrag_positief', 'aantal'):
+            df[col] = _to_number(df[col])
+    elif key == 'inkoopbetalingen':
+        df['vervaldatum'] = _to_datetime(df['vervaldatum'])
+        df['betaaldatum'] = _to_datetime(df['betaaldatum'])
+        df['factuurbedrag'] = _to_number(df['factuurbedrag'])
+    return df
+
+
+# =============================================================================
+# In-memory versies van de SQL-aggregaties in NotificaDataSource
+# =============================================================================
+
+def _admin_rows(df: pd.DataFrame, administratie: Optional[str], column: str = 'administratie') -> pd.DataFrame:
+    """Rijen van één administratie (zonder administratie: alle rijen).
+
+    Bankmutaties hebben een aparte `cashflow_administratie` (andere bron dan
+    het banksaldo); ontbreekt die kolom, dan geldt `administratie`.
+    """
+    if not administratie or df.empty:
+        return df
+    if column not in df.columns:
+        column = 'administratie'
+    if column not in df.columns:
+        return df
+    return df[df[column] == administratie].reset_index(drop=True)
+
+
+def _banksaldo(mutaties: pd.DataFrame, standdatum: date) -> pd.DataFrame:
+    """get_banksaldo: saldo per dagboek t/m standdatum."""
+    if mutaties.empty:
+        return _empty('banksaldo')
+    rows = mutaties[mutaties['boekdatum'] <= pd.Timestamp(standdatum)]
+    saldo = (rows['inkomsten'] - rows['uitgaven']).groupby(rows['bank_naam'], dropna=False).sum()
+    saldo = saldo[saldo.abs() > 0.01].sort_values(ascending=False, kind='stable')
+    if saldo.empty:
+        return _empty('banksaldo')
+    return pd.DataFrame({
+        'bank_naam': saldo.index,
+        'rekeningnummer': saldo.index,
+        'saldo': saldo.values,
+        'datum': date.today(),
+    })
+
+
+def _weekly_cashflow(mutaties: pd.DataFrame, startdatum: date, einddatum: date) -> pd.DataFrame:
+    """get_historische_cashflow_per_week: boekdatum in [startdatum, einddatum)."""
+    if mutaties.empty:
+        return _empty('cashflow')
+    rows = mutaties[(mutaties['boekdatum'] >= pd.Timestamp(startdatum))
+                    & (mutaties['boekdatum'] < pd.Timestamp(einddatum))]
+    if rows.empty:
+        return _empty('cashflow')
+    d = rows['boekdatum']
+    # GROUP BY DATE_TRUNC('week'), EXTRACT(WEEK) (ISO), EXTRACT(MONTH)
+    keys = pd.DataFrame({
+        'week_start': d - pd.to_timedelta(d.dt.weekday, unit='D'),
+        'week_nummer': d.dt.isocalendar().week.astype(int),
+        'maand': d.dt.month,
+        'inkomsten': rows['inkomsten'],
+        'uitgaven': rows['uitgaven'],
+    })
+    weekly = keys.groupby(['week_start', 'week_nummer', 'maand'], as_index=False)[['inkomsten', 'uitgaven']].sum()
+    weekly['netto'] = weekly['inkomsten'] - weekly['uitgaven']
+    return weekly
+
+
+def _open_debiteuren(termijnen: pd.DataFrame, standdatum: date) -> pd.DataFrame:
+    """get_openstaande_debiteuren: saldo per debiteur van termijnen t/m standdatum."""
+    if termijnen.empty:
+        return _empty('debiteuren')
+    rows = termijnen[termijnen['alloc_datum'] <= pd.Timestamp(standdatum)]
+    per_deb = rows.groupby(['debiteur_code', 'administratie', 'bedrijfseenheid'], sort=False, dropna=False).agg(
+        factuurdatum=('alloc_datum', 'max'),
+        vervaldatum=('vervaldatum', 'max'),
+        openstaand=('bedrag', 'sum'),
+    ).reset_index()
+    per_deb = per_deb[per_deb['openstaand'].abs() > 0.01]
+    if per_deb.empty:
+        return _empty('debiteuren')
+    per_deb = per_deb.sort_values('openstaand', ascending=False, kind='stable').reset_index(drop=True)
+    return pd.DataFrame({
+        'debiteur_code': per_deb['debiteur_code'],
+        'debiteur_naam': per_deb['debiteur_code'],
+        'factuurnummer': 'Diverse',
+        'factuurdatum': per_deb['factuurdatum'],
+        'vervaldatum': per_deb['vervaldatum'],
+        'bedrag_excl_btw': per_deb['openstaand'],
+        'betaaldatum': pd.NaT,
+        'betaald': 0,
+        'openstaand': per_deb['openstaand'],
+        'betaaltermijn_dagen': 30,
+        'administratie': per_deb['administratie'],
+        'bedrijfseenheid': per_deb['bedrijfseenheid'],
+    })
+
+
+def _betaal_stats(facturen: pd.DataFrame, code_col: str, with_min_max: bool) -> pd.DataFrame:
+    """Statistiek per relatie over kolom 'dagen' (zie *_stats CTE's in de SQL)."""
+    stats = facturen.groupby(code_col, sort=False, dropna=False).agg(
+        aantal_facturen=('dagen', 'size'),
+        gem=('dagen', 'mean'),
+        std=('dagen', 'std'),
+        min_dagen=('dagen', 'min'),
+        max_dagen=('dagen', 'max'),
+        totaal=('factuurbedrag', 'sum'),
+        laatste_betaling=('betaaldatum', 'max'),
+    ).reset_index()
+    stats = stats[stats['aantal_facturen'] >= 2]
+    if stats.empty:
+        return pd.DataFrame()
+
+    betrouwbaarheid = np.minimum(
+        1.0,
+        (1.0 - np.minimum(1.0, stats['std'].fillna(30) / 30.0)) * 0.7
+        + np.minimum(1.0, stats['aantal_facturen'] / 10.0) * 0.3,
+    )
+    result = pd.DataFrame({
+        code_col: stats[code_col],
+        'aantal_facturen': stats['aantal_facturen'],
+        'gem_dagen_tot_betaling': _sql_round(stats['gem'], 1),
+        'std_dagen_tot_betaling': _sql_round(stats['std'].fillna(0), 1),
+    })
+    if with_min_max:
+        result['min_dagen'] = _sql_round(stats['min_dagen'], 0)
+        result['max_dagen'] = _sql_round(stats['max_dagen'], 0)
+    result['totaal_factuurbedrag'] = _sql_round(stats['totaal'], 2)
+    result['laatste_betaling'] = stats['laatste_betaling']
+    result['betrouwbaarheid'] = _sql_round(betrouwbaarheid, 2)
+    return result.sort_values('totaal_factuurbedrag', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _betaalgedrag_debiteuren(termijnen: pd.DataFrame, startdatum: date, einddatum: date) -> pd.DataFrame:
+    """get_betaalgedrag_per_debiteur: volledig betaalde facturen met alloc_datum in het venster."""
+    if termijnen.empty:
+        return _empty('betaalgedrag_deb')
+    rows = termijnen[(termijnen['alloc_datum'] >= pd.Timestamp(startdatum))
+                     & (termijnen['alloc_datum'] <= pd.Timestamp(einddatum))]
+    facturen = rows.groupby(['debiteur_code', 'factuur_key'], sort=False, dropna=False).agg(
+        factuurdatum=('alloc_datum', 'min'),
+        betaaldatum=('alloc_datum', 'max'),
+        factuurbedrag=('bedrag_positief', 'sum'),
+        saldo=('bedrag', 'sum'),
+        aantal=('aantal', 'sum'),
+    ).reset_index()
+    facturen = facturen[(facturen['saldo'].abs() < 0.01) & (facturen['aantal'] >= 2)].copy()
+    facturen['factuurbedrag'] = facturen['factuurbedrag'].abs()
+    facturen['dagen'] = (facturen['betaaldatum'] - facturen['factuurdatum']).dt.total_seconds() / 86400
+    facturen = facturen[facturen['dagen'].between(0, 365)]
+    result = _betaal_stats(facturen, 'debiteur_code', with_min_max=True)
+    return result if not result.empty else _empty('betaalgedrag_deb')
+
+
+def _betaalgedrag_crediteuren(betalingen: pd.DataFrame, startdatum: date, einddatum: date) -> pd.DataFrame:
+    """get_betaalgedrag_per_crediteur: betaaldatum in het venster, dagen t.o.v. vervaldatum."""
+    if betalingen.empty:
+        return _empty('betaalgedrag_cred')
+    rows = betalingen[(betalingen['betaaldatum'] >= pd.Timestamp(startdatum))
+                      & (betalingen['betaaldatum'] <= pd.Timestamp(einddatum))].copy()
+    rows['dagen'] = (rows['betaaldatum'] - rows['vervaldatum']).dt.total_seconds() / 86400
+    rows = rows[rows['dagen'].between(-90, 365)]
+    result = _betaal_stats(rows, 'crediteur_code', with_min_max=False)
+    return result if not result.empty else _empty('betaalgedrag_cred')
+
+
+def _slice_months(df: pd.DataFrame, startdatum: date, einddatum: date) -> pd.DataFrame:
+    """Maand-aggregaat filteren op maand in [startdatum, einddatum)."""
+    if df.empty or 'maand' not in df.columns:
+        return df.copy()
+    maand = _to_datetime(df['maand'])
+    mask = (maand >= pd.Timestamp(startdatum)) & (maand < pd.Timestamp(einddatum))
+    return df[mask].reset_index(drop=True)
+
+
+# =============================================================================
+# Snapshot
+# =============================================================================
+
+class BacktestSnapshot:
+    """Eén keer geladen data voor alle cutoffs van een backtest.
+
+    Args:
+        db: Data source met get_* methoden en de RAW_METHODS
+        administratie: Administratie waarvoor de backtest draait
+        cutoffs: Cutoff dates die de snapshot moet kunnen bedienen
+        horizon_weeks: Weken realisatie na de laatste cutoff
+        max_workers: Parallelle queries bij het laden
+    """
+
+    def __init__(self, db, administratie: str, cutoffs: List[date], horizon_weeks: int = 12,
+                 max_workers: int = FETCH_MAX_WORKERS):
+        self.db = db
+        self.administratie = administratie
+        self.cutoffs = sorted(cutoffs)
+        self.first_cutoff = self.cutoffs[0]
+        self.last_cutoff = self.cutoffs[-1]
+        # Historie: V7 kijkt tot 24 maanden voor de cutoff terug
+        self.history_start = date(self.first_cutoff.year - 2, self.first_cutoff.month, 1)
+        # Realisatie: horizon weken na de laatste cutoff
+        self.actuals_end = self.last_cutoff + timedelta(weeks=horizon_weeks)
+        self.max_workers = max_workers
+        self.queries = 0
+        self._frames: Dict[str, object] = {}
+
+    @staticmethod
+    def supports(db) -> bool:
+        """True als de data source de ruwe data-methoden heeft (MockDatabase niet)."""
+        return all(callable(getattr(db, m, None)) for m in RAW_METHODS)
+
+    def covers(self, cutoffs: List[date]) -> bool:
+        return bool(cutoffs) and min(cutoffs) >= self.first_cutoff and max(cutoffs) <= self.last_cutoff
+
+    # ===== Laden =====
+
+    def _plan(self, model_version: str) -> List[FetchTask]:
+        adm = self.administratie
+        tasks = [
+            FetchTask('bankmutaties', 'get_bankmutaties_per_dag',
+                      {'einddatum': self.actuals_end, 'administratie': adm}),
+            FetchTask('verkooptermijnen', 'get_verkoopfactuur_termijnen_per_dag',
+                      {'einddatum': self.last_cutoff, 'administratie': adm}),
+            # Zoals _reconstruct_open_ap_at_cutoff: zonder administratie-filter
+            FetchTask('crediteuren', 'get_openstaande_crediteuren', {'standdatum': self.last_cutoff}),
+        ]
+        if model_version != 'v7':
+            return tasks
+
+        window = {'startdatum': self.history_start, 'einddatum': self.last_cutoff}
+        tasks += [
+            FetchTask('inkoopbetalingen', 'get_betalingen_inkoopregels', {**window, 'administratie': adm}),
+            FetchTask('btw_aangifteregels', 'get_btw_aangifteregels', dict(window)),
+            FetchTask('salarishistorie', 'get_salarishistorie', dict(window)),
+            FetchTask('terugkerende_kosten', 'get_terugkerende_kosten', {**window, 'administratie': adm}),
+        ]
+        for method in STATIC_METHODS:
+            kwargs = {'administratie': adm}
+            tasks.append(FetchTask(_memo_key(method, (), kwargs), method, kwargs))
+        for year in sorted({c.year for c in self.cutoffs}):
+            kwargs = {'boekjaar': year, 'administratie': adm}
+            tasks.append(FetchTask(_memo_key('get_budgetten', (), kwargs), 'get_budgetten', kwargs))
+        return tasks
+
+    def load(self, model_version: str = 'v6') -> 'BacktestSnapshot':
+        """Haal alle nog ontbrekende datasets voor dit model parallel op."""
+        tasks = [t for t in self._plan(model_version) if t.key not in self._frames]
+        if tasks:
+            fetched = run_fetch_plan(self.db, tasks, max_workers=self.max_workers)
+            for key, df in fetched.items():
+                self._frames[key] = _prepare(key, df)
+            self.queries += len(tasks)
+        return self
+
+    def _frame(self, key: str) -> pd.DataFrame:
+        if key not in self._frames:
+            task = next(t for t in self._plan('v7') if t.key == key)
+            self._frames[key] = _prepare(key, run_fetch_plan(self.db, [task])[key])
+            self.queries += 1
+        return self._frames[key]
+
+    def _delegate(self, method: str, *args, **kwargs):
+        """Buiten het geladen venster: gewoon de database (één keer per argumentset)."""
+        key = _memo_key(method, args, kwargs)
+        if key not in self._frames:
+            self._frames[key] = getattr(self.db, method)(*args, **kwargs)
+            self.queries += 1
+        result = self._frames[key]
+        return result.copy() if isinstance(result, pd.DataFrame) else result
+
+    def __getattr__(self, name):
+        # Overige data source methoden (niet cutoff-afhankelijk): memoized doorgeven
+        if name.startswith('_') or name == 'db':
+            raise AttributeError(name)
+        attr = getattr(self.db, name)
+        if not name.startswith('get_') or not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            return self._delegate(name, *args, **kwargs)
+        return method
+
+    def _same_administratie(self, administratie: Optional[str]) -> bool:
+        return (administratie or '') == (self.administratie or '')
+
+    def _in_window(self, startdatum: Optional[date], einddatum: Optional[date], months: bool = False) -> bool:
+        if startdatum is None or einddatum is None:
+            return False
+        if months and (startdatum.day != 1 or einddatum.day != 1):
+            return False
+        return startdatum >= self.history_start and einddatum <= self.last_cutoff
+
+    # ===== Cutoff-afhankelijke datasets =====
+
+    def get_historische_cashflow_per_week(self, startdatum: date = None, einddatum: date = None,
+                                          administratie: str = None, administratie_key: int = None) -> pd.DataFrame:
+        if (startdatum is None or einddatum is None or administratie_key
+                or not self._same_administratie(administratie) or einddatum > self.actuals_end):
+            return self._delegate('get_historische_cashflow_per_week', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie, administratie_key=administratie_key)
+        mutaties = _admin_rows(self._frame('bankmutaties'), self.administratie, 'cashflow_administratie')
+        return _weekly_cashflow(mutaties, startdatum, einddatum)
+
+    def get_banksaldo(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        if standdatum is None or not self._same_administratie(administratie) or standdatum >= self.actuals_end:
+            return self._delegate('get_banksaldo', standdatum=standdatum, administratie=administratie)
+        return _banksaldo(_admin_rows(self._frame('bankmutaties'), self.administratie), standdatum)
+
+    def get_openstaande_debiteuren(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        if standdatum is None or not self._same_administratie(administratie) or standdatum > self.last_cutoff:
+            return self._delegate('get_openstaande_debiteuren', standdatum=standdatum, administratie=administratie)
+        return _open_debiteuren(self._frame('verkooptermijnen'), standdatum)
+
+    def get_openstaande_crediteuren(self, standdatum: date = None, administratie: str = None) -> pd.DataFrame:
+        if standdatum is None or administratie or standdatum > self.last_cutoff:
+            return self._delegate('get_openstaande_crediteuren', standdatum=standdatum, administratie=administratie)
+        crediteuren = self._frame('crediteuren')
+        if crediteuren.empty or 'factuurdatum' not in crediteuren.columns:
+            return crediteuren.copy()
+        mask = _to_datetime(crediteuren['factuurdatum']) <= pd.Timestamp(standdatum)
+        return crediteuren[mask].reset_index(drop=True)
+
+    def get_betaalgedrag_per_debiteur(self, startdatum: date = None, einddatum: date = None,
+                                      administratie: str = None) -> pd.DataFrame:
+        if (startdatum is None or einddatum is None or not self._same_administratie(administratie)
+                or einddatum > self.last_cutoff):
+            return self._delegate('get_betaalgedrag_per_debiteur', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        return _betaalgedrag_debiteuren(self._frame('verkooptermijnen'), startdatum, einddatum)
+
+    def get_betaalgedrag_per_crediteur(self, startdatum: date = None, einddatum: date = None,
+                                       administratie: str = None) -> pd.DataFrame:
+        if not self._in_window(startdatum, einddatum) or not self._same_administratie(administratie):
+            return self._delegate('get_betaalgedrag_per_crediteur', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        return _betaalgedrag_crediteuren(self._frame('inkoopbetalingen'), startdatum, einddatum)
+
+    def get_btw_aangifteregels(self, startdatum: date = None, einddatum: date = None) -> pd.DataFrame:
+        if not self._in_window(startdatum, einddatum, months=True):
+            return self._delegate('get_btw_aangifteregels', startdatum=startdatum, einddatum=einddatum)
+        return _slice_months(self._frame('btw_aangifteregels'), startdatum, einddatum)
+
+    def get_salarishistorie(self, startdatum: date = None, einddatum: date = None) -> pd.DataFrame:
+        if not self._in_window(startdatum, einddatum, months=True):
+            return self._delegate('get_salarishistorie', startdatum=startdatum, einddatum=einddatum)
+        return _slice_months(self._frame('salarishistorie'), startdatum, einddatum)
+
+    def get_terugkerende_kosten(self, startdatum: date = None, einddatum: date = None,
+                                administratie: str = None) -> pd.DataFrame:
+        if not self._in_window(startdatum, einddatum, months=True) or not self._same_administratie(administratie):
+            return self._delegate('get_terugkerende_kosten', startdatum=startdatum, einddatum=einddatum,
+                                  administratie=administratie)
+        return _slice_months(self._frame('terugkerende_kosten'), startdatum, einddatum)
+
+    def stats(self) -> dict:
+        return {
+            'cutoffs': len(self.cutoffs),
+            'queries': self.queries,
+            'datasets': len(self._frames),
+        }
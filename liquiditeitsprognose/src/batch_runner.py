@@ -0,0 +1,403 @@
+"""
+Liquiditeitsprognose - Batch Runner
+===================================
+Forecast (en optioneel backtest) voor een lijst klanten in één run, bijv.
+als nachtelijke job. Schrijft de resultaten naar Parquet.
+
+Werkwijze:
+1. Data ophalen per klant via hetzelfde fetch-plan als het dashboard
+   (fetch_dashboard_data), met maximaal `fetch_workers` klanten tegelijk.
+   Binnen een klant lopen de queries parallel via de fetch planner; de SDK
+   bewaakt de API-limiet van 60 requests per minuut. Staat dezelfde klant
+   met meerdere administraties in de lijst, dan wordt elke dataset één keer
+   voor al die administraties opgehaald (AdministratieSnapshot).
+2. Zodra de data van een klant binnen is, gaat create_forecast_v7 naar een
+   process pool (`workers` processen). Voor backtests haalt dezelfde fetch
+   thread ook de gemaskeerde data + realisatie per cutoff op
+   (BacktestFramework.fetch_cutoff_inputs); de pool krijgt alleen die data
+   en scoort de cutoffs. Alle API-verkeer loopt dus via dit proces en één
+   gedeelde rate limiter, ongeacht `workers`.
+3. Resultaten in `out_dir`:
+     forecasts.parquet  Eén rij per klant x week (forecast DataFrame + klantnummer)
+     runs.parquet       Eén rij per klant: status, fout, timings, metadata (JSON)
+                        en backtest-metrics
+   Beide bestanden worden per run atomair vervangen.
+
+Gebruik:
+    python -m src.batch_runner 1229 1230:"Installatie BV" --out results
+    python -m src.batch_runner --jobs klanten.csv --mode both --workers 4
+    python -m src.batch_runner --mock DEMO --out /tmp/batch
+
+    klanten.csv: kolommen klantnummer[,administratie]
+
+Vereist pyarrow voor Parquet output.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.calculations import _process_pool
+from src.database import FailedConnectionDatabase, get_database
+from src.admin_snapshot import fetch_dashboard_data_per_administratie
+from src.fetch_planner import fetch_dashboard_data
+from src.forecast_v7 import create_forecast_v7
+
+
+# Standaard parallelliteit (overschrijfbaar via environment)
+BATCH_FETCH_WORKERS = int(os.getenv("BATCH_FETCH_WORKERS", "2"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+MODES = ('forecast', 'backtest', 'both')
+
+
+@dataclass
+class BatchJob:
+    """Eén klant (en optioneel administratie) in de batch."""
+    klantnummer: str
+    administratie: str = ""
+
+
+def parse_jobs(specs: List[str]) -> List[BatchJob]:
+    """'1229' of '1229:Administratie' naar BatchJob."""
+    jobs = []
+    for spec in specs:
+        klant, _, adm = spec.partition(':')
+        if klant.strip():
+            jobs.append(BatchJob(klant.strip(), adm.strip()))
+    return jobs
+
+
+def load_jobs(path: str) -> List[BatchJob]:
+    """Lees jobs uit een CSV met kolommen klantnummer[,administratie]."""
+    df = pd.read_csv(path, dtype=str).fillna("")
+    if 'klantnummer' not in df.columns:
+        raise ValueError(f"{path}: kolom 'klantnummer' ontbreekt")
+    adm = df['administratie'] if 'administratie' in df.columns else pd.Series("", index=df.index)
+    return [BatchJob(k.strip(), a.strip()) for k, a in zip(df['klantnummer'], adm) if k.strip()]
+
+
+# =============================================================================
+# Stappen (module-level, zodat ze in een process pool draaien)
+# =============================================================================
+
+def _fetch_job(job: BatchJob, standdatum: date, use_mock: bool) -> Tuple[Optional[Dict], Optional[str], float]:
+    """Haal de data van één klant op (in een thread). Returns (data, fout, duur)."""
+    start = time.perf_counter()
+    try:
+        db = get_database(use_mock=use_mock, customer_code=job.klantnummer)
+        if isinstance(db, FailedConnectionDatabase):
+            return None, db.error_msg, time.perf_counter() - start
+        data = fetch_dashboard_data(db, standdatum, job.administratie or None)
+    except Exception as e:
+        return None, f"Data ophalen mislukt: {e}", time.perf_counter() - start
+    # De db-verbinding gaat niet mee naar het forecast-proces
+    data.pop('_db', None)
+    return data, None, time.perf_counter() - start
+
+
+def _fetch_klant(jobs: List[BatchJob], standdatum: date,
+                 use_mock: bool) -> Tuple[List[Tuple[Optional[Dict], Optional[str]]], float]:
+    """Haal de data van meerdere administraties van één klant in één ronde op.
+
+    Returns ([(data, fout) per job], duur).
+    """
+    if len(jobs) == 1:
+        data, error, duration = _fetch_job(jobs[0], standdatum, use_mock)
+        return [(data, error)], duration
+
+    start = time.perf_counter()
+    try:
+        db = get_database(use_mock=use_mock, customer_code=jobs[0].klantnummer)
+        if isinstance(db, FailedConnectionDatabase):
+            return [(None, db.error_msg)] * len(jobs), time.perf_counter() - start
+        per_adm = fetch_dashboard_data_per_administratie(
+            db, standdatum, [job.administratie for job in jobs], consolidated=False)
+    except Exception as e:
+        return [(None, f"Data ophalen mislukt: {e}")] * len(jobs), time.perf_counter() - start
+    results = []
+    for job in jobs:
+        data = per_adm[job.administratie]
+        data.pop('_db', None)
+        results.append((data, None))
+    return results, time.perf_counter() - start
+
+
+def _group_jobs(jobs: List[BatchJob]) -> List[List[int]]:
+    """Jobs van dezelfde klant met een opgegeven administratie samen ophalen."""
+    groups: Dict[str, List[int]] = {}
+    singles: List[List[int]] = []
+    for i, job in enumerate(jobs):
+        if job.administratie:
+            groups.setdefault(job.klantnummer, []).append(i)
+        else:
+            singles.append([i])
+    return singles + list(groups.values())
+
+
+def _forecast_job(data: Dict, standdatum: date, weeks_forecast: int, weeks_history: int):
+    """create_forecast_v7 voor één klant (in de process pool)."""
+    start = time.perf_counter()
+    forecast, _, metadata = create_forecast_v7(
+        data=data,
+        weeks_forecast=weeks_forecast,
+        weeks_history=weeks_history,
+        reference_date=standdatum,
+        calibrated_dso=data.get('calibrated_dso'),
+        calibrated_dpo=data.get('calibrated_dpo'),
+    )
+    return forecast, metadata, time.perf_counter() - start
+
+
+def _fetch_backtest(klantnummer: str, administratie: str, n_months: int,
+                    use_mock: bool) -> Tuple[Optional[Dict], Optional[str], float]:
+    """Haal de backtest-data van één klant op (in een thread). Returns (inputs, fout, duur).
+
+    inputs = {'cutoffs': {cutoff: (masked_data, actuals)}, 'errors': {cutoff: fout}}
+    """
+    from src.backtest import BacktestFramework
+
+    start = time.perf_counter()
+    try:
+        db = get_database(use_mock=use_mock, customer_code=klantnummer)
+        if isinstance(db, FailedConnectionDatabase):
+            return None, db.error_msg, time.perf_counter() - start
+        framework = BacktestFramework(db, administratie, model_version='v7', max_workers=1)
+        cutoffs = framework.generate_cutoff_dates(n_months)
+        framework.prepare_snapshot(cutoffs)
+        cutoff_inputs, errors = framework.fetch_cutoff_inputs(cutoffs)
+    except Exception as e:
+        return None, f"Backtest data ophalen mislukt: {e}", time.perf_counter() - start
+    return {'cutoffs': cutoff_inputs, 'errors': errors}, None, time.perf_counter() - start
+
+
+def _backtest_job(inputs: Dict) -> Tuple[Dict, float]:
+    """Walk-forward backtest (V7) voor één klant op opgehaalde data (in de process pool)."""
+    from src.backtest import BacktestFramework
+
+    start = time.perf_counter()
+    framework = BacktestFramework(None, '', model_version='v7', use_snapshot=False, max_workers=1)
+    results = []
+    errors = dict(inputs['errors'])
+    for cutoff, (masked_data, actuals) in sorted(inputs['cutoffs'].items()):
+        try:
+            results.append(framework.score_cutoff(cutoff, masked_data, actuals))
+        except Exception as e:
+            errors[cutoff] = f"{type(e).__name__}: {e}"
+    framework.errors = errors
+    report = framework.build_report(results)
+    if report is None:
+        summary = {'backtest_runs': 0, 'backtest_errors': len(errors)}
+    else:
+        summary = {
+            'backtest_runs': len(report.results),
+            'backtest_errors': len(report.errors),
+            'backtest_mape': float(report.overall_mape),
+            'backtest_bias': float(report.overall_bias),
+            'backtest_accuracy_decay': json.dumps(
+                {str(k): (None if np.isnan(v) else float(v)) for k, v in report.accuracy_decay.items()}),
+        }
+    return summary, time.perf_counter() - start
+
+
+# =============================================================================
+# Batch
+# =============================================================================
+
+def run_batch(
+    jobs: List[BatchJob],
+    out_dir: str,
+    mode: str = 'forecast',
+    standdatum: Optional[date] = None,
+    weeks_forecast: int = 13,
+    weeks_history: int = 13,
+    n_months: int = 6,
+    workers: int = BATCH_MAX_WORKERS,
+    fetch_workers: int = BATCH_FETCH_WORKERS,
+    use_mock: bool = False,
+) -> pd.DataFrame:
+    """
+    Draai forecasts/backtests voor alle jobs en schrijf de resultaten naar Parquet.
+
+    Args:
+        jobs: Klanten (klantnummer + optioneel administratie)
+        out_dir: Map voor forecasts.parquet en runs.parquet
+        mode: 'forecast', 'backtest' of 'both'
+        standdatum: Peildatum (default: vandaag)
+        weeks_forecast: Weken vooruit
+        weeks_history: Weken historie in de forecast-output
+        n_months: Aantal cutoffs voor de backtest
+        workers: Aantal processen voor forecasts/backtests
+        fetch_workers: Aantal klanten waarvan tegelijk data wordt opgehaald
+        use_mock: Demo data (MockDatabase) in plaats van de API
+
+    Returns:
+        De runs-tabel (één rij per job)
+    """
+    if mode not in MODES:
+        raise ValueError(f"Onbekende mode '{mode}' (kies uit {', '.join(MODES)})")
+    standdatum = standdatum or datetime.now().date()
+    run_id = uuid.uuid4().hex[:12]
+    started = datetime.now()
+    if use_mock:
+        # MockDatabase gebruikt globale np.random seeds — niet parallel ophalen
+        fetch_workers = 1
+
+    runs: Dict[int, Dict] = {
+        i: {
+            'run_id': run_id,
+            'gestart': started,
+            'klantnummer': job.klantnummer,
+            'administratie': job.administratie,
+            'standdatum': standdatum,
+            'mode': mode,
+            'status': 'ok',
+            'fout': None,
+        }
+        for i, job in enumerate(jobs)
+    }
+    forecasts: Dict[int, pd.DataFrame] = {}
+
+    def fail(i: int, message: str):
+        runs[i]['status'] = 'error'
+        runs[i]['fout'] = message if runs[i]['fout'] is None else f"{runs[i]['fout']}; {message}"
+        print(f"[ERROR] {jobs[i].klantnummer}: {message}")
+
+    batch_start = time.perf_counter()
+    # Spawn-pool: workers worden gestart terwijl de fetch threads lopen
+    pool = _process_pool(workers)
+    with pool, ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as fetchers:
+        pending = {}
+        fetching = {}
+
+        if mode == 'backtest':
+            for i, job in enumerate(jobs):
+                fetching[fetchers.submit(_fetch_backtest, job.klantnummer, job.administratie, n_months, use_mock)] = (i, 'backtest')
+        else:
+            for group in _group_jobs(jobs):
+                fetching[fetchers.submit(_fetch_klant, [jobs[i] for i in group], standdatum, use_mock)] = (group, 'forecast')
+
+        # Rekenwerk starten zodra de data van een klant binnen is
+        while fetching:
+            done, _ = wait(fetching, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, step = fetching.pop(future)
+                if step == 'backtest':
+                    inputs, error, fetch_s = future.result()
+                    runs[key]['backtest_fetch_s'] = fetch_s
+                    if error:
+                        fail(key, error)
+                    else:
+                        pending[pool.submit(_backtest_job, inputs)] = (key, 'backtest')
+                    continue
+
+                fetched, fetch_s = future.result()
+                for i, (data, error) in zip(key, fetched):
+                    runs[i]['fetch_s'] = fetch_s
+                    if error:
+                        fail(i, error)
+                        continue
+                    detected = data.get('detected_admin') or ""
+                    runs[i]['detected_admin'] = detected
+                    pending[pool.submit(_forecast_job, data, standdatum, weeks_forecast, weeks_history)] = (i, 'forecast')
+                    if mode == 'both':
+                        adm = jobs[i].administratie or detected
+                        fetching[fetchers.submit(_fetch_backtest, jobs[i].klantnummer, adm, n_months, use_mock)] = (i, 'backtest')
+
+        for future in as_completed(pending):
+            i, step = pending[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                fail(i, f"{step} mislukt: {e}")
+                continue
+            if step == 'forecast':
+                forecast, metadata, forecast_s = result
+                runs[i]['forecast_s'] = forecast_s
+                runs[i]['metadata'] = json.dumps(metadata, default=str)
+                forecast = forecast.copy()
+                forecast.insert(0, 'klantnummer', jobs[i].klantnummer)
+                forecast.insert(1, 'administratie', runs[i].get('detected_admin') or jobs[i].administratie)
+                forecast.insert(2, 'standdatum', standdatum)
+                forecast.insert(0, 'run_id', run_id)
+                forecasts[i] = forecast
+            else:
+                summary, backtest_s = result
+                runs[i]['backtest_s'] = backtest_s
+                runs[i].update(summary)
+
+    runs_df = pd.DataFrame([runs[i] for i in range(len(jobs))])
+    forecasts_df = pd.concat([forecasts[i] for i in sorted(forecasts)], ignore_index=True) \
+        if forecasts else pd.DataFrame()
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    _write_parquet(runs_df, out / 'runs.parquet')
+    if mode in ('forecast', 'both'):
+        _write_parquet(forecasts_df, out / 'forecasts.parquet')
+
+    n_ok = int((runs_df['status'] == 'ok').sum()) if not runs_df.empty else 0
+    print(f"Batch {run_id}: {n_ok}/{len(jobs)} klanten ok in {time.perf_counter() - batch_start:.1f}s -> {out}")
+    return runs_df
+
+
+def _write_parquet(df: pd.DataFrame, path: Path):
+    """Schrijf via een tijdelijk bestand + os.replace (lezers zien nooit een half bestand)."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# =============================================================================
+# CLI INTERFACE
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch forecast/backtest voor meerdere klanten")
+    parser.add_argument('klanten', nargs='*', help="klantnummer of klantnummer:administratie")
+    parser.add_argument('--jobs', help="CSV met kolommen klantnummer[,administratie]")
+    parser.add_argument('--out', default='batch_results', help="Map voor de Parquet output")
+    parser.add_argument('--mode', choices=MODES, default='forecast')
+    parser.add_argument('--standdatum', help="Peildatum (YYYY-MM-DD, default vandaag)")
+    parser.add_argument('--weeks', type=int, default=13, help="Weken vooruit")
+    parser.add_argument('--history', type=int, default=13, help="Weken historie")
+    parser.add_argument('--months', type=int, default=6, help="Backtest cutoffs")
+    parser.add_argument('--workers', type=int, default=BATCH_MAX_WORKERS, help="Processen")
+    parser.add_argument('--fetch-workers', type=int, default=BATCH_FETCH_WORKERS,
+                        help="Klanten tegelijk ophalen")
+    parser.add_argument('--mock', action='store_true', help="Demo data gebruiken")
+    args = parser.parse_args(argv)
+
+    jobs = parse_jobs(args.klanten)
+    if args.jobs:
+        jobs += load_jobs(args.jobs)
+    if not jobs:
+        parser.error("geen klanten opgegeven")
+
+    standdatum = datetime.strptime(args.standdatum, "%Y-%m-%d").date() if args.standdatum else None
+    runs = run_batch(
+        jobs, args.out, mode=args.mode, standdatum=standdatum,
+        weeks_forecast=args.weeks, weeks_history=args.history, n_months=args.months,
+        workers=args.workers, fetch_workers=args.fetch_workers, use_mock=args.mock,
+    )
+    return 0 if (runs['status'] == 'ok').all() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
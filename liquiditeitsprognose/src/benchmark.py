@@ -0,0 +1,473 @@
+"""
+Liquiditeitsprognose - Benchmark Harness
+========================================
+Meet hoe de forecast-engines schalen met de omvang van de administratie.
+
+SyntheticDatabase levert dezelfde methoden en kolommen als MockDatabase,
+maar met instelbare omvang: aantal open posten (debiteuren + crediteuren)
+en jaren weekhistorie. De data is deterministisch per seed, zodat runs op
+verschillende versies van de code dezelfde input krijgen.
+
+Per (omvang, pijler) wordt gemeten:
+    seconds_min / seconds_median   Doorlooptijd over `repeat` runs
+    peak_mb                        Piekgeheugen (tracemalloc, aparte run)
+
+Pijlers:
+    data         fetch_dashboard_data (fetch-plan zoals het dashboard)
+    forecast_v7  create_forecast_v7
+    layered      create_layered_cashflow_forecast
+    enhanced     create_enhanced_forecast
+    backtest_v7  BacktestFramework(v7).run_full_backtest (sequentieel)
+
+Het resultaat is een JSON-bestand met de omgeving (git commit, versies) en
+één rij per meting. Met --compare wordt een eerder bestand ernaast gelegd;
+metingen die meer dan --threshold trager zijn worden gemarkeerd (exit 1).
+
+Gebruik:
+    python -m src.benchmark --items 1000 10000 100000 --years 1 3 --out bench.json
+    python -m src.benchmark --items 1000000 --years 5 --pillars forecast_v7
+    python -m src.benchmark --out nieuw.json --compare bench.json
+
+Gefitte modellen worden niet gecached tijdens een benchmark (MODEL_CACHE_SIZE=0),
+zodat elke run de volledige fit meet.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.database import MockDatabase
+
+
+PILLARS = ('data', 'forecast_v7', 'layered', 'enhanced', 'backtest_v7')
+ADMINISTRATIE = "Synthetisch"
+
+DEFAULT_ITEMS = (1_000, 10_000, 100_000)
+DEFAULT_YEARS = (1, 3)
+
+
+# =============================================================================
+# Synthetische data
+# =============================================================================
+
+class SyntheticDatabase(MockDatabase):
+    """MockDatabase met instelbare omvang en deterministische (seeded) data.
+
+    Open posten liggen relatief ten opzichte van de standdatum, zodat elke
+    backtest-cutoff hetzelfde aantal posten ziet. De weekhistorie beslaat
+    `history_years` jaar tot en met vandaag en respecteert startdatum/einddatum.
+    """
+
+    def __init__(self, n_open_items: int = 1_000, history_years: int = 1,
+                 seed: int = 0, today: Optional[date] = None):
+        super().__init__()
+        self.today = today or self.today
+        self.n_open_items = n_open_items
+        self.history_years = history_years
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        n_deb = int(round(n_open_items * 0.6))
+        n_cred = n_open_items - n_deb
+        self.n_relaties = max(10, n_open_items // 25)
+        self._debiteuren = self._open_items(rng, n_deb, 'debiteur', 'DEB', 'VF', (1500, 45000), with_terms=True)
+        self._crediteuren = self._open_items(rng, n_cred, 'crediteur', 'CRED', 'INK', (500, 25000), with_terms=False)
+
+        # Weekhistorie (met seizoen), tot en met de laatste maandag
+        n_weeks = max(1, int(round(history_years * 52)))
+        last_monday = self.today - timedelta(days=self.today.weekday())
+        weeks = pd.date_range(end=last_monday, periods=n_weeks, freq='W-MON')
+        sf = np.where(weeks.month.isin([6, 7, 8]), 0.85, np.where(weeks.month.isin([11, 12, 1]), 1.15, 1.0))
+        scale = max(1.0, n_open_items / 1_000)
+        inkomsten = (180000 * scale * sf * rng.uniform(0.8, 1.2, n_weeks)).round(2)
+        uitgaven = (150000 * scale * sf * rng.uniform(0.85, 1.15, n_weeks)).round(2)
+        self._weeks = pd.DataFrame({
+            'week_start': weeks,
+            'week_nummer': weeks.isocalendar().week.astype(int).to_numpy(),
+            'maand': weeks.month,
+            'inkomsten': inkomsten,
+            'uitgaven': uitgaven,
+            'netto': (inkomsten - uitgaven).round(2),
+        })
+
+        n_months = max(12, history_years * 12)
+        self._months = pd.date_range(end=self.today, periods=n_months, freq='ME')
+        self._scale = scale
+
+    def _open_items(self, rng, n: int, relatie: str, code: str, prefix: str, amount_range,
+                    with_terms: bool) -> pd.DataFrame:
+        nummers = rng.integers(0, self.n_relaties, n)
+        termijn = rng.choice([14, 30, 45], n)
+        df = pd.DataFrame({
+            f'{relatie}_code': [f"{code}{i:05d}" for i in nummers],
+            f'{relatie}_naam': [f"Relatie {i}" for i in nummers],
+            'factuurnummer': [f"{prefix}{i:07d}" for i in range(n)],
+            '_leeftijd': rng.integers(0, 150, n),     # dagen sinds factuurdatum
+            '_termijn': termijn,
+            'bedrag_excl_btw': rng.uniform(*amount_range, n).round(2),
+            'betaald': np.zeros(n),
+            'openstaand': rng.uniform(*amount_range, n).round(2),
+            'administratie': ADMINISTRATIE,
+            'bedrijfseenheid': ADMINISTRATIE,
+        })
+        if with_terms:
+            df['betaaltermijn_dagen'] = termijn
+        return df
+
+    def _dated(self, items: pd.DataFrame, standdatum) -> pd.DataFrame:
+        ref = pd.Timestamp(standdatum or self.today)
+        df = items.copy()
+        factuurdatum = ref - pd.to_timedelta(df.pop('_leeftijd'), unit='D')
+        vervaldatum = factuurdatum + pd.to_timedelta(df.pop('_termijn'), unit='D')
+        df.insert(3, 'factuurdatum', factuurdatum)
+        df.insert(4, 'vervaldatum', vervaldatum)
+        return df
+
+    def get_beschikbare_administraties(self):
+        return [ADMINISTRATIE]
+
+    def get_banksaldo(self, standdatum=None, administratie=None):
+        df = super().get_banksaldo(standdatum, administratie)
+        df['saldo'] = df['saldo'] * self._scale
+        return df
+
+    def get_openstaande_debiteuren(self, standdatum=None, administratie=None):
+        return self._dated(self._debiteuren, standdatum)
+
+    def get_openstaande_crediteuren(self, standdatum=None, administratie=None):
+        return self._dated(self._crediteuren, standdatum)
+
+    def get_historische_cashflow_per_week(self, startdatum=None, einddatum=None, administratie=None, administratie_key=None):
+        df = self._weeks
+        if startdatum is not None:
+            df = df[df['week_start'] >= pd.Timestamp(startdatum)]
+        if einddatum is not None:
+            df = df[df['week_start'] < pd.Timestamp(einddatum)]
+        return df.reset_index(drop=True)
+
+    def _betaalgedrag(self, relatie: str, code: str, seed_offset: int) -> pd.DataFrame:
+        rng = np.random.default_rng(self.seed + seed_offset)
+        n = self.n_relaties
+        gem = rng.uniform(15, 70, n).round(1)
+        return pd.DataFrame({
+            f'{relatie}_code': [f"{code}{i:05d}" for i in range(n)],
+            'aantal_facturen': rng.integers(1, 40, n),
+            'gem_dagen_tot_betaling': gem,
+            'std_dagen_tot_betaling': rng.uniform(2, 20, n).round(1),
+            'min_dagen': np.maximum(0, gem - 15).round(0),
+            'max_dagen': (gem + 30).round(0),
+            'totaal_factuurbedrag': rng.uniform(1e4, 2e5, n).round(2),
+            'laatste_betaling': [self.today - timedelta(10)] * n,
+            'betrouwbaarheid': rng.uniform(0.3, 0.95, n).round(2),
+        })
+
+    def get_betaalgedrag_per_debiteur(self, startdatum=None, einddatum=None, administratie=None):
+        return self._betaalgedrag('debiteur', 'DEB', 1)
+
+    def get_betaalgedrag_per_crediteur(self, startdatum=None, einddatum=None, administratie=None):
+        return self._betaalgedrag('crediteur', 'CRED', 2)
+
+    def _month_filter(self, startdatum, einddatum) -> pd.DatetimeIndex:
+        months = self._months
+        if startdatum is not None:
+            months = months[months >= pd.Timestamp(startdatum)]
+        if einddatum is not None:
+            months = months[months < pd.Timestamp(einddatum)]
+        return months
+
+    def get_terugkerende_kosten(self, startdatum=None, einddatum=None, administratie=None):
+        months = self._month_filter(startdatum, einddatum)
+        rng = np.random.default_rng(self.seed + 3)
+        soorten = [("Personeelskosten", 85000), ("Huisvestingskosten", 12000), ("Autokosten", 8000)]
+        rows = []
+        for d in months:
+            for soort, base in soorten:
+                base = base * self._scale
+                rows.append({"maand": d, "kostensoort": soort, "bedrag": base + rng.uniform(-base * 0.1, base * 0.1)})
+        return pd.DataFrame(rows, columns=["maand", "kostensoort", "bedrag"])
+
+    def get_btw_aangifteregels(self, startdatum=None, einddatum=None):
+        months = self._month_filter(startdatum, einddatum)
+        kwartaal = months.month.isin([1, 4, 7, 10])
+        return pd.DataFrame({"maand": months, "btw_bedrag": np.where(kwartaal, 25000 * self._scale, 0.0),
+                             "aantal_regels": np.where(kwartaal, 50, 0)})
+
+    def get_salarishistorie(self, startdatum=None, einddatum=None):
+        months = self._month_filter(startdatum, einddatum)
+        bedragen = np.where(months.month == 5, 95000, np.where(months.month == 12, 88000, 82000)) * self._scale
+        return pd.DataFrame({"maand": months, "salaris_bedrag": bedragen, "aantal_medewerkers": [25] * len(months)})
+
+
+# =============================================================================
+# Pijlers
+# =============================================================================
+
+def _pillar_data(db: SyntheticDatabase, data: Dict, standdatum: date):
+    from src.fetch_planner import fetch_dashboard_data
+    return fetch_dashboard_data(db, standdatum, ADMINISTRATIE)
+
+
+def _pillar_forecast_v7(db: SyntheticDatabase, data: Dict, standdatum: date):
+    from src.forecast_v7 import create_forecast_v7
+    return create_forecast_v7(
+        data=data, weeks_forecast=13, weeks_history=13, reference_date=standdatum,
+        calibrated_dso=data.get('calibrated_dso'), calibrated_dpo=data.get('calibrated_dpo'),
+    )
+
+
+def _pillar_layered(db: SyntheticDatabase, data: Dict, standdatum: date):
+    from src.calculations import create_layered_cashflow_forecast
+    historie = data['historische_cashflow']
+    historische_omzet = pd.DataFrame({'week_start': historie['week_start'], 'omzet': historie['inkomsten']})
+    return create_layered_cashflow_forecast(
+        banksaldo=data['banksaldo'],
+        debiteuren=data['debiteuren'],
+        crediteuren=data['crediteuren'],
+        historische_omzet=historische_omzet,
+        betaalgedrag_debiteuren=data['betaalgedrag_debiteuren'],
+        reference_date=standdatum,
+        administratie=ADMINISTRATIE,
+    )
+
+
+def _pillar_enhanced(db: SyntheticDatabase, data: Dict, standdatum: date):
+    from src.calculations import create_enhanced_forecast
+    return create_enhanced_forecast(
+        banksaldo=data['banksaldo'],
+        debiteuren=data['debiteuren'],
+        crediteuren=data['crediteuren'],
+        historische_cashflow=data['historische_cashflow'],
+        reference_date=standdatum,
+        administratie=ADMINISTRATIE,
+    )
+
+
+def _pillar_backtest_v7(db: SyntheticDatabase, data: Dict, standdatum: date, n_months: int = 3):
+    from src.backtest import BacktestFramework
+    # Cutoffs vanaf de standdatum: de synthetische data eindigt daar
+    framework = BacktestFramework(db, ADMINISTRATIE, model_version='v7', max_workers=1,
+                                  reference_date=standdatum)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return framework.run_full_backtest(n_months)
+
+
+_PILLAR_FUNCS: Dict[str, Callable] = {
+    'data': _pillar_data,
+    'forecast_v7': _pillar_forecast_v7,
+    'layered': _pillar_layered,
+    'enhanced': _pillar_enhanced,
+    'backtest_v7': _pillar_backtest_v7,
+}
+
+
+# =============================================================================
+# Meten
+# =============================================================================
+
+def _measure(fn: Callable[[], object], repeat: int, track_memory: bool) -> Dict:
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    result = {
+        'seconds_min': round(min(timings), 4),
+        'seconds_median': round(statistics.median(timings), 4),
+        'repeat': len(timings),
+    }
+    if track_memory:
+        # Aparte run: tracemalloc vertraagt de code zelf
+        tracemalloc.start()
+        try:
+            fn()
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmark(
+    items: Sequence[int] = DEFAULT_ITEMS,
+    years: Sequence[int] = DEFAULT_YEARS,
+    pillars: Sequence[str] = PILLARS,
+    repeat: int = 3,
+    track_memory: bool = True,
+    backtest_months: int = 3,
+    seed: int = 0,
+    standdatum: Optional[date] = None,
+    verbose: bool = True,
+) -> List[Dict]:
+    """
+    Meet elke pijler voor elke combinatie van (open posten, jaren historie).
+
+    Args:
+        items: Aantallen open posten (debiteuren + crediteuren)
+        years: Jaren weekhistorie
+        pillars: Te meten pijlers (zie PILLARS)
+        repeat: Aantal runs voor de tijdmeting
+        track_memory: Piekgeheugen meten (extra run met tracemalloc)
+        backtest_months: Aantal cutoffs voor backtest_v7
+        seed: Seed voor de synthetische data
+        standdatum: Peildatum (default: vandaag)
+        verbose: Voortgang printen
+
+    Returns:
+        Lijst met één dict per meting (pillar, n_open_items, history_years, ...)
+    """
+    unknown = set(pillars) - set(PILLARS)
+    if unknown:
+        raise ValueError(f"Onbekende pijler(s): {', '.join(sorted(unknown))} (kies uit {', '.join(PILLARS)})")
+    standdatum = standdatum or datetime.now().date()
+
+    results = []
+    for n_items in items:
+        for n_years in years:
+            build_start = time.perf_counter()
+            db = SyntheticDatabase(n_items, n_years, seed=seed, today=standdatum)
+            data = _pillar_data(db, {}, standdatum)
+            # Het dashboard haalt 12 maanden op; hier de volledige historie,
+            # zodat de lengte van de reeks (history_years) echt meeweegt
+            data['historische_cashflow'] = db.get_historische_cashflow_per_week(einddatum=standdatum)
+            build_s = time.perf_counter() - build_start
+
+            for pillar in pillars:
+                func = _PILLAR_FUNCS[pillar]
+                kwargs = {'n_months': backtest_months} if pillar == 'backtest_v7' else {}
+                row = {'pillar': pillar, 'n_open_items': n_items, 'history_years': n_years,
+                       'status': 'ok', 'error': None}
+                try:
+                    row.update(_measure(lambda: func(db, data, standdatum, **kwargs), repeat, track_memory))
+                except Exception as e:
+                    row.update(status='error', error=f"{type(e).__name__}: {e}")
+                results.append(row)
+                if verbose:
+                    detail = (f"{row['seconds_median']:8.3f}s" + (f"  {row['peak_mb']:8.1f} MB" if 'peak_mb' in row else "")
+                              if row['status'] == 'ok' else f"FOUT {row['error']}")
+                    print(f"{n_items:>9,} posten  {n_years}j  {pillar:<12} {detail}")
+            if verbose:
+                print(f"{n_items:>9,} posten  {n_years}j  (data opbouw {build_s:.2f}s)")
+    return results
+
+
+def environment_info() -> Dict:
+    """Omgeving van de meting, zodat resultaten vergelijkbaar blijven."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_results(results: List[Dict], path: str, settings: Optional[Dict] = None) -> Dict:
+    """Schrijf {'environment', 'settings', 'results'} als JSON."""
+    payload = {'environment': environment_info(), 'settings': settings or {}, 'results': results}
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp, path)
+    return payload
+
+
+def compare_results(baseline: List[Dict], current: List[Dict], threshold: float = 1.2) -> pd.DataFrame:
+    """
+    Leg twee benchmarkruns naast elkaar (op pillar, n_open_items, history_years).
+
+    Returns:
+        DataFrame met seconds_baseline, seconds_current, ratio en regressie
+        (ratio > threshold); geheugen idem als beide runs het gemeten hebben
+    """
+    key = ['pillar', 'n_open_items', 'history_years']
+
+    def frame(rows):
+        df = pd.DataFrame([r for r in rows if r.get('status') == 'ok'])
+        if df.empty:
+            return pd.DataFrame(columns=key + ['seconds_median', 'peak_mb'])
+        if 'peak_mb' not in df.columns:
+            df['peak_mb'] = np.nan
+        return df[key + ['seconds_median', 'peak_mb']]
+
+    merged = frame(baseline).merge(frame(current), on=key, suffixes=('_baseline', '_current'))
+    merged = merged.rename(columns={'seconds_median_baseline': 'seconds_baseline',
+                                    'seconds_median_current': 'seconds_current'})
+    merged['ratio'] = (merged['seconds_current'] / merged['seconds_baseline'].replace(0, np.nan)).round(2)
+    merged['regressie'] = merged['ratio'] > threshold
+    return merged
+
+
+# =============================================================================
+# CLI INTERFACE
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark van de forecast-engines op synthetische data")
+    parser.add_argument('--items', type=int, nargs='+', default=list(DEFAULT_ITEMS),
+                        help="Aantallen open posten (bijv. 1000 100000 1000000)")
+    parser.add_argument('--years', type=int, nargs='+', default=list(DEFAULT_YEARS),
+                        help="Jaren weekhistorie (1-5)")
+    parser.add_argument('--pillars', nargs='+', choices=PILLARS, default=list(PILLARS))
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per meting")
+    parser.add_argument('--no-memory', action='store_true', help="Geen piekgeheugen meten")
+    parser.add_argument('--backtest-months', type=int, default=3, help="Cutoffs voor backtest_v7")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--standdatum', help="Peildatum (YYYY-MM-DD, default vandaag)")
+    parser.add_argument('--out', default='benchmark.json', help="JSON output")
+    parser.add_argument('--compare', help="Eerder JSON-resultaat om mee te vergelijken")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Ratio nieuw/oud waarboven een meting als regressie telt")
+    args = parser.parse_args(argv)
+
+    # Koude fits meten: geen hergebruik van gefitte modellen tussen runs
+    os.environ['MODEL_CACHE_SIZE'] = '0'
+    os.environ.pop('MODEL_CACHE_DIR', None)
+
+    standdatum = datetime.strptime(args.standdatum, "%Y-%m-%d").date() if args.standdatum else None
+    settings = {
+        'items': args.items, 'years': args.years, 'pillars': args.pillars, 'repeat': args.repeat,
+        'backtest_months': args.backtest_months, 'seed': args.seed,
+        'standdatum': str(standdatum) if standdatum else None,
+    }
+    results = run_benchmark(
+        items=args.items, years=args.years, pillars=args.pillars, repeat=args.repeat,
+        track_memory=not args.no_memory, backtest_months=args.backtest_months,
+        seed=args.seed, standdatum=standdatum,
+    )
+    write_results(results, args.out, settings)
+    print(f"Resultaten -> {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        comparison = compare_results(baseline, results, args.threshold)
+        with pd.option_context('display.width', 160, 'display.max_rows', None):
+            print(comparison.to_string(index=False))
+        if comparison['regressie'].any():
+            print(f"{int(comparison['regressie'].sum())} meting(en) meer dan {args.threshold:.2f}x trager")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,9 +12,22 @@ Methoden:
 import pandas as pd
 import numpy as np
 import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Tuple, Optional, Dict
-from dataclasses import dataclass
+from typing import Tuple, Optional, Dict, List
+from dataclasses import dataclass, field
+
+from src.model_cache import get_model_cache
+
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool voor de backtests, altijd met spawn.
+
+    Fork kopieert de locks van andere threads mee (Streamlit, fetch-threads)
+    en kan het kind dan laten hangen; spawn start een schoon proces.
+    """
+    return ProcessPoolExecutor(max_workers=max(1, max_workers), mp_context=multiprocessing.get_context("spawn"))
 
 
 @dataclass
@@ -114,24 +127,22 @@ def calculate_dso_adjustment(
 
     adjustments = {"_fallback": round(fallback_dagen, 1)}
 
-    for _, row in betaalgedrag.iterrows():
-        debiteur = row["debiteur_code"]
-        gem_dagen = row["gem_dagen_tot_betaling"]
-        betrouwbaarheid = row.get("betrouwbaarheid", 0.5)
-
-        # Extra dagen = werkelijke betaaltijd - standaard termijn
-        # Positief = betaalt later dan termijn
-        # Negatief = betaalt eerder dan termijn
-        extra_dagen = gem_dagen - standaard_betaaltermijn
-
-        # Weeg de correctie met betrouwbaarheid
-        # Lage betrouwbaarheid -> correctie richting gemiddelde
-        gewogen_extra = (
-            betrouwbaarheid * extra_dagen +
-            (1 - betrouwbaarheid) * (gem_alle - standaard_betaaltermijn)
-        )
+    # Extra dagen = werkelijke betaaltijd - standaard termijn
+    # Positief = betaalt later dan termijn
+    # Negatief = betaalt eerder dan termijn
+    extra_dagen = betaalgedrag["gem_dagen_tot_betaling"] - standaard_betaaltermijn
+
+    # Weeg de correctie met betrouwbaarheid
+    # Lage betrouwbaarheid -> correctie richting gemiddelde
+    betrouwbaarheid = (
+        betaalgedrag["betrouwbaarheid"] if "betrouwbaarheid" in betaalgedrag.columns else 0.5
+    )
+    gewogen_extra = (
+        betrouwbaarheid * extra_dagen +
+        (1 - betrouwbaarheid) * (gem_alle - standaard_betaaltermijn)
+    )
 
-        adjustments[debiteur] = round(gewogen_extra, 1)
+    adjustments.update(zip(betaalgedrag["debiteur_code"], gewogen_extra.round(1)))
 
     return adjustments
 
@@ -161,35 +172,27 @@ def adjust_receivables_due_dates(
     df = debiteuren.copy()
 
     # Zorg dat vervaldatum een date is
-    df[date_column] = pd.to_datetime(df[date_column]).dt.date
+    vervaldatum = pd.to_datetime(df[date_column])
+    df[date_column] = vervaldatum.dt.date
 
     # Fallback voor onbekende debiteuren
     fallback = dso_adjustments.get("_fallback", 0)
 
-    def get_expected_date(row):
-        debiteur = row.get("debiteur_code", row.get("debiteur_naam", ""))
-        vervaldatum = row[date_column]
-
-        if pd.isna(vervaldatum):
-            return None
-
-        # Zoek DSO correctie voor deze debiteur
-        extra_dagen = dso_adjustments.get(debiteur, fallback)
+    # DSO correctie per debiteur via één hash-lookup i.p.v. apply per rij
+    if "debiteur_code" in df.columns:
+        codes = df["debiteur_code"]
+    elif "debiteur_naam" in df.columns:
+        codes = df["debiteur_naam"]
+    else:
+        codes = pd.Series("", index=df.index)
+    correctie = codes.map(dso_adjustments).fillna(fallback).astype(float)
 
-        # Bereken verwachte betaaldatum
-        if isinstance(vervaldatum, datetime):
-            return (vervaldatum + timedelta(days=extra_dagen)).date()
-        else:
-            return vervaldatum + timedelta(days=extra_dagen)
-
-    df["verwachte_betaling"] = df.apply(get_expected_date, axis=1)
-    df["dso_correctie_dagen"] = df.apply(
-        lambda row: dso_adjustments.get(
-            row.get("debiteur_code", row.get("debiteur_naam", "")),
-            fallback
-        ),
-        axis=1
+    # date + timedelta(days=x) telt alleen hele dagen (afgerond naar beneden)
+    verwacht = vervaldatum.dt.normalize() + pd.to_timedelta(np.floor(correctie), unit="D")
+    df["verwachte_betaling"] = pd.Series(
+        np.where(verwacht.notna(), verwacht.dt.date, None), index=df.index, dtype=object
     )
+    df["dso_correctie_dagen"] = correctie
 
     return df
 
@@ -606,44 +609,26 @@ def calculate_aging_buckets(
     if reference_date is None:
         reference_date = datetime.now().date()
 
-    df = df.copy()
-    # Convert to datetime first, then to date - keep NaT handling robust
+    # Gevectoriseerd: dagen vervallen als datetime64-verschil, buckets via pd.cut
+    reference = pd.Timestamp(reference_date).normalize()
     date_series = pd.to_datetime(df[date_column], errors='coerce')
+    if getattr(date_series.dt, "tz", None) is not None:
+        date_series = date_series.dt.tz_localize(None)
+    dagen_vervallen = (reference - date_series.dt.normalize()).dt.days.fillna(0)
 
-    # Calculate days overdue - handle NaT values before .dt.date conversion
-    def calc_days(dt_val):
-        if pd.isna(dt_val):
-            return 0
-        try:
-            return (reference_date - dt_val.date()).days
-        except (AttributeError, TypeError):
-            return 0
-
-    df["dagen_vervallen"] = date_series.apply(calc_days)
-
-    # Define buckets
-    def assign_bucket(days):
-        if days <= 0:
-            return "Niet vervallen"
-        elif days <= 30:
-            return "1-30 dagen"
-        elif days <= 60:
-            return "31-60 dagen"
-        elif days <= 90:
-            return "61-90 dagen"
-        else:
-            return "> 90 dagen"
-
-    df["bucket"] = df["dagen_vervallen"].apply(assign_bucket)
-
-    # Aggregate by bucket
+    # Define buckets: (-inf, 0], (0, 30], (30, 60], (60, 90], (90, inf)
     bucket_order = ["Niet vervallen", "1-30 dagen", "31-60 dagen", "61-90 dagen", "> 90 dagen"]
-    summary = df.groupby("bucket")[amount_column].sum().reset_index()
-    summary.columns = ["bucket", "bedrag"]
+    bucket = pd.cut(
+        dagen_vervallen,
+        bins=[-np.inf, 0, 30, 60, 90, np.inf],
+        labels=bucket_order,
+    )
 
-    # Ensure all buckets are present
-    all_buckets = pd.DataFrame({"bucket": bucket_order})
-    summary = all_buckets.merge(summary, on="bucket", how="left").fillna(0)
+    # Aggregate by bucket (observed=False: lege buckets blijven staan)
+    bedrag = pd.to_numeric(df[amount_column], errors='coerce').astype(float)
+    summary = bedrag.groupby(bucket, observed=False).sum().reset_index()
+    summary.columns = ["bucket", "bedrag"]
+    summary["bucket"] = summary["bucket"].astype(object)
 
     # Calculate percentages
     total = summary["bedrag"].sum()
@@ -652,6 +637,22 @@ def calculate_aging_buckets(
     return summary
 
 
+def _payment_delay_stats(historical_behavior: pd.DataFrame) -> Tuple[int, float]:
+    """Extra dagen na de vervaldatum en betrouwbaarheid uit historisch betaalgedrag."""
+    # Calculate average delay from historical data
+    avg_delay = historical_behavior["gem_betaaltermijn_debiteuren"].mean()
+    std_delay = historical_behavior["gem_betaaltermijn_debiteuren"].std()
+
+    # Assume invoices are sent with 30-day terms
+    standard_terms = 30
+    extra_days = int(avg_delay - standard_terms)
+
+    # Confidence based on consistency (lower std = higher confidence)
+    confidence = max(0.3, min(0.95, 1 - (std_delay / 30))) if std_delay else 0.7
+
+    return max(0, extra_days), round(confidence, 2)
+
+
 def predict_payment_date(
     historical_behavior: pd.DataFrame,
     invoice_due_date: datetime,
@@ -672,23 +673,40 @@ def predict_payment_date(
         # Default: assume payment on due date
         return invoice_due_date, 0.5
 
-    # Calculate average delay from historical data
-    avg_delay = historical_behavior["gem_betaaltermijn_debiteuren"].mean()
-    std_delay = historical_behavior["gem_betaaltermijn_debiteuren"].std()
-
-    # Assume invoices are sent with 30-day terms
-    standard_terms = 30
-    extra_days = int(avg_delay - standard_terms)
+    extra_days, confidence = _payment_delay_stats(historical_behavior)
 
     if isinstance(invoice_due_date, datetime):
-        predicted_date = invoice_due_date + timedelta(days=max(0, extra_days))
+        predicted_date = invoice_due_date + timedelta(days=extra_days)
     else:
-        predicted_date = datetime.combine(invoice_due_date, datetime.min.time()) + timedelta(days=max(0, extra_days))
+        predicted_date = datetime.combine(invoice_due_date, datetime.min.time()) + timedelta(days=extra_days)
 
-    # Confidence based on consistency (lower std = higher confidence)
-    confidence = max(0.3, min(0.95, 1 - (std_delay / 30))) if std_delay else 0.7
+    return predicted_date, confidence
+
+
+def predict_payment_dates(
+    historical_behavior: pd.DataFrame,
+    invoice_due_dates: pd.Series,
+) -> pd.DataFrame:
+    """
+    Gevectoriseerde predict_payment_date voor een hele kolom vervaldatums.
+
+    Args:
+        historical_behavior: Historical payment data
+        invoice_due_dates: Vervaldatums (date, datetime of string)
 
-    return predicted_date, round(confidence, 2)
+    Returns:
+        DataFrame (zelfde index) met verwachte_betaling (datetime64) en betrouwbaarheid
+    """
+    due = pd.to_datetime(invoice_due_dates, errors='coerce')
+    if historical_behavior.empty:
+        extra_days, confidence = 0, 0.5
+    else:
+        extra_days, confidence = _payment_delay_stats(historical_behavior)
+
+    return pd.DataFrame({
+        "verwachte_betaling": due + pd.Timedelta(days=extra_days),
+        "betrouwbaarheid": confidence,
+    }, index=due.index)
 
 
 def calculate_seasonality_factors(
@@ -1696,10 +1714,46 @@ except ImportError:
     PROPHET_AVAILABLE = False
 
 
+def _fit_prophet(prophet_df: pd.DataFrame, include_seasonality: bool):
+    """Fit een Prophet model op een reeks met 'ds' en 'y'."""
+    # Configureer Prophet model
+    model = Prophet(
+        yearly_seasonality=include_seasonality,
+        weekly_seasonality=False,  # We werken met wekelijkse data
+        daily_seasonality=False,
+        seasonality_mode="multiplicative"
+    )
+
+    # Voeg maandelijkse seizoenseffecten toe
+    if include_seasonality:
+        model.add_seasonality(
+            name="monthly",
+            period=30.5,
+            fourier_order=5
+        )
+
+    # Train het model (suppress logging)
+    import logging
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+    model.fit(prophet_df)
+    return model
+
+
+def _prophet_to_json(model) -> str:
+    from prophet.serialize import model_to_json
+    return model_to_json(model)
+
+
+def _prophet_from_json(payload: str):
+    from prophet.serialize import model_from_json
+    return model_from_json(payload)
+
+
 def create_prophet_forecast(
     historische_cashflow: pd.DataFrame,
     weeks_ahead: int = 13,
-    include_seasonality: bool = True
+    include_seasonality: bool = True,
+    administratie: Optional[str] = None,
 ) -> Optional[pd.DataFrame]:
     """
     Maak een forecast met Facebook Prophet (indien beschikbaar).
@@ -1709,10 +1763,14 @@ def create_prophet_forecast(
     - Omgaan met ontbrekende data
     - Confidence intervals
 
+    Gefitte modellen worden hergebruikt via de modelcache zolang de
+    historie per kolom niet verandert.
+
     Args:
         historische_cashflow: DataFrame met week_start, inkomsten, uitgaven
         weeks_ahead: Hoeveel weken vooruit voorspellen
         include_seasonality: Of seizoenseffecten moeten worden meegenomen
+        administratie: Optioneel - administratie (sleutel voor de modelcache)
 
     Returns:
         DataFrame met Prophet forecast of None als Prophet niet beschikbaar
@@ -1742,27 +1800,14 @@ def create_prophet_forecast(
         if len(prophet_df) < 12:
             continue
 
-        # Configureer Prophet model
-        model = Prophet(
-            yearly_seasonality=include_seasonality,
-            weekly_seasonality=False,  # We werken met wekelijkse data
-            daily_seasonality=False,
-            seasonality_mode="multiplicative"
+        model = get_model_cache().get_or_fit(
+            "prophet", administratie, prophet_df,
+            {"include_seasonality": include_seasonality, "seasonality_mode": "multiplicative"},
+            fit=lambda: _fit_prophet(prophet_df, include_seasonality),
+            dumps=_prophet_to_json,
+            loads=_prophet_from_json,
         )
 
-        # Voeg maandelijkse seizoenseffecten toe
-        if include_seasonality:
-            model.add_seasonality(
-                name="monthly",
-                period=30.5,
-                fourier_order=5
-            )
-
-        # Train het model (suppress logging)
-        import logging
-        logging.getLogger('prophet').setLevel(logging.WARNING)
-        model.fit(prophet_df)
-
         # Maak toekomstige datums
         future = model.make_future_dataframe(periods=weeks_ahead, freq="W")
 
@@ -2004,10 +2049,36 @@ class LayeredForecastResult:
     forecast_metrics: Dict[str, float]
 
 
+def _fit_holt_winters(series: pd.Series, seasonal_periods: int):
+    """Fit Holt-Winters (met seizoen als er minstens twee periodes historie zijn)."""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    # Bepaal of we genoeg data hebben voor seizoenseffecten
+    if len(series) >= seasonal_periods * 2:
+        model = ExponentialSmoothing(
+            series,
+            seasonal_periods=min(seasonal_periods, len(series) // 2),
+            trend="add",
+            seasonal="add",
+            damped_trend=True,
+        )
+    else:
+        # Niet genoeg data voor seizoenseffecten, gebruik alleen trend
+        model = ExponentialSmoothing(
+            series,
+            trend="add",
+            seasonal=None,
+            damped_trend=True,
+        )
+
+    return model.fit(optimized=True)
+
+
 def forecast_revenue_holt_winters(
     historische_omzet: pd.DataFrame,
     weeks_ahead: int = 26,
     seasonal_periods: int = 52,  # Jaarlijkse seizoenseffecten
+    administratie: Optional[str] = None,
 ) -> pd.DataFrame:
     """
     Voorspel OMZET (niet cashflow!) met Holt-Winters Exponential Smoothing.
@@ -2015,10 +2086,14 @@ def forecast_revenue_holt_winters(
     Dit is de kern van de nieuwe aanpak: we voorspellen eerst stabielere omzet,
     daarna converteren we naar cash met DSO-lag.
 
+    Het gefitte model komt uit de modelcache zolang de reeks niet verandert;
+    alleen als er nieuwe weken bij komen wordt opnieuw gefit.
+
     Args:
         historische_omzet: DataFrame met kolommen 'week_start', 'omzet'
         weeks_ahead: Aantal weken vooruit voorspellen
         seasonal_periods: Periode voor seizoenseffecten (52 = jaar)
+        administratie: Optioneel - administratie (sleutel voor de modelcache)
 
     Returns:
         DataFrame met week_start, omzet_forecast, omzet_lower, omzet_upper
@@ -2032,31 +2107,17 @@ def forecast_revenue_holt_winters(
 
     # Gebruik statsmodels Holt-Winters als beschikbaar
     try:
-        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing  # noqa: F401
 
         # Bereid data voor
         series = df.set_index("week_start")["omzet"].asfreq("W-MON")
         series = series.fillna(method="ffill").fillna(0)
 
-        # Bepaal of we genoeg data hebben voor seizoenseffecten
-        if len(series) >= seasonal_periods * 2:
-            model = ExponentialSmoothing(
-                series,
-                seasonal_periods=min(seasonal_periods, len(series) // 2),
-                trend="add",
-                seasonal="add",
-                damped_trend=True,
-            )
-        else:
-            # Niet genoeg data voor seizoenseffecten, gebruik alleen trend
-            model = ExponentialSmoothing(
-                series,
-                trend="add",
-                seasonal=None,
-                damped_trend=True,
-            )
-
-        fit = model.fit(optimized=True)
+        fit = get_model_cache().get_or_fit(
+            "holt_winters", administratie, series,
+            {"seasonal_periods": seasonal_periods, "trend": "add", "damped_trend": True},
+            fit=lambda: _fit_holt_winters(series, seasonal_periods),
+        )
 
         # Voorspel
         forecast = fit.forecast(weeks_ahead)
@@ -2266,6 +2327,7 @@ def create_layered_cashflow_forecast(
     weeks_history: int = 4,
     reference_date=None,
     standaard_betaaltermijn: int = 30,
+    administratie: Optional[str] = None,
 ) -> Tuple[pd.DataFrame, int, Dict]:
     """
     NIEUW 4-LAGEN CASHFLOW FORECAST MODEL.
@@ -2292,6 +2354,7 @@ def create_layered_cashflow_forecast(
         weeks_history: Aantal weken realisatie
         reference_date: Referentiedatum
         standaard_betaaltermijn: Standaard betaaltermijn
+        administratie: Optioneel - administratie (sleutel voor de modelcache)
 
     Returns:
         Tuple van (forecast DataFrame, forecast_start_idx, metadata dict)
@@ -2406,7 +2469,8 @@ def create_layered_cashflow_forecast(
         # Voorspel omzet met Holt-Winters
         omzet_forecast = forecast_revenue_holt_winters(
             historische_omzet,
-            weeks_ahead=weeks + 10  # Extra weken voor DSO buffer
+            weeks_ahead=weeks + 10,  # Extra weken voor DSO buffer
+            administratie=administratie,
         )
 
         if not omzet_forecast.empty:
@@ -2592,6 +2656,9 @@ class BacktestResult:
     # Per-cutoff resultaten (voor visualisatie)
     detailed_results: pd.DataFrame
 
+    # Mislukte test momenten: cutoff (YYYY-MM-DD) -> foutmelding
+    errors: Dict[str, str] = field(default_factory=dict)
+
 
 @dataclass
 class CustomerProfile:
@@ -2898,12 +2965,90 @@ def analyze_volatility(
     return inzichten
 
 
+def _backtest_cutoff(
+    cutoff: pd.Timestamp,
+    df_omzet: pd.DataFrame,
+    df_cash: pd.DataFrame,
+    betaalgedrag: pd.DataFrame,
+    forecast_horizon: int,
+) -> List[dict]:
+    """Eén test moment van run_walk_forward_backtest (module-level voor de process pool).
+
+    Returns:
+        Lijst met een resultaat-rij per vergeleken horizon
+    """
+    rows = []
+    cutoff_date = cutoff.date()
+
+    # === DATA MASKING ===
+    # Alleen data VOOR de cutoff gebruiken voor training
+    train_omzet = df_omzet[df_omzet["week_start"] < cutoff].copy()
+
+    if len(train_omzet) < 12:
+        return rows
+
+    # === GENEREER FORECAST ===
+    omzet_forecast = forecast_revenue_holt_winters(
+        train_omzet.rename(columns={"omzet": "omzet"}) if "omzet" not in train_omzet.columns else train_omzet,
+        weeks_ahead=forecast_horizon
+    )
+
+    if omzet_forecast.empty:
+        return rows
+
+    # Portfolio DSO voor time-shift
+    portfolio_dso = calculate_portfolio_dso(betaalgedrag, None)
+
+    # === VERGELIJK MET ACTUALS ===
+    for h in range(1, forecast_horizon + 1):
+        forecast_week = cutoff + timedelta(weeks=h)
+
+        # Zoek forecast waarde
+        forecast_row = omzet_forecast[
+            omzet_forecast["week_start"].dt.date == forecast_week.date()
+        ]
+
+        if forecast_row.empty:
+            continue
+
+        forecast_value = forecast_row["omzet_forecast"].values[0]
+
+        # Zoek actual waarde
+        actual_row = df_cash[
+            (df_cash["week_start"].dt.date >= forecast_week.date()) &
+            (df_cash["week_start"].dt.date < (forecast_week + timedelta(weeks=1)).date())
+        ]
+
+        if actual_row.empty:
+            continue
+
+        actual_value = actual_row["actuals"].values[0]
+
+        # Bereken error
+        if actual_value != 0:
+            pct_error = (forecast_value - actual_value) / actual_value * 100
+            abs_error = abs(forecast_value - actual_value)
+
+            rows.append({
+                "cutoff_date": cutoff_date,
+                "horizon": h,
+                "forecast": forecast_value,
+                "actual": actual_value,
+                "error": forecast_value - actual_value,
+                "pct_error": pct_error,
+                "abs_pct_error": abs(pct_error)
+            })
+
+    return rows
+
+
 def run_walk_forward_backtest(
     historische_omzet: pd.DataFrame,
     historische_cashflow: pd.DataFrame,
     betaalgedrag: pd.DataFrame,
     n_cutoff_dates: int = 12,
     forecast_horizon: int = 12,
+    max_workers: int = 1,
 ) -> BacktestResult:
     """
     Voer walk-forward backtesting uit op het 4-lagen model.
@@ -2921,6 +3066,7 @@ def run_walk_forward_backtest(
         betaalgedrag: DSO per debiteur
         n_cutoff_dates: Aantal test momenten
         forecast_horizon: Hoeveel weken vooruit testen
+        max_workers: Aantal processen voor de test momenten (1 = sequentieel)
 
     Returns:
         BacktestResult met alle metrics en learnings
@@ -2983,70 +3129,34 @@ def run_walk_forward_backtest(
 
     all_results = []
     errors_per_horizon = {h: [] for h in range(1, forecast_horizon + 1)}
-
-    for cutoff in cutoff_dates:
-        cutoff_date = cutoff.date()
-
-        # === DATA MASKING ===
-        # Alleen data VOOR de cutoff gebruiken voor training
-        train_omzet = df_omzet[df_omzet["week_start"] < cutoff].copy()
-
-        if len(train_omzet) < 12:
-            continue
-
-        # === GENEREER FORECAST ===
-        omzet_forecast = forecast_revenue_holt_winters(
-            train_omzet.rename(columns={"omzet": "omzet"}) if "omzet" not in train_omzet.columns else train_omzet,
-            weeks_ahead=forecast_horizon
-        )
-
-        if omzet_forecast.empty:
+    errors = {}
+
+    # Elke cutoff is onafhankelijk: optioneel parallel in een process pool
+    args = [(cutoff, df_omzet, df_cash, betaalgedrag, forecast_horizon) for cutoff in cutoff_dates]
+    if max_workers > 1 and len(args) > 1:
+        with _process_pool(min(max_workers, len(args))) as pool:
+            futures = [pool.submit(_backtest_cutoff, *a) for a in args]
+            outcomes = []
+            for f in futures:
+                try:
+                    outcomes.append((f.result(), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+    else:
+        outcomes = []
+        for a in args:
+            try:
+                outcomes.append((_backtest_cutoff(*a), None))
+            except Exception as e:
+                outcomes.append((None, e))
+
+    for cutoff, (rows, error) in zip(cutoff_dates, outcomes):
+        if error is not None:
+            errors[str(cutoff.date())] = f"{type(error).__name__}: {error}"
             continue
-
-        # Portfolio DSO voor time-shift
-        portfolio_dso = calculate_portfolio_dso(betaalgedrag, None)
-
-        # === VERGELIJK MET ACTUALS ===
-        for h in range(1, forecast_horizon + 1):
-            forecast_week = cutoff + timedelta(weeks=h)
-
-            # Zoek forecast waarde
-            forecast_row = omzet_forecast[
-                omzet_forecast["week_start"].dt.date == forecast_week.date()
-            ]
-
-            if forecast_row.empty:
-                continue
-
-            forecast_value = forecast_row["omzet_forecast"].values[0]
-
-            # Zoek actual waarde
-            actual_row = df_cash[
-                (df_cash["week_start"].dt.date >= forecast_week.date()) &
-                (df_cash["week_start"].dt.date < (forecast_week + timedelta(weeks=1)).date())
-            ]
-
-            if actual_row.empty:
-                continue
-
-            actual_value = actual_row["actuals"].values[0]
-
-            # Bereken error
-            if actual_value != 0:
-                pct_error = (forecast_value - actual_value) / actual_value * 100
-                abs_error = abs(forecast_value - actual_value)
-
-                errors_per_horizon[h].append(pct_error)
-
-                all_results.append({
-                    "cutoff_date": cutoff_date,
-                    "horizon": h,
-                    "forecast": forecast_value,
-                    "actual": actual_value,
-                    "error": forecast_value - actual_value,
-                    "pct_error": pct_error,
-                    "abs_pct_error": abs(pct_error)
-                })
+        for row in rows:
+            errors_per_horizon[row["horizon"]].append(row["pct_error"])
+        all_results.extend(rows)
 
     # === BEREKEN METRICS ===
     if not all_results:
@@ -3061,7 +3171,8 @@ def run_walk_forward_backtest(
             n_cutoff_dates=0,
             test_period_start=str(cutoff_dates[0].date()) if len(cutoff_dates) > 0 else "",
             test_period_end=str(cutoff_dates[-1].date()) if len(cutoff_dates) > 0 else "",
-            detailed_results=pd.DataFrame()
+            detailed_results=pd.DataFrame(),
+            errors=errors,
         )
 
     results_df = pd.DataFrame(all_results)
@@ -3128,6 +3239,10 @@ def run_walk_forward_backtest(
     if layer3_accuracy > 0:
         learnings.append(f"👻 Laag 3 (Ghost Invoices): {layer3_accuracy:.0f}% nauwkeurig")
 
+    if errors:
+        learnings.append(f"⚠️ {len(errors)} van {len(cutoff_dates)} test momenten mislukt "
+                         f"(eerste: {next(iter(errors.values()))})")
+
     return BacktestResult(
         mape_per_horizon=mape_per_horizon,
         overall_mape=round(overall_mape, 1),
@@ -3139,7 +3254,8 @@ def run_walk_forward_backtest(
         n_cutoff_dates=len(cutoff_dates),
         test_period_start=str(cutoff_dates[0].date()) if len(cutoff_dates) > 0 else "",
         test_period_end=str(cutoff_dates[-1].date()) if len(cutoff_dates) > 0 else "",
-        detailed_results=results_df
+        detailed_results=results_df,
+        errors=errors,
     )
 
 
@@ -3278,6 +3394,7 @@ def create_enhanced_forecast(
     prophet_weight: float = 0.3,
     use_week_of_month: bool = True,
     wom_strength: float = 0.5,
+    administratie: Optional[str] = None,
 ) -> Tuple[pd.DataFrame, int, ForecastModelMetrics, Dict]:
     """
     Verbeterde cashflow forecast die alle fasen combineert:
@@ -3303,6 +3420,7 @@ def create_enhanced_forecast(
         prophet_weight: Gewicht voor Prophet blend
         use_week_of_month: Of week-van-maand correctie moet worden toegepast
         wom_strength: Sterkte van week-van-maand correctie
+        administratie: Optioneel - administratie (sleutel voor de modelcache)
 
     Returns:
         Tuple van (forecast DataFrame, forecast_start_idx, metrics, extra_info)
@@ -3383,7 +3501,8 @@ def create_enhanced_forecast(
     if use_prophet and PROPHET_AVAILABLE and not historische_cashflow.empty:
         prophet_forecast = create_prophet_forecast(
             historische_cashflow,
-            weeks_ahead=weeks
+            weeks_ahead=weeks,
+            administratie=administratie,
         )
 
         if prophet_forecast is not None:
@@ -7,9 +7,14 @@ Vervangt directe psycopg2-verbinding.
 
 import os
 import sys
+import time
+import threading
 import pandas as pd
+from contextlib import contextmanager
 from datetime import date, timedelta
-from typing import Optional, Union
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from src.history_cache import history_cache
 
 # SDK import
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_sdk'))
@@ -187,6 +192,16 @@ class NotificaDataSource:
                 "administratie": [], "bedrijfseenheid": [],
             })
 
+    @staticmethod
+    def _cashflow_adm_filter(administratie: str = None, administratie_key: int = None):
+        """(join, filter) voor de administratie op journaalregels via het dagboek."""
+        if administratie_key:
+            return "", f'AND dag."AdministratieKey" = {int(administratie_key)}'
+        if administratie:
+            return ('JOIN stam."Administraties" adm ON dag."AdministratieKey" = adm."AdministratieKey"',
+                    f'AND adm."Administratie" = {_sql_str(administratie)}')
+        return "", ""
+
     def get_historische_cashflow_per_week(
         self, startdatum: date = None, einddatum: date = None,
         administratie: str = None, administratie_key: int = None
@@ -196,15 +211,20 @@ class NotificaDataSource:
         if startdatum is None:
             startdatum = date(einddatum.year - 1, einddatum.month, 1)
 
-        if administratie_key:
-            adm_filter = f'AND dag."AdministratieKey" = {int(administratie_key)}'
-            adm_join = ""
-        elif administratie:
-            adm_filter = f'AND adm."Administratie" = {_sql_str(administratie)}'
-            adm_join = 'JOIN stam."Administraties" adm ON dag."AdministratieKey" = adm."AdministratieKey"'
-        else:
-            adm_filter = ""
-            adm_join = ""
+        # Met HISTORY_CACHE_DIR: afgesloten weken uit de lokale cache,
+        # alleen de recente weken opnieuw uit Journaalregels
+        cache = history_cache()
+        if cache is not None:
+            try:
+                return cache.weekly(
+                    lambda van, tot: self.get_cashflow_per_dag(van, tot, administratie, administratie_key),
+                    (self.klantnummer, administratie or "", administratie_key or ""),
+                    startdatum, einddatum,
+                )
+            except Exception as e:
+                print(f"[WARNING] Cashflow history cache mislukt, direct ophalen: {e}")
+
+        adm_join, adm_filter = self._cashflow_adm_filter(administratie, administratie_key)
 
         sql = f"""
         SELECT
@@ -235,6 +255,37 @@ class NotificaDataSource:
             print(f"Error fetching historical weekly cashflow: {e}")
             return pd.DataFrame({"week_start": [], "week_nummer": [], "maand": [], "inkomsten": [], "uitgaven": [], "netto": []})
 
+    def get_cashflow_per_dag(
+        self, startdatum: date, einddatum: date,
+        administratie: str = None, administratie_key: int = None
+    ) -> pd.DataFrame:
+        """Bankcashflow per boekdatum in [startdatum, einddatum) — basis voor de history cache.
+
+        Zelfde selectie als get_historische_cashflow_per_week. Fouten worden
+        doorgegeven: een mislukte query mag niet als lege (afgesloten) week
+        in de cache belanden.
+        """
+        adm_join, adm_filter = self._cashflow_adm_filter(administratie, administratie_key)
+
+        sql = f"""
+        SELECT
+            CAST(j."Boekdatum" AS DATE) as boekdatum,
+            SUM(CASE WHEN j."Debet/Credit" = 'D' THEN j."Bedrag" ELSE 0 END) as inkomsten,
+            SUM(CASE WHEN j."Debet/Credit" = 'C' THEN j."Bedrag" ELSE 0 END) as uitgaven
+        FROM financieel."Journaalregels" j
+        JOIN stam."Documenten" d ON j."DocumentKey" = d."DocumentKey"
+        JOIN stam."Dagboeken" dag ON d."DagboekKey" = dag."DagboekKey"
+        {adm_join}
+        WHERE j."Boekdatum" >= {_sql_date(startdatum)}
+          AND j."Boekdatum" < {_sql_date(einddatum)}
+          AND d."StandaardEntiteitKey" = 10
+          AND j."RubriekKey" = dag."DagboekRubriekKey"
+          {adm_filter}
+        GROUP BY CAST(j."Boekdatum" AS DATE)
+        ORDER BY boekdatum
+        """
+        return self._query(sql)
+
     def get_betaalgedrag_per_debiteur(
         self, startdatum: date = None, einddatum: date = None, administratie: str = None
     ) -> pd.DataFrame:
@@ -553,7 +604,8 @@ class NotificaDataSource:
             b."Begindatum" as datum,
             b."Bedrag" as budget_bedrag,
             rub."Rubriek" as rubriek,
-            rub."Rubriek Code" as rubriek_code
+            rub."Rubriek Code" as rubriek_code,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM financieel."Budgetten" b
         LEFT JOIN financieel."Rubrieken" rub ON b."RubriekKey" = rub."RubriekKey"
         LEFT JOIN notifica."SSM Administraties" a ON b."AdministratieKey" = a."AdministratieKey"
@@ -565,7 +617,8 @@ class NotificaDataSource:
             return self._query(sql)
         except Exception as e:
             print(f"Error fetching budgets: {e}")
-            return pd.DataFrame({"datum": [], "budget_bedrag": [], "rubriek": [], "rubriek_code": []})
+            return pd.DataFrame({"datum": [], "budget_bedrag": [], "rubriek": [], "rubriek_code": [],
+                                 "administratie": []})
 
     def get_orderportefeuille(self, administratie: str = None) -> pd.DataFrame:
         """Openstaande orders (orderportefeuille) via eenmalige orderregels + projecten."""
@@ -577,7 +630,8 @@ class NotificaDataSource:
             eor."FactureerDatum" as opleverdatum,
             p."Einddatum" as einddatum,
             eor."TotaalRegelbedrag Excl. BTW" as orderbedrag,
-            p."Status" as status
+            p."Status" as status,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM projecten."Eenmalige Orderregels" eor
         LEFT JOIN projecten."Projecten" p ON eor."ProjectKey" = p."ProjectKey"
         LEFT JOIN notifica."SSM Administraties" a ON eor."AdministratieKey" = a."AdministratieKey"
@@ -590,7 +644,7 @@ class NotificaDataSource:
         except Exception as e:
             print(f"Error fetching order portfolio: {e}")
             return pd.DataFrame({"order_code": [], "opleverdatum": [], "einddatum": [],
-                                 "orderbedrag": [], "status": []})
+                                 "orderbedrag": [], "status": [], "administratie": []})
 
     def get_projecten_met_status(self, administratie: str = None) -> pd.DataFrame:
         """Actieve projecten met status en omzet."""
@@ -632,7 +686,8 @@ class NotificaDataSource:
         SELECT
             sp."Factureerdatum" as verwachte_factuurdatum,
             sp."Factureerbedrag excl. BTW" as verwacht_bedrag,
-            sp."document status" as status
+            sp."document status" as status,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM service."Service Orders Prognose" sp
         LEFT JOIN notifica."SSM Administraties" a ON sp."AdministratieKey" = a."AdministratieKey"
         WHERE sp."Factureerdatum" >= CURRENT_DATE
@@ -643,7 +698,8 @@ class NotificaDataSource:
             return self._query(sql)
         except Exception as e:
             print(f"Error fetching service orders prognose: {e}")
-            return pd.DataFrame({"verwachte_factuurdatum": [], "verwacht_bedrag": [], "status": []})
+            return pd.DataFrame({"verwachte_factuurdatum": [], "verwacht_bedrag": [], "status": [],
+                                 "administratie": []})
 
     # =========================================================================
     # NIEUW: Orderregels, Abonnementen, BTW Prognose
@@ -666,8 +722,10 @@ class NotificaDataSource:
             por."Ingangsdatum index" as ingangsdatum,
             por."Einddatum" as einddatum,
             por."Omschrijving" as omschrijving,
-            (por."Brutoprijs per eenheid" * por."Aantal" * por."Kortingfactor" * por."BTWfactor") as regelbedrag
+            (por."Brutoprijs per eenheid" * por."Aantal" * por."Kortingfactor" * por."BTWfactor") as regelbedrag,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM projecten."Periodieke Orderregels" por
+        LEFT JOIN notifica."SSM Administraties" a ON por."AdministratieKey" = a."AdministratieKey"
         WHERE por."Geplande factureerdatum" IS NOT NULL
           AND por."Brutoprijs per eenheid" > 0
           {adm_filter}
@@ -691,8 +749,10 @@ class NotificaDataSource:
             eor."TotaalRegelbedrag Excl. BTW" as totaalbedrag,
             eor."Nog te factureren excl. BTW" as nog_te_factureren,
             eor."Document status" as status,
-            eor."Omschrijving" as omschrijving
+            eor."Omschrijving" as omschrijving,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM projecten."Eenmalige Orderregels" eor
+        LEFT JOIN notifica."SSM Administraties" a ON eor."AdministratieKey" = a."AdministratieKey"
         WHERE eor."Nog te factureren excl. BTW" > 0
           {adm_filter}
         ORDER BY eor."FactureerDatum"
@@ -720,8 +780,10 @@ class NotificaDataSource:
             ab."financieel kalendereenheid" as kalendereenheid,
             ab."Ingangsdatum" as ingangsdatum,
             ab."Einddatum" as einddatum,
-            (ab."Facturatiebedrag per eenheid" * ab."Facturatie Aantal") as facturatiebedrag
+            (ab."Facturatiebedrag per eenheid" * ab."Facturatie Aantal") as facturatiebedrag,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM financieel."Abonnementen" ab
+        LEFT JOIN notifica."SSM Administraties" a ON ab."AdministratieKey" = a."AdministratieKey"
         WHERE ab."Status" NOT IN ('Vervallen', 'Opgezegd', 'Beëindigd')
           AND (ab."Einddatum" IS NULL OR ab."Einddatum" >= CURRENT_DATE)
           {adm_filter}
@@ -761,8 +823,10 @@ class NotificaDataSource:
             bp."BTW bedrag" as btw_bedrag,
             bp."Debet/Credit" as debet_credit,
             bp."Standaard entiteit" as entiteit,
-            bp."Document code" as document_code
+            bp."Document code" as document_code,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
         FROM notifica."SSM Prognose BTW" bp
+        LEFT JOIN notifica."SSM Administraties" a ON bp."AdministratieKey" = a."AdministratieKey"
         WHERE bp."BTW bedrag" != 0
           {adm_filter}
         """
@@ -786,6 +850,217 @@ class NotificaDataSource:
         except Exception:
             return []
 
+    # =========================================================================
+    # RUWE DATA — dag/regel-niveau voor BacktestSnapshot (src/backtest_snapshot.py)
+    # Eén keer laden voor alle cutoffs; de snapshot aggregeert in-memory naar
+    # dezelfde vorm als de get_* methoden hierboven.
+    # =========================================================================
+
+    def get_bankmutaties_per_dag(self, einddatum: date = None, administratie: str = None) -> pd.DataFrame:
+        """Bankmutaties per dag en dagboek (basis voor banksaldo én weekcashflow).
+
+        Twee administratie-kolommen, elk uit dezelfde bron als de query die
+        de snapshot vervangt: `administratie` uit notifica."SSM Administraties"
+        (get_banksaldo) en `cashflow_administratie` uit stam."Administraties"
+        (get_historische_cashflow_per_week). Het filter laat rijen door die
+        in één van beide bij de administratie horen.
+        """
+        if einddatum is None:
+            einddatum = date.today()
+
+        adm_filter = (f'AND (a."Administratie" = {_sql_str(administratie)} '
+                      f'OR adm."Administratie" = {_sql_str(administratie)})') if administratie else ""
+
+        sql = f"""
+        SELECT
+            j."Boekdatum"::date as boekdatum,
+            dag."Dagboek" as bank_naam,
+            SUM(CASE WHEN j."Debet/Credit" = 'D' THEN j."Bedrag" ELSE 0 END) as inkomsten,
+            SUM(CASE WHEN j."Debet/Credit" = 'C' THEN j."Bedrag" ELSE 0 END) as uitgaven,
+            COALESCE(a."Administratie", 'Onbekend') as administratie,
+            COALESCE(adm."Administratie", 'Onbekend') as cashflow_administratie
+        FROM financieel."Journaalregels" j
+        JOIN stam."Documenten" d ON j."DocumentKey" = d."DocumentKey"
+        JOIN stam."Dagboeken" dag ON d."DagboekKey" = dag."DagboekKey"
+        LEFT JOIN notifica."SSM Administraties" a ON dag."AdministratieKey" = a."AdministratieKey"
+        LEFT JOIN stam."Administraties" adm ON dag."AdministratieKey" = adm."AdministratieKey"
+        WHERE j."Boekdatum" < {_sql_date(einddatum)}
+          AND d."StandaardEntiteitKey" = 10
+          AND j."RubriekKey" = dag."DagboekRubriekKey"
+          {adm_filter}
+        GROUP BY j."Boekdatum"::date, dag."Dagboek", a."Administratie", adm."Administratie"
+        ORDER BY boekdatum
+        """
+        try:
+            return self._query(sql)
+        except Exception as e:
+            print(f"Error fetching daily bank mutations: {e}")
+            return pd.DataFrame({"boekdatum": [], "bank_naam": [], "inkomsten": [], "uitgaven": [],
+                                 "administratie": [], "cashflow_administratie": []})
+
+    def get_verkoopfactuur_termijnen_per_dag(self, einddatum: date = None, administratie: str = None) -> pd.DataFrame:
+        """Verkoopfactuur-termijnen per factuur en allocatiedatum (open AR + betaalgedrag)."""
+        if einddatum is None:
+            einddatum = date.today()
+
+        adm_filter = f'AND a."Administratie" = {_sql_str(administratie)}' if administratie else ""
+
+        sql = f"""
+        SELECT
+            vft."Debiteur" as debiteur_code,
+            vft."VerkoopfactuurDocumentKey" as factuur_key,
+            vft."Alloc_datum" as alloc_datum,
+            MAX(vft."Vervaldatum") as vervaldatum,
+            SUM(vft."Bedrag") as bedrag,
+            SUM(CASE WHEN vft."Bedrag" > 0 THEN vft."Bedrag" ELSE 0 END) as bedrag_positief,
+            COUNT(*) as aantal,
+            COALESCE(a."Administratie", 'Onbekend') as administratie,
+            COALESCE(be."Bedrijfseenheid", 'Onbekend') as bedrijfseenheid
+        FROM notifica."SSM Verkoopfactuur termijnen" vft
+        LEFT JOIN notifica."SSM Documenten" d ON vft."VerkoopfactuurDocumentKey" = d."DocumentKey"
+        LEFT JOIN notifica."SSM Bedrijfseenheden" be ON d."BedrijfseenheidKey"::bigint = be."BedrijfseenheidKey"
+        LEFT JOIN notifica."SSM Administraties" a ON be."AdministratieKey" = a."AdministratieKey"
+        WHERE vft."Alloc_datum" <= {_sql_date(einddatum)}
+          {adm_filter}
+        GROUP BY vft."Debiteur", vft."VerkoopfactuurDocumentKey", vft."Alloc_datum",
+                 a."Administratie", be."Bedrijfseenheid"
+        """
+        try:
+            return self._query(sql)
+        except Exception as e:
+            print(f"Error fetching sales invoice terms: {e}")
+            return pd.DataFrame({"debiteur_code": [], "factuur_key": [], "alloc_datum": [], "vervaldatum": [],
+                                 "bedrag": [], "bedrag_positief": [], "aantal": [],
+                                 "administratie": [], "bedrijfseenheid": []})
+
+    def get_betalingen_inkoopregels(
+        self, startdatum: date = None, einddatum: date = None, administratie: str = None
+    ) -> pd.DataFrame:
+        """Betaalde inkoopregels (basis voor betaalgedrag per crediteur)."""
+        if einddatum is None:
+            einddatum = date.today()
+        if startdatum is None:
+            startdatum = date(einddatum.year - 2, einddatum.month, 1)
+
+        adm_filter = f'AND a."Administratie" = {_sql_str(administratie)}' if administratie else ""
+
+        sql = f"""
+        SELECT
+            b."Crediteur" as crediteur_code,
+            b."Vervaldatum" as vervaldatum,
+            b."Betaaldatum" as betaaldatum,
+            ABS(b."BetaaldExclBTW") as factuurbedrag,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
+        FROM notifica."SSM Betalingen per inkoopregel" b
+        LEFT JOIN notifica."SSM Administraties" a ON b."AdministratieKey" = a."AdministratieKey"
+        WHERE b."Betaaldatum" IS NOT NULL
+          AND b."Vervaldatum" IS NOT NULL
+          AND b."Betaaldatum" >= {_sql_date(startdatum)}
+          AND b."Betaaldatum" <= {_sql_date(einddatum)}
+          AND ABS(b."BetaaldExclBTW") > 0
+          {adm_filter}
+        """
+        try:
+            return self._query(sql)
+        except Exception as e:
+            print(f"Error fetching purchase payments: {e}")
+            return pd.DataFrame({"crediteur_code": [], "vervaldatum": [], "betaaldatum": [], "factuurbedrag": [],
+                                 "administratie": []})
+
+    # =========================================================================
+    # PER ADMINISTRATIE — alle administraties in één query, gegroepeerd op
+    # AdministratieKey, voor AdministratieSnapshot (src/admin_snapshot.py)
+    # =========================================================================
+
+    def get_terugkerende_kosten_per_administratie(
+        self, startdatum: date = None, einddatum: date = None
+    ) -> pd.DataFrame:
+        """get_terugkerende_kosten voor alle administraties, met kolom administratie."""
+        if einddatum is None:
+            einddatum = date.today()
+        if startdatum is None:
+            startdatum = date(einddatum.year - 1, einddatum.month, 1)
+
+        sql = f"""
+        SELECT
+            DATE_TRUNC('month', j."Boekdatum") as maand,
+            CASE
+                WHEN rub."Rubriek Code" LIKE '4%%' THEN 'Personeelskosten'
+                WHEN rub."Rubriek Code" LIKE '61%%' THEN 'Huisvestingskosten'
+                WHEN rub."Rubriek Code" LIKE '62%%' THEN 'Machinekosten'
+                WHEN rub."Rubriek Code" LIKE '65%%' THEN 'Autokosten'
+                ELSE 'Overige vaste kosten'
+            END as kostensoort,
+            SUM(CASE WHEN j."Debet/Credit" = 'D' THEN j."Bedrag" ELSE 0 END) -
+            SUM(CASE WHEN j."Debet/Credit" = 'C' THEN j."Bedrag" ELSE 0 END) as bedrag,
+            COALESCE(a."Administratie", 'Onbekend') as administratie
+        FROM financieel."Journaalregels" j
+        JOIN financieel."Rubrieken" rub ON j."RubriekKey" = rub."RubriekKey"
+        LEFT JOIN notifica."SSM Administraties" a ON j."AdministratieKey" = a."AdministratieKey"
+        WHERE j."Boekdatum" >= {_sql_date(startdatum)}
+          AND j."Boekdatum" < {_sql_date(einddatum)}
+          AND (rub."Rubriek Code" LIKE '4%%' OR rub."Rubriek Code" LIKE '61%%'
+               OR rub."Rubriek Code" LIKE '62%%' OR rub."Rubriek Code" LIKE '65%%')
+        GROUP BY DATE_TRUNC('month', j."Boekdatum"), kostensoort, a."Administratie"
+        ORDER BY maand
+        """
+        try:
+            return self._query(sql)
+        except Exception as e:
+            print(f"Error fetching recurring costs per administratie: {e}")
+            return pd.DataFrame({"maand": [], "kostensoort": [], "bedrag": [], "administratie": []})
+
+    def get_calibrated_dso_dpo_per_administratie(self, lookback_months: int = 12) -> Dict[Optional[str], dict]:
+        """get_calibrated_dso_dpo voor alle administraties: {administratie: {'dso', 'dpo'}}.
+
+        De DSO-query is niet administratie-specifiek en draait één keer. De
+        DPO-mediaan per administratie en over het geheel (sleutel None)
+        komt uit één query via GROUPING SETS.
+        """
+        dso = None
+        dso_sql = f"""
+        SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (
+            ORDER BY b."Betaaldatum"::date - b."Factuurdatum"::date
+        ) as median_dso
+        FROM notifica."SSM Betalingen per opbrengstregel" b
+        WHERE b."Betaaldatum" IS NOT NULL AND b."Factuurdatum" IS NOT NULL
+          AND b."Betaaldatum" >= CURRENT_DATE - INTERVAL '{int(lookback_months)} months'
+          AND b."BetaaldExclBTW" > 0
+        """
+        try:
+            df = self._query(dso_sql)
+            if not df.empty and df['median_dso'].iloc[0] is not None:
+                dso = float(df['median_dso'].iloc[0])
+        except Exception as e:
+            print(f"Could not calculate DSO: {e}")
+
+        result: Dict[Optional[str], dict] = {None: {'dso': dso, 'dpo': None}}
+        dpo_sql = f"""
+        SELECT
+            a."Administratie" as administratie,
+            GROUPING(a."Administratie") as totaal,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (
+                ORDER BY b."Betaaldatum"::date - b."Vervaldatum"::date
+            ) as median_days_vs_due
+        FROM notifica."SSM Betalingen per inkoopregel" b
+        JOIN notifica."SSM Administraties" a ON b."AdministratieKey" = a."AdministratieKey"
+        WHERE b."Betaaldatum" IS NOT NULL AND b."Vervaldatum" IS NOT NULL
+          AND b."Betaaldatum" >= CURRENT_DATE - INTERVAL '{int(lookback_months)} months'
+        GROUP BY GROUPING SETS ((a."Administratie"), ())
+        """
+        try:
+            df = self._query(dpo_sql)
+            for adm, totaal, median in zip(df['administratie'], df['totaal'], df['median_days_vs_due']):
+                dpo = float(median) if median is not None and not pd.isna(median) else None
+                if int(totaal):
+                    result[None]['dpo'] = dpo
+                elif adm is not None:
+                    result[adm] = {'dso': dso, 'dpo': dpo}
+        except Exception as e:
+            print(f"Could not calculate DPO per administratie: {e}")
+
+        return result
+
     # =========================================================================
     # FORECAST PROFIEL — Opslaan/laden via app_forecast_profiles
     # =========================================================================
@@ -879,6 +1154,204 @@ class NotificaDataSource:
             return False
 
 
+# =============================================================================
+# DWHConnectionPool — Hergebruik van pyodbc-verbindingen per klant
+# =============================================================================
+
+class DWHConnectionPool:
+    """Thread-safe pool van pyodbc-verbindingen naar één klant-DWH.
+
+    Elke nieuwe verbinding naar Azure SQL kost een TLS-handshake plus login.
+    De pool houdt verbindingen open tussen queries, zodat een volledige
+    load_data run (±20 queries) maar één keer die prijs betaalt.
+
+    - max_size: maximaal aantal gelijktijdig open verbindingen. Bij een volle
+      pool wacht checkout tot er een verbinding vrijkomt (max checkout_timeout).
+    - idle_timeout: verbindingen die langer ongebruikt zijn worden gesloten.
+    - health_check_after: verbindingen die langer dan dit idle waren worden
+      eerst met SELECT 1 gecontroleerd voordat ze worden uitgeleend.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        max_size: int = 4,
+        idle_timeout: float = 300.0,
+        health_check_after: float = 30.0,
+        checkout_timeout: float = 60.0,
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+
+        self._lock = threading.Condition()
+        self._idle = []          # [(conn, laatst_gebruikt_monotonic)]
+        self._in_use = 0
+        self._closed = False     # na close_all: teruggebrachte verbindingen sluiten
+
+        # Tellers (zie stats())
+        self._checkouts = 0
+        self._reused = 0
+        self._created = 0
+        self._evicted = 0
+        self._health_check_failures = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now: float) -> list:
+        """Verwijder verlopen idle verbindingen (aanroepen met lock). Retourneert te sluiten conns."""
+        expired = [c for c, t in self._idle if now - t > self.idle_timeout]
+        if expired:
+            self._idle = [(c, t) for c, t in self._idle if now - t <= self.idle_timeout]
+            self._evicted += len(expired)
+        return expired
+
+    def _checkout(self):
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        candidate = None
+        to_close = []
+        with self._lock:
+            while True:
+                to_close.extend(self._evict_idle(time.monotonic()))
+                if self._idle:
+                    candidate = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Geen vrije DWH-verbinding binnen {self.checkout_timeout:.0f}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._lock.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        for conn in to_close:
+            self._close_quietly(conn)
+
+        try:
+            if candidate is not None:
+                conn, last_used = candidate
+                if time.monotonic() - last_used < self.health_check_after or self._is_healthy(conn):
+                    with self._lock:
+                        self._reused += 1
+                    return conn
+                with self._lock:
+                    self._health_check_failures += 1
+                self._close_quietly(conn)
+
+            conn = self._connect()
+            with self._lock:
+                self._created += 1
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def _checkin(self, conn, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+            discard = broken or self._closed
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+        if discard:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """Leen een verbinding uit de pool. Bij een fout wordt de verbinding weggegooid."""
+        conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            self._checkin(conn, broken=True)
+            raise
+        else:
+            self._checkin(conn)
+
+    def close_all(self):
+        """Sluit alle idle verbindingen; uitgeleende verbindingen sluiten bij checkin."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> dict:
+        """Pool tellers: checkout wachttijd en hergebruik-ratio."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": checkouts,
+                "created": self._created,
+                "reused": self._reused,
+                "reuse_rate": self._reused / checkouts if checkouts else 0.0,
+                "evicted_idle": self._evicted,
+                "health_check_failures": self._health_check_failures,
+                "wait_total_s": self._wait_total,
+                "wait_avg_ms": (self._wait_total / checkouts * 1000) if checkouts else 0.0,
+                "wait_max_ms": self._wait_max * 1000,
+            }
+
+
+# Eén pool per (klantnummer, connection string), gedeeld door alle
+# DirectDWHDataSource instanties
+_DWH_POOLS: Dict[Tuple[int, str], DWHConnectionPool] = {}
+_DWH_POOLS_LOCK = threading.Lock()
+
+
+def get_dwh_pool(klantnummer: int, conn_str: str, connect: Callable[[], object], **pool_kwargs) -> DWHConnectionPool:
+    """Haal de gedeelde connection pool voor een klant op (of maak hem aan).
+
+    De pool hoort bij klantnummer plus connection string: wijzigt de
+    connection string (bijv. een geroteerd wachtwoord), dan komt er een
+    nieuwe pool en worden de idle verbindingen van de oude gesloten.
+    """
+    with _DWH_POOLS_LOCK:
+        pool = _DWH_POOLS.get((klantnummer, conn_str))
+        if pool is not None:
+            return pool
+        stale = [key for key in _DWH_POOLS if key[0] == klantnummer]
+        old_pools = [_DWH_POOLS.pop(key) for key in stale]
+        pool = DWHConnectionPool(connect, **pool_kwargs)
+        _DWH_POOLS[(klantnummer, conn_str)] = pool
+    for old in old_pools:
+        old.close_all()
+    return pool
+
+
 # =============================================================================
 # DirectDWHDataSource — Directe Azure SQL verbinding (bypass API)
 # =============================================================================
@@ -911,16 +1384,25 @@ class DirectDWHDataSource(NotificaDataSource):
             "TrustServerCertificate=no;"
             "Connection Timeout=30;"
         )
+        conn_str = self._conn_str
+        self._pool = get_dwh_pool(
+            self.klantnummer,
+            conn_str,
+            connect=lambda: pyodbc.connect(conn_str),
+            max_size=int(os.getenv('DWH_POOL_MAX_SIZE', '4')),
+            idle_timeout=float(os.getenv('DWH_POOL_IDLE_TIMEOUT', '300')),
+        )
 
     def _query(self, sql: str) -> pd.DataFrame:
-        """Execute SQL direct op Azure SQL DWH."""
-        import pyodbc
-        conn = pyodbc.connect(self._conn_str)
-        cur = conn.cursor()
-        cur.execute(sql)
-        columns = [desc[0] for desc in cur.description]
-        rows = cur.fetchall()
-        conn.close()
+        """Execute SQL direct op Azure SQL DWH (via de gedeelde connection pool)."""
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql)
+                columns = [desc[0] for desc in cur.description]
+                rows = cur.fetchall()
+            finally:
+                cur.close()
         df = pd.DataFrame.from_records(rows, columns=columns)
         for col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='ignore')
@@ -934,6 +1416,10 @@ class DirectDWHDataSource(NotificaDataSource):
             print(f"Direct DWH connection failed: {e}")
             return False
 
+    def pool_stats(self) -> dict:
+        """Tellers van de connection pool (checkout wachttijd, hergebruik)."""
+        return self._pool.stats()
+
 
 # =============================================================================
 # MockDatabase — Demo modus
@@ -0,0 +1,226 @@
+"""
+Liquiditeitsprognose - Fetch Planner
+====================================
+Haalt onafhankelijke datasets parallel op via de data source
+(NotificaDataSource / DirectDWHDataSource / MockDatabase).
+
+Zonder planner worden ±20 `db.get_*` calls na elkaar uitgevoerd en is de
+laadtijd de som van alle query-latencies. Met de planner is dat ongeveer
+de traagste query. De Notifica API-limiet (60 requests per minuut) wordt
+bewaakt door de gedeelde RateLimitScheduler in de NotificaClient SDK; die
+doseert elke request, ook als meerdere threads tegelijk queries doen.
+
+Gebruik:
+    tasks = [
+        FetchTask("banksaldo", "get_banksaldo", {"standdatum": d}),
+        FetchTask("crediteuren", "get_openstaande_crediteuren", {"standdatum": d}),
+    ]
+    results = run_fetch_plan(db, tasks, max_workers=6)
+
+Het volledige plan van het dashboard (basis + administratie-afhankelijke
+datasets, incl. auto-detectie van de administratie) staat in
+fetch_dashboard_data; dat wordt ook door de batch runner gebruikt.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+
+# Standaard parallelliteit (overschrijfbaar via environment)
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "6"))
+
+
+@dataclass
+class FetchTask:
+    """Eén dataset in het fetch-plan.
+
+    Attributes:
+        key: Sleutel in het resultaat-dict (bijv. 'debiteuren')
+        method: Naam van de db-methode (bijv. 'get_openstaande_debiteuren')
+        kwargs: Argumenten voor de methode
+        default: Factory voor de fallback-waarde bij een fout of ontbrekende methode
+    """
+    key: str
+    method: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    default: Callable[[], Any] = pd.DataFrame
+
+
+def _run_task(db, task: FetchTask):
+    fn = getattr(db, task.method, None)
+    if fn is None:
+        return task.default(), 0.0
+    start = time.perf_counter()
+    try:
+        result = fn(**task.kwargs)
+    except Exception as e:
+        print(f"[WARNING] {task.method} mislukt: {e}")
+        result = task.default()
+    return result, time.perf_counter() - start
+
+
+def run_fetch_plan(
+    db,
+    tasks: List[FetchTask],
+    max_workers: int = FETCH_MAX_WORKERS,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """Voer alle taken uit met maximaal max_workers tegelijk.
+
+    Args:
+        db: Data source met get_* methoden
+        tasks: Lijst met FetchTask (keys moeten uniek zijn)
+        max_workers: Maximaal aantal gelijktijdige queries (1 = sequentieel)
+        timings: Optioneel dict dat per key de query-duur (s) ontvangt
+
+    Returns:
+        Dict {task.key: resultaat}, in de volgorde van tasks
+    """
+    if max_workers <= 1 or len(tasks) <= 1:
+        outcomes = [_run_task(db, t) for t in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+            futures = [pool.submit(_run_task, db, t) for t in tasks]
+            outcomes = [f.result() for f in futures]
+
+    results = {}
+    for task, (result, duration) in zip(tasks, outcomes):
+        results[task.key] = result
+        if timings is not None:
+            timings[task.key] = duration
+    return results
+
+
+# =============================================================================
+# Dashboard fetch-plan
+# =============================================================================
+
+def plan_admin_tasks(is_mock_db: bool, standdatum: date, administratie: Optional[str]) -> List[FetchTask]:
+    """Datasets die afhangen van de (gedetecteerde) administratie."""
+    tasks = [
+        FetchTask("banksaldo", "get_banksaldo", {"standdatum": standdatum, "administratie": administratie}),
+    ]
+
+    if is_mock_db:
+        tasks += [
+            FetchTask("terugkerende_kosten", "get_terugkerende_kosten"),
+            FetchTask("historische_cashflow", "get_historische_cashflow_per_week"),
+            FetchTask("betaalgedrag_debiteuren", "get_betaalgedrag_per_debiteur"),
+            FetchTask("betaalgedrag_crediteuren", "get_betaalgedrag_per_crediteur"),
+            FetchTask("service_orders_prognose", "get_service_orders_prognose"),
+            # Nieuwe V7 databronnen (mock)
+            FetchTask("orderregels_periodiek", "get_orderregels_periodiek"),
+            FetchTask("orderregels_eenmalig", "get_orderregels_eenmalig"),
+            FetchTask("abonnementen", "get_abonnementen"),
+            FetchTask("service_contract_intake", "get_service_contract_intake"),
+            FetchTask("btw_prognose", "get_btw_prognose"),
+        ]
+    elif administratie:
+        hist_startdatum = date(standdatum.year - 1, standdatum.month, 1)
+        dso_startdatum = date(standdatum.year - 2, standdatum.month, 1)
+        adm = {"administratie": administratie}
+        tasks += [
+            FetchTask("historische_cashflow", "get_historische_cashflow_per_week",
+                      {"startdatum": hist_startdatum, "einddatum": standdatum, **adm}),
+            # Betaalgedrag data
+            FetchTask("betaalgedrag_debiteuren", "get_betaalgedrag_per_debiteur",
+                      {"startdatum": dso_startdatum, "einddatum": standdatum, **adm}),
+            FetchTask("betaalgedrag_crediteuren", "get_betaalgedrag_per_crediteur",
+                      {"startdatum": dso_startdatum, "einddatum": standdatum, **adm}),
+            # DSO/DPO calibratie (2 queries)
+            FetchTask("_dso_dpo", "get_calibrated_dso_dpo", adm, default=dict),
+            # V7 data sources
+            FetchTask("btw_aangifteregels", "get_btw_aangifteregels",
+                      {"startdatum": dso_startdatum, "einddatum": standdatum}),
+            FetchTask("salarishistorie", "get_salarishistorie",
+                      {"startdatum": dso_startdatum, "einddatum": standdatum}),
+            FetchTask("budgetten", "get_budgetten", {"boekjaar": standdatum.year, **adm}),
+            FetchTask("orderportefeuille", "get_orderportefeuille", adm),
+            # Service Orders Prognose (verwachte toekomstige facturatie)
+            FetchTask("service_orders_prognose", "get_service_orders_prognose", adm),
+            FetchTask("terugkerende_kosten", "get_terugkerende_kosten",
+                      {"startdatum": hist_startdatum, "einddatum": standdatum, **adm}),
+            # Periodieke + Eenmalige Orderregels (projectfacturatie-timing)
+            FetchTask("orderregels_periodiek", "get_orderregels_periodiek", adm),
+            FetchTask("orderregels_eenmalig", "get_orderregels_eenmalig", adm),
+            # Abonnementen + Servicecontracten (recurring revenue)
+            FetchTask("abonnementen", "get_abonnementen", adm),
+            FetchTask("service_contract_intake", "get_service_contract_intake", adm),
+            # BTW Prognose uit SSM
+            FetchTask("btw_prognose", "get_btw_prognose", adm),
+        ]
+    return tasks
+
+
+def fetch_dashboard_data(db, standdatum: date, administratie: Optional[str] = None,
+                         timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Haal alle datasets voor de V7 forecast op (zoals het dashboard ze gebruikt).
+
+    Alleen als de administratie nog niet bekend is, gaan de debiteuren (voor
+    auto-detectie) in een eerste ronde voor.
+
+    Args:
+        db: Data source (NotificaDataSource / DirectDWHDataSource / MockDatabase)
+        standdatum: Peildatum
+        administratie: Administratie, of None voor auto-detectie
+        timings: Optioneel dict dat per dataset de query-duur (s) ontvangt
+
+    Returns:
+        Dict met DataFrames per databron plus detected_admin, calibrated_dso/dpo en _db
+    """
+    is_mock_db = type(db).__name__ == "MockDatabase"
+
+    # MockDatabase gebruikt globale np.random seeds — sequentieel houden voor reproduceerbare demo data
+    plan_kwargs = {"max_workers": 1 if is_mock_db else FETCH_MAX_WORKERS, "timings": timings}
+
+    basis_tasks = [
+        FetchTask("debiteuren", "get_openstaande_debiteuren", {"standdatum": standdatum, "administratie": administratie}),
+        FetchTask("crediteuren", "get_openstaande_crediteuren", {"standdatum": standdatum}),
+        FetchTask("salarissen", "get_geplande_salarissen"),
+        FetchTask("historisch", "get_historisch_betalingsgedrag"),
+    ]
+
+    if administratie:
+        # Administratie bekend: alles in één parallelle ronde
+        fetched = run_fetch_plan(db, basis_tasks + plan_admin_tasks(is_mock_db, standdatum, administratie), **plan_kwargs)
+        detected_admin = administratie
+    else:
+        # Ronde 1: debiteuren (voor auto-detect) + administratie-onafhankelijke datasets
+        fetched = run_fetch_plan(db, basis_tasks, **plan_kwargs)
+        debiteuren = fetched["debiteuren"]
+
+        # Auto-detect administratie
+        detected_admin = administratie
+        if not debiteuren.empty and "administratie" in debiteuren.columns:
+            unique_admins = debiteuren["administratie"].dropna().unique()
+            if len(unique_admins) > 0:
+                admin_counts = debiteuren["administratie"].value_counts()
+                detected_admin = admin_counts.index[0] if len(admin_counts) > 0 else unique_admins[0]
+
+        # Ronde 2: alles wat van de administratie afhangt
+        fetched.update(run_fetch_plan(db, plan_admin_tasks(is_mock_db, standdatum, detected_admin), **plan_kwargs))
+
+    dso_dpo = fetched.pop("_dso_dpo", None) or {}
+    data = {
+        "detected_admin": detected_admin,
+        "calibrated_dso": dso_dpo.get('dso'),
+        "calibrated_dpo": dso_dpo.get('dpo'),
+        "betaalgedrag_debiteuren": pd.DataFrame(),
+        "betaalgedrag_crediteuren": pd.DataFrame(),
+        "terugkerende_kosten": pd.DataFrame(),
+        "historische_cashflow": pd.DataFrame(),
+        "_db": db,  # Database referentie voor profiel opslag
+    }
+
+    data.update(fetched)
+
+    if not is_mock_db and detected_admin:
+        data["geplande_salarissen"] = pd.DataFrame()
+
+    return data
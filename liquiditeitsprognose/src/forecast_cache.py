@@ -0,0 +1,418 @@
+"""
+Liquiditeitsprognose - Forecast Cache
+=====================================
+Memoization van create_forecast_v7 op basis van een fingerprint van de input.
+
+Streamlit voert bij elke widget-interactie (tab wisselen, grafiek aan/uit)
+het hele script opnieuw uit. De data zelf komt uit st.cache_data, maar de
+drie pilaren werden daarna steeds opnieuw berekend. De cache herkent dat de
+input ongewijzigd is en geeft het vorige resultaat terug.
+
+Sleutel: per DataFrame een content-hash (pd.util.hash_pandas_object) plus
+weeks_forecast, weeks_history, reference_date, DSO/DPO en de knoppen van het
+ForecastProfile. CACHE_VERSION is een hash van de broncode van forecast_v7 en
+deze module, dus elke wijziging in het model maakt oude resultaten ongeldig.
+
+Bij een miss (bijv. de gebruiker past alleen het profiel aan) draait
+create_forecast_v7 met een StageCache: elke stap (realiteit, structuur,
+volume, pijplijn, ...) wordt apart gecached op de databronnen waar hij van
+afhangt (forecast_v7.V7_STAGE_INPUTS) plus zijn eigen parameters. Geen van
+die stappen leest het profiel, dus dan draaien alleen de overrides, de blend
+en de output opnieuw.
+
+Gebruik:
+    from src.forecast_cache import cached_forecast_v7
+
+    forecast, start_idx, metadata = cached_forecast_v7(data=filtered_data, ...)
+
+Configuratie via environment:
+    FORECAST_CACHE_SIZE     Max aantal resultaten in geheugen (default 32, 0 = uit)
+    FORECAST_CACHE_DIR      Optioneel: map voor persistente opslag op schijf
+    FORECAST_CACHE_MAX_MB   Max grootte van de schijfcache (default 200)
+    FORECAST_STAGE_CACHE_SIZE  Max aantal tussenresultaten in geheugen (default 128)
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from src.forecast_v7 import create_forecast_v7
+
+
+def _source_hash(*paths: Path) -> str:
+    """Hash van de inhoud van bronbestanden (verandert bij elke codewijziging)."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(Path(path).read_bytes())
+    return h.hexdigest()[:16]
+
+
+# Afgeleid van de code van het model en van deze cache (wat er in een
+# resultaat zit, bijv. metadata['stage_timings']), zodat oude resultaten op
+# schijf na elke wijziging vanzelf niet meer matchen.
+CACHE_VERSION = _source_hash(sys.modules[create_forecast_v7.__module__].__file__, __file__)
+
+# Profielvelden die de uitkomst niet beïnvloeden
+_PROFILE_META_FIELDS = ('laatst_gewijzigd', 'gewijzigd_door')
+
+
+def fingerprint_frame(df: pd.DataFrame) -> str:
+    """Goedkope content-hash van een DataFrame (waarden, index, kolommen en dtypes)."""
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode('utf-8'))
+    h.update(repr([str(t) for t in df.dtypes]).encode('utf-8'))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        # Onhashbare cellen (lists, dicts): val terug op de tekstrepresentatie
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=True).values.tobytes())
+    return h.hexdigest()
+
+
+def _fingerprint_value(value) -> Optional[str]:
+    if isinstance(value, pd.DataFrame):
+        return fingerprint_frame(value)
+    if isinstance(value, pd.Series):
+        return fingerprint_frame(value.to_frame())
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return json.dumps(value)
+    # Overige objecten (bijv. de db-connectie onder '_db') doen niet mee
+    return None
+
+
+def _profile_key(forecast_profile) -> Optional[Dict[str, Any]]:
+    if forecast_profile is None:
+        return None
+    fields = asdict(forecast_profile) if is_dataclass(forecast_profile) else dict(vars(forecast_profile))
+    return {k: v for k, v in fields.items() if k not in _PROFILE_META_FIELDS}
+
+
+def fingerprint_data(data: Dict[str, Any]) -> Dict[str, str]:
+    """Fingerprint per databron; objecten die niet meedoen worden overgeslagen."""
+    fingerprints = {}
+    for name in sorted(data):
+        fp = _fingerprint_value(data[name])
+        if fp is not None:
+            fingerprints[name] = fp
+    return fingerprints
+
+
+def forecast_cache_key(data: Dict[str, Any], fingerprints: Optional[Dict[str, str]] = None, **params) -> str:
+    """Stabiele sleutel voor (data, parameters) van create_forecast_v7."""
+    data_part = fingerprints if fingerprints is not None else fingerprint_data(data)
+    params = dict(params)
+    params['forecast_profile'] = _profile_key(params.get('forecast_profile'))
+    raw = json.dumps(
+        {'version': CACHE_VERSION, 'data': data_part, 'params': params},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ForecastCache:
+    """LRU-cache voor forecast-resultaten, optioneel met een map op schijf.
+
+    In geheugen staan maximaal max_entries resultaten. Met een directory
+    wordt elk resultaat ook als pickle weggeschreven (tijdelijk bestand +
+    os.replace), zodat een nieuwe Streamlit sessie of herstart warm start.
+    De schijfcache wordt op totale grootte begrensd (LRU op mtime).
+    Alleen gebruiken met een map die het proces zelf beheert: pickle-bestanden
+    worden zonder verdere controle ingelezen.
+    """
+
+    def __init__(self, max_entries: int = 32, directory: Optional[str] = None,
+                 max_bytes: Optional[int] = 200 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = Path(directory).expanduser() if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> 'ForecastCache':
+        max_mb = float(os.getenv('FORECAST_CACHE_MAX_MB', '200'))
+        return cls(
+            max_entries=int(os.getenv('FORECAST_CACHE_SIZE', '32')),
+            directory=os.getenv('FORECAST_CACHE_DIR') or None,
+            max_bytes=int(max_mb * 1024 * 1024),
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.pkl'
+
+    def get(self, key: str) -> Optional[Tuple]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Tuple):
+        with self._lock:
+            self._remember(key, value)
+        self._store(key, value)
+
+    def _remember(self, key: str, value: Tuple):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ===== Schijf =====
+
+    def _load(self, key: str) -> Optional[Tuple]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path, None)  # LRU: markeer als recent gebruikt
+        except OSError:
+            return None
+        except Exception:
+            # Corrupt of incompatibel bestand — weggooien
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return value
+
+    def _store(self, key: str, value: Tuple):
+        if self.directory is None:
+            return
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        entries = []
+        total = 0
+        for path in self.directory.glob('*.pkl'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for path in self.directory.glob('*.pkl'):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class StageCache:
+    """LRU-cache (in geheugen) voor tussenresultaten van create_forecast_v7.
+
+    Sleutel per stap: naam + fingerprints van de databronnen waar de stap van
+    afhangt + de parameters die de stap meekrijgt. De resultaten worden
+    gedeeld tussen runs en mogen dus niet aangepast worden door de aanroeper
+    (_blend_pillars en de output-opbouw lezen ze alleen).
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.runs: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'StageCache':
+        return cls(max_entries=int(os.getenv('FORECAST_STAGE_CACHE_SIZE', '128')))
+
+    def bind(self, data: Dict[str, Any], fingerprints: Optional[Dict[str, str]] = None) -> '_BoundStages':
+        """Koppel aan één data-dict; geef het resultaat mee als `stages=`."""
+        return _BoundStages(self, data, fingerprints)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def _remember(self, name: str, key: str, value):
+        with self._lock:
+            self.runs[name] = self.runs.get(name, 0) + 1
+            if self.max_entries <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'runs': dict(self.runs),
+            }
+
+
+class _BoundStages:
+    """StageCache + fingerprints van één data-dict (per forecast-run)."""
+
+    def __init__(self, cache: StageCache, data: Dict[str, Any], fingerprints: Optional[Dict[str, str]]):
+        self.cache = cache
+        self.data = data
+        self.fingerprints = dict(fingerprints) if fingerprints is not None else {}
+
+    def _fingerprint(self, name: str) -> Optional[str]:
+        if name not in self.fingerprints:
+            self.fingerprints[name] = _fingerprint_value(self.data.get(name))
+        return self.fingerprints[name]
+
+    def run(self, name: str, data_keys: Iterable[str], params: Dict[str, Any], fn: Callable[[], Any]):
+        raw = json.dumps(
+            {
+                'version': CACHE_VERSION,
+                'stage': name,
+                'data': {k: self._fingerprint(k) for k in data_keys},
+                'params': params,
+            },
+            sort_keys=True, default=str,
+        )
+        key = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        found, value = self.cache._lookup(key)
+        if found:
+            return value
+        value = fn()
+        self.cache._remember(name, key, value)
+        return value
+
+
+_CACHE: Optional[ForecastCache] = None
+_STAGE_CACHE: Optional[StageCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_forecast_cache() -> ForecastCache:
+    """Proces-brede cache (gedeeld door alle Streamlit sessies)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ForecastCache.from_env()
+        return _CACHE
+
+
+def get_stage_cache() -> StageCache:
+    """Proces-brede stage cache (gedeeld door alle Streamlit sessies)."""
+    global _STAGE_CACHE
+    with _CACHE_LOCK:
+        if _STAGE_CACHE is None:
+            _STAGE_CACHE = StageCache.from_env()
+        return _STAGE_CACHE
+
+
+def cached_forecast_v7(
+    data: Dict[str, pd.DataFrame],
+    weeks_forecast: int = 13,
+    weeks_history: int = 13,
+    reference_date=None,
+    calibrated_dso: Optional[float] = None,
+    calibrated_dpo: Optional[float] = None,
+    forecast_profile=None,
+    cache: Optional[ForecastCache] = None,
+    stage_cache: Optional[StageCache] = None,
+) -> Tuple[pd.DataFrame, int, Dict]:
+    """create_forecast_v7 met memoization; zelfde argumenten en resultaat.
+
+    reference_date=None wordt hier al naar vandaag omgezet, zodat de sleutel
+    na middernacht verandert. Het resultaat is een kopie: aanpassingen door
+    de aanroeper komen niet in de cache terecht.
+    """
+    if reference_date is None:
+        reference_date = pd.Timestamp.now().date()
+    cache = cache if cache is not None else get_forecast_cache()
+    stage_cache = stage_cache if stage_cache is not None else get_stage_cache()
+
+    params = dict(
+        weeks_forecast=weeks_forecast,
+        weeks_history=weeks_history,
+        reference_date=reference_date,
+        calibrated_dso=calibrated_dso,
+        calibrated_dpo=calibrated_dpo,
+        forecast_profile=forecast_profile,
+    )
+    fingerprints = fingerprint_data(data)
+    key = forecast_cache_key(data, fingerprints=fingerprints, **params)
+    result = cache.get(key)
+    from_cache = result is not None
+    if result is None:
+        result = create_forecast_v7(data=data, stages=stage_cache.bind(data, fingerprints), **params)
+        cache.put(key, result)
+
+    forecast_df, forecast_start_idx, metadata = result
+    metadata = copy.deepcopy(metadata)
+    if 'stage_timings' in metadata:
+        # Timings horen bij de oorspronkelijke run; markeer een cache-hit
+        metadata['stage_timings']['from_cache'] = from_cache
+    return forecast_df.copy(), forecast_start_idx, metadata
@@ -33,6 +33,8 @@ Blending:
 
 import pandas as pd
 import numpy as np
+import time
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional
@@ -126,6 +128,38 @@ def _week_contains_month_end(week_start: date) -> Optional[date]:
 # PILAAR 1: REALITEIT
 # =============================================================================
 
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Parse een datumkolom in één keer naar (tz-naive) datums om middernacht.
+
+    Valt terug op per-element parsing bij gemengde formaten; onleesbare of
+    out-of-bounds datums (bijv. 9999-12-31) worden NaT.
+    """
+    try:
+        dates = pd.to_datetime(values)
+    except (ValueError, TypeError):
+        dates = pd.to_datetime(values, format='mixed', errors='coerce')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.normalize()
+
+
+def _weekly_totals(
+    dates: pd.Series,
+    amounts: np.ndarray,
+    reference_date: date,
+    weeks: int,
+    shift_days: int = 0,
+) -> np.ndarray:
+    """Tel bedragen op per weekindex t.o.v. reference_date (array van lengte weeks)."""
+    dates = _parse_dates(dates)
+    days = (dates - pd.Timestamp(reference_date)).dt.days.to_numpy(dtype=float) + shift_days
+    valid = ~np.isnan(days)
+    w_idx = np.floor_divide(days[valid], 7).astype(np.int64)
+    amounts = np.asarray(amounts, dtype=float)[valid]
+    in_range = (w_idx >= 0) & (w_idx < weeks)
+    return np.bincount(w_idx[in_range], weights=amounts[in_range], minlength=weeks)[:weeks]
+
+
 def _build_realiteit(
     debiteuren: pd.DataFrame,
     crediteuren: pd.DataFrame,
@@ -138,8 +172,7 @@ def _build_realiteit(
     btw_prognose: pd.DataFrame = None,
 ) -> Dict[int, Dict[str, float]]:
     """Harde ERP-feiten per week: open AR/AP met DSO/DPO correctie."""
-    result = {w: {'inkomsten': 0.0, 'uitgaven': 0.0, 'salarissen': 0.0, 'btw': 0.0}
-              for w in range(weeks)}
+    totals = {k: np.zeros(weeks) for k in ('inkomsten', 'uitgaven', 'salarissen', 'btw')}
 
     # --- Debiteuren: open facturen + DSO shift ---
     if not debiteuren.empty:
@@ -147,19 +180,14 @@ def _build_realiteit(
         amt_col = next((c for c in ['openstaand', 'bedrag_excl_btw'] if c in debiteuren.columns), None)
 
         if date_col and amt_col:
-            for _, row in debiteuren.iterrows():
-                d, a = row[date_col], row[amt_col]
-                if pd.isna(d) or pd.isna(a) or float(a) <= 0:
-                    continue
-                if isinstance(d, str):
-                    d = pd.to_datetime(d).date()
-                elif hasattr(d, 'date'):
-                    d = d.date()
-
-                expected = d + timedelta(days=max(0, dso_days))
-                w_idx = (expected - reference_date).days // 7
-                if 0 <= w_idx < weeks:
-                    result[w_idx]['inkomsten'] += float(a)
+            amounts = pd.to_numeric(debiteuren[amt_col], errors='coerce')
+            mask = (amounts > 0) & debiteuren[date_col].notna()
+            # DSO in hele dagen (zoals date + timedelta)
+            shift = timedelta(days=max(0, dso_days)).days
+            totals['inkomsten'] = _weekly_totals(
+                debiteuren.loc[mask, date_col], amounts[mask].to_numpy(),
+                reference_date, weeks, shift,
+            )
 
     # --- Crediteuren: open facturen + DPO shift ---
     if not crediteuren.empty:
@@ -167,48 +195,39 @@ def _build_realiteit(
         amt_col = next((c for c in ['openstaand', 'bedrag_excl_btw'] if c in crediteuren.columns), None)
 
         if date_col and amt_col:
-            for _, row in crediteuren.iterrows():
-                d, a = row[date_col], row[amt_col]
-                if pd.isna(d) or pd.isna(a) or float(a) <= 0:
-                    continue
-                if isinstance(d, str):
-                    d = pd.to_datetime(d).date()
-                elif hasattr(d, 'date'):
-                    d = d.date()
-
-                expected = d + timedelta(days=max(0, dpo_days))
-                w_idx = (expected - reference_date).days // 7
-                if 0 <= w_idx < weeks:
-                    result[w_idx]['uitgaven'] += float(a)
+            amounts = pd.to_numeric(crediteuren[amt_col], errors='coerce')
+            mask = (amounts > 0) & crediteuren[date_col].notna()
+            shift = timedelta(days=max(0, dpo_days)).days
+            totals['uitgaven'] = _weekly_totals(
+                crediteuren.loc[mask, date_col], amounts[mask].to_numpy(),
+                reference_date, weeks, shift,
+            )
 
     # --- Geplande salarissen (als bekend) ---
     if not salarissen.empty and 'betaaldatum' in salarissen.columns:
-        for _, row in salarissen.iterrows():
-            bd = row['betaaldatum']
-            if pd.isna(bd):
-                continue
-            if isinstance(bd, str):
-                bd = pd.to_datetime(bd).date()
-            elif hasattr(bd, 'date'):
-                bd = bd.date()
-            w_idx = (bd - reference_date).days // 7
-            if 0 <= w_idx < weeks:
-                result[w_idx]['salarissen'] += float(row.get('bedrag', 0))
+        mask = salarissen['betaaldatum'].notna()
+        if 'bedrag' in salarissen.columns:
+            amounts = pd.to_numeric(salarissen.loc[mask, 'bedrag'], errors='coerce').to_numpy()
+        else:
+            amounts = np.zeros(int(mask.sum()))
+        totals['salarissen'] = _weekly_totals(
+            salarissen.loc[mask, 'betaaldatum'], amounts, reference_date, weeks,
+        )
 
     # --- Bekende BTW-verplichtingen (recente maanden met bedrag) ---
     if not btw_data.empty and 'maand' in btw_data.columns:
-        df_btw = btw_data.copy()
-        df_btw['maand'] = pd.to_datetime(df_btw['maand'])
-        df_btw['btw_bedrag'] = pd.to_numeric(df_btw['btw_bedrag'], errors='coerce').fillna(0)
+        maand = pd.to_datetime(btw_data['maand'])
+        btw_bedrag = pd.to_numeric(btw_data['btw_bedrag'], errors='coerce').fillna(0).abs()
         # Alleen toekomstige BTW-verplichtingen
-        future_btw = df_btw[df_btw['maand'] >= pd.Timestamp(reference_date)]
-        for _, row in future_btw.iterrows():
-            btw_date = row['maand']
-            if hasattr(btw_date, 'date'):
-                btw_date = btw_date.date()
-            w_idx = (btw_date - reference_date).days // 7
-            if 0 <= w_idx < weeks and abs(row['btw_bedrag']) > 0:
-                result[w_idx]['btw'] += abs(float(row['btw_bedrag']))
+        mask = (maand >= pd.Timestamp(reference_date)) & (btw_bedrag > 0)
+        totals['btw'] = _weekly_totals(
+            maand[mask], btw_bedrag[mask].to_numpy(), reference_date, weeks,
+        )
+
+    result = {
+        w: {k: float(v[w]) for k, v in totals.items()}
+        for w in range(weeks)
+    }
 
     # --- SSM Prognose BTW (netto BTW-positie uit DWH) ---
     # Overschrijft de bovenstaande ritme-schatting met werkelijke prognose als beschikbaar
@@ -1160,6 +1179,104 @@ def _blend_pillars(
     return result
 
 
+# =============================================================================
+# STAGES — afhankelijkheden per stap van de pipeline
+# =============================================================================
+
+# Databronnen (keys in `data`) waar elke stap van afhangt, inclusief die van
+# eerdere stappen die als input dienen (volume gebruikt structuur). Geen van
+# deze stappen leest het ForecastProfile: bij een profielwijziging hoeven
+# alleen de overrides, de blend en de output opnieuw. Zie
+# src/forecast_cache.StageCache.
+V7_STAGE_INPUTS: Dict[str, Tuple[str, ...]] = {
+    'bedrijfstype': ('historische_cashflow', 'debiteuren'),
+    'realiteit': ('debiteuren', 'crediteuren', 'geplande_salarissen',
+                  'btw_aangifteregels', 'btw_prognose'),
+    'structuur': ('historische_cashflow', 'btw_aangifteregels', 'salarishistorie',
+                  'betaalgedrag_debiteuren', 'betaalgedrag_crediteuren'),
+    'volume': ('historische_cashflow', 'btw_aangifteregels', 'salarishistorie',
+               'betaalgedrag_debiteuren', 'betaalgedrag_crediteuren',
+               'budgetten', 'orderportefeuille', 'service_contract_intake'),
+    'pijplijn': ('service_orders_prognose', 'orderportefeuille', 'orderregels_periodiek',
+                 'orderregels_eenmalig', 'abonnementen'),
+    'terugkerende_kosten': ('terugkerende_kosten',),
+    'inkomstenpatroon': ('historische_cashflow',),
+    'run_rate': ('historische_cashflow',),
+}
+
+
+def _count_rows(value) -> Optional[int]:
+    """Aantal rijen/weken van een (tussen)resultaat, None als dat niet zinvol is."""
+    if isinstance(value, (pd.DataFrame, pd.Series, dict, list)):
+        return len(value)
+    return None
+
+
+class StageTracer:
+    """
+    Wall time en rijaantallen per stap van create_forecast_v7.
+
+    Gebruik:
+        tracer = StageTracer(data)
+        with tracer.span('realiteit', inputs=('debiteuren', 'crediteuren')) as span:
+            realiteit = _build_realiteit(...)
+            span['rows_out'] = len(realiteit)
+        metadata['stage_timings'] = tracer.summary()
+
+    rows_in is het totaal aantal rijen van de gebruikte databronnen; rows_out
+    het aantal rijen/weken van het resultaat (None voor profielobjecten).
+    cached=True betekent dat de stage cache het resultaat leverde.
+    """
+
+    def __init__(self, data: Optional[Dict[str, pd.DataFrame]] = None):
+        self.data = data or {}
+        self.records: List[Dict] = []
+        self._started = time.perf_counter()
+
+    def _rows_in(self, inputs) -> Optional[int]:
+        if not inputs:
+            return None
+        return sum(len(self.data[k]) for k in inputs if isinstance(self.data.get(k), pd.DataFrame))
+
+    @contextmanager
+    def span(self, name: str, inputs: Tuple[str, ...] = ()):
+        record = {'stage': name, 'seconds': 0.0, 'rows_in': self._rows_in(inputs),
+                  'rows_out': None, 'cached': False}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            self.records.append(record)
+
+    def summary(self) -> Dict:
+        return {
+            'total_s': round(time.perf_counter() - self._started, 6),
+            'stages': [dict(r) for r in self.records],
+        }
+
+
+def _run_stage(stages, name: str, fn, tracer: Optional[StageTracer] = None, **params):
+    """Voer een stap uit; met een stage cache alleen als de input gewijzigd is.
+
+    Met een tracer worden duur, rijen en cache-hit van de stap vastgelegd.
+    """
+    if tracer is None:
+        return fn() if stages is None else stages.run(name, V7_STAGE_INPUTS[name], params, fn)
+
+    with tracer.span(name, V7_STAGE_INPUTS[name]) as span:
+        executed = []
+
+        def traced():
+            executed.append(True)
+            return fn()
+
+        value = traced() if stages is None else stages.run(name, V7_STAGE_INPUTS[name], params, traced)
+        span['cached'] = not executed
+        span['rows_out'] = _count_rows(value)
+    return value
+
+
 # =============================================================================
 # HOOFDFUNCTIE
 # =============================================================================
@@ -1172,6 +1289,7 @@ def create_forecast_v7(
     calibrated_dso: Optional[float] = None,
     calibrated_dpo: Optional[float] = None,
     forecast_profile=None,
+    stages=None,
 ) -> Tuple[pd.DataFrame, int, Dict]:
     """
     V7 forecast: Structuur x Volume x Realiteit.
@@ -1185,11 +1303,19 @@ def create_forecast_v7(
         calibrated_dpo: Gecalibreerde DPO in dagen
         forecast_profile: Optioneel ForecastProfile met klant-specifieke instellingen.
             Als None wordt het profiel automatisch gedetecteerd.
+        stages: Optionele stage cache, gebonden aan `data` (zie
+            forecast_cache.StageCache.bind). Stappen waarvan de input
+            (V7_STAGE_INPUTS + parameters) niet gewijzigd is, worden dan
+            niet opnieuw uitgevoerd.
 
     Returns:
         (forecast_df, forecast_start_idx, metadata)
         Backward compatible met V6. Extra kolommen: pilaar_realiteit/structuur/volume
+        metadata['stage_timings'] bevat per stap de duur, rijen in/uit en
+        of het resultaat uit de stage cache kwam (zie StageTracer).
     """
+    tracer = StageTracer(data)
+
     if reference_date is None:
         reference_date = datetime.now().date()
     elif isinstance(reference_date, datetime):
@@ -1233,7 +1359,11 @@ def create_forecast_v7(
     # =========================================================================
     # BEDRIJFSTYPE DETECTIE + PROFIEL OVERRIDES
     # =========================================================================
-    business_profile = _detect_business_type(hist_cf, debiteuren)
+    business_profile = _run_stage(
+        stages, 'bedrijfstype',
+        lambda: _detect_business_type(hist_cf, debiteuren),
+        tracer=tracer,
+    )
 
     # Auto-detectie resultaat bewaren (voor UI: "model stelt voor...")
     auto_detected_type = business_profile.business_type
@@ -1245,42 +1375,67 @@ def create_forecast_v7(
     # =========================================================================
     # PILAAR 1: REALITEIT (harde ERP-feiten)
     # =========================================================================
-    realiteit = _build_realiteit(
-        debiteuren, crediteuren, salarissen, btw_data,
-        dso_days, dpo_days, reference_date, weeks_forecast,
-        btw_prognose=btw_prognose,
+    realiteit = _run_stage(
+        stages, 'realiteit',
+        lambda: _build_realiteit(
+            debiteuren, crediteuren, salarissen, btw_data,
+            dso_days, dpo_days, reference_date, weeks_forecast,
+            btw_prognose=btw_prognose,
+        ),
+        dso_days=dso_days, dpo_days=dpo_days,
+        reference_date=reference_date, weeks=weeks_forecast,
+        tracer=tracer,
     )
 
     # =========================================================================
     # PILAAR 2: STRUCTUUR (historische timing-patronen)
     # =========================================================================
-    structuur = _build_structuur(
-        hist_cf, btw_data, salaris_data, betaalgedrag_deb, betaalgedrag_cred,
+    structuur = _run_stage(
+        stages, 'structuur',
+        lambda: _build_structuur(
+            hist_cf, btw_data, salaris_data, betaalgedrag_deb, betaalgedrag_cred,
+        ),
+        tracer=tracer,
     )
 
     # =========================================================================
     # PILAAR 3: VOLUME (hoeveel, uit budget of run rate)
     # =========================================================================
-    volume = _build_volume(
-        hist_cf, budgetten, orders, structuur, reference_date, weeks_forecast,
-        service_contract_intake=service_contract_intake,
+    volume = _run_stage(
+        stages, 'volume',
+        lambda: _build_volume(
+            hist_cf, budgetten, orders, structuur, reference_date, weeks_forecast,
+            service_contract_intake=service_contract_intake,
+        ),
+        reference_date=reference_date, weeks=weeks_forecast,
+        tracer=tracer,
     )
 
     # =========================================================================
     # NIEUW: PROJECTPIJPLIJN (facturering prioriteitshiërarchie v3)
     # =========================================================================
-    pipeline = _build_project_pipeline(
-        service_orders, orders, dso_days, reference_date, weeks_forecast,
-        orderregels_periodiek=orderregels_periodiek,
-        orderregels_eenmalig=orderregels_eenmalig,
-        abonnementen=abonnementen,
+    pipeline = _run_stage(
+        stages, 'pijplijn',
+        lambda: _build_project_pipeline(
+            service_orders, orders, dso_days, reference_date, weeks_forecast,
+            orderregels_periodiek=orderregels_periodiek,
+            orderregels_eenmalig=orderregels_eenmalig,
+            abonnementen=abonnementen,
+        ),
+        dso_days=dso_days, reference_date=reference_date, weeks=weeks_forecast,
+        tracer=tracer,
     )
 
     # =========================================================================
     # NIEUW: TERUGKERENDE KOSTEN (deterministische uitgaven)
     # =========================================================================
-    recurring_costs = _build_recurring_costs(
-        terugkerende_kosten_data, reference_date, weeks_forecast,
+    recurring_costs = _run_stage(
+        stages, 'terugkerende_kosten',
+        lambda: _build_recurring_costs(
+            terugkerende_kosten_data, reference_date, weeks_forecast,
+        ),
+        reference_date=reference_date, weeks=weeks_forecast,
+        tracer=tracer,
     )
 
     # =========================================================================
@@ -1294,21 +1449,28 @@ def create_forecast_v7(
         use_recurring = forecast_profile.effective_recurring
 
     if business_profile.business_type == 'project_based':
-        income_pattern = _estimate_income_pattern(
-            hist_cf, reference_date, weeks_forecast,
+        income_pattern = _run_stage(
+            stages, 'inkomstenpatroon',
+            lambda: _estimate_income_pattern(
+                hist_cf, reference_date, weeks_forecast,
+            ),
+            reference_date=reference_date, weeks=weeks_forecast,
+            tracer=tracer,
         )
 
     # =========================================================================
     # BLEND (met projectpijplijn, terugkerende kosten, adaptieve blending)
     # =========================================================================
-    blended = _blend_pillars(
-        realiteit, volume, structuur, reference_date, weeks_forecast,
-        pipeline=pipeline if use_pipeline else None,
-        recurring_costs=recurring_costs if use_recurring else None,
-        business_profile=business_profile,
-        income_pattern=income_pattern,
-        forecast_profile=forecast_profile,
-    )
+    with tracer.span('blend') as span:
+        blended = _blend_pillars(
+            realiteit, volume, structuur, reference_date, weeks_forecast,
+            pipeline=pipeline if use_pipeline else None,
+            recurring_costs=recurring_costs if use_recurring else None,
+            business_profile=business_profile,
+            income_pattern=income_pattern,
+            forecast_profile=forecast_profile,
+        )
+        span['rows_out'] = len(blended)
 
     # =========================================================================
     # OUTPUT (backward compatible met V6)
@@ -1355,8 +1517,13 @@ def create_forecast_v7(
         df['cumulatief_saldo'] = start_balance + df['netto_cashflow'].cumsum()
 
     # Metadata
-    income_rate, expense_rate = _calc_weighted_run_rate(hist_cf)
-    data_quality = _validate_v7_quality(data, structuur)
+    income_rate, expense_rate = _run_stage(
+        stages, 'run_rate', lambda: _calc_weighted_run_rate(hist_cf),
+        tracer=tracer,
+    )
+    with tracer.span('validatie', ('historische_cashflow', 'debiteuren', 'crediteuren', 'banksaldo',
+                                   'btw_aangifteregels', 'salarishistorie')):
+        data_quality = _validate_v7_quality(data, structuur)
 
     metadata = {
         'portfolio_dso': dso_days,
@@ -1427,6 +1594,7 @@ def create_forecast_v7(
             'service_contract_intake': not service_contract_intake.empty,
             'btw_prognose': not btw_prognose.empty,
         },
+        'stage_timings': tracer.summary(),
     }
 
     return df, forecast_start_idx, metadata
@@ -0,0 +1,246 @@
+"""
+Liquiditeitsprognose - Cashflow History Cache
+=============================================
+Lokale cache voor de historische cashflow per week.
+
+get_historische_cashflow_per_week aggregeert bij elke aanroep alle
+Journaalregels van 12-24 maanden, terwijl afgesloten weken niet meer
+veranderen. Deze cache bewaart per (klant, administratie) de cashflow per
+boekdatum voor afgesloten weken in één Parquet-bestand. Bij een nieuwe
+aanvraag wordt alleen opgehaald wat ontbreekt: normaal de weken na de
+laatste afgesloten week (plus een eventueel ontbrekend stuk aan het begin
+als de lookback langer is dan eerder).
+
+Op dagniveau opslaan maakt het resultaat identiek aan de SQL-aggregatie,
+ook als startdatum/einddatum midden in een week vallen (de SQL filtert op
+boekdatum en groepeert daarna per week, weeknummer en maand).
+
+Een week geldt als afgesloten als hij meer dan `settle_days` dagen geleden
+eindigde (default 7: ruimte voor laat geboekte mutaties).
+
+Gebruik:
+    cache = history_cache()          # None als HISTORY_CACHE_DIR niet gezet is
+    df = cache.weekly(fetch_daily, ('1229', 'Adm'), startdatum, einddatum)
+
+Configuratie via environment:
+    HISTORY_CACHE_DIR          Map voor de Parquet-bestanden (leeg = uit)
+    HISTORY_CACHE_SETTLE_DAYS  Dagen na weekeinde voordat een week vast ligt (default 7)
+
+Vereist pyarrow (of fastparquet) voor Parquet opslag.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+
+DAILY_COLUMNS = ['boekdatum', 'inkomsten', 'uitgaven']
+WEEKLY_COLUMNS = ['week_start', 'week_nummer', 'maand', 'inkomsten', 'uitgaven', 'netto']
+
+
+def _monday(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def _normalize_daily(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame({
+            'boekdatum': pd.Series(dtype='datetime64[ns]'),
+            'inkomsten': pd.Series(dtype=float),
+            'uitgaven': pd.Series(dtype=float),
+        })
+    out = pd.DataFrame({
+        'boekdatum': pd.to_datetime(df['boekdatum']).dt.normalize(),
+        'inkomsten': pd.to_numeric(df['inkomsten'], errors='coerce').fillna(0.0).astype(float),
+        'uitgaven': pd.to_numeric(df['uitgaven'], errors='coerce').fillna(0.0).astype(float),
+    })
+    return out.groupby('boekdatum', as_index=False)[['inkomsten', 'uitgaven']].sum()
+
+
+def aggregate_weekly(daily: pd.DataFrame) -> pd.DataFrame:
+    """Dag-cashflow naar het formaat van get_historische_cashflow_per_week.
+
+    Zelfde groepering als de SQL: DATE_TRUNC('week'), ISO-weeknummer en maand
+    van de boekdatum (een week over een maandgrens geeft dus twee rijen).
+    """
+    if daily.empty:
+        return pd.DataFrame({c: [] for c in WEEKLY_COLUMNS})
+    dates = daily['boekdatum']
+    grouped = pd.DataFrame({
+        'week_start': dates - pd.to_timedelta(dates.dt.weekday, unit='D'),
+        'week_nummer': dates.dt.isocalendar().week.astype(int).to_numpy(),
+        'maand': dates.dt.month,
+        'inkomsten': daily['inkomsten'],
+        'uitgaven': daily['uitgaven'],
+    }).groupby(['week_start', 'week_nummer', 'maand'], as_index=False)[['inkomsten', 'uitgaven']].sum()
+    grouped['netto'] = grouped['inkomsten'] - grouped['uitgaven']
+    return grouped.sort_values(['week_start', 'maand'], ignore_index=True)[WEEKLY_COLUMNS]
+
+
+class WeeklyCashflowCache:
+    """Parquet-cache met de dag-cashflow van afgesloten weken per (klant, administratie).
+
+    Per sleutel staan twee bestanden in de map:
+        <hash>.parquet - boekdatum, inkomsten, uitgaven (alleen afgesloten weken)
+        <hash>.json    - gedekte periode [covered_from, covered_to) in maandagen
+
+    De gedekte periode is altijd aaneengesloten. Schrijven gaat via een
+    tijdelijk bestand + os.replace.
+    """
+
+    def __init__(self, directory: str, settle_days: int = 7):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                raise ImportError("WeeklyCashflowCache vereist pyarrow of fastparquet: pip install pyarrow")
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.settle_days = settle_days
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.hits = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['WeeklyCashflowCache']:
+        directory = os.getenv('HISTORY_CACHE_DIR', '')
+        if not directory:
+            return None
+        return cls(directory, settle_days=int(os.getenv('HISTORY_CACHE_SETTLE_DAYS', '7')))
+
+    def _paths(self, key: Tuple) -> Tuple[Path, Path]:
+        name = hashlib.sha256(json.dumps([str(k) for k in key]).encode('utf-8')).hexdigest()[:32]
+        return self.directory / f'{name}.parquet', self.directory / f'{name}.json'
+
+    def _load(self, key: Tuple):
+        data_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            daily = pd.read_parquet(data_path)
+            return (date.fromisoformat(meta['covered_from']),
+                    date.fromisoformat(meta['covered_to']),
+                    _normalize_daily(daily))
+        except (OSError, ValueError, KeyError):
+            return None
+        except Exception:
+            # Corrupt bestand — opnieuw opbouwen
+            return None
+
+    def _store(self, key: Tuple, covered_from: date, covered_to: date, daily: pd.DataFrame):
+        data_path, meta_path = self._paths(key)
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            daily.to_parquet(tmp, index=False)
+            os.replace(tmp, data_path)
+        except Exception:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        meta_tmp = meta_path.with_suffix('.json.tmp')
+        meta_tmp.write_text(json.dumps({
+            'key': [str(k) for k in key],
+            'covered_from': covered_from.isoformat(),
+            'covered_to': covered_to.isoformat(),
+        }), encoding='utf-8')
+        os.replace(meta_tmp, meta_path)
+
+    def weekly(
+        self,
+        fetch_daily: Callable[[date, date], pd.DataFrame],
+        key: Tuple,
+        startdatum: date,
+        einddatum: date,
+        today: Optional[date] = None,
+    ) -> pd.DataFrame:
+        """Weekcashflow voor boekdatum in [startdatum, einddatum).
+
+        Args:
+            fetch_daily: Haalt de dag-cashflow op voor [van, tot)
+                (kolommen boekdatum, inkomsten, uitgaven)
+            key: Sleutel, bijv. (klantnummer, administratie)
+            startdatum: Eerste boekdatum (inclusief)
+            einddatum: Laatste boekdatum (exclusief)
+            today: Vandaag (voor tests)
+        """
+        today = today or date.today()
+        final_to = _monday(today - timedelta(days=self.settle_days))
+
+        with self._lock:
+            cached = self._load(key)
+            pieces = []
+            if cached is None:
+                covered_from = covered_to = None
+                cached_daily = _normalize_daily(None)
+            else:
+                covered_from, covered_to, cached_daily = cached
+
+            fetch_start = _monday(startdatum)
+            if covered_from is None:
+                ranges = [(fetch_start, einddatum)]
+            else:
+                ranges = []
+                if fetch_start < covered_from:
+                    ranges.append((fetch_start, covered_from))
+                if einddatum > covered_to:
+                    ranges.append((covered_to, einddatum))
+                if not ranges:
+                    self.hits += 1
+
+            for van, tot in ranges:
+                if van < tot:
+                    self.queries += 1
+                    pieces.append(_normalize_daily(fetch_daily(van, tot)))
+
+            fetched = pd.concat(pieces, ignore_index=True) if pieces else _normalize_daily(None)
+            combined = pd.concat([cached_daily, fetched], ignore_index=True) if pieces else cached_daily
+
+            # Bijwerken: alleen volledig opgehaalde, afgesloten weken
+            if pieces:
+                new_from = min(fetch_start, covered_from) if covered_from else fetch_start
+                fetched_to = max(tot for _, tot in ranges)
+                new_to = min(final_to, _monday(fetched_to))
+                if covered_to is not None:
+                    new_to = max(new_to, covered_to)
+                if new_to > new_from:
+                    keep = combined[
+                        (combined['boekdatum'] >= pd.Timestamp(new_from))
+                        & (combined['boekdatum'] < pd.Timestamp(new_to))
+                    ]
+                    keep = keep.drop_duplicates('boekdatum').sort_values('boekdatum', ignore_index=True)
+                    self._store(key, new_from, new_to, keep)
+
+        result = combined.drop_duplicates('boekdatum')
+        result = result[
+            (result['boekdatum'] >= pd.Timestamp(startdatum))
+            & (result['boekdatum'] < pd.Timestamp(einddatum))
+        ].sort_values('boekdatum', ignore_index=True)
+        return aggregate_weekly(result)
+
+    def stats(self) -> dict:
+        return {'queries': self.queries, 'hits': self.hits}
+
+
+_CACHE: Optional[WeeklyCashflowCache] = None
+_CACHE_LOADED = False
+_CACHE_LOCK = threading.Lock()
+
+
+def history_cache() -> Optional[WeeklyCashflowCache]:
+    """Proces-brede cache op basis van HISTORY_CACHE_DIR (None als niet gezet)."""
+    global _CACHE, _CACHE_LOADED
+    with _CACHE_LOCK:
+        if not _CACHE_LOADED:
+            _CACHE = WeeklyCashflowCache.from_env()
+            _CACHE_LOADED = True
+        return _CACHE
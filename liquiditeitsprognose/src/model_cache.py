@@ -0,0 +1,135 @@
+"""
+Liquiditeitsprognose - Model Cache
+==================================
+Hergebruik van gefitte tijdreeksmodellen (Holt-Winters, Prophet).
+
+forecast_revenue_holt_winters en create_prophet_forecast fitten bij elke
+run van de gelaagde/ML forecast opnieuw, terwijl de historie meestal niet
+veranderd is. Vooral Prophet kost per fit enkele seconden. Deze cache bewaart
+het gefitte model onder (soort model, administratie, hash van de reeks,
+hyperparameters); zolang de reeks gelijk blijft wordt het model hergebruikt
+en alleen opnieuw gevoorspeld. Komt er een week bij (of verandert een
+bestaande week), dan verandert de hash en volgt één nieuwe fit.
+
+De forecast-horizon zit bewust niet in de sleutel: een gefit model voorspelt
+elke horizon.
+
+Opslag hergebruikt ForecastCache: LRU in geheugen, optioneel een map op
+schijf (pickle, tijdelijk bestand + os.replace, begrensd op grootte).
+Prophet-modellen gaan via prophet.serialize naar JSON, zodat alleen de
+gefitte parameters en de trainingshistorie bewaard worden.
+
+Gebruik:
+    fit = get_model_cache().get_or_fit(
+        'holt_winters', administratie, series, {'seasonal_periods': 52},
+        fit=lambda: model.fit(optimized=True),
+    )
+
+Configuratie via environment:
+    MODEL_CACHE_SIZE     Max aantal modellen in geheugen (default 16, 0 = uit)
+    MODEL_CACHE_DIR      Optioneel: map voor persistente opslag op schijf
+    MODEL_CACHE_MAX_MB   Max grootte van de schijfcache (default 100)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from src.forecast_cache import ForecastCache, fingerprint_frame
+
+
+# Ophogen als de manier van fitten verandert (andere defaults, nieuwe versie
+# van statsmodels/prophet met ander pickle-formaat, ...)
+MODEL_CACHE_VERSION = 1
+
+
+def model_cache_key(kind: str, administratie: Optional[str], series, params: Dict[str, Any]) -> str:
+    """Sleutel voor (soort model, administratie, reeks, hyperparameters)."""
+    frame = series.to_frame() if isinstance(series, pd.Series) else series
+    raw = json.dumps({
+        'version': MODEL_CACHE_VERSION,
+        'kind': kind,
+        'administratie': administratie or '',
+        'series': fingerprint_frame(frame),
+        'params': params,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ModelCache(ForecastCache):
+    """ForecastCache voor gefitte modellen, met get_or_fit als ingang."""
+
+    def __init__(self, max_entries: int = 16, directory: Optional[str] = None,
+                 max_bytes: Optional[int] = 100 * 1024 * 1024):
+        super().__init__(max_entries=max_entries, directory=directory, max_bytes=max_bytes)
+        self.fits = 0
+
+    @classmethod
+    def from_env(cls) -> 'ModelCache':
+        max_mb = float(os.getenv('MODEL_CACHE_MAX_MB', '100'))
+        return cls(
+            max_entries=int(os.getenv('MODEL_CACHE_SIZE', '16')),
+            directory=os.getenv('MODEL_CACHE_DIR') or None,
+            max_bytes=int(max_mb * 1024 * 1024),
+        )
+
+    def get_or_fit(
+        self,
+        kind: str,
+        administratie: Optional[str],
+        series,
+        params: Dict[str, Any],
+        fit: Callable[[], Any],
+        dumps: Optional[Callable[[Any], Any]] = None,
+        loads: Optional[Callable[[Any], Any]] = None,
+    ):
+        """
+        Geef het gefitte model uit de cache, of fit en bewaar het.
+
+        Args:
+            kind: Soort model ('holt_winters', 'prophet', ...)
+            administratie: Administratie (namespace; None = alle)
+            series: De trainingsreeks (Series of DataFrame) waarop gefit wordt
+            params: Hyperparameters die de fit bepalen
+            fit: Functie die het model fit en teruggeeft
+            dumps/loads: Optionele (de)serialisatie van het model voor opslag
+        """
+        key = model_cache_key(kind, administratie, series, params)
+        stored = self.get(key)
+        if stored is not None:
+            try:
+                return loads(stored) if loads else stored
+            except Exception:
+                pass  # Onleesbaar (andere versie) — opnieuw fitten
+
+        model = fit()
+        with self._lock:
+            self.fits += 1
+        try:
+            self.put(key, dumps(model) if dumps else model)
+        except Exception:
+            pass  # Niet serialiseerbaar: dan alleen geen cache
+        return model
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats['fits'] = self.fits
+        return stats
+
+
+_MODEL_CACHE: Optional[ModelCache] = None
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def get_model_cache() -> ModelCache:
+    """Proces-brede modelcache (gedeeld door alle Streamlit sessies)."""
+    global _MODEL_CACHE
+    with _MODEL_CACHE_LOCK:
+        if _MODEL_CACHE is None:
+            _MODEL_CACHE = ModelCache.from_env()
+        return _MODEL_CACHE
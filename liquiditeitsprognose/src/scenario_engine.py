@@ -0,0 +1,232 @@
+"""
+Liquiditeitsprognose - Scenario Engine (Monte Carlo)
+====================================================
+Risicobanden rond de puntprognose: hoe ver kan het banksaldo per week
+afwijken als debiteuren (en optioneel crediteuren) sneller of trager betalen
+dan verwacht?
+
+Per openstaande factuur wordt de betaaltermijn getrokken uit de verdeling
+van die relatie (gem_dagen_tot_betaling / std_dagen_tot_betaling uit
+get_betaalgedrag_per_debiteur of _per_crediteur). Relaties zonder historie
+krijgen de portefeuille-verdeling (gewogen naar factuurbedrag).
+
+    betaaldatum = factuurdatum + max(0, N(gem, std))
+    (al verstreken → betaling in week 0; na de horizon → valt buiten beeld)
+
+De bandbreedte is de afwijking van elk scenario ten opzichte van het
+verwachte schema (elke factuur op de gemiddelde termijn), opgeteld bij het
+cumulatieve saldo van de puntprognose. P50 ligt daardoor rond de
+puntprognose en de banden tonen alleen de timing-onzekerheid.
+
+Alle scenario's worden als NumPy-arrays doorgerekend (in blokken, zodat het
+geheugengebruik begrensd blijft): 10.000 scenario's x 13 weken kosten bij
+enkele honderden open posten ruim minder dan een seconde.
+
+Gebruik:
+    forecast, start_idx, meta = create_forecast_v7(data, reference_date=d)
+    bands = simulate_balance_bands(
+        forecast, data['debiteuren'], data['betaalgedrag_debiteuren'],
+        reference_date=d, n_scenarios=10_000, seed=1,
+    )
+"""
+
+from datetime import date, datetime
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.forecast_v7 import _parse_dates
+
+
+# Fallback als er helemaal geen betaalgedrag bekend is
+DEFAULT_DELAY_DAYS = 35.0
+DEFAULT_DELAY_STD = 15.0
+DEFAULT_PAYMENT_TERM = 30
+
+# Max aantal getrokken termijnen per blok (facturen x scenario's)
+_CHUNK_ELEMENTS = 2_000_000
+
+
+def _delay_distribution(
+    codes: pd.Series,
+    betaalgedrag: Optional[pd.DataFrame],
+    code_col: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Gemiddelde en standaardafwijking van de betaaltermijn per factuur."""
+    n = len(codes)
+    mean = np.full(n, DEFAULT_DELAY_DAYS)
+    std = np.full(n, DEFAULT_DELAY_STD)
+    if betaalgedrag is None or betaalgedrag.empty or code_col not in betaalgedrag.columns \
+            or 'gem_dagen_tot_betaling' not in betaalgedrag.columns:
+        return mean, std
+
+    stats = betaalgedrag.drop_duplicates(code_col).set_index(code_col)
+    gem = pd.to_numeric(stats['gem_dagen_tot_betaling'], errors='coerce')
+    sd = pd.to_numeric(stats.get('std_dagen_tot_betaling', pd.Series(np.nan, index=stats.index)),
+                       errors='coerce')
+
+    # Portefeuille-verdeling voor relaties zonder historie
+    weights = pd.to_numeric(stats.get('totaal_factuurbedrag', pd.Series(1.0, index=stats.index)),
+                            errors='coerce').fillna(0).clip(lower=0)
+    valid = gem.notna()
+    if valid.any():
+        w = weights[valid] if weights[valid].sum() > 0 else None
+        mean[:] = float(np.average(gem[valid], weights=w))
+        sd_valid = sd[valid].fillna(DEFAULT_DELAY_STD)
+        std[:] = float(np.average(sd_valid, weights=w))
+
+    mapped_mean = codes.map(gem).to_numpy(dtype=float)
+    mapped_std = codes.map(sd).to_numpy(dtype=float)
+    known = ~np.isnan(mapped_mean)
+    mean[known] = mapped_mean[known]
+    has_std = known & ~np.isnan(mapped_std)
+    std[has_std] = mapped_std[has_std]
+    return mean, np.maximum(std, 0.0)
+
+
+def _open_items(
+    posten: Optional[pd.DataFrame],
+    betaalgedrag: Optional[pd.DataFrame],
+    code_col: str,
+    reference_date: date,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(dagen factuurdatum→peildatum, bedrag, gem termijn, std termijn) per open post."""
+    empty = np.empty(0)
+    if posten is None or posten.empty:
+        return empty, empty, empty, empty
+    amt_col = next((c for c in ['openstaand', 'bedrag_excl_btw'] if c in posten.columns), None)
+    if amt_col is None:
+        return empty, empty, empty, empty
+
+    amounts = pd.to_numeric(posten[amt_col], errors='coerce')
+    ref = pd.Timestamp(reference_date)
+
+    if 'factuurdatum' in posten.columns:
+        base = _parse_dates(posten['factuurdatum'])
+    else:
+        base = pd.Series(pd.NaT, index=posten.index)
+    if 'vervaldatum' in posten.columns:
+        # Zonder factuurdatum: terugrekenen vanaf de vervaldatum
+        term = pd.to_numeric(posten.get('betaaltermijn_dagen', DEFAULT_PAYMENT_TERM), errors='coerce')
+        term = pd.Series(term, index=posten.index).fillna(DEFAULT_PAYMENT_TERM)
+        fallback = _parse_dates(posten['vervaldatum']) - pd.to_timedelta(term, unit='D')
+        base = base.fillna(fallback)
+
+    mask = (amounts > 0) & base.notna()
+    if not mask.any():
+        return empty, empty, empty, empty
+
+    offset = (base[mask] - ref).dt.days.to_numpy(dtype=float)
+    codes = posten.loc[mask, code_col] if code_col in posten.columns else pd.Series(None, index=posten.index[mask])
+    mean, std = _delay_distribution(codes, betaalgedrag, code_col)
+    return offset, amounts[mask].to_numpy(dtype=float), mean, std
+
+
+def _expected_flows(offset, amounts, mean, weeks: int) -> np.ndarray:
+    """Betalingen per week als elke factuur op de gemiddelde termijn betaald wordt."""
+    days = np.maximum(offset + np.maximum(mean, 0.0), 0.0)
+    week = (days // 7).astype(np.int64)
+    inside = week < weeks
+    return np.bincount(week[inside], weights=amounts[inside], minlength=weeks)[:weeks]
+
+
+def _simulate_flows(offset, amounts, mean, std, weeks: int, n_scenarios: int,
+                    rng: np.random.Generator) -> np.ndarray:
+    """Gesimuleerde betalingen per (scenario, week).
+
+    Werkt in float32 en in place per blok van scenario's x facturen; betalingen
+    na de horizon gaan naar een extra 'overloop'-week die daarna wegvalt.
+    """
+    n_items = len(amounts)
+    simulated = np.zeros((n_scenarios, weeks))
+    offset = offset.astype(np.float32)
+    mean = mean.astype(np.float32)
+    std = std.astype(np.float32)
+
+    chunk = max(1, _CHUNK_ELEMENTS // n_items)
+    for start in range(0, n_scenarios, chunk):
+        size = min(chunk, n_scenarios - start)
+        days = rng.standard_normal((size, n_items), dtype=np.float32)
+        days *= std
+        days += mean
+        np.maximum(days, 0.0, out=days)      # termijn >= 0
+        days += offset
+        np.maximum(days, 0.0, out=days)      # al verstreken -> week 0
+        days /= 7
+        week = days.astype(np.int32)
+        np.minimum(week, weeks, out=week)    # na de horizon -> overloop
+        week += (np.arange(size, dtype=np.int32) * (weeks + 1))[:, None]
+        paid = np.bincount(
+            week.ravel(),
+            weights=np.broadcast_to(amounts, (size, n_items)).ravel(),
+            minlength=size * (weeks + 1),
+        )
+        simulated[start:start + size] = paid.reshape(size, weeks + 1)[:, :weeks]
+    return simulated
+
+
+def simulate_balance_bands(
+    forecast: pd.DataFrame,
+    debiteuren: pd.DataFrame,
+    betaalgedrag_debiteuren: pd.DataFrame,
+    reference_date=None,
+    crediteuren: Optional[pd.DataFrame] = None,
+    betaalgedrag_crediteuren: Optional[pd.DataFrame] = None,
+    n_scenarios: int = 10_000,
+    percentiles: Sequence[float] = (5, 50, 95),
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Monte Carlo risicobanden voor het banksaldo per prognoseweek.
+
+    Args:
+        forecast: Puntprognose (create_forecast_v7 / create_layered_cashflow_forecast)
+            met kolommen is_realisatie, week_nummer, week_start, cumulatief_saldo
+        debiteuren: Openstaande debiteuren (debiteur_code, factuurdatum/vervaldatum, openstaand)
+        betaalgedrag_debiteuren: Resultaat van get_betaalgedrag_per_debiteur
+        reference_date: Peildatum (default: vandaag)
+        crediteuren: Optioneel: openstaande crediteuren (ook onzeker in timing)
+        betaalgedrag_crediteuren: Resultaat van get_betaalgedrag_per_crediteur
+        n_scenarios: Aantal scenario's
+        percentiles: Te rapporteren percentielen
+        seed: Seed voor reproduceerbare resultaten
+
+    Returns:
+        DataFrame per prognoseweek met week_nummer, week_start, saldo_verwacht,
+        saldo_p<x> per percentiel en kans_negatief (fractie scenario's < 0)
+    """
+    if reference_date is None:
+        reference_date = datetime.now().date()
+    elif isinstance(reference_date, datetime):
+        reference_date = reference_date.date()
+
+    prognose = forecast[forecast['is_realisatie'] == False].sort_values('week_nummer')  # noqa: E712
+    weeks = len(prognose)
+    point = prognose['cumulatief_saldo'].to_numpy(dtype=float)
+    rng = np.random.default_rng(seed)
+
+    deviation = np.zeros((n_scenarios, weeks))
+    for posten, gedrag, code_col, sign in (
+        (debiteuren, betaalgedrag_debiteuren, 'debiteur_code', 1.0),
+        (crediteuren, betaalgedrag_crediteuren, 'crediteur_code', -1.0),
+    ):
+        offset, amounts, mean, std = _open_items(posten, gedrag, code_col, reference_date)
+        if len(amounts) == 0:
+            continue
+        simulated = _simulate_flows(offset, amounts, mean, std, weeks, n_scenarios, rng)
+        expected = _expected_flows(offset, amounts, mean, weeks)
+        deviation += sign * (simulated - expected[None, :])
+
+    balances = point[None, :] + np.cumsum(deviation, axis=1)
+    bands = np.percentile(balances, list(percentiles), axis=0)
+
+    result = pd.DataFrame({
+        'week_nummer': prognose['week_nummer'].to_numpy(),
+        'week_start': prognose['week_start'].to_numpy(),
+        'saldo_verwacht': point,
+    })
+    for p, values in zip(percentiles, bands):
+        result[f'saldo_p{p:g}'] = values
+    result['kans_negatief'] = (balances < 0).mean(axis=0)
+    return result
@@ -0,0 +1,303 @@
+"""
+Test: administratie snapshot (src/admin_snapshot.py)
+====================================================
+Een kleine in-memory data source met twee administraties (plus boekingen
+zonder administratie) bedient zowel de gewone get_* methoden (gefilterd op
+administratie) als de bulk-methoden. Gecontroleerd wordt dat de snapshot
+per administratie dezelfde datasets oplevert als fetch_dashboard_data
+direct op de database, dat de geconsolideerde view klopt en dat elke
+dataset één keer wordt opgevraagd, ongeacht het aantal administraties.
+
+Draaien:
+    python -m pytest test_admin_snapshot.py -q
+"""
+
+import os
+import sys
+from collections import Counter
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.admin_snapshot import (
+    BULK_METHODS,
+    CONSOLIDATED,
+    AdministratieSnapshot,
+    fetch_dashboard_data_per_administratie,
+)
+from src.backtest_snapshot import (
+    _banksaldo,
+    _betaalgedrag_crediteuren,
+    _betaalgedrag_debiteuren,
+    _open_debiteuren,
+    _prepare,
+    _weekly_cashflow,
+)
+from src.database import MockDatabase
+from src.fetch_planner import fetch_dashboard_data
+
+STANDDATUM = date(2025, 3, 12)
+ADMINISTRATIES = ['Installatie BV', 'Service BV']
+
+
+class _LedgerDB:
+    """Data source op vaste tabellen; telt het aantal aanroepen per methode."""
+
+    def __init__(self, seed: int = 7):
+        rng = np.random.default_rng(seed)
+        adms = np.array(ADMINISTRATIES + ['Onbekend'])
+        self.calls = Counter()
+
+        days = pd.date_range(STANDDATUM - timedelta(days=3 * 365), STANDDATUM + timedelta(days=30), freq='D')
+        n = len(days) * 3
+        adm = np.tile(adms, len(days))
+        self.bankmutaties = pd.DataFrame({
+            'boekdatum': np.repeat(days, 3),
+            'bank_naam': np.char.add('Bank ', adm),
+            'inkomsten': rng.gamma(2, 2_000, n).round(2),
+            'uitgaven': rng.gamma(2, 1_900, n).round(2),
+            'administratie': adm,
+        })
+
+        m = 4_000
+        alloc = pd.Timestamp(STANDDATUM) - pd.to_timedelta(rng.integers(0, 900, m), unit='D')
+        keys = rng.integers(0, 1_500, m)
+        self.verkooptermijnen = pd.DataFrame({
+            'debiteur_code': [f'D{k % 60}' for k in keys],
+            'factuur_key': keys,
+            'alloc_datum': alloc,
+            'vervaldatum': alloc + pd.Timedelta(days=30),
+            'bedrag': np.where(rng.random(m) < 0.5, 1, -1) * rng.integers(1, 20, m) * 100.0,
+            'bedrag_positief': rng.integers(1, 20, m) * 100.0,
+            'aantal': rng.integers(1, 3, m),
+            'administratie': adms[keys % 3],
+            'bedrijfseenheid': 'Hoofd',
+        })
+
+        k = 1_500
+        vervaldatum = pd.Timestamp(STANDDATUM) - pd.to_timedelta(rng.integers(0, 800, k), unit='D')
+        self.inkoopbetalingen = pd.DataFrame({
+            'crediteur_code': [f'C{i}' for i in rng.integers(0, 40, k)],
+            'vervaldatum': vervaldatum,
+            'betaaldatum': vervaldatum + pd.to_timedelta(rng.integers(-10, 40, k), unit='D'),
+            'factuurbedrag': rng.gamma(2, 800, k).round(2),
+            'administratie': rng.choice(adms, k),
+        })
+
+        self.crediteuren = pd.DataFrame({
+            'crediteur_code': ['C1', 'C2', 'C3', 'C4'],
+            'vervaldatum': [STANDDATUM + timedelta(days=d) for d in (5, 12, 20, 40)],
+            'openstaand': [1_000.0, 2_500.0, 800.0, 4_000.0],
+            'administratie': ['Installatie BV', 'Service BV', 'Installatie BV', 'Onbekend'],
+        })
+
+        maanden = pd.date_range('2024-01-01', '2025-03-01', freq='MS')
+        self.kosten = pd.DataFrame([
+            {'maand': mnd, 'kostensoort': soort, 'bedrag': float(rng.integers(1_000, 9_000)), 'administratie': a}
+            for mnd in maanden for soort in ('Personeelskosten', 'Autokosten') for a in adms
+        ])
+
+        self.lists = {
+            method: pd.DataFrame({'bedrag': rng.integers(100, 1_000, 9).astype(float),
+                                  'administratie': np.tile(adms, 3)})
+            for method in ('get_orderportefeuille', 'get_service_orders_prognose', 'get_orderregels_periodiek',
+                           'get_orderregels_eenmalig', 'get_abonnementen', 'get_btw_prognose')
+        }
+        self.budgetten = pd.DataFrame({'rubriek_code': ['4000', '6100', '4000'], 'budget_bedrag': [1.0, 2.0, 3.0],
+                                       'administratie': ADMINISTRATIES + ['Onbekend']})
+        self.dpo = {'Installatie BV': 4.0, 'Service BV': 11.0}
+
+    def __getattr__(self, name):
+        if name in ('get_orderportefeuille', 'get_service_orders_prognose', 'get_orderregels_periodiek',
+                    'get_orderregels_eenmalig', 'get_abonnementen', 'get_btw_prognose'):
+            def method(administratie=None):
+                self.calls[name] += 1
+                return self._filter(self.lists[name], administratie)
+            return method
+        raise AttributeError(name)
+
+    @staticmethod
+    def _filter(df, administratie):
+        return df[df['administratie'] == administratie].reset_index(drop=True) if administratie else df.copy()
+
+    # ===== Gewone methoden (SQL-filter op administratie) =====
+
+    def get_banksaldo(self, standdatum=None, administratie=None):
+        self.calls['get_banksaldo'] += 1
+        return _banksaldo(_prepare('bankmutaties', self._filter(self.bankmutaties, administratie)), standdatum)
+
+    def get_historische_cashflow_per_week(self, startdatum=None, einddatum=None, administratie=None,
+                                          administratie_key=None):
+        self.calls['get_historische_cashflow_per_week'] += 1
+        rows = _prepare('bankmutaties', self._filter(self.bankmutaties, administratie))
+        return _weekly_cashflow(rows, startdatum, einddatum)
+
+    def get_openstaande_debiteuren(self, standdatum=None, administratie=None):
+        self.calls['get_openstaande_debiteuren'] += 1
+        rows = _prepare('verkooptermijnen', self._filter(self.verkooptermijnen, administratie))
+        return _open_debiteuren(rows, standdatum)
+
+    def get_openstaande_crediteuren(self, standdatum=None, administratie=None):
+        self.calls['get_openstaande_crediteuren'] += 1
+        return self._filter(self.crediteuren, administratie)
+
+    def get_betaalgedrag_per_debiteur(self, startdatum=None, einddatum=None, administratie=None):
+        self.calls['get_betaalgedrag_per_debiteur'] += 1
+        rows = _prepare('verkooptermijnen', self._filter(self.verkooptermijnen, administratie))
+        return _betaalgedrag_debiteuren(rows, startdatum, einddatum)
+
+    def get_betaalgedrag_per_crediteur(self, startdatum=None, einddatum=None, administratie=None):
+        self.calls['get_betaalgedrag_per_crediteur'] += 1
+        rows = _prepare('inkoopbetalingen', self._filter(self.inkoopbetalingen, administratie))
+        return _betaalgedrag_crediteuren(rows, startdatum, einddatum)
+
+    def get_terugkerende_kosten(self, startdatum=None, einddatum=None, administratie=None):
+        self.calls['get_terugkerende_kosten'] += 1
+        rows = self._kosten_window(startdatum, einddatum)
+        rows = self._filter(rows, administratie)
+        return rows.groupby(['maand', 'kostensoort'], as_index=False, sort=False)['bedrag'].sum()
+
+    def get_calibrated_dso_dpo(self, administratie, lookback_months=12):
+        self.calls['get_calibrated_dso_dpo'] += 1
+        return {'dso': 38.0, 'dpo': self.dpo.get(administratie)}
+
+    def get_budgetten(self, boekjaar=None, administratie=None):
+        self.calls['get_budgetten'] += 1
+        return self._filter(self.budgetten, administratie)
+
+    def get_btw_aangifteregels(self, startdatum=None, einddatum=None):
+        self.calls['get_btw_aangifteregels'] += 1
+        return pd.DataFrame({'maand': [pd.Timestamp('2025-01-01')], 'btw_bedrag': [1_234.0]})
+
+    def get_salarishistorie(self, startdatum=None, einddatum=None):
+        self.calls['get_salarishistorie'] += 1
+        return pd.DataFrame({'maand': [pd.Timestamp('2025-01-01')], 'salaris_bedrag': [50_000.0]})
+
+    def get_service_contract_intake(self, administratie=None):
+        self.calls['get_service_contract_intake'] += 1
+        return pd.DataFrame({'jaarbedrag_doorlopend': [12_000.0], 'jaarbedrag_eindig': [3_000.0]})
+
+    def get_geplande_salarissen(self):
+        self.calls['get_geplande_salarissen'] += 1
+        return pd.DataFrame({'betaaldatum': [], 'omschrijving': [], 'bedrag': []})
+
+    def get_historisch_betalingsgedrag(self):
+        self.calls['get_historisch_betalingsgedrag'] += 1
+        return pd.DataFrame({'maand': [], 'inkomsten': [], 'uitgaven': []})
+
+    # ===== Bulk-methoden =====
+
+    def get_bankmutaties_per_dag(self, einddatum=None, administratie=None):
+        self.calls['get_bankmutaties_per_dag'] += 1
+        return self.bankmutaties[self.bankmutaties['boekdatum'] < pd.Timestamp(einddatum)].reset_index(drop=True)
+
+    def get_verkoopfactuur_termijnen_per_dag(self, einddatum=None, administratie=None):
+        self.calls['get_verkoopfactuur_termijnen_per_dag'] += 1
+        rows = self.verkooptermijnen
+        return rows[rows['alloc_datum'] <= pd.Timestamp(einddatum)].reset_index(drop=True)
+
+    def get_betalingen_inkoopregels(self, startdatum=None, einddatum=None, administratie=None):
+        self.calls['get_betalingen_inkoopregels'] += 1
+        rows = self.inkoopbetalingen
+        mask = rows['betaaldatum'].between(pd.Timestamp(startdatum), pd.Timestamp(einddatum))
+        return rows[mask].reset_index(drop=True)
+
+    def get_terugkerende_kosten_per_administratie(self, startdatum=None, einddatum=None):
+        self.calls['get_terugkerende_kosten_per_administratie'] += 1
+        return self._kosten_window(startdatum, einddatum)
+
+    def get_calibrated_dso_dpo_per_administratie(self, lookback_months=12):
+        self.calls['get_calibrated_dso_dpo_per_administratie'] += 1
+        result = {adm: {'dso': 38.0, 'dpo': dpo} for adm, dpo in self.dpo.items()}
+        result[None] = {'dso': 38.0, 'dpo': 7.0}
+        return result
+
+    def _kosten_window(self, startdatum, einddatum):
+        rows = self.kosten
+        return rows[(rows['maand'] >= pd.Timestamp(startdatum)) & (rows['maand'] < pd.Timestamp(einddatum))]
+
+
+def _frames(data: dict) -> dict:
+    return {k: v for k, v in data.items() if isinstance(v, pd.DataFrame)}
+
+
+def test_per_administratie_matches_direct_fetch():
+    db = _LedgerDB()
+    per_adm = fetch_dashboard_data_per_administratie(db, STANDDATUM)
+    assert list(per_adm) == ADMINISTRATIES + [CONSOLIDATED]
+
+    for adm in ADMINISTRATIES:
+        direct = fetch_dashboard_data(_LedgerDB(), STANDDATUM, adm)
+        bulk = per_adm[adm]
+        assert bulk['detected_admin'] == adm
+        assert (bulk['calibrated_dso'], bulk['calibrated_dpo']) == (direct['calibrated_dso'], direct['calibrated_dpo'])
+        assert bulk['_db'] is db
+        assert set(_frames(bulk)) == set(_frames(direct))
+        for key, expected in _frames(direct).items():
+            pd.testing.assert_frame_equal(bulk[key].reset_index(drop=True), expected.reset_index(drop=True),
+                                          check_dtype=False, obj=f'{adm}/{key}')
+        assert not bulk['debiteuren'].empty and not bulk['historische_cashflow'].empty
+
+
+def test_consolidated_view():
+    db = _LedgerDB()
+    alle = fetch_dashboard_data_per_administratie(db, STANDDATUM)[CONSOLIDATED]
+    reference = _LedgerDB()
+    hist_start = date(STANDDATUM.year - 1, STANDDATUM.month, 1)
+
+    pd.testing.assert_frame_equal(alle['banksaldo'], reference.get_banksaldo(STANDDATUM))
+    pd.testing.assert_frame_equal(alle['debiteuren'], reference.get_openstaande_debiteuren(STANDDATUM))
+    pd.testing.assert_frame_equal(
+        alle['historische_cashflow'],
+        reference.get_historische_cashflow_per_week(hist_start, STANDDATUM))
+    pd.testing.assert_frame_equal(
+        alle['terugkerende_kosten'],
+        reference.get_terugkerende_kosten(hist_start, STANDDATUM), check_dtype=False)
+    assert len(alle['orderportefeuille']) == 9
+    assert (alle['calibrated_dso'], alle['calibrated_dpo']) == (38.0, 7.0)
+
+
+def test_one_query_per_dataset():
+    db = _LedgerDB()
+    fetch_dashboard_data_per_administratie(db, STANDDATUM)
+    assert max(db.calls.values()) == 1, db.calls
+    for method in BULK_METHODS:
+        assert db.calls[method] == 1
+    # De per-administratie gefilterde queries worden niet meer gebruikt
+    for method in ('get_banksaldo', 'get_openstaande_debiteuren', 'get_historische_cashflow_per_week',
+                   'get_betaalgedrag_per_debiteur', 'get_betaalgedrag_per_crediteur',
+                   'get_terugkerende_kosten', 'get_calibrated_dso_dpo'):
+        assert db.calls[method] == 0, method
+
+    # Direct per administratie: elke dataset N keer
+    direct = _LedgerDB()
+    for adm in ADMINISTRATIES:
+        fetch_dashboard_data(direct, STANDDATUM, adm)
+    assert direct.calls['get_historische_cashflow_per_week'] == len(ADMINISTRATIES)
+
+
+def test_outside_window_goes_to_database():
+    db = _LedgerDB()
+    snapshot = AdministratieSnapshot(db, STANDDATUM, ADMINISTRATIES).load()
+    later = STANDDATUM + timedelta(days=7)
+    for _ in range(2):
+        saldo = snapshot.get_banksaldo(later, 'Service BV')
+    assert db.calls['get_banksaldo'] == 1
+    pd.testing.assert_frame_equal(saldo, _LedgerDB().get_banksaldo(later, 'Service BV'))
+    assert snapshot.stats() == {'queries': len(snapshot._plan()) + 1, 'administraties': 2}
+
+
+def test_mock_database_falls_back_to_per_administratie():
+    per_adm = fetch_dashboard_data_per_administratie(MockDatabase(), STANDDATUM, consolidated=False)
+    assert list(per_adm) == ['Demo Administratie']
+    assert not per_adm['Demo Administratie']['debiteuren'].empty
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,108 @@
+"""
+Test: parallelle backtests (src/backtest.py en src/calculations.py)
+===================================================================
+Met max_workers > 1 draaien de cutoffs in een process pool. Gecontroleerd
+wordt dat dat exact dezelfde uitkomst geeft als sequentieel, en dat een
+mislukte cutoff in de fouten terechtkomt zonder de rest af te breken.
+
+Draaien:
+    python -m pytest test_backtest_parallel.py -q
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.backtest import BacktestFramework
+from src.calculations import run_walk_forward_backtest
+from test_backtest_snapshot import ADMINISTRATIE, CUTOFFS, _Ledger
+
+
+class _Poison(float):
+    """Realisatie waar niet mee te rekenen valt (picklebaar, dus ook in de pool)."""
+
+    def __ne__(self, other):
+        raise ValueError("kapotte realisatie")
+
+
+def _weekly(poison_week: int = None):
+    weeks = pd.date_range('2022-01-03', periods=120, freq='W-MON')
+    rng = np.random.default_rng(3)
+    omzet = pd.DataFrame({'week_start': weeks, 'omzet': rng.gamma(5, 4_000, len(weeks))})
+    cash = pd.DataFrame({'week_start': weeks, 'inkomsten': rng.gamma(5, 4_000, len(weeks))})
+    if poison_week is not None:
+        cash['inkomsten'] = cash['inkomsten'].astype(object)
+        cash.at[poison_week, 'inkomsten'] = _Poison(cash.at[poison_week, 'inkomsten'])
+    return omzet, cash
+
+
+def test_walk_forward_parallel_matches_sequential():
+    omzet, cash = _weekly()
+    seq = run_walk_forward_backtest(omzet, cash, pd.DataFrame(), n_cutoff_dates=6, max_workers=1)
+    par = run_walk_forward_backtest(omzet, cash, pd.DataFrame(), n_cutoff_dates=6, max_workers=3)
+    assert seq.n_cutoff_dates > 0 and not seq.errors
+    assert par.mape_per_horizon == seq.mape_per_horizon
+    assert (par.overall_mape, par.bias, par.rmse) == (seq.overall_mape, seq.bias, seq.rmse)
+    pd.testing.assert_frame_equal(par.detailed_results, seq.detailed_results)
+
+
+def test_walk_forward_failing_cutoff_is_recorded():
+    omzet, cash = _weekly(poison_week=110)
+    for workers in (1, 3):
+        result = run_walk_forward_backtest(omzet, cash, pd.DataFrame(), n_cutoff_dates=6, max_workers=workers)
+        assert len(result.errors) == 1, workers
+        assert 'kapotte realisatie' in next(iter(result.errors.values()))
+        # De overige cutoffs zijn gewoon doorgerekend
+        assert not result.detailed_results.empty
+        failed = next(iter(result.errors))
+        assert failed not in set(result.detailed_results['cutoff_date'].astype(str))
+
+
+def _run_cutoffs(db, workers: int, model_version: str = 'v7'):
+    framework = BacktestFramework(db, ADMINISTRATIE, model_version=model_version,
+                                  use_snapshot=False, max_workers=workers)
+    results, errors = framework._run_cutoffs(CUTOFFS)
+    framework.errors = errors
+    return results, errors, framework.build_report(results)
+
+
+def test_framework_parallel_matches_sequential():
+    seq, seq_errors, seq_report = _run_cutoffs(_Ledger(), workers=1)
+    par, par_errors, par_report = _run_cutoffs(_Ledger(), workers=3)
+    assert not seq_errors and not par_errors
+    assert [r.cutoff_date for r in par] == [r.cutoff_date for r in seq] == CUTOFFS
+    for a, b in zip(par, seq):
+        pd.testing.assert_frame_equal(a.forecast_df, b.forecast_df)
+        assert (a.total_mape, a.total_bias) == (b.total_mape, b.total_bias)
+        assert a.mape_per_week == b.mape_per_week
+    assert par_report.overall_mape == seq_report.overall_mape
+    assert par_report.accuracy_decay.keys() == seq_report.accuracy_decay.keys()
+
+
+class _BrokenCutoffLedger(_Ledger):
+    """Debiteuren op één cutoff niet op te halen."""
+
+    def get_openstaande_debiteuren(self, standdatum=None, administratie=None):
+        if standdatum == CUTOFFS[1]:
+            raise ConnectionError("API timeout")
+        return super().get_openstaande_debiteuren(standdatum, administratie)
+
+
+def test_framework_failing_cutoff_lands_in_errors():
+    for workers in (1, 3):
+        results, errors, report = _run_cutoffs(_BrokenCutoffLedger(), workers=workers, model_version='v6')
+        assert list(errors) == [CUTOFFS[1]], workers
+        assert 'API timeout' in errors[CUTOFFS[1]]
+        assert [r.cutoff_date for r in results] == [c for c in CUTOFFS if c != CUTOFFS[1]]
+        assert report.errors == errors
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,374 @@
+"""
+Test: backtest snapshot (src/backtest_snapshot.py)
+==================================================
+Een kleine grootboek-fixture (journaalregels, verkoopfactuur-termijnen,
+inkoopbetalingen) achter een data source die elke get_* methode per
+aanroep uitrekent zoals de SQL in NotificaDataSource: regel voor regel,
+zonder de pandas-aggregaties uit de snapshot. Gecontroleerd wordt dat een
+walk-forward backtest met BacktestSnapshot per cutoff exact dezelfde
+tijdmachine-data en realisatie oplevert als zonder snapshot, en dat de
+snapshot de cutoff-afhankelijke queries echt niet meer doet. Het
+kasdagboek hangt in notifica."SSM Administraties" (banksaldo) onder een
+andere administratie dan in stam."Administraties" (cashflow), zodat een
+gefilterde administratie beide bronnen apart moet volgen.
+
+Draaien:
+    python -m pytest test_backtest_snapshot.py -q
+"""
+
+import os
+import random
+import statistics
+import sys
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.backtest import BacktestFramework
+from src.backtest_snapshot import RAW_METHODS, STATIC_METHODS, BacktestSnapshot
+
+ADMINISTRATIE = 'Installatie BV'
+CUTOFFS = [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1)]
+FIRST_DAY = date(2022, 10, 1)
+LAST_DAY = date(2025, 8, 31)
+
+# Per cutoff via de database; met snapshot mogen deze niet meer aangeroepen worden
+CUTOFF_METHODS = (
+    'get_historische_cashflow_per_week', 'get_banksaldo', 'get_openstaande_debiteuren',
+    'get_openstaande_crediteuren', 'get_betaalgedrag_per_debiteur', 'get_betaalgedrag_per_crediteur',
+    'get_btw_aangifteregels', 'get_salarishistorie', 'get_terugkerende_kosten',
+)
+
+
+def _round(value: float, decimals: int) -> float:
+    """ROUND(x::numeric, n): half away from zero."""
+    step = Decimal(1).scaleb(-decimals)
+    return float(Decimal(repr(value)).quantize(step, rounding=ROUND_HALF_UP))
+
+
+def _month(d: date) -> pd.Timestamp:
+    return pd.Timestamp(d.year, d.month, 1)
+
+
+def _days(start: date, end: date):
+    d = start
+    while d <= end:
+        yield d
+        d += timedelta(days=1)
+
+
+class _Ledger:
+    """Fixture-grootboek; elke get_* methode rekent vanaf de ruwe regels."""
+
+    def __init__(self, seed: int = 11):
+        rng = random.Random(seed)
+        self.calls = Counter()
+
+        # Journaalregels op bankdagboeken:
+        # (boekdatum, dagboek, D/C, bedrag, SSM-administratie, stam-administratie)
+        self.journaal = []
+        for d in _days(FIRST_DAY, LAST_DAY):
+            for bank in ('ING', 'Rabobank'):
+                for _ in range(rng.randint(0, 2)):
+                    dc = 'D' if rng.random() < 0.52 else 'C'
+                    adm = ADMINISTRATIE if rng.random() < 0.9 else 'Service BV'
+                    self.journaal.append((d, bank, dc, round(rng.uniform(50, 9_000), 2), adm, adm))
+            if rng.random() < 0.3:
+                dc = 'D' if rng.random() < 0.5 else 'C'
+                self.journaal.append((d, 'Kas', dc, round(rng.uniform(20, 900), 2), 'Service BV', ADMINISTRATIE))
+
+        # Verkoopfactuur termijnen: (debiteur, factuur_key, alloc_datum, vervaldatum, bedrag, adm, bedrijfseenheid)
+        self.termijnen = []
+        for key in range(400):
+            debiteur = f'D{rng.randint(1, 12):02d}'
+            factuurdatum = FIRST_DAY + timedelta(days=rng.randint(0, 900))
+            vervaldatum = factuurdatum + timedelta(days=30)
+            bedrag = round(rng.uniform(200, 15_000), 2)
+            eenheid = rng.choice(['Service', 'Projecten'])
+            adm = ADMINISTRATIE if key % 7 else 'Service BV'
+            self.termijnen.append((debiteur, key, factuurdatum, vervaldatum, bedrag, adm, eenheid))
+            if rng.random() < 0.85:
+                betaald = factuurdatum + timedelta(days=rng.randint(3, 120))
+                if rng.random() < 0.3:
+                    deel = round(bedrag / 2, 2)
+                    self.termijnen.append((debiteur, key, betaald, vervaldatum, -deel, adm, eenheid))
+                    betaald += timedelta(days=rng.randint(1, 20))
+                    bedrag = round(bedrag - deel, 2)
+                self.termijnen.append((debiteur, key, betaald, vervaldatum, -bedrag, adm, eenheid))
+
+        # Betalingen per inkoopregel: (crediteur, vervaldatum, betaaldatum, bedrag, administratie)
+        self.inkoop = []
+        for _ in range(600):
+            vervaldatum = FIRST_DAY + timedelta(days=rng.randint(0, 900))
+            betaaldatum = vervaldatum + timedelta(days=rng.randint(-120, 90))
+            adm = ADMINISTRATIE if rng.random() < 0.85 else 'Service BV'
+            self.inkoop.append((f'C{rng.randint(1, 9)}', vervaldatum, betaaldatum,
+                                round(rng.uniform(20, 6_000), 2), adm))
+
+        # Inkoopfactuur termijnen met huidige status
+        self.inkoopfacturen = []
+        for i in range(40):
+            factuurdatum = FIRST_DAY + timedelta(days=rng.randint(600, 900))
+            self.inkoopfacturen.append({
+                'crediteur_code': f'C{rng.randint(1, 9)}', 'factuurnummer': f'IF{i:04d}',
+                'factuurdatum': pd.Timestamp(factuurdatum),
+                'vervaldatum': pd.Timestamp(factuurdatum + timedelta(days=rng.choice([14, 30, 60]))),
+                'openstaand': round(rng.uniform(100, 8_000), 2),
+                'status': 'Openstaand' if rng.random() < 0.6 else 'Betaald',
+            })
+
+        # Maandboekingen: btw, salaris (rubriek 4xxx) en vaste kosten
+        self.maandboekingen = []
+        for d in _days(FIRST_DAY, LAST_DAY):
+            if d.day in (1, 15):
+                self.maandboekingen.append((d, 'btw', round(rng.uniform(1_000, 20_000), 2)))
+            if d.day == 25:
+                self.maandboekingen.append((d, 'Personeelskosten', round(rng.uniform(40_000, 60_000), 2)))
+                self.maandboekingen.append((d, 'Huisvestingskosten', round(rng.uniform(3_000, 4_000), 2)))
+
+    def _count(self, name):
+        self.calls[name] += 1
+
+    # ===== Per-cutoff queries (zoals de SQL) =====
+
+    def get_banksaldo(self, standdatum=None, administratie=None):
+        self._count('get_banksaldo')
+        saldo = defaultdict(float)
+        for d, bank, dc, bedrag, adm, _ in self.journaal:
+            if d <= standdatum and (not administratie or adm == administratie):
+                saldo[bank] += bedrag if dc == 'D' else -bedrag
+        rows = sorted(((b, s) for b, s in saldo.items() if abs(s) > 0.01), key=lambda r: -r[1])
+        return pd.DataFrame({'bank_naam': [b for b, _ in rows], 'rekeningnummer': [b for b, _ in rows],
+                             'saldo': [s for _, s in rows], 'datum': date.today()})
+
+    def get_historische_cashflow_per_week(self, startdatum=None, einddatum=None, administratie=None,
+                                          administratie_key=None):
+        self._count('get_historische_cashflow_per_week')
+        weeks = defaultdict(lambda: [0.0, 0.0])
+        for d, _, dc, bedrag, _, adm in self.journaal:
+            if startdatum <= d < einddatum and (not administratie or adm == administratie):
+                key = (d - timedelta(days=d.weekday()), d.isocalendar()[1], d.month)
+                weeks[key][0 if dc == 'D' else 1] += bedrag
+        rows = [(pd.Timestamp(k[0]), k[1], k[2], ink, uit, ink - uit) for k, (ink, uit) in sorted(weeks.items())]
+        return pd.DataFrame(rows, columns=['week_start', 'week_nummer', 'maand', 'inkomsten', 'uitgaven', 'netto'])
+
+    def get_openstaande_debiteuren(self, standdatum=None, administratie=None):
+        self._count('get_openstaande_debiteuren')
+        groups = {}
+        for deb, _, alloc, verval, bedrag, adm, eenheid in self.termijnen:
+            if alloc <= standdatum and (not administratie or adm == administratie):
+                g = groups.setdefault((deb, adm, eenheid), [alloc, verval, 0.0])
+                g[0], g[1], g[2] = max(g[0], alloc), max(g[1], verval), g[2] + bedrag
+        rows = sorted(((k, v) for k, v in groups.items() if abs(v[2]) > 0.01), key=lambda r: -r[1][2])
+        return pd.DataFrame([{
+            'debiteur_code': deb, 'debiteur_naam': deb, 'factuurnummer': 'Diverse',
+            'factuurdatum': pd.Timestamp(alloc), 'vervaldatum': pd.Timestamp(verval),
+            'bedrag_excl_btw': saldo, 'betaaldatum': pd.NaT, 'betaald': 0, 'openstaand': saldo,
+            'betaaltermijn_dagen': 30, 'administratie': adm, 'bedrijfseenheid': eenheid,
+        } for (deb, adm, eenheid), (alloc, verval, saldo) in rows])
+
+    def get_openstaande_crediteuren(self, standdatum=None, administratie=None):
+        self._count('get_openstaande_crediteuren')
+        rows = [r for r in self.inkoopfacturen
+                if r['status'] == 'Openstaand' and r['factuurdatum'] <= pd.Timestamp(standdatum)]
+        rows = sorted(rows, key=lambda r: r['vervaldatum'])
+        return pd.DataFrame([{k: v for k, v in r.items() if k != 'status'} for r in rows])
+
+    @staticmethod
+    def _stats(code_col, per_relatie, with_min_max):
+        """*_stats CTE + eindselectie: per relatie een lijst (dagen, bedrag, betaaldatum)."""
+        rows = []
+        for code, facturen in per_relatie.items():
+            if len(facturen) < 2:
+                continue
+            dagen = [f[0] for f in facturen]
+            std = statistics.stdev(dagen)
+            row = {code_col: code, 'aantal_facturen': len(facturen),
+                   'gem_dagen_tot_betaling': _round(statistics.mean(dagen), 1),
+                   'std_dagen_tot_betaling': _round(std, 1)}
+            if with_min_max:
+                row['min_dagen'] = _round(min(dagen), 0)
+                row['max_dagen'] = _round(max(dagen), 0)
+            row['totaal_factuurbedrag'] = _round(sum(f[1] for f in facturen), 2)
+            row['laatste_betaling'] = pd.Timestamp(max(f[2] for f in facturen))
+            row['betrouwbaarheid'] = _round(
+                min(1.0, (1.0 - min(1.0, std / 30.0)) * 0.7 + min(1.0, len(facturen) / 10.0) * 0.3), 2)
+            rows.append(row)
+        return pd.DataFrame(sorted(rows, key=lambda r: -r['totaal_factuurbedrag']))
+
+    def get_betaalgedrag_per_debiteur(self, startdatum=None, einddatum=None, administratie=None):
+        self._count('get_betaalgedrag_per_debiteur')
+        facturen = defaultdict(list)
+        for deb, key, alloc, _, bedrag, adm, _ in self.termijnen:
+            if startdatum <= alloc <= einddatum and (not administratie or adm == administratie):
+                facturen[(deb, key)].append((alloc, bedrag))
+        per_deb = defaultdict(list)
+        for (deb, _), regels in facturen.items():
+            if abs(sum(b for _, b in regels)) >= 0.01 or len(regels) < 2:
+                continue
+            eerste, laatste = min(a for a, _ in regels), max(a for a, _ in regels)
+            dagen = (laatste - eerste).days
+            if 0 <= dagen <= 365:
+                per_deb[deb].append((dagen, abs(sum(b for _, b in regels if b > 0)), laatste))
+        return self._stats('debiteur_code', per_deb, with_min_max=True)
+
+    def get_betaalgedrag_per_crediteur(self, startdatum=None, einddatum=None, administratie=None):
+        self._count('get_betaalgedrag_per_crediteur')
+        per_cred = defaultdict(list)
+        for cred, verval, betaald, bedrag, adm in self.inkoop:
+            if startdatum <= betaald <= einddatum and (not administratie or adm == administratie):
+                dagen = (betaald - verval).days
+                if -90 <= dagen <= 365:
+                    per_cred[cred].append((dagen, bedrag, betaald))
+        return self._stats('crediteur_code', per_cred, with_min_max=False)
+
+    def _per_maand(self, soorten, startdatum, einddatum):
+        totals = defaultdict(float)
+        for d, soort, bedrag in self.maandboekingen:
+            if soort in soorten and startdatum <= d < einddatum:
+                totals[(_month(d), soort)] += bedrag
+        return sorted(totals.items())
+
+    def get_btw_aangifteregels(self, startdatum=None, einddatum=None):
+        self._count('get_btw_aangifteregels')
+        rows = self._per_maand({'btw'}, startdatum, einddatum)
+        return pd.DataFrame([(m, b) for (m, _), b in rows], columns=['maand', 'btw_bedrag'])
+
+    def get_salarishistorie(self, startdatum=None, einddatum=None):
+        self._count('get_salarishistorie')
+        rows = self._per_maand({'Personeelskosten'}, startdatum, einddatum)
+        return pd.DataFrame([(m, b, 0) for (m, _), b in rows], columns=['maand', 'salaris_bedrag', 'aantal_medewerkers'])
+
+    def get_terugkerende_kosten(self, startdatum=None, einddatum=None, administratie=None):
+        self._count('get_terugkerende_kosten')
+        rows = self._per_maand({'Personeelskosten', 'Huisvestingskosten'}, startdatum, einddatum)
+        return pd.DataFrame([(m, s, b) for (m, s), b in rows], columns=['maand', 'kostensoort', 'bedrag'])
+
+    def get_budgetten(self, boekjaar=None, administratie=None):
+        self._count('get_budgetten')
+        return pd.DataFrame({'rubriek_code': ['4000', '6100'], 'budget_bedrag': [boekjaar * 1.0, 2.0]})
+
+    def __getattr__(self, name):
+        if name in STATIC_METHODS:
+            def method(administratie=None):
+                self._count(name)
+                return pd.DataFrame({'bedrag': [100.0, 250.0], 'administratie': [administratie] * 2})
+            return method
+        raise AttributeError(name)
+
+    # ===== Ruwe data voor de snapshot (zoals de SQL van de RAW_METHODS) =====
+
+    def get_bankmutaties_per_dag(self, einddatum=None, administratie=None):
+        self._count('get_bankmutaties_per_dag')
+        per_dag = defaultdict(lambda: [0.0, 0.0])
+        for d, bank, dc, bedrag, adm, cashflow_adm in self.journaal:
+            if d < einddatum and (not administratie or administratie in (adm, cashflow_adm)):
+                per_dag[(d, bank, adm, cashflow_adm)][0 if dc == 'D' else 1] += bedrag
+        return pd.DataFrame([(d, bank, ink, uit, adm, cashflow_adm)
+                             for (d, bank, adm, cashflow_adm), (ink, uit) in sorted(per_dag.items())],
+                            columns=['boekdatum', 'bank_naam', 'inkomsten', 'uitgaven', 'administratie',
+                                     'cashflow_administratie'])
+
+    def get_verkoopfactuur_termijnen_per_dag(self, einddatum=None, administratie=None):
+        self._count('get_verkoopfactuur_termijnen_per_dag')
+        groups = {}
+        for deb, key, alloc, verval, bedrag, adm, eenheid in self.termijnen:
+            if alloc <= einddatum and (not administratie or adm == administratie):
+                g = groups.setdefault((deb, key, alloc, adm, eenheid), [verval, 0.0, 0.0, 0])
+                g[0] = max(g[0], verval)
+                g[1] += bedrag
+                g[2] += bedrag if bedrag > 0 else 0.0
+                g[3] += 1
+        return pd.DataFrame([
+            {'debiteur_code': deb, 'factuur_key': key, 'alloc_datum': alloc, 'vervaldatum': verval,
+             'bedrag': bedrag, 'bedrag_positief': positief, 'aantal': aantal,
+             'administratie': adm, 'bedrijfseenheid': eenheid}
+            for (deb, key, alloc, adm, eenheid), (verval, bedrag, positief, aantal) in groups.items()
+        ])
+
+    def get_betalingen_inkoopregels(self, startdatum=None, einddatum=None, administratie=None):
+        self._count('get_betalingen_inkoopregels')
+        return pd.DataFrame([
+            {'crediteur_code': cred, 'vervaldatum': verval, 'betaaldatum': betaald,
+             'factuurbedrag': abs(bedrag), 'administratie': adm}
+            for cred, verval, betaald, bedrag, adm in self.inkoop
+            if startdatum <= betaald <= einddatum and (not administratie or adm == administratie)
+        ])
+
+
+def _assert_same(actual: pd.DataFrame, expected: pd.DataFrame, name: str):
+    actual, expected = actual.reset_index(drop=True), expected.reset_index(drop=True)
+    assert list(actual.columns) == list(expected.columns), name
+    for col in expected.columns:
+        if pd.api.types.is_datetime64_any_dtype(expected[col]) or pd.api.types.is_datetime64_any_dtype(actual[col]):
+            actual[col], expected[col] = pd.to_datetime(actual[col]), pd.to_datetime(expected[col])
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=False, rtol=1e-9, obj=name)
+
+
+def _run(use_snapshot: bool, administratie: str = ADMINISTRATIE):
+    db = _Ledger()
+    framework = BacktestFramework(db, administratie, model_version='v7', use_snapshot=use_snapshot, max_workers=1)
+    framework.prepare_snapshot(CUTOFFS)
+    inputs, errors = framework.fetch_cutoff_inputs(CUTOFFS)
+    assert not errors
+    return db, framework, inputs
+
+
+def _assert_snapshot_matches(administratie: str):
+    _, _, expected = _run(use_snapshot=False, administratie=administratie)
+    _, framework, actual = _run(use_snapshot=True, administratie=administratie)
+    assert isinstance(framework.snapshot, BacktestSnapshot)
+
+    for cutoff in CUTOFFS:
+        masked, actuals = actual[cutoff]
+        masked_ref, actuals_ref = expected[cutoff]
+        assert set(masked) == set(masked_ref)
+        for key, ref in masked_ref.items():
+            _assert_same(masked[key], ref, f'{cutoff}/{key}')
+        _assert_same(actuals, actuals_ref, f'{cutoff}/actuals')
+
+        # De fixture moet de aggregaties echt raken
+        for key in ('historische_cashflow', 'debiteuren', 'crediteuren', 'banksaldo',
+                    'betaalgedrag_debiteuren', 'betaalgedrag_crediteuren', 'salarishistorie'):
+            assert not masked_ref[key].empty, f'{cutoff}/{key}'
+    return expected
+
+
+def test_snapshot_matches_per_cutoff_queries():
+    _assert_snapshot_matches(ADMINISTRATIE)
+
+
+def test_snapshot_matches_for_other_administratie():
+    # Het kasdagboek telt voor Service BV wel in het banksaldo, niet in de cashflow
+    expected = _assert_snapshot_matches('Service BV')
+    assert 'Kas' in expected[CUTOFFS[0]][0]['banksaldo']['bank_naam'].tolist()
+    installatie = _run(use_snapshot=False)[2]
+    assert 'Kas' not in installatie[CUTOFFS[0]][0]['banksaldo']['bank_naam'].tolist()
+
+
+def test_snapshot_does_not_query_per_cutoff():
+    db, framework, _ = _run(use_snapshot=True)
+    for method in RAW_METHODS:
+        assert db.calls[method] == 1, method
+    # Eén keer over het hele venster bij het laden, daarna in-memory per cutoff
+    loaded_once = {'get_openstaande_crediteuren', 'get_btw_aangifteregels', 'get_salarishistorie',
+                   'get_terugkerende_kosten'}
+    for method in CUTOFF_METHODS:
+        assert db.calls[method] == (1 if method in loaded_once else 0), method
+    for method in STATIC_METHODS:
+        assert db.calls[method] == 1, method
+
+    reference, _, _ = _run(use_snapshot=False)
+    assert reference.calls['get_historische_cashflow_per_week'] == 2 * len(CUTOFFS)
+    assert framework.snapshot.queries < sum(reference.calls.values())
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,84 @@
+"""
+Test: batch runner (src/batch_runner.py)
+========================================
+Draait een kleine batch op demo data en controleert de Parquet output.
+
+Draaien:
+    python -m pytest test_batch_runner.py -q
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.batch_runner import BatchJob, _group_jobs, load_jobs, parse_jobs, run_batch
+
+STANDDATUM = date(2025, 3, 3)
+
+
+def test_parse_and_load_jobs():
+    assert parse_jobs(['1229', '1230:Installatie BV', ' ']) == [
+        BatchJob('1229'), BatchJob('1230', 'Installatie BV'),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'klanten.csv')
+        pd.DataFrame({'klantnummer': ['0042', '1229'], 'administratie': ['', 'Adm']}).to_csv(path, index=False)
+        assert load_jobs(path) == [BatchJob('0042'), BatchJob('1229', 'Adm')]
+
+
+def test_forecast_batch_writes_parquet():
+    jobs = [BatchJob('A'), BatchJob('B', 'Demo')]
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = run_batch(jobs, tmp, standdatum=STANDDATUM, weeks_forecast=8, weeks_history=4,
+                         workers=2, use_mock=True)
+        assert list(runs['status']) == ['ok', 'ok']
+        assert runs['fetch_s'].notna().all() and runs['forecast_s'].notna().all()
+
+        stored = pd.read_parquet(os.path.join(tmp, 'runs.parquet'))
+        assert list(stored['klantnummer']) == ['A', 'B']
+        assert stored['metadata'].str.contains('portfolio_dso').all()
+
+        forecasts = pd.read_parquet(os.path.join(tmp, 'forecasts.parquet'))
+        assert set(forecasts['klantnummer']) == {'A', 'B'}
+        per_klant = forecasts[forecasts['is_realisatie'] == False].groupby('klantnummer').size()  # noqa: E712
+        assert (per_klant == 8).all()
+        assert forecasts['run_id'].nunique() == 1
+
+
+def test_administraties_of_one_klant_fetched_together():
+    jobs = [BatchJob('1229'), BatchJob('1230', 'Installatie BV'), BatchJob('1230', 'Service BV'),
+            BatchJob('1231', 'Holding')]
+    assert _group_jobs(jobs) == [[0], [1, 2], [3]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = run_batch([BatchJob('A', 'Demo'), BatchJob('A', 'Demo Administratie')], tmp,
+                         standdatum=STANDDATUM, weeks_forecast=4, weeks_history=4, workers=1, use_mock=True)
+        assert list(runs['status']) == ['ok', 'ok']
+        assert list(runs['detected_admin']) == ['Demo', 'Demo Administratie']
+
+
+def test_both_mode_with_parallel_workers():
+    # Forecast- en backtest-jobs van meerdere klanten tegelijk in de pool,
+    # terwijl de fetch threads nog lopen (hing eerder met fork)
+    jobs = [BatchJob('A'), BatchJob('B'), BatchJob('C', 'Demo')]
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = run_batch(jobs, tmp, mode='both', standdatum=STANDDATUM, weeks_forecast=4,
+                         weeks_history=4, n_months=2, workers=2, use_mock=True)
+        assert list(runs['status']) == ['ok', 'ok', 'ok']
+        assert runs['forecast_s'].notna().all() and runs['backtest_s'].notna().all()
+        assert (runs['backtest_runs'] == 2).all() and (runs['backtest_errors'] == 0).all()
+
+        forecasts = pd.read_parquet(os.path.join(tmp, 'forecasts.parquet'))
+        assert set(forecasts['klantnummer']) == {'A', 'B', 'C'}
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
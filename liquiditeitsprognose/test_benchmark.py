@@ -0,0 +1,99 @@
+"""
+Test: benchmark harness (src/benchmark.py)
+==========================================
+Controleert dat de synthetische data meeschaalt en dezelfde kolommen heeft
+als MockDatabase, dat een kleine benchmarkrun voor elke pijler een meting
+oplevert en dat de JSON-vergelijking regressies markeert.
+
+Draaien:
+    python -m pytest test_benchmark.py -q
+"""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.benchmark import (
+    PILLARS, SyntheticDatabase, _pillar_backtest_v7, compare_results, run_benchmark, write_results,
+)
+from src.database import MockDatabase
+
+STANDDATUM = date(2025, 6, 18)
+
+
+def test_synthetic_data_scales_and_matches_mock_columns():
+    small = SyntheticDatabase(500, 1, today=STANDDATUM)
+    large = SyntheticDatabase(5_000, 3, today=STANDDATUM)
+    mock = MockDatabase()
+
+    deb = large.get_openstaande_debiteuren(STANDDATUM)
+    cred = large.get_openstaande_crediteuren(STANDDATUM)
+    assert len(deb) + len(cred) == 5_000
+    assert set(mock.get_openstaande_debiteuren().columns) <= set(deb.columns)
+    assert set(mock.get_openstaande_crediteuren().columns) <= set(cred.columns)
+    assert (deb['factuurdatum'] <= pd.Timestamp(STANDDATUM)).all()
+
+    assert len(small.get_historische_cashflow_per_week()) == 52
+    assert len(large.get_historische_cashflow_per_week()) == 156
+    window = large.get_historische_cashflow_per_week(startdatum=date(2025, 1, 1), einddatum=date(2025, 3, 1))
+    assert window['week_start'].min() >= pd.Timestamp(2025, 1, 1)
+    assert window['week_start'].max() < pd.Timestamp(2025, 3, 1)
+
+    # Deterministisch per seed
+    again = SyntheticDatabase(5_000, 3, today=STANDDATUM).get_openstaande_debiteuren(STANDDATUM)
+    assert deb.equals(again)
+
+
+def test_small_run_measures_every_pillar():
+    results = run_benchmark(items=[300], years=[1], pillars=PILLARS, repeat=1,
+                            track_memory=True, backtest_months=2, standdatum=STANDDATUM, verbose=False)
+    assert [r['pillar'] for r in results] == list(PILLARS)
+    for row in results:
+        assert row['status'] == 'ok', row
+        assert row['seconds_median'] >= 0 and row['peak_mb'] >= 0
+
+
+def test_backtest_pillar_uses_standdatum():
+    # Cutoffs vanaf de standdatum, niet vanaf vandaag: anders ligt elke cutoff na de data
+    report = _pillar_backtest_v7(SyntheticDatabase(300, 1, today=STANDDATUM), {}, STANDDATUM, n_months=2)
+    assert [r.cutoff_date for r in report.results] == [date(2025, 4, 1), date(2025, 5, 1)]
+    assert np.isfinite(report.overall_mape)
+
+
+def test_results_json_and_comparison():
+    baseline = [
+        {'pillar': 'forecast_v7', 'n_open_items': 1000, 'history_years': 1, 'status': 'ok',
+         'seconds_median': 0.10, 'peak_mb': 5.0},
+        {'pillar': 'layered', 'n_open_items': 1000, 'history_years': 1, 'status': 'ok',
+         'seconds_median': 0.20, 'peak_mb': 8.0},
+    ]
+    current = [
+        dict(baseline[0], seconds_median=0.11),
+        dict(baseline[1], seconds_median=0.40),
+    ]
+    comparison = compare_results(baseline, current, threshold=1.2)
+    assert list(comparison['regressie']) == [False, True]
+    assert list(comparison['ratio']) == [1.1, 2.0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.json')
+        write_results(current, path, {'items': [1000]})
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        assert payload['results'] == current
+        assert payload['settings'] == {'items': [1000]}
+        assert {'timestamp', 'python', 'pandas', 'numpy'} <= set(payload['environment'])
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,152 @@
+"""
+Test: DWH connection pool (src/database.py)
+===========================================
+Controleert met nep-verbindingen (geen pyodbc nodig) dat de pool bij een
+volle pool na checkout_timeout opgeeft, verlopen idle verbindingen sluit,
+kapotte verbindingen via de health check vervangt en per klantnummer plus
+connection string wordt gedeeld.
+
+Draaien:
+    python -m pytest test_dwh_pool.py -q
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database import DWHConnectionPool, get_dwh_pool
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise ConnectionError("verbinding verbroken")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(**kwargs):
+    created = []
+
+    def connect():
+        created.append(_Conn())
+        return created[-1]
+
+    return DWHConnectionPool(connect, **kwargs), created
+
+
+def test_checkout_times_out_when_pool_is_full():
+    pool, _ = _pool(max_size=1, checkout_timeout=0.1)
+    with pool.connection():
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+        assert time.monotonic() - start >= 0.09
+    # Na de time-out is de pool gewoon weer bruikbaar
+    with pool.connection():
+        pass
+    assert pool.stats()['in_use'] == 0
+
+
+def test_waiting_checkout_gets_released_connection():
+    pool, created = _pool(max_size=1, checkout_timeout=2.0)
+    got = []
+    with pool.connection() as conn:
+        t = threading.Thread(target=lambda: got.append(pool._checkout()))
+        t.start()
+        time.sleep(0.1)
+    t.join()
+    assert got == [conn] and len(created) == 1
+    assert pool.stats()['wait_max_ms'] >= 90
+
+
+def test_idle_connections_are_evicted():
+    pool, created = _pool(idle_timeout=0.05)
+    with pool.connection():
+        pass
+    time.sleep(0.1)
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert created[0].closed
+    stats = pool.stats()
+    assert stats['evicted_idle'] == 1 and stats['reused'] == 0
+
+
+def test_broken_connection_fails_health_check():
+    pool, created = _pool(health_check_after=0.0)
+    with pool.connection():
+        pass
+    created[0].broken = True
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert created[0].closed
+    assert pool.stats()['health_check_failures'] == 1
+
+    # Gezonde verbinding wordt gewoon hergebruikt
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert pool.stats()['reused'] == 1
+
+
+def test_error_during_use_discards_connection():
+    pool, created = _pool()
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("query fout")
+    assert created[0].closed and pool.stats()['idle'] == 0
+
+
+def test_pool_is_keyed_by_connection_string():
+    klant = 99001
+    pool_a = get_dwh_pool(klant, 'PWD=oud;', connect=_Conn)
+    assert get_dwh_pool(klant, 'PWD=oud;', connect=_Conn) is pool_a
+    with pool_a.connection() as conn:
+        pass
+
+    # Ander wachtwoord: nieuwe pool, oude idle verbindingen dicht
+    pool_b = get_dwh_pool(klant, 'PWD=nieuw;', connect=_Conn)
+    assert pool_b is not pool_a
+    assert conn.closed
+    assert get_dwh_pool(klant + 1, 'PWD=nieuw;', connect=_Conn) is not pool_b
+
+
+def test_connection_in_use_is_closed_when_pool_is_replaced():
+    klant = 99002
+    pool_a = get_dwh_pool(klant, 'PWD=oud;', connect=_Conn)
+    with pool_a.connection() as conn:
+        get_dwh_pool(klant, 'PWD=nieuw;', connect=_Conn)
+        assert not conn.closed
+    # Teruggebracht in de vervangen pool: gesloten, niet opnieuw idle
+    assert conn.closed and pool_a.stats()['idle'] == 0
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
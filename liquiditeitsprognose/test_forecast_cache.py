@@ -0,0 +1,245 @@
+"""
+Test: forecast cache (src/forecast_cache.py)
+============================================
+Controleert dat create_forecast_v7 alleen opnieuw draait als de inhoud van
+de data of de parameters wijzigt, dat de cache begrensd is, dat de
+schijfcache een nieuwe instantie warm laat starten en dat een
+profielwijziging alleen de blend opnieuw laat draaien (StageCache).
+
+Draaien:
+    python -m pytest test_forecast_cache.py -q
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import src.forecast_cache as fc
+from config import ForecastProfile
+from src.forecast_cache import ForecastCache, StageCache, cached_forecast_v7, fingerprint_frame
+from src.forecast_v7 import V7_STAGE_INPUTS, create_forecast_v7
+
+REFERENCE_DATE = date(2025, 3, 3)
+
+
+def _data(seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    weeks = [REFERENCE_DATE - timedelta(weeks=w) for w in range(60, 0, -1)]
+    hist = pd.DataFrame({
+        'week_start': pd.to_datetime(weeks),
+        'inkomsten': rng.uniform(20_000, 60_000, len(weeks)).round(2),
+        'uitgaven': rng.uniform(15_000, 50_000, len(weeks)).round(2),
+    })
+    hist['netto'] = hist['inkomsten'] - hist['uitgaven']
+    debiteuren = pd.DataFrame({
+        'debiteur_code': [f'D{i}' for i in range(20)],
+        'vervaldatum': [REFERENCE_DATE + timedelta(days=int(d)) for d in rng.integers(-30, 60, 20)],
+        'openstaand': rng.uniform(500, 10_000, 20).round(2),
+    })
+    return {
+        'historische_cashflow': hist,
+        'debiteuren': debiteuren,
+        'crediteuren': pd.DataFrame(),
+        'banksaldo': pd.DataFrame({'saldo': [100_000.0]}),
+        '_db': object(),
+    }
+
+
+class _Counter:
+    def __init__(self):
+        self.calls = 0
+        self._original = fc.create_forecast_v7
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return self._original(**kwargs)
+
+
+def _with_counter(fn):
+    def wrapper():
+        counter = _Counter()
+        fc.create_forecast_v7 = counter
+        try:
+            fn(counter)
+        finally:
+            fc.create_forecast_v7 = counter._original
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+def test_fingerprint_is_content_based():
+    a = _data(1)['historische_cashflow']
+    assert fingerprint_frame(a) == fingerprint_frame(a.copy())
+    b = a.copy()
+    b.loc[3, 'inkomsten'] += 0.01
+    assert fingerprint_frame(a) != fingerprint_frame(b)
+
+
+@_with_counter
+def test_hit_on_identical_input(counter):
+    cache = ForecastCache(max_entries=4)
+    first = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache)
+    # Nieuwe, inhoudelijk gelijke DataFrames (zoals na een Streamlit rerun)
+    second = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache)
+    assert counter.calls == 1
+    pd.testing.assert_frame_equal(first[0], second[0])
+    assert first[1] == second[1]
+    assert cache.stats()['hits'] == 1
+
+
+@_with_counter
+def test_miss_on_changed_input(counter):
+    cache = ForecastCache(max_entries=8)
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache)
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, weeks_forecast=8, cache=cache)
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, calibrated_dso=42.0, cache=cache)
+    cached_forecast_v7(_data(seed=2), reference_date=REFERENCE_DATE, cache=cache)
+    assert counter.calls == 4
+
+
+@_with_counter
+def test_profile_knobs_in_key_metadata_not(counter):
+    cache = ForecastCache(max_entries=8)
+    profile = ForecastProfile(profiel_naam='project')
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=profile, cache=cache)
+
+    touched = ForecastProfile(profiel_naam='project', laatst_gewijzigd='2025-03-03', gewijzigd_door='consultant')
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=touched, cache=cache)
+    assert counter.calls == 1
+
+    tuned = ForecastProfile(profiel_naam='project', nieuwe_facturatie_pct=0.1)
+    cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=tuned, cache=cache)
+    assert counter.calls == 2
+
+
+def test_result_is_a_copy():
+    cache = ForecastCache(max_entries=4)
+    df, _, meta = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache)
+    df['netto_cashflow'] = 0.0
+    meta['portfolio_dso'] = -1
+    df2, _, meta2 = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache)
+    assert (df2['netto_cashflow'] != 0).any()
+    assert meta2['portfolio_dso'] != -1
+
+
+def test_lru_bound():
+    cache = ForecastCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, (pd.DataFrame(), 0, {}))
+    assert cache.stats()['entries'] == 2
+    assert cache.get('a') is None
+    assert cache.get('c') is not None
+
+
+@_with_counter
+def test_disk_cache_survives_new_instance(counter):
+    with tempfile.TemporaryDirectory() as tmp:
+        first = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE,
+                                   cache=ForecastCache(max_entries=4, directory=tmp))
+        second = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE,
+                                    cache=ForecastCache(max_entries=4, directory=tmp))
+        assert counter.calls == 1
+        pd.testing.assert_frame_equal(first[0], second[0])
+
+
+@_with_counter
+def test_code_change_invalidates_disk_cache(counter):
+    import src.forecast_v7
+    assert fc.CACHE_VERSION == fc._source_hash(src.forecast_v7.__file__, fc.__file__)
+
+    original = fc.CACHE_VERSION
+    with tempfile.TemporaryDirectory() as tmp:
+        cached_forecast_v7(_data(), reference_date=REFERENCE_DATE,
+                           cache=ForecastCache(max_entries=4, directory=tmp))
+        # Zelfde input, andere modelcode: het oude resultaat mag niet matchen
+        fc.CACHE_VERSION = original + '-gewijzigd'
+        try:
+            cached_forecast_v7(_data(), reference_date=REFERENCE_DATE,
+                               cache=ForecastCache(max_entries=4, directory=tmp))
+        finally:
+            fc.CACHE_VERSION = original
+        assert counter.calls == 2
+
+
+def _without_timings(metadata: dict) -> dict:
+    return {k: v for k, v in metadata.items() if k != 'stage_timings'}
+
+
+def test_profile_change_only_reruns_blend():
+    cache = ForecastCache(max_entries=8)
+    stages = StageCache()
+    profiles = [
+        None,
+        ForecastProfile(profiel_naam='project', manually_set=True),
+        ForecastProfile(profiel_naam='onderhoud', manually_set=True, nieuwe_facturatie_pct=0.05),
+        ForecastProfile(profiel_naam='gemengd', realiteit_horizon_weken=6, gebruik_pijplijn=False),
+    ]
+    for profile in profiles:
+        staged = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=profile,
+                                    cache=cache, stage_cache=stages)
+        direct = create_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=profile)
+        pd.testing.assert_frame_equal(staged[0], direct[0])
+        assert _without_timings(staged[2]) == _without_timings(direct[2])
+
+    runs = stages.stats()['runs']
+    # Elke profiel-onafhankelijke stap is precies één keer uitgevoerd
+    for name in V7_STAGE_INPUTS:
+        if name != 'inkomstenpatroon':
+            assert runs[name] == 1, (name, runs)
+    assert runs.get('inkomstenpatroon', 0) <= 1
+
+
+def test_stage_reruns_only_on_its_own_inputs():
+    stages = StageCache()
+    data = _data()
+    create_forecast_v7(data, reference_date=REFERENCE_DATE, stages=stages.bind(data))
+    changed = dict(data)
+    changed['crediteuren'] = pd.DataFrame({
+        'vervaldatum': [REFERENCE_DATE + timedelta(days=10)],
+        'openstaand': [2_500.0],
+    })
+    create_forecast_v7(changed, reference_date=REFERENCE_DATE, stages=stages.bind(changed))
+    runs = stages.stats()['runs']
+    assert runs['realiteit'] == 2
+    assert runs['structuur'] == 1 and runs['volume'] == 1 and runs['pijplijn'] == 1
+
+
+def test_stage_timings_in_metadata():
+    cache = ForecastCache(max_entries=4)
+    stages = StageCache()
+    _, _, first = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache, stage_cache=stages)
+    timings = first['stage_timings']
+    names = [r['stage'] for r in timings['stages']]
+    for name in ('realiteit', 'structuur', 'volume', 'pijplijn', 'terugkerende_kosten', 'blend', 'validatie'):
+        assert name in names
+    assert timings['from_cache'] is False
+    assert not any(r['cached'] for r in timings['stages'])
+    assert all(r['seconds'] >= 0 for r in timings['stages'])
+    assert timings['total_s'] >= sum(r['seconds'] for r in timings['stages'])
+    realiteit = next(r for r in timings['stages'] if r['stage'] == 'realiteit')
+    assert realiteit['rows_in'] == len(_data()['debiteuren']) + len(_data()['crediteuren'])
+    assert realiteit['rows_out'] == 13
+
+    # Zelfde input: resultaat uit de forecast cache
+    _, _, again = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, cache=cache, stage_cache=stages)
+    assert again['stage_timings']['from_cache'] is True
+
+    # Alleen profiel gewijzigd: de stappen komen uit de stage cache, de blend niet
+    profile = ForecastProfile(profiel_naam='onderhoud', manually_set=True, nieuwe_facturatie_pct=0.05)
+    _, _, rerun = cached_forecast_v7(_data(), reference_date=REFERENCE_DATE, forecast_profile=profile,
+                                     cache=cache, stage_cache=stages)
+    cached = {r['stage']: r['cached'] for r in rerun['stage_timings']['stages']}
+    assert cached['realiteit'] and cached['structuur'] and not cached['blend']
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
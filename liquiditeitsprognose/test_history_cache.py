@@ -0,0 +1,120 @@
+"""
+Test: cashflow history cache (src/history_cache.py)
+===================================================
+Controleert dat de cache dezelfde weekcashflow oplevert als één volledige
+query, en dat vervolgaanroepen alleen de recente (nog open) weken of een
+ontbrekend begin ophalen.
+
+Draaien:
+    python -m pytest test_history_cache.py -q
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.history_cache import WeeklyCashflowCache, aggregate_weekly
+
+TODAY = date(2025, 6, 18)  # woensdag
+
+
+def _ledger() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    days = pd.date_range(TODAY - timedelta(days=1000), TODAY - timedelta(days=1), freq='D')
+    days = days[rng.random(len(days)) < 0.8]  # niet elke dag mutaties
+    return pd.DataFrame({
+        'boekdatum': days,
+        'inkomsten': rng.gamma(2, 3000, len(days)).round(2),
+        'uitgaven': rng.gamma(2, 2500, len(days)).round(2),
+    })
+
+
+class _Source:
+    def __init__(self):
+        self.ledger = _ledger()
+        self.calls = []
+
+    def fetch_daily(self, van: date, tot: date) -> pd.DataFrame:
+        self.calls.append((van, tot))
+        d = self.ledger['boekdatum']
+        return self.ledger[(d >= pd.Timestamp(van)) & (d < pd.Timestamp(tot))]
+
+    def direct(self, van: date, tot: date) -> pd.DataFrame:
+        d = self.ledger['boekdatum']
+        return aggregate_weekly(self.ledger[(d >= pd.Timestamp(van)) & (d < pd.Timestamp(tot))].reset_index(drop=True))
+
+
+def test_aggregate_weekly_splits_month_boundaries():
+    daily = pd.DataFrame({
+        'boekdatum': pd.to_datetime(['2025-03-31', '2025-04-01', '2025-04-02']),
+        'inkomsten': [10.0, 20.0, 30.0],
+        'uitgaven': [1.0, 2.0, 3.0],
+    })
+    weekly = aggregate_weekly(daily)
+    assert list(weekly['maand']) == [3, 4]
+    assert (weekly['week_start'] == pd.Timestamp('2025-03-31')).all()
+    assert list(weekly['week_nummer']) == [14, 14]
+    assert list(weekly['netto']) == [9.0, 45.0]
+
+
+def test_incremental_fetch_matches_full_query():
+    source = _Source()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = WeeklyCashflowCache(tmp, settle_days=7)
+        key = (1229, 'Adm')
+        start = date(TODAY.year - 1, TODAY.month, 1)
+
+        first = cache.weekly(source.fetch_daily, key, start, TODAY, today=TODAY)
+        pd.testing.assert_frame_equal(first, source.direct(start, TODAY))
+        assert len(source.calls) == 1
+
+        # Tweede keer: alleen de weken na de laatste afgesloten week
+        source.calls.clear()
+        second = cache.weekly(source.fetch_daily, key, start, TODAY, today=TODAY)
+        pd.testing.assert_frame_equal(second, first)
+        assert len(source.calls) == 1
+        van, tot = source.calls[0]
+        assert van.weekday() == 0 and (TODAY - van).days < 21 and tot == TODAY
+
+        # Langere lookback (seizoen): alleen het ontbrekende begin erbij
+        source.calls.clear()
+        long_start = date(TODAY.year - 2, 1, 15)
+        longer = cache.weekly(source.fetch_daily, key, long_start, TODAY, today=TODAY)
+        pd.testing.assert_frame_equal(longer, source.direct(long_start, TODAY))
+        heads = [c for c in source.calls if c[1] < TODAY]
+        assert len(heads) == 1 and heads[0][1] <= start
+
+        # Een week later: opnieuw alleen de staart, weer identiek
+        source.calls.clear()
+        later = TODAY + timedelta(days=7)
+        source.ledger = pd.concat([source.ledger, pd.DataFrame({
+            'boekdatum': pd.date_range(TODAY, later - timedelta(days=1)),
+            'inkomsten': 100.0, 'uitgaven': 50.0,
+        })], ignore_index=True)
+        moved = cache.weekly(source.fetch_daily, key, start, later, today=later)
+        pd.testing.assert_frame_equal(moved, source.direct(start, later))
+        assert len(source.calls) == 1
+
+
+def test_keys_are_separate():
+    source = _Source()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = WeeklyCashflowCache(tmp)
+        start = date(TODAY.year - 1, 1, 1)
+        cache.weekly(source.fetch_daily, (1229, 'A'), start, TODAY, today=TODAY)
+        source.calls.clear()
+        cache.weekly(source.fetch_daily, (1229, 'B'), start, TODAY, today=TODAY)
+        assert source.calls == [(start - timedelta(days=start.weekday()), TODAY)]
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,111 @@
+"""
+Test: cache voor gefitte modellen (src/model_cache.py)
+======================================================
+Controleert dat een ongewijzigde reeks het gefitte model hergebruikt, dat
+een extra week of andere hyperparameters een nieuwe fit geven, dat
+administraties gescheiden blijven en dat de schijfcache via dumps/loads
+een nieuwe sessie warm laat starten.
+
+Draaien:
+    python -m pytest test_model_cache.py -q
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.model_cache import ModelCache, model_cache_key
+
+
+def _series(weeks: int = 60) -> pd.Series:
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2024-01-01', periods=weeks, freq='W-MON')
+    return pd.Series(rng.gamma(4, 5_000, weeks).round(2), index=index, name='omzet')
+
+
+class _Fitter:
+    """Telt het aantal fits; het 'model' is het gemiddelde van de reeks."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, series):
+        def fit():
+            self.calls += 1
+            return {'level': float(series.mean()), 'n': len(series)}
+        return fit
+
+
+def test_unchanged_series_reuses_fit():
+    cache = ModelCache(max_entries=4)
+    fitter = _Fitter()
+    series = _series()
+    first = cache.get_or_fit('holt_winters', 'A', series, {'seasonal_periods': 52}, fitter(series))
+    again = cache.get_or_fit('holt_winters', 'A', series.copy(), {'seasonal_periods': 52}, fitter(series))
+    assert first == again
+    assert fitter.calls == 1
+    assert cache.stats()['fits'] == 1 and cache.stats()['hits'] == 1
+
+
+def test_new_week_or_other_params_refit():
+    cache = ModelCache(max_entries=8)
+    fitter = _Fitter()
+    series = _series()
+    cache.get_or_fit('holt_winters', 'A', series, {'seasonal_periods': 52}, fitter(series))
+
+    longer = _series(61)
+    model = cache.get_or_fit('holt_winters', 'A', longer, {'seasonal_periods': 52}, fitter(longer))
+    assert model['n'] == 61 and fitter.calls == 2
+
+    cache.get_or_fit('holt_winters', 'A', series, {'seasonal_periods': 26}, fitter(series))
+    cache.get_or_fit('holt_winters', 'B', series, {'seasonal_periods': 52}, fitter(series))
+    cache.get_or_fit('prophet', 'A', series, {'seasonal_periods': 52}, fitter(series))
+    assert fitter.calls == 5
+
+
+def test_key_depends_on_values_not_identity():
+    series = _series()
+    params = {'seasonal_periods': 52}
+    assert model_cache_key('holt_winters', None, series, params) == \
+        model_cache_key('holt_winters', '', series.copy(), params)
+    changed = series.copy()
+    changed.iloc[10] += 0.01
+    assert model_cache_key('holt_winters', None, series, params) != \
+        model_cache_key('holt_winters', None, changed, params)
+
+
+def test_disk_cache_survives_new_process():
+    series = _series()
+    with tempfile.TemporaryDirectory() as tmp:
+        fitter = _Fitter()
+        ModelCache(directory=tmp).get_or_fit(
+            'prophet', 'A', series, {}, fitter(series), dumps=json.dumps, loads=json.loads)
+
+        # Nieuwe cache (nieuwe sessie) op dezelfde map: geen fit nodig
+        fresh = ModelCache(directory=tmp)
+        model = fresh.get_or_fit(
+            'prophet', 'A', series, {}, fitter(series), dumps=json.dumps, loads=json.loads)
+        assert model == {'level': float(series.mean()), 'n': len(series)}
+        assert fitter.calls == 1
+
+
+def test_disabled_memory_cache_still_fits():
+    cache = ModelCache(max_entries=0)
+    fitter = _Fitter()
+    series = _series()
+    for _ in range(2):
+        cache.get_or_fit('holt_winters', None, series, {}, fitter(series))
+    assert fitter.calls == 2
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f'OK  {name}')
@@ -0,0 +1,181 @@
+"""
+Regressietest: gevectoriseerde _build_realiteit
+===============================================
+Vergelijkt de weektotalen van de gevectoriseerde _build_realiteit met de
+oorspronkelijke rij-voor-rij implementatie (hieronder als referentie
+opgenomen) op synthetische open posten: gemengde datumtypes, NaN's,
+negatieve bedragen, posten buiten de horizon en fractionele DSO/DPO.
+
+Draaien:
+    python -m pytest test_realiteit_regression.py -q
+"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.forecast_v7 import _build_realiteit
+
+REFERENCE_DATE = date(2025, 3, 3)
+WEEKS = 13
+
+
+def _build_realiteit_rowwise(
+    debiteuren: pd.DataFrame,
+    crediteuren: pd.DataFrame,
+    salarissen: pd.DataFrame,
+    btw_data: pd.DataFrame,
+    dso_days: float,
+    dpo_days: float,
+    reference_date: date,
+    weeks: int,
+    btw_prognose: pd.DataFrame = None,
+) -> Dict[int, Dict[str, float]]:
+    """Oorspronkelijke iterrows-implementatie (zonder SSM BTW-prognose)."""
+    result = {w: {'inkomsten': 0.0, 'uitgaven': 0.0, 'salarissen': 0.0, 'btw': 0.0}
+              for w in range(weeks)}
+
+    # --- Debiteuren: open facturen + DSO shift ---
+    if not debiteuren.empty:
+        date_col = next((c for c in ['vervaldatum', 'expected_pay_date'] if c in debiteuren.columns), None)
+        amt_col = next((c for c in ['openstaand', 'bedrag_excl_btw'] if c in debiteuren.columns), None)
+
+        if date_col and amt_col:
+            for _, row in debiteuren.iterrows():
+                d, a = row[date_col], row[amt_col]
+                if pd.isna(d) or pd.isna(a) or float(a) <= 0:
+                    continue
+                if isinstance(d, str):
+                    d = pd.to_datetime(d).date()
+                elif hasattr(d, 'date'):
+                    d = d.date()
+
+                expected = d + timedelta(days=max(0, dso_days))
+                w_idx = (expected - reference_date).days // 7
+                if 0 <= w_idx < weeks:
+                    result[w_idx]['inkomsten'] += float(a)
+
+    # --- Crediteuren: open facturen + DPO shift ---
+    if not crediteuren.empty:
+        date_col = next((c for c in ['vervaldatum'] if c in crediteuren.columns), None)
+        amt_col = next((c for c in ['openstaand', 'bedrag_excl_btw'] if c in crediteuren.columns), None)
+
+        if date_col and amt_col:
+            for _, row in crediteuren.iterrows():
+                d, a = row[date_col], row[amt_col]
+                if pd.isna(d) or pd.isna(a) or float(a) <= 0:
+                    continue
+                if isinstance(d, str):
+                    d = pd.to_datetime(d).date()
+                elif hasattr(d, 'date'):
+                    d = d.date()
+
+                expected = d + timedelta(days=max(0, dpo_days))
+                w_idx = (expected - reference_date).days // 7
+                if 0 <= w_idx < weeks:
+                    result[w_idx]['uitgaven'] += float(a)
+
+    # --- Geplande salarissen (als bekend) ---
+    if not salarissen.empty and 'betaaldatum' in salarissen.columns:
+        for _, row in salarissen.iterrows():
+            bd = row['betaaldatum']
+            if pd.isna(bd):
+                continue
+            if isinstance(bd, str):
+                bd = pd.to_datetime(bd).date()
+            elif hasattr(bd, 'date'):
+                bd = bd.date()
+            w_idx = (bd - reference_date).days // 7
+            if 0 <= w_idx < weeks:
+                result[w_idx]['salarissen'] += float(row.get('bedrag', 0))
+
+    # --- Bekende BTW-verplichtingen (recente maanden met bedrag) ---
+    if not btw_data.empty and 'maand' in btw_data.columns:
+        df_btw = btw_data.copy()
+        df_btw['maand'] = pd.to_datetime(df_btw['maand'])
+        df_btw['btw_bedrag'] = pd.to_numeric(df_btw['btw_bedrag'], errors='coerce').fillna(0)
+        # Alleen toekomstige BTW-verplichtingen
+        future_btw = df_btw[df_btw['maand'] >= pd.Timestamp(reference_date)]
+        for _, row in future_btw.iterrows():
+            btw_date = row['maand']
+            if hasattr(btw_date, 'date'):
+                btw_date = btw_date.date()
+            w_idx = (btw_date - reference_date).days // 7
+            if 0 <= w_idx < weeks and abs(row['btw_bedrag']) > 0:
+                result[w_idx]['btw'] += abs(float(row['btw_bedrag']))
+
+    return result
+
+
+def _open_posten(n: int, seed: int, date_kind: str) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(-60, 120, n)
+    dates = [REFERENCE_DATE + timedelta(days=int(o)) for o in offsets]
+    if date_kind == 'str':
+        dates = [d.isoformat() for d in dates]
+    elif date_kind == 'timestamp':
+        dates = [pd.Timestamp(d) + pd.Timedelta(hours=int(h)) for d, h in zip(dates, rng.integers(0, 24, n))]
+    elif date_kind == 'datetime':
+        dates = [datetime(d.year, d.month, d.day, 9, 30) for d in dates]
+    amounts = rng.normal(2500, 4000, n).round(2)  # ook negatieve bedragen (creditnota's)
+    df = pd.DataFrame({'vervaldatum': dates, 'openstaand': amounts})
+    df.loc[rng.random(n) < 0.05, 'vervaldatum'] = None
+    df.loc[rng.random(n) < 0.05, 'openstaand'] = np.nan
+    return df
+
+
+def _salarissen() -> pd.DataFrame:
+    return pd.DataFrame({
+        'betaaldatum': ['2025-03-25', date(2025, 4, 25), pd.Timestamp('2025-05-23'), None, '2025-02-25'],
+        'bedrag': [85000.0, 85000.0, 170000.0, 85000.0, 85000.0],
+    })
+
+
+def _btw() -> pd.DataFrame:
+    return pd.DataFrame({
+        'maand': ['2025-01-31', '2025-03-31', '2025-04-30', '2025-05-31', '2025-06-30'],
+        'btw_bedrag': [40000, -52000.5, 0, 'n.v.t.', 61000],
+    })
+
+
+def _assert_same(expected: Dict, actual: Dict):
+    assert expected.keys() == actual.keys()
+    for w in expected:
+        for k in expected[w]:
+            assert np.isclose(expected[w][k], actual[w][k], rtol=1e-12, atol=1e-6), (w, k, expected[w][k], actual[w][k])
+
+
+def _compare(debiteuren, crediteuren, salarissen, btw, dso, dpo):
+    args = (debiteuren, crediteuren, salarissen, btw, dso, dpo, REFERENCE_DATE, WEEKS)
+    _assert_same(_build_realiteit_rowwise(*args), _build_realiteit(*args))
+
+
+def test_date_objects():
+    _compare(_open_posten(2000, 1, 'date'), _open_posten(1500, 2, 'date'), _salarissen(), _btw(), 35.0, 30.0)
+
+
+def test_string_dates_and_fractional_dso():
+    _compare(_open_posten(2000, 3, 'str'), _open_posten(1500, 4, 'str'), _salarissen(), _btw(), 41.7, 12.4)
+
+
+def test_timestamps_with_time_of_day():
+    _compare(_open_posten(2000, 5, 'timestamp'), _open_posten(1500, 6, 'datetime'), _salarissen(), _btw(), 0.0, -5.0)
+
+
+def test_alternative_columns_and_empty_inputs():
+    deb = _open_posten(500, 7, 'date').rename(columns={'vervaldatum': 'expected_pay_date', 'openstaand': 'bedrag_excl_btw'})
+    _compare(deb, pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 20.0, 30.0)
+    _compare(pd.DataFrame(), _open_posten(500, 8, 'str'), _salarissen().drop(columns='bedrag'), _btw(), 20.0, 30.0)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f'[OK] {name}')
@@ -11,6 +11,9 @@ Gebruik:
 """
 
 from .client import NotificaClient
+from .async_client import AsyncNotificaClient
+from .cache import QueryCache
+from .scheduler import RateLimitScheduler, RetryPolicy
 from .exceptions import (
     NotificaError,
     AuthError,
@@ -24,6 +27,10 @@ from .exceptions import (
 __version__ = '0.1.0'
 __all__ = [
     'NotificaClient',
+    'AsyncNotificaClient',
+    'QueryCache',
+    'RateLimitScheduler',
+    'RetryPolicy',
     'NotificaError',
     'AuthError',
     'PermissionError',
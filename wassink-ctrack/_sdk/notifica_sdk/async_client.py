@@ -0,0 +1,240 @@
+"""
+Notifica SDK — Async Client
+===========================
+asyncio-variant van NotificaClient op basis van httpx, voor het
+gelijktijdig uitvoeren van meerdere queries zonder zelf threads te beheren.
+
+Gebruik:
+    import asyncio
+    from notifica_sdk import AsyncNotificaClient
+
+    async def main():
+        async with AsyncNotificaClient() as client:
+            data = await client.gather_queries(1229, {
+                'debiteuren': 'SELECT ...',
+                'crediteuren': 'SELECT ...',
+            })
+        return data  # {'debiteuren': DataFrame, 'crediteuren': DataFrame}
+
+    data = asyncio.run(main())
+
+Rate limiting en retries zijn gelijk aan NotificaClient; de rate limiter per
+API key wordt gedeeld met synchrone clients in hetzelfde proces. Lezen en
+schrijven van de QueryCache (schijf-IO) gaat via asyncio.to_thread, zodat de
+event loop niet blokkeert.
+
+Vereist httpx: pip install httpx
+"""
+
+import asyncio
+import io
+import os
+from typing import Dict
+
+import pandas as pd
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+from .cache import QueryCache
+from .client import (
+    COLUMNAR_ACCEPT, PYARROW_AVAILABLE,
+    _frame_from_columnar, _frame_from_json, _raise_for_error,
+)
+from .exceptions import AuthError, ServerError, TimeoutError
+from .scheduler import RateLimitScheduler, RetryPolicy, shared_scheduler, parse_retry_after
+
+
+class AsyncNotificaClient:
+    """Async client voor de Notifica Data API.
+
+    Zelfde configuratie en parameters als NotificaClient (environment
+    variabelen, cache, transport, timeout, max_retries, scheduler).
+    Gebruik als async context manager, of roep aclose() aan na afloop.
+    """
+
+    def __init__(self, api_url: str = None, app_key: str = None, data_key: str = None,
+                 cache: QueryCache = None, transport: str = None,
+                 timeout: float = None, max_retries: int = None,
+                 scheduler: RateLimitScheduler = None):
+        if not HTTPX_AVAILABLE:
+            raise ImportError("AsyncNotificaClient vereist httpx: pip install httpx")
+        self.api_url = (api_url or os.getenv('NOTIFICA_API_URL', 'https://app.notifica.nl')).rstrip('/')
+        self.app_key = app_key or os.getenv('NOTIFICA_APP_KEY', '')
+        self.data_key = data_key or os.getenv('NOTIFICA_DATA_KEY', '')
+        if not self.app_key and not self.data_key:
+            raise AuthError("NOTIFICA_APP_KEY of NOTIFICA_DATA_KEY niet gevonden. Zet deze in .env of geef app_key=/data_key= mee.")
+        headers = {'Content-Type': 'application/json'}
+        # Data Key heeft voorrang — beide tegelijk sturen veroorzaakt auth-errors
+        if self.data_key:
+            headers['X-Data-Key'] = self.data_key
+        elif self.app_key:
+            headers['X-App-Key'] = self.app_key
+        if cache is None:
+            cache = QueryCache.from_env()
+        self.cache = cache or None
+        transport = (transport or os.getenv('NOTIFICA_TRANSPORT', 'json')).lower()
+        if transport not in ('json', 'arrow'):
+            raise ValueError(f"Onbekend transport '{transport}' (kies 'json' of 'arrow')")
+        self.transport = transport if PYARROW_AVAILABLE else 'json'
+        self.timeout = timeout if timeout is not None else float(os.getenv('NOTIFICA_TIMEOUT', '120'))
+        if max_retries is None:
+            max_retries = int(os.getenv('NOTIFICA_MAX_RETRIES', '3'))
+        self.retry = RetryPolicy(max_retries=max_retries)
+        self.scheduler = scheduler or shared_scheduler(self.api_url, self.data_key or self.app_key)
+        self._http = httpx.AsyncClient(base_url=self.api_url, headers=headers, timeout=self.timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _send(self, method: str, path: str, **kwargs) -> 'httpx.Response':
+        """Verstuur een request via de scheduler, met retry/backoff (zie NotificaClient._send)."""
+        attempt = 0
+        while True:
+            await self.scheduler.acquire_async()
+            try:
+                resp = await self._http.request(method, path, **kwargs)
+            except httpx.TimeoutException:
+                if self.retry.should_retry(attempt, None):
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raise TimeoutError("Request timeout bij verbinden met de API.")
+            except httpx.TransportError:
+                if self.retry.should_retry(attempt, None):
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raise ServerError(f"Kan niet verbinden met {self.api_url}. Is de API bereikbaar?")
+
+            if resp.status_code == 200 or not self.retry.should_retry(attempt, resp.status_code):
+                return resp
+
+            retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+            wait = self.retry.delay(attempt, retry_after)
+            if resp.status_code == 429:
+                self.scheduler.pause(wait)
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        resp = await self._send(method, path, **kwargs)
+        if resp.status_code != 200:
+            _raise_for_error(resp)
+        if 'application/json' in resp.headers.get('content-type', ''):
+            return resp.json()
+        return {'raw': resp.text}
+
+    async def _fetch_frame(self, path: str, body: dict, convert_numeric: bool) -> pd.DataFrame:
+        if self.transport == 'arrow':
+            resp = await self._send('POST', path, json=body, headers={'Accept': COLUMNAR_ACCEPT})
+            if resp.status_code != 200:
+                _raise_for_error(resp)
+            df = _frame_from_columnar(resp)
+            if df is not None:
+                return df
+            result = resp.json() if 'application/json' in resp.headers.get('content-type', '') else {}
+        else:
+            result = await self._request('POST', path, json=body)
+        return _frame_from_json(result, convert_numeric)
+
+    # ===== QUERIES =====
+
+    async def query(self, klantnummer: int, sql: str, max_rows: int = None, use_cache: bool = True) -> pd.DataFrame:
+        """Voer een vrije SQL query uit (vereist dev_mode). Zie NotificaClient.query."""
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = QueryCache.key_for_sql(klantnummer, sql, max_rows, self.transport)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        body = {'klantnummer': klantnummer, 'sql': sql}
+        if max_rows:
+            body['max_rows'] = max_rows
+        df = await self._fetch_frame('/api/data/query', body, convert_numeric=True)
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, df, klantnummer=int(klantnummer), sql=sql[:500])
+        return df
+
+    async def query_template(self, klantnummer: int, template_name: str, parameters: dict = None,
+                             use_cache: bool = True) -> pd.DataFrame:
+        """Voer een template-query uit. Zie NotificaClient.query_template."""
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = QueryCache.key_for_template(klantnummer, template_name, parameters, self.transport)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        body = {'klantnummer': klantnummer}
+        if parameters:
+            body['parameters'] = parameters
+        df = await self._fetch_frame(f'/api/data/query/{template_name}', body, convert_numeric=False)
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, df, klantnummer=int(klantnummer), template=template_name)
+        return df
+
+    async def gather_queries(self, klantnummer: int, queries: Dict[str, str], max_concurrency: int = 6,
+                             return_exceptions: bool = False, use_cache: bool = True) -> Dict[str, pd.DataFrame]:
+        """Voer een set benoemde SQL queries gelijktijdig uit.
+
+        Args:
+            klantnummer: Klantnummer
+            queries: Dict {naam: sql}
+            max_concurrency: Maximaal aantal gelijktijdige requests
+                (de rate limiter doseert daarnaast op 60 per minuut)
+            return_exceptions: True = fout per query als waarde teruggeven
+                in plaats van de eerste fout te raisen
+            use_cache: Gebruik de query cache (als geconfigureerd)
+
+        Returns:
+            Dict {naam: DataFrame} (of exception bij return_exceptions=True)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(sql):
+            async with semaphore:
+                return await self.query(klantnummer, sql, use_cache=use_cache)
+
+        names = list(queries)
+        results = await asyncio.gather(
+            *(run(queries[name]) for name in names),
+            return_exceptions=return_exceptions,
+        )
+        return dict(zip(names, results))
+
+    # ===== SCHEMA =====
+
+    async def schema(self, klantnummer: int) -> dict:
+        """Ontdek het database schema (vereist dev_mode)."""
+        return await self._request('GET', f'/api/data/schema/{klantnummer}')
+
+    # ===== CSV =====
+
+    async def csv_files(self, klantnummer: int, date: str, folder: str) -> list:
+        """Lijst bestanden in een CSV batch."""
+        result = await self._request('GET', f'/api/data/csv/{klantnummer}/{date}/{folder}/files')
+        return result.get('files', result) if isinstance(result, dict) else result
+
+    async def csv_download(self, klantnummer: int, date: str, folder: str, filename: str) -> pd.DataFrame:
+        """Download een CSV bestand als DataFrame."""
+        resp = await self._send('GET', f'/api/data/csv/{klantnummer}/{date}/{folder}/{filename}')
+        if resp.status_code != 200:
+            try:
+                error_msg = resp.json().get('error', resp.text)
+            except Exception:
+                error_msg = resp.text
+            raise ServerError(f"CSV download mislukt: {error_msg}", status_code=resp.status_code)
+        return pd.read_csv(io.StringIO(resp.text))